@@ -1,12 +1,16 @@
 import re
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Dict, List
 
 from dotenv import load_dotenv
 
+from utils import aone
 from utils.cli import run_command
+from utils.exceptions import InvalidData, InvalidState, ToolkitError
 from utils.file import (
     SITES_SKIP_KEYS,
     is_encrypted_ansible,
+    load_file,
     load_yaml,
     loads_json,
     read_component_site_variables,
@@ -15,46 +19,39 @@ from utils.file import (
     save_yaml_file,
 )
 from utils.git import (
-    git_add,
-    git_branches,
-    git_checkout,
-    git_clean_fd,
-    git_clone,
-    git_commit,
+    git_commit_changes,
     git_create_branch,
-    git_current_branch,
-    git_detect_changes,
-    git_fetch_prune,
-    git_pull,
-    git_push,
-    git_reset_hard,
-    git_sync_branches,
-    git_validate_token,
+    git_fetch_branch,
+    git_push_branches,
+    git_refs,
+    git_remote_branches,
+    git_rev_parse,
 )
-from utils.logs import msg, setup_logger
+from utils.github import github_validate_access
+from utils.library import (
+    SITE_LIBRARY_COMMIT_FILE,
+    library_changed_components,
+    prepare_library,
+)
+from utils.logs import MessageBuffer, msg, setup_logger
+from utils.metrics import log_run_metrics
 from utils.one import (
     check_one_health,
     oneacl_create,
-    oneflow_custom_attr_value_by_id,
-    oneflow_role_vm_name_by_id,
     onegate_endpoint,
     onegroup_addadmin,
     onegroup_create,
     onegroup_id,
-    onegroups_names,
     onehost_cpu_model,
     onehosts_avx_cpu_mem,
-    onemarket_create,
-    onemarket_show,
     onemarketapp_add,
     onemarketapp_instantiate,
     onemarketapp_name,
+    onemarkets_bootstrap,
     oneuser_chgrp,
     oneuser_create,
     oneuser_update_public_ssh_key,
     oneusername_id,
-    oneusernames,
-    onevm_cpu_model,
     onevm_deploy,
     onevm_disk_resize,
     onevm_ip,
@@ -63,14 +60,13 @@ from utils.one import (
     onevm_updateconf_cpu_model,
     onevm_user_input,
     onevm_user_input_by_id,
-    onevm_user_template_param,
 )
 from utils.os import (
     DOTENV_PATH,
     TEMP_DIRECTORY,
     get_dotenv_var,
+    is_file,
     join_path,
-    list_dirs_no_hidden,
     make_directory,
     remove_directory,
     remove_file,
@@ -84,6 +80,11 @@ from utils.questionary import (
     ask_select,
     ask_text,
 )
+from utils.trace import log_trace_summary, set_phase, set_thread_phase
+
+# messages of the repositories prepared in the background, logged once they are waited for
+repositories = None
+repositories_messages = MessageBuffer()
 
 try:
     # configuration
@@ -140,6 +141,7 @@ try:
     )
     route_manager_api_token_param = get_dotenv_var(key="ROUTE_MANAGER_API_TOKEN_PARAM")
     github_organization_name = get_dotenv_var(key="GITHUB_ORGANIZATION_NAME")
+    github_api_url = get_dotenv_var(key="GITHUB_API_URL")
     github_sites_team_name = get_dotenv_var(key="GITHUB_SITES_TEAM_NAME")
     sites_https_url = get_dotenv_var(key="SITES_HTTPS_URL")
     sites_repository_name = get_dotenv_var(key="SITES_REPOSITORY_NAME")
@@ -147,6 +149,8 @@ try:
     library_https_url = get_dotenv_var(key="LIBRARY_HTTPS_URL")
     library_repository_name = get_dotenv_var(key="LIBRARY_REPOSITORY_NAME")
     library_ref = get_dotenv_var(key="LIBRARY_REF")
+    library_checkout = get_dotenv_var(key="LIBRARY_CHECKOUT")
+    library_components_shown = get_dotenv_var(key="LIBRARY_COMPONENTS")
     trial_network_component = get_dotenv_var(key="TRIAL_NETWORK_COMPONENT")
     pipeline_tn_deploy = get_dotenv_var(key="PIPELINE_TN_DEPLOY")
     tnlcm_port = get_dotenv_var(key="TNLCM_PORT")
@@ -170,6 +174,7 @@ try:
     msg(level="info", message=f"Temporary directory created in path: {TEMP_DIRECTORY}")
 
     # validation
+    set_phase(phase="validation")
     msg(
         level="info",
         message=(
@@ -190,11 +195,11 @@ try:
     )
 
     if opennebula_version == "Other":
-        msg(level="error", message=("The toolkit installer is only available for the following OpenNebula versions: 6.10.x. and 7.0.x. "
+        raise ToolkitError(
+            "The toolkit installer is only available for the following OpenNebula versions: 6.10.x. and 7.0.x. "
             "Please reinstall OpenNebula using one of these supported versions before proceeding. "
             f"For more information, refer to the official documentation: {sandbox_documentation_url}/site_admin/toolkit#requirements"
-       ),)
-        exit(1)
+        )
     else:
         if opennebula_version == "6.10.x":
             msg(level="info", message="ACCESSING TO TOOLKIT FOR OPENNEBULA 6.10.X")
@@ -221,18 +226,55 @@ try:
     )
     msg(
         level="info",
-        message=f"Validating if the personal access token of the user {github_username} with access to the {sites_repository_name} repository is correct",
+        message=f"Validating if the personal access token of the user {github_username} with access to the {sites_repository_name} repository is correct and if the user is a member of the {github_sites_team_name} team",
     )
-    git_validate_token(
+    github_validate_access(
         token=sites_github_token,
         organization_name=github_organization_name,
         repository_name=sites_repository_name,
+        team_name=github_sites_team_name,
         username=github_username,
+        api_url=github_api_url,
+        cache_path=join_path(TEMP_DIRECTORY, "github"),
     )
     msg(level="info", message="Token validated successfully")
 
+    # repositories, prepared in the background while OpenNebula is configured
+    sites_path = join_path(TEMP_DIRECTORY, sites_repository_name)
+    library_path = join_path(TEMP_DIRECTORY, library_repository_name)
+    repositories = ThreadPoolExecutor(
+        max_workers=3,
+        thread_name_prefix="repositories",
+        initializer=set_thread_phase,
+        initargs=("repositories", repositories_messages),
+    )
+    sites_future = repositories.submit(
+        git_remote_branches, https_url=sites_https_url, token=sites_github_token
+    )
+    sites_main_future = repositories.submit(
+        git_fetch_branch,
+        https_url=sites_https_url,
+        path=sites_path,
+        branch="main",
+        token=sites_github_token,
+    )
+    library_future = repositories.submit(
+        prepare_library,
+        https_url=library_https_url,
+        path=library_path,
+        ref=library_ref,
+        checkout=library_checkout,
+        patterns=[
+            "/*/.tnlcm/public.yaml",
+            f"/{trial_network_component}/sample_tnlcm_descriptor.yaml",
+        ],
+        cache_path=join_path(TEMP_DIRECTORY, f"{library_repository_name}-metadata"),
+    )
+    repositories.shutdown(wait=False)
+
     # user
-    usernames = oneusernames()
+    set_phase(phase="user/group")
+    usernames, groups_names = aone.gather(aone.user_names(), aone.group_names())
     msg(
         level="info",
         message="User in OpenNebula is required to manage the trial networks deployed in 6G-SANDBOX. We recommend to create a new user for this purpose",
@@ -265,7 +307,6 @@ try:
         msg(level="info", message=f"User {username} already exists in OpenNebula")
 
     # group
-    groups_names = onegroups_names()
     msg(
         level="info",
         message="Group in OpenNebula is required to manage the trial networks deployed in 6G-SANDBOX. We recommend to create a new group for this purpose",
@@ -305,30 +346,30 @@ try:
     )
 
     # marketplaces
-    if not onemarket_show(marketplace_name=opennebula_public_marketplace_name):
-        _ = onemarket_create(
-            marketplace_name=opennebula_public_marketplace_name,
-            marketplace_description=opennebula_public_marketplace_description,
-            marketplace_endpoint=opennebula_public_marketplace_endpoint,
-            marketplace_monitoring_interval=marketplace_monitoring_interval,
-        )
-        msg(
-            level="info",
-            message=f"Marketplace {opennebula_public_marketplace_name} created successfully",
-        )
-    if not onemarket_show(marketplace_name=opennebula_sandbox_marketplace_name):
-        _ = onemarket_create(
-            marketplace_name=opennebula_sandbox_marketplace_name,
-            marketplace_description=opennebula_sandbox_marketplace_description,
-            marketplace_endpoint=opennebula_sandbox_marketplace_endpoint,
-            marketplace_monitoring_interval=marketplace_monitoring_interval,
-        )
+    set_phase(phase="marketplaces")
+    created_marketplaces = onemarkets_bootstrap(
+        marketplaces=[
+            {
+                "name": opennebula_public_marketplace_name,
+                "description": opennebula_public_marketplace_description,
+                "endpoint": opennebula_public_marketplace_endpoint,
+            },
+            {
+                "name": opennebula_sandbox_marketplace_name,
+                "description": opennebula_sandbox_marketplace_description,
+                "endpoint": opennebula_sandbox_marketplace_endpoint,
+            },
+        ],
+        marketplace_monitoring_interval=int(marketplace_monitoring_interval),
+    )
+    for created_marketplace in created_marketplaces:
         msg(
             level="info",
-            message=f"Marketplace {opennebula_sandbox_marketplace_name} created successfully",
+            message=f"Marketplace {created_marketplace} created successfully",
         )
 
     # toolkit service
+    set_phase(phase="toolkit service")
     appliance_toolkit_service_name = onemarketapp_name(
         appliance_url=appliance_toolkit_service_url
     )
@@ -346,9 +387,8 @@ try:
     )
 
     if not is_toolkit_service_instantiated:
-        msg(
-            level="error",
-            message=f"Appliance {appliance_toolkit_service_name} not instantiated and is MANDATORY",
+        raise InvalidState(
+            f"Appliance {appliance_toolkit_service_name} not instantiated and is MANDATORY"
         )
     msg(
         level="info",
@@ -358,16 +398,29 @@ try:
             "The public SSH key is stored in the user template of the Jenkins virtual machine."
         ),
     )
-    jenkins_vm = oneflow_role_vm_name_by_id(
-        oneflow_id=toolkit_service_id,
-        oneflow_role=toolkit_service_jenkins_role,
-    )
-    jenkins_ssh_key = onevm_user_template_param(
-        vm_name=jenkins_vm, param=toolkit_service_jenkins_ssh_key_param
+    jenkins_vm, minio_vm, tnlcm_vm, sites_ansible_token = aone.gather(
+        aone.flow_role_vm_name_by_id(
+            oneflow_id=toolkit_service_id,
+            oneflow_role=toolkit_service_jenkins_role,
+        ),
+        aone.flow_role_vm_name_by_id(
+            oneflow_id=toolkit_service_id,
+            oneflow_role=toolkit_service_minio_role,
+        ),
+        aone.flow_role_vm_name_by_id(
+            oneflow_id=toolkit_service_id,
+            oneflow_role=toolkit_service_tnlcm_role,
+        ),
+        aone.flow_custom_attr_value_by_id(
+            oneflow_id=toolkit_service_id,
+            attr_key=toolkit_service_sites_ansible_token,
+        ),
     )
-    sites_ansible_token = oneflow_custom_attr_value_by_id(
-        oneflow_id=toolkit_service_id,
-        attr_key=toolkit_service_sites_ansible_token,
+    jenkins_ssh_key, tnlcm_cpu_model = aone.gather(
+        aone.vm_user_template_param(
+            vm_name=jenkins_vm, param=toolkit_service_jenkins_ssh_key_param
+        ),
+        aone.vm_cpu_model(vm_name=tnlcm_vm),
     )
     sites_ansible_token_path = join_path(
         TEMP_DIRECTORY, toolkit_service_sites_ansible_token
@@ -382,10 +435,6 @@ try:
         level="info",
         message=f"Resizing MinIO disk with id {toolkit_service_minio_disk_id} to {toolkit_service_minio_disk_size} GB",
     )
-    minio_vm = oneflow_role_vm_name_by_id(
-        oneflow_id=toolkit_service_id,
-        oneflow_role=toolkit_service_minio_role,
-    )
     onevm_disk_resize(
         vm_name=minio_vm,
         disk_id=toolkit_service_minio_disk_id,
@@ -395,10 +444,6 @@ try:
         level="info",
         message=f"Disk with id {toolkit_service_minio_disk_id} resized to {toolkit_service_minio_disk_size} GB",
     )
-    tnlcm_vm = oneflow_role_vm_name_by_id(
-        oneflow_id=toolkit_service_id,
-        oneflow_role=toolkit_service_tnlcm_role,
-    )
     msg(
         level="info",
         message=f"The TNLCM virtual machine requires a CPU model with AVX support because it uses MongoDB. Readme more here: {sandbox_documentation_url}/toolkit-installer/installation#known-issues"
@@ -407,7 +452,6 @@ try:
         "Then, if there are compatible hosts, select the one where TNLCM will be deployed. "
         "If there are no compatible models, the default value is used: host-passthrough",
     )
-    tnlcm_cpu_model = onevm_cpu_model(vm_name=tnlcm_vm)
     if tnlcm_cpu_model != tnlcm_default_cpu_model:
         msg(
             level="warning",
@@ -448,6 +492,7 @@ try:
         )
 
     # technitium
+    set_phase(phase="appliances")
     appliance_technitium_name = onemarketapp_name(
         appliance_url=appliance_technitium_url
     )
@@ -491,6 +536,7 @@ try:
         )
 
     # sites
+    set_phase(phase="sites")
     msg(
         level="info",
         message=(
@@ -499,11 +545,10 @@ try:
             f"Read the dummy site documentation here {dummy_site_url} before start with this process. Just fill in the requested fields. Some are autocomplete"
         ),
     )
-    sites_path = join_path(TEMP_DIRECTORY, sites_repository_name)
-    git_clone(https_url=sites_https_url, path=sites_path, token=sites_github_token)
-    git_fetch_prune(path=sites_path)
-    git_sync_branches(path=sites_path)
-    sites = git_branches(path=sites_path)
+    wait([sites_future, sites_main_future])
+    repositories_messages.flush()
+    sites = sites_future.result()
+    sites_main_future.result()
     site = ask_select(
         message=(
             "Select an existing site or create a new one. If you select a site that already exists, the documentation is encrypted for security reasons. "
@@ -512,12 +557,12 @@ try:
         choices=["Create new site"] + sites,
     )
     if site != "Create new site":
-        current_branch = git_current_branch(path=sites_path)
-        if current_branch != site:
-            if git_detect_changes(path=sites_path):
-                git_reset_hard(path=sites_path)
-                git_clean_fd(path=sites_path)
-            git_checkout(path=sites_path, ref=site)
+        git_fetch_branch(
+            https_url=sites_https_url,
+            path=sites_path,
+            branch=site,
+            token=sites_github_token,
+        )
         site_path = join_path(sites_path, site)
         core_site_path = join_path(site_path, "core.yaml")
         if is_encrypted_ansible(file_path=core_site_path):
@@ -537,10 +582,15 @@ try:
                 else True
             ),
         )
-        if git_detect_changes(path=sites_path):
-            git_reset_hard(path=sites_path)
-            git_clean_fd(path=sites_path)
-        git_create_branch(path=sites_path, new_branch=site, base_branch="main")
+        # main was fetched with the repositories prepared in the background
+        if site in git_refs(path=sites_path).names():
+            msg(
+                level="info",
+                message=f"Local branch {site} left by an interrupted run without a remote branch is recreated from main",
+            )
+        git_create_branch(
+            path=sites_path, new_branch=site, base_branch="main", reset=True
+        )
         remove_directory(path=join_path(sites_path, ".github"))
         remove_file(path=join_path(sites_path, "README.md"))
         dummy_site_path = join_path(sites_path, ".dummy_site")
@@ -554,9 +604,8 @@ try:
     site_data = read_site_yaml(data=core_site_data)
     for sites_key in SITES_SKIP_KEYS:
         if sites_key not in core_site_data:
-            msg(
-                level="error",
-                message=f"Key {sites_key} not found in site {site} in repository {sites_repository_name}",
+            raise InvalidData(
+                f"Key {sites_key} not found in site {site} in repository {sites_repository_name}"
             )
     if is_technitium_instantiated:
         # Use VM ID to avoid conflicts with VMs of the same name
@@ -567,9 +616,8 @@ try:
     site_data["site_onegate"] = onegate_endpoint()
     site_data["site_s3_server"] = core_site_data["site_s3_server"]
     if "endpoint" not in core_site_data["site_s3_server"]:
-        msg(
-            level="error",
-            message=f"Endpoint not found in site_s3_server in site {site} in repository {sites_repository_name}",
+        raise InvalidData(
+            f"Endpoint not found in site_s3_server in site {site} in repository {sites_repository_name}"
         )
     site_data["site_s3_server"]["endpoint"] = (
         f"https://{onevm_ip(vm_name=minio_vm)}:9000"
@@ -577,23 +625,22 @@ try:
     site_data["site_routemanager"] = core_site_data["site_routemanager"]
     if is_route_manager_api_instantiated:
         if "api_endpoint" not in core_site_data["site_routemanager"]:
-            msg(
-                level="error",
-                message=f"API endpoint not found in site_routemanager in site {site} in repository {sites_repository_name}",
+            raise InvalidData(
+                f"API endpoint not found in site_routemanager in site {site} in repository {sites_repository_name}"
             )
         # Use VM ID to avoid conflicts with VMs of the same name
         site_data["site_routemanager"]["api_endpoint"] = onevm_ip_by_id(
             vm_id=route_manager_api_vm_id
         )
         if "token" not in core_site_data["site_routemanager"]:
-            msg(
-                level="error",
-                message=f"Token not found in site_routemanager in site {site} in repository {sites_repository_name}",
+            raise InvalidData(
+                f"Token not found in site_routemanager in site {site} in repository {sites_repository_name}"
             )
         site_data["site_routemanager"]["token"] = route_manager_api_token
     site_data["site_available_components"] = core_site_data["site_available_components"]
 
     # library
+    set_phase(phase="library")
     msg(
         level="info",
         message=(
@@ -601,48 +648,37 @@ try:
             f"The {library_repository_name} repository contains the description of the components using YAML files and the ansible playbooks to deploy the components"
         ),
     )
-    library_path = join_path(TEMP_DIRECTORY, library_repository_name)
-    git_clone(https_url=library_https_url, path=library_path)
-    git_pull(path=library_path)
-    git_fetch_prune(path=library_path)
-    git_sync_branches(path=library_path)
-    git_checkout(path=library_path, ref=library_ref)
-    library_components = list_dirs_no_hidden(path=library_path)
+    wait([library_future])
+    repositories_messages.flush()
+    library_components = library_future.result()
     if not library_components:
-        msg(
-            level="error",
-            message=f"No components found in repository {library_repository_name} using ref {library_ref}",
+        raise InvalidData(
+            f"No components found in repository {library_repository_name} using ref {library_ref}"
         )
+    site_library_commit_path = join_path(site_path, SITE_LIBRARY_COMMIT_FILE)
+    if library_components_shown == "changed":
+        library_commit = git_rev_parse(path=library_path, ref="HEAD")
+        if is_file(path=site_library_commit_path):
+            site_library_commit = load_file(file_path=site_library_commit_path).strip()
+            changed_components = library_changed_components(
+                path=library_path, old_commit=site_library_commit, new_commit=library_commit
+            )
+            if changed_components is not None:
+                msg(
+                    level="info",
+                    message=f"Site {site} was updated with the commit {site_library_commit} of the {library_repository_name}. Only the {len(changed_components & library_components.keys())} components added or changed since then are shown",
+                )
+                library_components = {
+                    component: component_data
+                    for component, component_data in library_components.items()
+                    if component in changed_components
+                }
     msg(
         level="info",
         message=f"Proceed to read component by component of the {library_repository_name} to determine if you want to add it to your site {site}",
     )
-    for component in library_components:
-        component_data = load_yaml(
-            file_path=join_path(library_path, component, ".tnlcm", "public.yaml")
-        )
-        if "metadata" not in component_data:
-            msg(
-                level="error",
-                message=f"Metadata not found in component {component} in repository {library_repository_name} using ref {library_ref}",
-            )
-        metadata = component_data["metadata"]
-        if not isinstance(metadata, Dict):
-            msg(
-                level="error",
-                message=f"Metadata for component {component} in repository {library_repository_name} using ref {library_ref} is not a dictionary",
-            )
-        if "long_description" not in metadata:
-            msg(
-                level="error",
-                message=f"Long description not found in component {component} in repository {library_repository_name} using ref {library_ref}",
-            )
-        long_description = metadata["long_description"]
-        if not isinstance(long_description, str):
-            msg(
-                level="error",
-                message=f"Long description for component {component} in repository {library_repository_name} using ref {library_ref} is not a string",
-            )
+    for component, component_data in library_components.items():
+        long_description = component_data["metadata"]["long_description"]
         component_upper = component.upper()
         component_header = f"\n{'━' * 60}\n📦 Component: {component_upper}\n{'━' * 60}"
         add_component = ask_confirm(
@@ -657,26 +693,22 @@ try:
                     site_data["site_available_components"][component] = None
             else:
                 if "site_variables" not in component_data:
-                    msg(
-                        level="error",
-                        message=f"Site variables not found in component {component} in repository {library_repository_name} using ref {library_ref}",
+                    raise InvalidData(
+                        f"Site variables not found in component {component} in repository {library_repository_name} using ref {library_ref}"
                     )
                 appliance_site_variables = component_data["site_variables"]
                 if not isinstance(appliance_site_variables, Dict):
-                    msg(
-                        level="error",
-                        message=f"Site variables for component {component} in repository {library_repository_name} using ref {library_ref} is not a dictionary",
+                    raise InvalidData(
+                        f"Site variables for component {component} in repository {library_repository_name} using ref {library_ref} is not a dictionary"
                     )
                 component_appliances_urls = component_data["metadata"]["appliances"]
                 if not isinstance(component_appliances_urls, List):
-                    msg(
-                        level="error",
-                        message=f"Appliances key for component {component} in repository {library_repository_name} using ref {library_ref} is not a list",
+                    raise InvalidData(
+                        f"Appliances key for component {component} in repository {library_repository_name} using ref {library_ref} is not a list"
                     )
                 if not component_appliances_urls:
-                    msg(
-                        level="error",
-                        message=f"No appliances found for component {component} in repository {library_repository_name} using ref {library_ref}",
+                    raise InvalidData(
+                        f"No appliances found for component {component} in repository {library_repository_name} using ref {library_ref}"
                     )
                 component_appliances_names = []
                 component_appliances_urls_names = {}
@@ -731,11 +763,8 @@ try:
                             appliance_url=component_appliance_url,
                         )
                     else:
-                        msg(
-                            level="error",
-                            message=(
-                                f"Appliance {component_appliance_name} not found in marketplaces {opennebula_public_marketplace_name} or {opennebula_sandbox_marketplace_name}"
-                            ),
+                        raise InvalidData(
+                            f"Appliance {component_appliance_name} not found in marketplaces {opennebula_public_marketplace_name} or {opennebula_sandbox_marketplace_name}"
                         )
                     # Store IDs for this appliance
                     appliance_ids[component_appliance_name] = {
@@ -832,12 +861,13 @@ try:
                 site_data["site_available_components"][component] = (
                     appliance_site_variables
                 )
+    set_phase(phase="sites")
     save_yaml_file(data=site_data, file_path=core_site_path)
     ansible_encrypt(data_path=core_site_path, token_path=sites_ansible_token_path)
-    if git_detect_changes(path=site_path):
-        git_add(path=site_path)
-        git_commit(path=site_path, message=f"change: site {site}")
-        git_push(path=site_path)
+    if library_components_shown == "changed":
+        save_file(data=f"{library_commit}\n", file_path=site_library_commit_path)
+    if git_commit_changes(path=site_path, message=f"change: site {site}"):
+        git_push_branches(path=site_path, branches=[site])
     msg(
         level="info",
         message=(
@@ -849,6 +879,7 @@ try:
     )
 
     # trial network
+    set_phase(phase="trial network")
     deploy_trial_network = ask_confirm(
         message="Do you want to deploy a trial network in the site?",
         default=False,
@@ -864,50 +895,83 @@ try:
         )
         credentials = f"{tnlcm_admin_user}:{tnlcm_admin_password}"
         encoded_credentials = encode_base64(data=credentials)
-        tnlcm_login = f'curl -w "%{{http_code}}" -X POST {tnlcm_url}/api/v1/user/login -H "accept: application/json" -H "authorization: Basic {encoded_credentials}"'
+        tnlcm_login = [
+            "curl",
+            "-w",
+            "%{http_code}",
+            "-X",
+            "POST",
+            f"{tnlcm_url}/api/v1/user/login",
+            "-H",
+            "accept: application/json",
+            "-H",
+            f"authorization: Basic {encoded_credentials}",
+        ]
         stdout, stderr, rc = run_command(command=tnlcm_login)
         tokens, status_code = stdout[:-3].strip(), stdout[-3:]
         if status_code != "201":
-            msg(
-                level="error",
-                message=f"Failed to login to TNLCM. Status code: {status_code}. API response: {tokens}. Return code: {rc}",
+            raise ToolkitError(
+                f"Failed to login to TNLCM. Status code: {status_code}. API response: {tokens}. Return code: {rc}"
             )
         access_token = loads_json(data=tokens)["access_token"]
         msg(level="info", message="Logged in successfully to TNLCM")
         trial_network_path = join_path(
             library_path, trial_network_component, "sample_tnlcm_descriptor.yaml"
         )
-        tnlcm_create_trial_network = f'''curl -w "%{{http_code}}" -X POST "{tnlcm_url}/api/v1/trial-network?validate=true" \
-            -H "accept: application/json" \
-            -H "Authorization: Bearer {access_token}" \
-            -H "Content-Type: multipart/form-data" \
-            -F "tn_id=test" \
-            -F "descriptor=@{trial_network_path}" \
-            -F "library_reference_type=branch" \
-            -F "library_reference_value={library_ref}" \
-            -F "sites_branch={site}" \
-            -F "deployment_site={site}"'''
+        tnlcm_create_trial_network = [
+            "curl",
+            "-w",
+            "%{http_code}",
+            "-X",
+            "POST",
+            f"{tnlcm_url}/api/v1/trial-network?validate=true",
+            "-H",
+            "accept: application/json",
+            "-H",
+            f"Authorization: Bearer {access_token}",
+            "-H",
+            "Content-Type: multipart/form-data",
+            "-F",
+            "tn_id=test",
+            "-F",
+            f"descriptor=@{trial_network_path}",
+            "-F",
+            "library_reference_type=branch",
+            "-F",
+            f"library_reference_value={library_ref}",
+            "-F",
+            f"sites_branch={site}",
+            "-F",
+            f"deployment_site={site}",
+        ]
         stdout, stderr, rc = run_command(command=tnlcm_create_trial_network)
         response_create_trial_network, status_code = stdout[:-3].strip(), stdout[-3:]
         if status_code != "201":
-            msg(
-                level="error",
-                message=f"Failed to create trial network in TNLCM. Status code: {status_code}. API response: {response_create_trial_network}. Return code: {rc}",
+            raise ToolkitError(
+                f"Failed to create trial network in TNLCM. Status code: {status_code}. API response: {response_create_trial_network}. Return code: {rc}"
             )
         trial_network_id = loads_json(data=response_create_trial_network)["tn_id"]
         msg(
             level="info",
             message=f"Trial network {trial_network_id} created successfully in TNLCM",
         )
-        deploy_trial_network = f'''curl -w "%{{http_code}}" -X POST "{tnlcm_url}/api/v1/trial-network/{trial_network_id}/activate" \
-            -H "accept: application/json" \
-            -H "Authorization: Bearer {access_token}"'''
+        deploy_trial_network = [
+            "curl",
+            "-w",
+            "%{http_code}",
+            "-X",
+            "POST",
+            f"{tnlcm_url}/api/v1/trial-network/{trial_network_id}/activate",
+            "-H",
+            "accept: application/json",
+            "-H",
+            f"Authorization: Bearer {access_token}",
+        ]
         stdout, stderr, rc = run_command(command=deploy_trial_network)
         response_deploy_trial_network, status_code = stdout[:-3].strip(), stdout[-3:]
         if status_code != "200":
-            msg(
-                level="error",
-                message=f"Failed to deploy trial network in TNLCM. Status code: {status_code}. API response: {response_deploy_trial_network}. Return code: {rc}",
+            raise ToolkitError(
+                f"Failed to deploy trial network in TNLCM. Status code: {status_code}. API response: {response_deploy_trial_network}. Return code: {rc}"
             )
         msg(
             level="info",
@@ -920,6 +984,17 @@ except KeyboardInterrupt:
     print("Operation interrupted by user")
     exit(1)
 
+except ToolkitError as e:
+    msg(level="error", message=e.message)
+    exit(1)
+
 except Exception as e:
     print(f"An error occurred: {e}")
     exit(1)
+
+finally:
+    if repositories is not None:
+        repositories.shutdown(wait=False, cancel_futures=True)
+    repositories_messages.flush()
+    log_run_metrics()
+    log_trace_summary()
@@ -0,0 +1,944 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of installer.py against a simulated backend
+
+The installer runs from the first prompt to the trial network with scripted
+answers, against:
+
+- the simulated OpenNebula CLI of scripts/one_simulator.py, with its resources
+  reaching their final state at once
+- an XML-RPC server answering one.system.version
+- an HTTP server answering the GitHub API requests, with ETags
+- fake systemctl, curl (marketplace appliances and TNLCM) and ansible-vault
+  commands
+- local sites and library git repositories
+
+The sleeps of the wait loops are skipped. Every command and RPC is traced and
+tagged with the installer phase that ran it, and the report shows the wall time
+and the number of commands of each phase:
+
+    python3 scripts/benchmark_installer.py
+    python3 scripts/benchmark_installer.py --output results.json
+    python3 scripts/benchmark_installer.py --budgets results.json --threshold 1.5
+    python3 scripts/benchmark_installer.py --replay
+
+The script exits with 1 when the run fails or a phase runs more commands than
+its budget, so a change that adds an N+1 show loop fails the suite. The budgets
+of the default scenario are in BUDGETS; update them in the same change when
+commands are added on purpose. A results file works as a budgets file, its
+seconds are then compared with the threshold ratio.
+
+With --replay the run is recorded in a cassette and replayed offline: the
+installer runs again without the simulated OpenNebula CLI, the XML-RPC and
+GitHub servers and the fake curl, and must succeed with the commands served
+from the cassette. Only git and ansible-vault run for real, against restored
+copies of the repositories, since later steps read the files they create.
+"""
+
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import re
+import runpy
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from one_simulator import (
+    MARKETAPP_TYPE_IMAGE,
+    MARKETAPP_TYPE_SERVICE_TEMPLATE,
+    Frontend,
+    init,
+)
+
+PHASES = (
+    "validation",
+    "repositories",
+    "user/group",
+    "marketplaces",
+    "toolkit service",
+    "appliances",
+    "sites",
+    "library",
+    "trial network",
+)
+
+# Commands and RPCs of each phase in the default scenario
+BUDGETS: Dict[str, Dict[str, float]] = {
+    "validation": {"commands": 4},
+    "repositories": {"commands": 13},
+    "user/group": {"commands": 9},
+    "marketplaces": {"commands": 2},
+    "toolkit service": {"commands": 126},
+    "appliances": {"commands": 43},
+    "sites": {"commands": 10},
+    "library": {"commands": 15},
+    "trial network": {"commands": 6},
+}
+
+DEFAULT_SIZE = 10
+
+DEFAULT_SEED = 0
+
+FAKE_PROGRAMS = ("ansible-vault", "curl", "systemctl")
+
+# Programs run for real when the cassette is replayed, their files are read later
+REPLAY_PASSTHROUGH = ("ansible-vault", "git")
+
+VAULT_HEADER = "$ANSIBLE_VAULT;1.1;AES256"
+
+SANDBOX_MARKETPLACE = "6G-SANDBOX"
+
+SANDBOX_ENDPOINT = "https://marketplace.mobilesandbox.cloud:9443/"
+
+TNLCM_PORT = "5000"
+
+GIT_IDENTITY = {
+    "GIT_AUTHOR_NAME": "benchmark",
+    "GIT_AUTHOR_EMAIL": "benchmark@example.org",
+    "GIT_COMMITTER_NAME": "benchmark",
+    "GIT_COMMITTER_EMAIL": "benchmark@example.org",
+}
+
+# Answers of the prompts, the first pattern found in the message wins. A prompt
+# without a matching pattern takes its default and fails the run if it has none
+FIRST_CHOICE = {"choice": 0}
+ALL_CHOICES = {"choice": "all"}
+ANSWERS: List[Tuple[str, Any]] = [
+    (r"What version of OpenNebula", "6.10.x"),
+    (r"Introduce the username that has been given access", "benchmark"),
+    (r"Introduce the personal access token", "ghp_benchmark"),
+    (r"Select an existing OpenNebula username", "Create new user"),
+    (r"Introduce new OpenNebula username", "benchmark-user"),
+    (r"Introduce the password for user", "benchmark-password"),
+    (r"Select an existing OpenNebula group name", "Create new group"),
+    (r"Introduce new OpenNebula group name", "benchmark-group"),
+    (r"Do you have .* instantiated in OpenNebula", False),
+    (r"No image has been found with the attribute", True),
+    (r"Select the datastore where", "default"),
+    (r"Do you want to instantiate the appliance", True),
+    (r"^Sites token", "benchmark-vault-token"),
+    (r"^TNLCM admin user", "admin"),
+    (r"^TNLCM admin password", "benchmark-password"),
+    (r"^Route manager API token", "benchmark-route-token"),
+    (r"^Public network", FIRST_CHOICE),
+    (r"Do you want to change the CPU model", True),
+    (r"The following hosts support AVX", FIRST_CHOICE),
+    (r"Select an existing site or create a new one", "Create new site"),
+    (r"Introduce new site name", "benchmark"),
+    (r"This key indicates", "1"),
+    (r"Do you want to add \w+ to your site", True),
+    (r"Select the appliances that you want to add", ALL_CHOICES),
+    (r"Do you want to deploy a trial network", True),
+]
+
+
+# ##############################################################################
+# ##                              BACKEND                                     ##
+# ##############################################################################
+
+
+def _appliances() -> Dict[str, Dict]:
+    """
+    The marketplace appliances of the scenario by URL, with their marketplace entry
+    """
+    toolkit_service = {
+        "SIMULATOR_IMAGES": "3",
+        "SIMULATOR_SERVICE": {
+            "roles": ["minio", "jenkins", "tnlcm"],
+            "custom_attrs": {
+                "oneapp_jenkins_sites_token": "M|password|Sites token| |",
+                "ONEAPP_TNLCM_ADMIN_USER": "M|text|TNLCM admin user| |",
+                "ONEAPP_TNLCM_ADMIN_PASSWORD": "M|password|TNLCM admin password| |",
+            },
+            "networks": {"Public": "M|network|Public network| |id:"},
+        },
+    }
+    route_manager = {
+        "SIMULATOR_IMAGES": "1",
+        "SIMULATOR_USER_INPUTS": {
+            "ONEAPP_ROUTEMANAGER_APITOKEN": "M|password|Route manager API token| |"
+        },
+    }
+    return {
+        f"{SANDBOX_ENDPOINT}appliance/toolkit_service": {
+            "name": "[6G-Sandbox] Toolkit Service",
+            "type": MARKETAPP_TYPE_SERVICE_TEMPLATE,
+            "template": toolkit_service,
+        },
+        f"{SANDBOX_ENDPOINT}appliance/dns": {
+            "name": "[6G-Sandbox] Technitium",
+            "type": MARKETAPP_TYPE_IMAGE,
+            "template": {"SIMULATOR_IMAGES": "1"},
+        },
+        f"{SANDBOX_ENDPOINT}appliance/routemanager": {
+            "name": "[6G-Sandbox] Route Manager API",
+            "type": MARKETAPP_TYPE_IMAGE,
+            "template": route_manager,
+        },
+        f"{SANDBOX_ENDPOINT}appliance/ueransim": {
+            "name": "[6G-Sandbox] UERANSIM",
+            "type": MARKETAPP_TYPE_IMAGE,
+            "template": {"SIMULATOR_IMAGES": "1"},
+        },
+    }
+
+
+def _http_responses() -> List[Dict]:
+    """
+    The answers of the fake curl, matched by method and URL pattern
+    """
+    responses = [
+        {
+            "method": "POST",
+            "url": rf":{TNLCM_PORT}/api/v1/user/login$",
+            "status": 201,
+            "body": {"access_token": "benchmark-access-token"},
+        },
+        {
+            "method": "POST",
+            "url": rf":{TNLCM_PORT}/api/v1/trial-network\?validate=true$",
+            "status": 201,
+            "body": {"tn_id": "test"},
+        },
+        {
+            "method": "POST",
+            "url": rf":{TNLCM_PORT}/api/v1/trial-network/[^/]+/activate$",
+            "status": 200,
+            "body": {"message": "Trial network activated"},
+        },
+    ]
+    for url, appliance in _appliances().items():
+        responses.append(
+            {
+                "method": "GET",
+                "url": f"^{re.escape(url)}$",
+                "status": 200,
+                "body": {
+                    "name": appliance["name"],
+                    "description": f"{appliance['name']} appliance",
+                    "version": "6.10.0-1.2",
+                },
+            }
+        )
+    return responses
+
+
+# Answers of the GitHub API server, matched by path
+GITHUB_RESPONSES: List[Tuple[str, Dict]] = [
+    (r"^/repos/[^/]+/[^/]+/collaborators/[^/]+/permission$", {"permission": "admin"}),
+    (
+        r"^/orgs/[^/]+/teams/[^/]+/memberships/[^/]+$",
+        {"state": "active", "role": "member"},
+    ),
+]
+
+
+def _git(*args: str, cwd: str) -> None:
+    subprocess.run(
+        ["git", *args],
+        cwd=cwd,
+        env={**os.environ, **GIT_IDENTITY},
+        check=True,
+        capture_output=True,
+    )
+
+
+def _git_repository(path: str, files: Dict[str, str], tag: Optional[str]) -> str:
+    """
+    Create a bare repository with one commit in main and return its URL
+    """
+    work_path = f"{path}.work"
+    for name, content in files.items():
+        file_path = os.path.join(work_path, name)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file=file_path, mode="wt", encoding="utf-8") as file:
+            file.write(content)
+    _git("init", "-q", "-b", "main", cwd=work_path)
+    _git("add", "-A", cwd=work_path)
+    _git("commit", "-q", "-m", "Initial commit", cwd=work_path)
+    if tag:
+        _git("tag", tag, cwd=work_path)
+    _git("clone", "-q", "--bare", work_path, path, cwd=os.path.dirname(path))
+    shutil.rmtree(work_path)
+    return f"file://{path}"
+
+
+def _component(description: str, appliances: List[str], variables: Dict) -> str:
+    metadata = {"long_description": description}
+    if appliances:
+        metadata["appliances"] = appliances
+    return json.dumps({"metadata": metadata, "site_variables": variables}, indent=2)
+
+
+def prepare(directory: str, seed: int, size: int) -> Dict[str, str]:
+    """
+    Create the simulated backend and the working directory of the installer
+
+    :param directory: the directory where everything is created, ``str``
+    :param seed: the seed of the synthetic OpenNebula pools, ``int``
+    :param size: the number of objects of every OpenNebula pool, ``int``
+    :return: the environment variables the installer runs with, ``Dict[str, str]``
+    """
+    one_path = os.path.join(directory, "one")
+    with contextlib.redirect_stdout(io.StringIO()):
+        init(
+            directory=one_path,
+            seed=seed,
+            size=size,
+            sizes={},
+            latency=0.0,
+            jitter=0.0,
+            list_latency_per_object=0.0,
+            transition=0.0,
+            error_rate=0.0,
+        )
+    frontend = Frontend(
+        directory=one_path,
+        config={"transition": 0.0, "list_latency_per_object": 0.0},
+    )
+    marketplace_id = frontend.add(
+        cli="onemarket",
+        data={
+            "NAME": SANDBOX_MARKETPLACE,
+            "MARKET_MAD": "one",
+            "TEMPLATE": {"ENDPOINT": SANDBOX_ENDPOINT},
+        },
+    )
+    for appliance in _appliances().values():
+        frontend.add(
+            cli="onemarketapp",
+            data={
+                "NAME": appliance["name"],
+                "TYPE": appliance["type"],
+                "MARKETPLACE": SANDBOX_MARKETPLACE,
+                "MARKETPLACE_ID": marketplace_id,
+                "TEMPLATE": appliance["template"],
+            },
+        )
+    frontend.save()
+
+    bin_path = os.path.join(directory, "bin")
+    os.makedirs(bin_path)
+    for program in FAKE_PROGRAMS:
+        os.symlink(os.path.abspath(__file__), os.path.join(bin_path, program))
+    http_responses_path = os.path.join(directory, "http.json")
+    with open(file=http_responses_path, mode="wt", encoding="utf-8") as file:
+        json.dump(_http_responses(), file, indent=2)
+
+    one_location = os.path.join(directory, "opennebula")
+    os.makedirs(os.path.join(one_location, "etc"))
+    with open(
+        file=os.path.join(one_location, "etc", "oned.conf"), mode="wt", encoding="utf-8"
+    ) as file:
+        file.write(
+            'PORT = 2633\nMONITORING_INTERVAL_MARKET = 600\nONEGATE_ENDPOINT = "http://192.168.10.1:5030"\n'
+        )
+
+    remote_path = os.path.join(directory, "remote")
+    os.makedirs(remote_path)
+    core_site = {
+        "site_dns": "",
+        "site_hypervisor": "",
+        "site_onegate": "",
+        "site_s3_server": {"endpoint": "", "access_key": "", "secret_key": ""},
+        "site_routemanager": {
+            "api_endpoint": "filled by the installer",
+            "token": "filled by the installer",
+        },
+        "site_available_components": {},
+        "site_domain": "example.org",
+        "site_public_vlans": [100, 101],
+        "site_default_disk_size": 20,
+    }
+    sites_url = _git_repository(
+        path=os.path.join(remote_path, "sites.git"),
+        files={
+            ".dummy_site/core.yaml": json.dumps(core_site, indent=2),
+            ".github/workflows/validate.yaml": "name: validate\n",
+            "README.md": "# Sites\n",
+        },
+        tag=None,
+    )
+    library_url = _git_repository(
+        path=os.path.join(remote_path, "library.git"),
+        files={
+            "tn_init/.tnlcm/public.yaml": _component(
+                description="Initial component of every trial network",
+                appliances=[],
+                variables={},
+            ),
+            "tn_init/sample_tnlcm_descriptor.yaml": "trial_network: {}\n",
+            "ueransim/.tnlcm/public.yaml": _component(
+                description="UERANSIM 5G UE and RAN simulator",
+                appliances=[f"{SANDBOX_ENDPOINT}appliance/ueransim"],
+                variables={
+                    "template_id": "ID of the VM template",
+                    "image_id": "ID of the image",
+                },
+            ),
+        },
+        tag="v1.0.0",
+    )
+
+    work_path = os.path.join(directory, "work")
+    os.makedirs(work_path)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    shutil.copyfile(os.path.join(root, ".env"), os.path.join(work_path, ".env"))
+    return {
+        "PATH": os.pathsep.join(
+            [bin_path, os.path.join(one_path, "bin"), os.environ.get("PATH", "")]
+        ),
+        "ONE_LOCATION": one_location,
+        "ONE_AUTH": os.path.join(one_location, "one_auth"),
+        "BENCHMARK_HTTP_RESPONSES": http_responses_path,
+        "SITES_HTTPS_URL": sites_url,
+        "LIBRARY_HTTPS_URL": library_url,
+        "OPENNEBULA_SANDBOX_MARKETPLACE_ENDPOINT": SANDBOX_ENDPOINT,
+        "TNLCM_PORT": TNLCM_PORT,
+        "TOOLKIT_INSTALLER_TRACE_PATH": os.path.join(directory, "trace.jsonl"),
+        "TOOLKIT_INSTALLER_CASSETTE_MODE": "",
+        "TOOLKIT_INSTALLER_GIT_CACHE_PATH": os.path.join(directory, "cache"),
+        **GIT_IDENTITY,
+    }
+
+
+# ##############################################################################
+# ##                           FAKE PROGRAMS                                  ##
+# ##############################################################################
+
+
+def fake_ansible_vault(argv: List[str]) -> int:
+    action, path = argv[0], argv[1]
+    with open(file=path, mode="rt", encoding="utf-8") as file:
+        data = file.read()
+    if action == "encrypt":
+        if data.startswith(VAULT_HEADER):
+            print("ERROR! input is already encrypted", file=sys.stderr)
+            return 1
+        data = f"{VAULT_HEADER}\n{data.encode().hex()}\n"
+    elif action == "decrypt":
+        if not data.startswith(VAULT_HEADER):
+            print("ERROR! input is not vault encrypted data", file=sys.stderr)
+            return 1
+        data = bytes.fromhex(data.split("\n", 1)[1].strip()).decode()
+    else:
+        print(f"ansible-vault: action {action} not supported", file=sys.stderr)
+        return 2
+    with open(file=path, mode="wt", encoding="utf-8") as file:
+        file.write(data)
+    print(f"{action.capitalize()}ion successful")
+    return 0
+
+
+def fake_curl(argv: List[str]) -> int:
+    method, write_out, url = "GET", None, None
+    index = 0
+    while index < len(argv):
+        if argv[index] == "-X":
+            method = argv[index + 1]
+            index += 1
+        elif argv[index] == "-w":
+            write_out = argv[index + 1]
+            index += 1
+        elif argv[index] in ("-H", "-F", "-d"):
+            index += 1
+        elif argv[index].startswith("http"):
+            url = argv[index]
+        index += 1
+    with open(
+        file=os.environ["BENCHMARK_HTTP_RESPONSES"], mode="rt", encoding="utf-8"
+    ) as file:
+        responses = json.load(file)
+    status, body = 404, {"message": "Not Found"}
+    for response in responses:
+        if response["method"] == method and re.search(response["url"], url or ""):
+            status, body = response["status"], response["body"]
+            break
+    sys.stdout.write(json.dumps(body))
+    if write_out == "%{http_code}":
+        sys.stdout.write(str(status))
+    return 0
+
+
+def fake_systemctl(argv: List[str]) -> int:
+    if argv and argv[0] == "show":
+        units = ["opennebula.service", "opennebula-flow.service"]
+        print(
+            "\n\n".join(
+                f"Id={unit}\nActiveState=active\nSubState=running" for unit in units
+            )
+        )
+    return 0
+
+
+class GitHubHandler(BaseHTTPRequestHandler):
+    """
+    Answers of the GitHub API, a request with the ETag of the answer gets a 304
+    """
+
+    def do_GET(self) -> None:
+        status, body = 404, {"message": "Not Found"}
+        path = self.path.split("?", 1)[0]
+        for pattern, answer in GITHUB_RESPONSES:
+            if re.search(pattern, path):
+                status, body = 200, answer
+                break
+        data = json.dumps(body).encode()
+        etag = f'"{hashlib.sha256(data).hexdigest()}"'
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 200:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+FAKES: Dict[str, Callable[[List[str]], int]] = {
+    "ansible-vault": fake_ansible_vault,
+    "curl": fake_curl,
+    "systemctl": fake_systemctl,
+}
+
+
+# ##############################################################################
+# ##                               DRIVER                                     ##
+# ##############################################################################
+
+
+def _answer(kind: str, message: str, choices: Optional[List], default: Any) -> Any:
+    for pattern, answer in ANSWERS:
+        if not re.search(pattern, message):
+            continue
+        if answer == ALL_CHOICES:
+            return list(choices)
+        if answer == FIRST_CHOICE:
+            return choices[0]
+        return answer
+    if default not in (None, ""):
+        return default
+    raise RuntimeError(f"No scripted answer for the {kind} prompt: {message}")
+
+
+def _validated(answer: Any, message: str, validate: Any) -> Any:
+    if validate is not None:
+        result = validate(answer)
+        if result is not True:
+            raise RuntimeError(
+                f"Scripted answer {answer!r} rejected ({result}) by the prompt: {message}"
+            )
+    return answer
+
+
+def drive(root: str, directory: str) -> None:
+    """
+    Run installer.py in this process with the scripted answers, skipping the sleeps
+
+    :param root: the checkout whose installer is run, ``str``
+    :param directory: the directory created by prepare, ``str``
+    """
+    slept: Dict[str, float] = {}
+    prompts = []
+
+    def sleep(seconds: float) -> None:
+        from utils.trace import get_phase
+
+        phase = get_phase() or "setup"
+        slept[phase] = slept.get(phase, 0.0) + seconds
+
+    # Patched before the utils package binds them with from imports
+    time.sleep = sleep
+    sys.path.insert(0, root)
+    os.chdir(os.path.join(directory, "work"))
+    from xmlrpc.server import SimpleXMLRPCServer
+
+    from utils import questionary
+
+    def ask_checkbox(message: str, choices: List[str], default: Any = None) -> Any:
+        prompts.append(message)
+        return _answer(kind="checkbox", message=message, choices=choices, default=None)
+
+    def ask_confirm(message: str, default: bool = False) -> bool:
+        prompts.append(message)
+        return _answer(kind="confirm", message=message, choices=None, default=default)
+
+    def ask_password(message: str, default: str = "", validate: Any = None) -> str:
+        prompts.append(message)
+        answer = _answer(
+            kind="password", message=message, choices=None, default=default
+        )
+        return _validated(answer=answer, message=message, validate=validate)
+
+    def ask_select(message: str, choices: List[str], default: Any = None) -> str:
+        prompts.append(message)
+        return _answer(kind="select", message=message, choices=choices, default=None)
+
+    def ask_text(message: str, default: str = "", validate: Any = None) -> str:
+        prompts.append(message)
+        answer = _answer(kind="text", message=message, choices=None, default=default)
+        return _validated(answer=answer, message=message, validate=validate)
+
+    questionary.ask_checkbox = ask_checkbox
+    questionary.ask_confirm = ask_confirm
+    questionary.ask_password = ask_password
+    questionary.ask_select = ask_select
+    questionary.ask_text = ask_text
+
+    servers = []
+    # A replay keeps the URLs of the recorded run, nothing answers them
+    if os.environ.get("TOOLKIT_INSTALLER_CASSETTE_MODE") != "replay":
+        server = SimpleXMLRPCServer(("127.0.0.1", 0), logRequests=False)
+        server.register_function(
+            lambda session: [True, "6.10.0", 0], "one.system.version"
+        )
+        os.environ["ONE_XMLRPC"] = f"http://127.0.0.1:{server.server_address[1]}/RPC2"
+        github_server = ThreadingHTTPServer(("127.0.0.1", 0), GitHubHandler)
+        os.environ["GITHUB_API_URL"] = (
+            f"http://127.0.0.1:{github_server.server_address[1]}"
+        )
+        servers = [server, github_server]
+    for server in servers:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    rc = 0
+    try:
+        runpy.run_path(os.path.join(root, "installer.py"), run_name="__main__")
+    except SystemExit as e:
+        rc = e.code if isinstance(e.code, int) else 1
+    end = time.time()
+    for server in servers:
+        server.shutdown()
+    urls = {name: os.environ[name] for name in ("ONE_XMLRPC", "GITHUB_API_URL")}
+    with open(
+        file=os.path.join(directory, "run.json"), mode="wt", encoding="utf-8"
+    ) as file:
+        json.dump(
+            {
+                "rc": rc,
+                "end": end,
+                "slept": slept,
+                "prompts": prompts,
+                "urls": urls,
+            },
+            file,
+        )
+
+
+def run_driver(root: str, directory: str, env: Dict[str, str]) -> Dict:
+    """
+    Run the driver in a new process with its output saved to installer.log
+
+    :param root: the checkout whose installer is run, ``str``
+    :param directory: the directory with the working directory of the installer, ``str``
+    :param env: the environment variables the installer runs with, ``Dict[str, str]``
+    :return: the result written by the driver, ``Dict``
+    """
+    with open(
+        file=os.path.join(directory, "installer.log"), mode="wt", encoding="utf-8"
+    ) as log:
+        subprocess.run(
+            [
+                sys.executable,
+                os.path.abspath(__file__),
+                "--root",
+                root,
+                "--drive",
+                directory,
+            ],
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+            check=True,
+        )
+    with open(
+        file=os.path.join(directory, "run.json"), mode="rt", encoding="utf-8"
+    ) as file:
+        return json.load(file)
+
+
+def replay(
+    root: str, directory: str, env: Dict[str, str], run: Dict, phases: Dict[str, Dict]
+) -> List[str]:
+    """
+    Replay the cassette of a run offline, with the repositories restored to their state before the run
+
+    :param root: the checkout whose installer is run, ``str``
+    :param directory: the directory created by prepare, ``str``
+    :param env: the environment variables of the recorded run, ``Dict[str, str]``
+    :param run: the result written by the driver of the recorded run, ``Dict``
+    :param phases: the summary of the recorded run by phase, ``Dict[str, Dict]``
+    :return: the differences with the recorded run, ``List[str]``
+    """
+    remote_path = os.path.join(directory, "remote")
+    shutil.rmtree(remote_path)
+    shutil.copytree(os.path.join(directory, "remote.orig"), remote_path)
+    replay_path = os.path.join(directory, "replay")
+    bin_path = os.path.join(replay_path, "bin")
+    os.makedirs(bin_path)
+    os.makedirs(os.path.join(replay_path, "work"))
+    shutil.copyfile(
+        os.path.join(root, ".env"), os.path.join(replay_path, "work", ".env")
+    )
+    for program in REPLAY_PASSTHROUGH:
+        if program in FAKE_PROGRAMS:
+            os.symlink(os.path.abspath(__file__), os.path.join(bin_path, program))
+    replay_env = {
+        **env,
+        **run["urls"],
+        "PATH": os.pathsep.join([bin_path, os.environ.get("PATH", "")]),
+        "TOOLKIT_INSTALLER_CASSETTE_MODE": "replay",
+        "TOOLKIT_INSTALLER_CASSETTE_PASSTHROUGH": " ".join(REPLAY_PASSTHROUGH),
+        "TOOLKIT_INSTALLER_TRACE_PATH": os.path.join(replay_path, "trace.jsonl"),
+        "TOOLKIT_INSTALLER_GIT_CACHE_PATH": os.path.join(replay_path, "cache"),
+    }
+    del replay_env["BENCHMARK_HTTP_RESPONSES"]
+    replay_run = run_driver(root=root, directory=replay_path, env=replay_env)
+    replay_phases = summarize(
+        trace_path=replay_env["TOOLKIT_INSTALLER_TRACE_PATH"], run=replay_run
+    )
+    print(
+        f"{'replay':<16} {sum(phase['commands'] for phase in replay_phases.values()):>8} {'':>7} {replay_run['end'] - run['end']:>8.3f}  served from the cassette"
+    )
+    differences = []
+    if replay_run["rc"] != 0:
+        with open(
+            file=os.path.join(replay_path, "installer.log"), mode="rt", encoding="utf-8"
+        ) as file:
+            print("".join(file.readlines()[-20:]), file=sys.stderr)
+        differences.append(f"installer exited with {replay_run['rc']}")
+    for name, phase in replay_phases.items():
+        recorded = phases.get(name, {"classes": {}})["classes"]
+        for cls in phase["classes"]:
+            if cls not in recorded:
+                differences.append(f"{name} ran {cls}, not run by the recorded run")
+    return differences
+
+
+# ##############################################################################
+# ##                               REPORT                                     ##
+# ##############################################################################
+
+
+def summarize(trace_path: str, run: Dict) -> Dict[str, Dict]:
+    """
+    Group the traced commands by the phase that ran them
+
+    :param trace_path: the trace file of the run, ``str``
+    :param run: the result written by the driver, ``Dict``
+    :return: the commands, classes, wall and skipped sleep seconds of each phase, ``Dict[str, Dict]``
+    """
+    phases: Dict[str, Dict] = {}
+    marks: List[Tuple[float, str]] = []
+    spans: Dict[str, Tuple[float, float]] = {}
+    if os.path.exists(trace_path):
+        with open(file=trace_path, mode="rt", encoding="utf-8") as file:
+            records = [json.loads(line) for line in file if line.strip()]
+    else:
+        records = []
+    for record in records:
+        if "command" not in record:
+            marks.append((record["start"], record["phase"]))
+            continue
+        phase = phases.setdefault(
+            record["phase"] or "setup",
+            {"commands": 0, "seconds": 0.0, "slept": 0.0, "classes": {}},
+        )
+        phase["commands"] += 1
+        first, last = spans.get(record["phase"] or "setup", (record["start"], 0.0))
+        spans[record["phase"] or "setup"] = (
+            min(first, record["start"]),
+            max(last, record["start"] + record["duration"]),
+        )
+        phase["classes"][record["class"]] = phase["classes"].get(record["class"], 0) + 1
+    for index, (start, name) in enumerate(marks):
+        end = marks[index + 1][0] if index + 1 < len(marks) else run["end"]
+        phase = phases.setdefault(
+            name, {"commands": 0, "seconds": 0.0, "slept": 0.0, "classes": {}}
+        )
+        phase["seconds"] += end - start
+    # The phases run in the background have no marks, they last while their commands run
+    marked = {name for _, name in marks}
+    for name, (first, last) in spans.items():
+        if name not in marked:
+            phases[name]["seconds"] = last - first
+    for name, seconds in run["slept"].items():
+        if name in phases:
+            phases[name]["slept"] = seconds
+    order = {name: index for index, name in enumerate(("setup", *PHASES))}
+    return dict(sorted(phases.items(), key=lambda item: order.get(item[0], len(order))))
+
+
+def compare(
+    phases: Dict[str, Dict], budgets: Dict[str, Dict], threshold: float
+) -> List[str]:
+    """
+    Compare the phases of the run with their budgets
+
+    :param phases: the summary of the run by phase, ``Dict[str, Dict]``
+    :param budgets: the maximum commands and seconds of each phase, ``Dict[str, Dict]``
+    :param threshold: the maximum ratio between the seconds of a phase and its budget, ``float``
+    :return: the budgets exceeded, ``List[str]``
+    """
+    exceeded = []
+    for name, budget in budgets.items():
+        phase = phases.get(name, {"commands": 0, "seconds": 0.0})
+        if "commands" in budget and phase["commands"] > budget["commands"]:
+            exceeded.append(
+                f"{name} ran {phase['commands']} commands, budget {budget['commands']}"
+            )
+        if "seconds" in budget and phase["seconds"] > budget["seconds"] * threshold:
+            exceeded.append(
+                f"{name} took {phase['seconds']:.3f} s > {threshold} x {budget['seconds']:.3f} s"
+            )
+    return exceeded
+
+
+def report(phases: Dict[str, Dict], budgets: Dict[str, Dict], top: int) -> None:
+    """
+    Print the phases as a table with their most frequent command classes
+
+    :param phases: the summary of the run by phase, ``Dict[str, Dict]``
+    :param budgets: the maximum commands and seconds of each phase, ``Dict[str, Dict]``
+    :param top: the number of command classes shown per phase, ``int``
+    """
+    print(
+        f"{'phase':<16} {'commands':>8} {'budget':>7} {'wall s':>8} {'slept s':>8}  top commands"
+    )
+    for name, phase in phases.items():
+        budget = budgets.get(name, {}).get("commands", "")
+        classes = sorted(phase["classes"].items(), key=lambda item: -item[1])[:top]
+        print(
+            f"{name:<16} {phase['commands']:>8} {budget:>7} {phase['seconds']:>8.3f} {phase['slept']:>8.0f}  "
+            + ", ".join(f"{cls} x{count}" for cls, count in classes)
+        )
+
+
+def main() -> int:
+    program = os.path.basename(sys.argv[0])
+    if program in FAKES:
+        return FAKES[program](sys.argv[1:])
+    parser = argparse.ArgumentParser(
+        description="End-to-end benchmark of installer.py against a simulated backend"
+    )
+    parser.add_argument(
+        "--root",
+        default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        help="checkout whose installer is benchmarked",
+    )
+    parser.add_argument(
+        "--size", type=int, default=DEFAULT_SIZE, help="objects per pool"
+    )
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--budgets", help="budgets file, or the results of a run")
+    parser.add_argument(
+        "--budget",
+        action="append",
+        default=[],
+        metavar="PHASE=COMMANDS",
+        help="maximum commands of a phase, e.g. sites=20",
+    )
+    parser.add_argument("--threshold", type=float, default=1.5)
+    parser.add_argument("--output", help="file where the results are saved")
+    parser.add_argument("--keep", help="directory kept with the backend, trace and log")
+    parser.add_argument("--top", type=int, default=3, help="command classes per phase")
+    parser.add_argument(
+        "--replay",
+        action="store_true",
+        help="record the run in a cassette and check it replays offline",
+    )
+    parser.add_argument("--drive", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    root = os.path.abspath(args.root)
+    if args.drive:
+        drive(root=root, directory=args.drive)
+        return 0
+
+    if args.budgets:
+        with open(file=args.budgets, mode="rt", encoding="utf-8") as file:
+            budgets = json.load(file)
+        budgets = budgets.get("phases", budgets)
+    elif args.size == DEFAULT_SIZE and args.seed == DEFAULT_SEED:
+        budgets = {name: dict(budget) for name, budget in BUDGETS.items()}
+    else:
+        print("The default budgets only apply to the default scenario", file=sys.stderr)
+        budgets = {}
+    for item in args.budget:
+        name, _, value = item.partition("=")
+        if not value.isdigit():
+            parser.error(f"invalid budget {item}")
+        budgets.setdefault(name, {})["commands"] = int(value)
+
+    directory = args.keep or tempfile.mkdtemp(prefix="benchmark-installer-")
+    os.makedirs(directory, exist_ok=True)
+    try:
+        env = {
+            **os.environ,
+            **prepare(directory=directory, seed=args.seed, size=args.size),
+        }
+        if args.replay:
+            shutil.copytree(
+                os.path.join(directory, "remote"),
+                os.path.join(directory, "remote.orig"),
+            )
+            env["TOOLKIT_INSTALLER_CASSETTE_MODE"] = "record"
+            env["TOOLKIT_INSTALLER_CASSETTE_PATH"] = os.path.join(
+                directory, "cassette.jsonl"
+            )
+        start = time.time()
+        run = run_driver(root=root, directory=directory, env=env)
+        phases = summarize(trace_path=env["TOOLKIT_INSTALLER_TRACE_PATH"], run=run)
+        report(phases=phases, budgets=budgets, top=args.top)
+        print(
+            f"{'total':<16} {sum(phase['commands'] for phase in phases.values()):>8} {'':>7} {run['end'] - start:>8.3f}  {len(run['prompts'])} prompts answered"
+        )
+        if args.output:
+            with open(file=args.output, mode="wt", encoding="utf-8") as file:
+                json.dump(
+                    {"rc": run["rc"], "prompts": len(run["prompts"]), "phases": phases},
+                    file,
+                    indent=2,
+                )
+        if run["rc"] != 0:
+            with open(
+                file=os.path.join(directory, "installer.log"),
+                mode="rt",
+                encoding="utf-8",
+            ) as file:
+                print("".join(file.readlines()[-20:]), file=sys.stderr)
+            print(f"Failed: installer exited with {run['rc']}", file=sys.stderr)
+        exceeded = compare(phases=phases, budgets=budgets, threshold=args.threshold)
+        for failure in exceeded:
+            print(f"Budget exceeded: {failure}", file=sys.stderr)
+        differences = []
+        if args.replay and run["rc"] == 0:
+            differences = replay(
+                root=root, directory=directory, env=env, run=run, phases=phases
+            )
+        for failure in differences:
+            print(f"Replay failed: {failure}", file=sys.stderr)
+        return 1 if run["rc"] != 0 or exceeded or differences else 0
+    finally:
+        if not args.keep:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Compare the sparse checkout of the 6G-Library at LIBRARY_REF with a full clone
+
+Each mode checks out the repository in an empty directory with the functions of
+utils/git.py the installer uses, without the shared mirror cache, and reports the
+time taken, the disk used and the number of files checked out:
+
+    python3 scripts/benchmark_library_checkout.py
+    python3 scripts/benchmark_library_checkout.py --ref main --repeat 3 --output results.json
+
+The URL, the ref and the trial network component are read from the .env file of
+``--root`` unless they are given.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from dotenv import dotenv_values
+
+MODES = ("full", "sparse")
+
+
+def disk_usage(path: str) -> Dict[str, int]:
+    """
+    Get the bytes used by a checkout, with and without its .git directory
+
+    :param path: the path to the checkout, ``str``
+    :return: the bytes of the .git directory and of the files checked out, ``Dict[str, int]``
+    """
+    usage = {"git_bytes": 0, "worktree_bytes": 0, "files": 0}
+    git_path = os.path.join(path, ".git")
+    for directory, _, files in os.walk(path):
+        in_git = directory == git_path or directory.startswith(git_path + os.sep)
+        for name in files:
+            size = os.lstat(os.path.join(directory, name)).st_blocks * 512
+            if in_git:
+                usage["git_bytes"] += size
+            else:
+                usage["worktree_bytes"] += size
+                usage["files"] += 1
+    return usage
+
+
+def measure(mode: str, url: str, ref: str, component: str) -> Dict:
+    """
+    Checkout the library in a temporary directory with one mode
+
+    :param mode: full or sparse, ``str``
+    :param url: the URL of the library repository, ``str``
+    :param ref: the tag as tags/<tag>, the branch or the commit to checkout, ``str``
+    :param component: the trial network component, ``str``
+    :return: the seconds taken and the disk used, ``Dict``
+    """
+    from utils.git import git_checkout, git_clone, git_sparse_checkout
+
+    with tempfile.TemporaryDirectory(prefix="benchmark-library-") as directory:
+        path = os.path.join(directory, "library")
+        start = time.perf_counter()
+        if mode == "sparse":
+            git_sparse_checkout(
+                https_url=url,
+                path=path,
+                ref=ref,
+                patterns=[
+                    "/*/.tnlcm/public.yaml",
+                    f"/{component}/sample_tnlcm_descriptor.yaml",
+                ],
+            )
+        else:
+            git_clone(https_url=url, path=path)
+            git_checkout(path=path, ref=ref)
+        seconds = time.perf_counter() - start
+        return {"seconds": seconds, **disk_usage(path=path)}
+
+
+def report(results: Dict[str, List[Dict]]) -> None:
+    """
+    Print the best run of each mode and its ratio to the full clone
+
+    :param results: the runs of each mode, ``Dict[str, List[Dict]]``
+    """
+    full = min(results["full"], key=lambda result: result["seconds"])
+    print(
+        f"{'mode':<8} {'time s':>8} {'vs full':>8} {'.git KiB':>10} {'files KiB':>10} {'files':>7} {'vs full':>8}"
+    )
+    for mode, runs in results.items():
+        best = min(runs, key=lambda result: result["seconds"])
+        disk = best["git_bytes"] + best["worktree_bytes"]
+        full_disk = full["git_bytes"] + full["worktree_bytes"]
+        print(
+            f"{mode:<8} {best['seconds']:>8.2f} {best['seconds'] / full['seconds']:>7.2f}x "
+            f"{best['git_bytes'] / 1024:>10.0f} {best['worktree_bytes'] / 1024:>10.0f} {best['files']:>7} {disk / full_disk:>7.2f}x"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Compare the sparse checkout of the library with a full clone"
+    )
+    parser.add_argument(
+        "--root",
+        default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        help="checkout whose utils package and .env file are used",
+    )
+    parser.add_argument(
+        "--url", help="URL of the library, LIBRARY_HTTPS_URL by default"
+    )
+    parser.add_argument("--ref", help="ref to checkout, LIBRARY_REF by default")
+    parser.add_argument("--repeat", type=int, default=1, help="runs of each mode")
+    parser.add_argument("--output", help="file where the results are saved")
+    args = parser.parse_args()
+    root = os.path.abspath(args.root)
+    dotenv = dotenv_values(os.path.join(root, ".env"))
+    url = args.url or dotenv["LIBRARY_HTTPS_URL"]
+    ref = args.ref or dotenv["LIBRARY_REF"]
+    component = dotenv["TRIAL_NETWORK_COMPONENT"]
+    if not shutil.which("git"):
+        print("git not found", file=sys.stderr)
+        return 1
+    os.environ["TOOLKIT_INSTALLER_GIT_CACHE_PATH"] = ""
+    sys.path.insert(0, root)
+    results = {
+        mode: [
+            measure(mode=mode, url=url, ref=ref, component=component)
+            for _ in range(args.repeat)
+        ]
+        for mode in MODES
+    }
+    print(f"{url} at {ref}")
+    report(results=results)
+    if args.output:
+        with open(args.output, mode="wt", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
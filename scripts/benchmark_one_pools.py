@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks of the pool parsing and lookups of utils/one.py
+
+Each function runs against synthetic pools of 1 (single dict shape), 100, 10k
+and 100k objects (list shape) generated with scripts/one_simulator.py. The CLI
+answers are served from a replay cassette, so the time measured is the one of
+the installer code (command dispatch, JSON parsing and the lookup) without
+process spawns. Every size runs in its own process to keep the memory figures
+independent.
+
+    python3 scripts/benchmark_one_pools.py --output results.json
+    python3 scripts/benchmark_one_pools.py --baseline results.json --threshold 1.5
+
+With ``--baseline`` the script exits with 1 when the time or the peak memory of
+a case grows more than the threshold ratio, or when a case that passed in the
+baseline now fails. ``--root`` benchmarks the utils package of another
+checkout, which lets CI compare the base branch with a pull request on the same
+runner. A checkout without utils/cassette.py cannot serve the synthetic pools,
+its results are empty and a comparison against them checks nothing.
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from one_simulator import POOLS, generate_pool, shape
+
+SIZES = (1, 100, 10_000, 100_000)
+
+MIN_TIME_DELTA = 0.002
+
+MIN_MEMORY_DELTA = 64 * 1024
+
+REPEAT_BUDGET = 0.5
+
+Responses = Dict[Tuple[str, ...], Dict]
+
+
+# ##############################################################################
+# ##                               CASES                                      ##
+# ##############################################################################
+
+
+def _pool(cli: str, objects: List[Dict]) -> Dict:
+    pool_name, element = POOLS[cli]
+    pool = shape(objects=objects)
+    return {pool_name: {element: pool} if pool else {}}
+
+
+def _acl_responses(size: int, rng: random.Random) -> Responses:
+    acls = generate_pool(cli="oneacl", size=size, rng=rng)
+    return {("oneacl", "list", "-j"): _pool(cli="oneacl", objects=acls)}
+
+
+def _host_responses(size: int, rng: random.Random) -> Responses:
+    hosts = generate_pool(cli="onehost", size=size, rng=rng)
+    responses = {("onehost", "list", "-j"): _pool(cli="onehost", objects=hosts)}
+    for host in hosts:
+        responses[("onehost", "show", host["NAME"], "-j")] = {"HOST": host}
+    return responses
+
+
+def _image_responses(size: int, rng: random.Random) -> Responses:
+    images = generate_pool(cli="oneimage", size=size, rng=rng)
+    return {("oneimage", "list", "-j"): _pool(cli="oneimage", objects=images)}
+
+
+def _template_responses(size: int, rng: random.Random) -> Responses:
+    template = generate_pool(cli="onetemplate", size=1, rng=rng)[0]
+    disks = [{"IMAGE_ID": str(id)} for id in range(size)]
+    template["TEMPLATE"]["DISK"] = shape(objects=disks)
+    return {("onetemplate", "show", template["NAME"], "-j"): {"VMTEMPLATE": template}}
+
+
+def _vm_responses(size: int, rng: random.Random) -> Responses:
+    vms = generate_pool(cli="onevm", size=size, rng=rng)
+    return {("onevm", "list", "-j"): _pool(cli="onevm", objects=vms)}
+
+
+# Missing group and appliance values make the lookups walk the whole pool
+CASES: Dict[str, Tuple[Callable[[int, random.Random], Responses], Callable]] = {
+    "check_group_acl": (
+        _acl_responses,
+        lambda one: one.check_group_acl(
+            group_id="-1", resources="VM+NET+IMAGE+TEMPLATE/*", rights="CREATE"
+        ),
+    ),
+    "oneimages_attribute": (
+        _image_responses,
+        lambda one: one.oneimages_attribute(
+            attribute="ONE_6GSB_MARKETPLACE_APPLIANCE_NAME", value="appliance-7"
+        ),
+    ),
+    "onehosts_avx_cpu_mem": (
+        _host_responses,
+        lambda one: one.onehosts_avx_cpu_mem(
+            min_percentage_cpu_available_host=0, min_percentage_mem_available_host=0
+        ),
+    ),
+    "onetemplate_image_ids": (
+        _template_responses,
+        lambda one: one.onetemplate_image_ids(template_name="template-0"),
+    ),
+    "onevms_running_with_ids": (
+        _vm_responses,
+        lambda one: one.onevms_running_with_ids(),
+    ),
+}
+
+
+# ##############################################################################
+# ##                              MEASURE                                     ##
+# ##############################################################################
+
+
+def measure(root: str, size: int, seed: int, output_path: str) -> None:
+    """
+    Benchmark every case with one pool size, the results are written as JSON
+
+    :param root: the checkout whose utils package is benchmarked, ``str``
+    :param size: the number of objects of the pools, ``int``
+    :param seed: the seed of the synthetic pools, ``int``
+    :param output_path: the file where the results are written, ``str``
+    """
+    sys.path.insert(0, root)
+    from utils.cassette import Cassette
+
+    cassette_path = os.path.join(os.path.dirname(output_path), f"cassette-{size}")
+    with open(cassette_path, mode="wt", encoding="utf-8") as file:
+        for name, (responses, _) in CASES.items():
+            for command, data in responses(size, random.Random(seed)).items():
+                entry = {
+                    "key": Cassette.key(command=list(command), input=None),
+                    "stdout": json.dumps(data),
+                    "stderr": "",
+                    "rc": 0,
+                }
+                file.write(json.dumps(entry) + "\n")
+    os.environ["TOOLKIT_INSTALLER_CASSETTE_MODE"] = "replay"
+    os.environ["TOOLKIT_INSTALLER_CASSETTE_PATH"] = cassette_path
+    from utils import one
+    from utils.cassette import get_cassette
+    from utils.exceptions import ToolkitError
+
+    cassette = get_cassette()
+    results = {}
+    for name, (_, call) in CASES.items():
+        result = {"size": size}
+        try:
+            replayed = cassette.replayed
+            call(one)
+            result["commands"] = cassette.replayed - replayed
+            timings = []
+            while not timings or (sum(timings) < REPEAT_BUDGET and len(timings) < 5):
+                start = time.perf_counter()
+                call(one)
+                timings.append(time.perf_counter() - start)
+            result["time"] = min(timings)
+            tracemalloc.start()
+            call(one)
+            result["peak_memory"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        except ToolkitError as e:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            result["error"] = f"{type(e).__name__}: {e.message}"
+        results[f"{name}[{size}]"] = result
+    with open(output_path, mode="wt", encoding="utf-8") as file:
+        json.dump(results, file)
+
+
+def run(root: str, sizes: List[int], seed: int) -> Dict[str, Dict]:
+    """
+    Benchmark every case with every pool size, each size in its own process
+
+    :param root: the checkout whose utils package is benchmarked, ``str``
+    :param sizes: the numbers of objects of the pools, ``List[int]``
+    :param seed: the seed of the synthetic pools, ``int``
+    :return: the results of every case by name, ``Dict[str, Dict]``
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="benchmark-one-pools-") as directory:
+        for size in sizes:
+            output_path = os.path.join(directory, f"results-{size}.json")
+            subprocess.run(
+                [
+                    sys.executable,
+                    os.path.abspath(__file__),
+                    "--root",
+                    root,
+                    "--seed",
+                    str(seed),
+                    "--measure-size",
+                    str(size),
+                    "--output",
+                    output_path,
+                ],
+                check=True,
+            )
+            with open(output_path, mode="rt", encoding="utf-8") as file:
+                results.update(json.load(file))
+    return results
+
+
+# ##############################################################################
+# ##                               REPORT                                     ##
+# ##############################################################################
+
+
+def compare(
+    results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float
+) -> List[str]:
+    """
+    Compare the results with a baseline
+
+    Small absolute changes are ignored so the timer resolution of the tiny pools does not fail the suite
+
+    :param results: the results of the run, ``Dict[str, Dict]``
+    :param baseline: the results of the baseline run, ``Dict[str, Dict]``
+    :param threshold: the maximum ratio between the run and the baseline, ``float``
+    :return: the regressions found, ``List[str]``
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if "error" in result:
+            if "error" not in base:
+                regressions.append(f"{name} fails: {result['error']}")
+            continue
+        if "error" in base:
+            continue
+        for key, floor in (("time", MIN_TIME_DELTA), ("peak_memory", MIN_MEMORY_DELTA)):
+            if result[key] > base[key] * threshold and result[key] - base[key] > floor:
+                regressions.append(
+                    f"{name} {key} {result[key]:.6g} > {threshold} x {base[key]:.6g}"
+                )
+    return regressions
+
+
+def report(results: Dict[str, Dict], baseline: Dict[str, Dict]) -> None:
+    """
+    Print the results as a table, with the ratio to the baseline when there is one
+
+    :param results: the results of the run, ``Dict[str, Dict]``
+    :param baseline: the results of the baseline run, ``Dict[str, Dict]``
+    """
+    print(
+        f"{'case':<36} {'commands':>8} {'time ms':>10} {'peak KiB':>10} {'vs base':>8}"
+    )
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:<36} {'FAILED':>8}  {result['error']}")
+            continue
+        base = baseline.get(name, {})
+        ratio = f"{result['time'] / base['time']:.2f}x" if base.get("time") else ""
+        print(
+            f"{name:<36} {result['commands']:>8} {result['time'] * 1000:>10.3f} {result['peak_memory'] / 1024:>10.1f} {ratio:>8}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmarks of the pool handling of utils/one.py"
+    )
+    parser.add_argument(
+        "--root",
+        default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        help="checkout whose utils package is benchmarked",
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(SIZES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file where the results are saved")
+    parser.add_argument("--baseline", help="results of a previous run to compare")
+    parser.add_argument("--threshold", type=float, default=1.5)
+    parser.add_argument("--measure-size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure_size is not None:
+        measure(
+            root=os.path.abspath(args.root),
+            size=args.measure_size,
+            seed=args.seed,
+            output_path=args.output,
+        )
+        return 0
+    root = os.path.abspath(args.root)
+    if os.path.isfile(os.path.join(root, "utils", "cassette.py")):
+        results = run(root=root, sizes=args.sizes, seed=args.seed)
+    else:
+        print(
+            f"{root} has no utils/cassette.py, the pools cannot be replayed on it",
+            file=sys.stderr,
+        )
+        results = {}
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, mode="rt", encoding="utf-8") as file:
+            baseline = json.load(file)
+        if not baseline:
+            print(
+                f"Baseline {args.baseline} has no results, nothing is compared",
+                file=sys.stderr,
+            )
+    report(results=results, baseline=baseline)
+    if args.output:
+        with open(args.output, mode="wt", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    regressions = compare(results=results, baseline=baseline, threshold=args.threshold)
+    for regression in regressions:
+        print(f"Regression: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
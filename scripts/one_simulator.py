@@ -0,0 +1,1262 @@
+#!/usr/bin/env python3
+"""
+Simulated OpenNebula CLI used to load test the toolkit installer
+
+The simulator implements the subset of the onevm, oneimage, onetemplate, oneflow,
+oneflow-template, onemarket, onemarketapp, onehost, oneuser, onegroup, oneacl,
+onedatastore and onevnet commands called by utils/one.py, with the same ``-j``
+output shapes: an empty pool is ``{}``, a pool with one element holds a dict and
+a pool with several elements holds a list.
+
+Create a simulated frontend and put its commands first in the PATH:
+
+    python3 scripts/one_simulator.py init --dir /tmp/onesim --seed 1 --size 100 \
+        --pool onevm=100000 --pool oneimage=10000 --latency 0.05 --transition 30
+    export PATH=/tmp/onesim/bin:$PATH
+
+Every command sleeps the configured latency (plus jitter and a cost per listed
+object) before answering, and can fail with a transient error at the configured
+rate. Created resources go through their states over time: VMs are PENDING and
+become RUNNING, images are LOCKED and become READY and services go from PENDING
+to DEPLOYING and RUNNING, each after the transition time. The ONESIM_LATENCY,
+ONESIM_TRANSITION and ONESIM_ERROR_RATE environment variables override the
+configuration of the simulated frontend and ONESIM_DIR selects it when the
+commands are not called through the links in its bin directory.
+
+Only the standard library is used, so the commands also run outside the
+virtual environment of the installer.
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import random
+import re
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+POOLS: Dict[str, Tuple[str, str]] = {
+    "oneacl": ("ACL_POOL", "ACL"),
+    "onedatastore": ("DATASTORE_POOL", "DATASTORE"),
+    "oneflow": ("DOCUMENT_POOL", "DOCUMENT"),
+    "oneflow-template": ("DOCUMENT_POOL", "DOCUMENT"),
+    "onegroup": ("GROUP_POOL", "GROUP"),
+    "onehost": ("HOST_POOL", "HOST"),
+    "oneimage": ("IMAGE_POOL", "IMAGE"),
+    "onemarket": ("MARKETPLACE_POOL", "MARKETPLACE"),
+    "onemarketapp": ("MARKETPLACEAPP_POOL", "MARKETPLACEAPP"),
+    "onetemplate": ("VMTEMPLATE_POOL", "VMTEMPLATE"),
+    "oneuser": ("USER_POOL", "USER"),
+    "onevm": ("VM_POOL", "VM"),
+    "onevnet": ("VNET_POOL", "VNET"),
+}
+
+OPTIONS_WITH_VALUE = {"--datastore", "--name", "--user-inputs"}
+
+TEMPLATE_ATTRIBUTE_PATTERN = re.compile(
+    r'(?P<key>[A-Za-z_][A-Za-z0-9_]*)\s*=\s*(?:"(?P<quoted>(?:[^"\\]|\\.)*)"|\[(?P<vector>[^\]]*)\]|(?P<plain>[^\s,\]]+))',
+    re.DOTALL,
+)
+
+TRANSIENT_ERROR = '[one.vm.info] Failed to open TCP connection to localhost:2633 (Connection refused - connect(2) for "localhost" port 2633)'
+
+VM_STATE_ACTIVE = "3"
+VM_STATE_PENDING = "1"
+VM_STATE_UNDEPLOYED = "9"
+VM_LCM_STATE_RUNNING = "3"
+IMAGE_STATE_READY = "1"
+IMAGE_STATE_LOCKED = "4"
+FLOW_STATE_PENDING = 0
+FLOW_STATE_DEPLOYING = 1
+FLOW_STATE_RUNNING = 2
+MARKETAPP_TYPE_IMAGE = "1"
+MARKETAPP_TYPE_VMTEMPLATE = "2"
+MARKETAPP_TYPE_SERVICE_TEMPLATE = "3"
+
+CommandResult = Tuple[str, str, int]
+
+
+# ##############################################################################
+# ##                            SIMULATED FRONTEND                            ##
+# ##############################################################################
+
+
+class Pool:
+    """
+    Objects of a pool kept as the JSON lines of its file and parsed only when used
+    """
+
+    def __init__(self, directory: str, cli: str, now: float):
+        self.cli = cli
+        self.meta_path = pool_path(directory=directory, cli=cli, extension="json")
+        self.objects_path = pool_path(directory=directory, cli=cli, extension="jsonl")
+        with open(file=self.meta_path, mode="rt", encoding="utf-8") as file:
+            meta = json.load(file)
+        self.next_id: int = meta["next_id"]
+        self.transitions: List[Dict] = meta["transitions"]
+        with open(file=self.objects_path, mode="rt", encoding="utf-8") as file:
+            lines = file.read().splitlines()
+        # Every line starts with {"ID":"<id>" so the id is read without parsing it
+        self.objects: Dict[str, Any] = {
+            line[7 : line.index('"', 7)]: line for line in lines if line
+        }
+        self.changed = False
+        pending = []
+        for transition in self.transitions:
+            if transition["at"] > now:
+                pending.append(transition)
+                continue
+            self.changed = True
+            if transition.get("delete"):
+                self.objects.pop(transition["id"], None)
+            elif transition["id"] in self.objects:
+                data = self.get(id=transition["id"])
+                for path, value in transition["set"].items():
+                    set_path(data=data, path=path, value=value)
+        self.transitions = pending
+
+    def dump(self) -> List[str]:
+        """
+        Get the JSON lines of the objects of the pool
+
+        :return: one compact JSON object per object of the pool, ``List[str]``
+        """
+        return [
+            data if isinstance(data, str) else json.dumps(data, separators=(",", ":"))
+            for data in self.objects.values()
+        ]
+
+    def find(self, reference: str) -> Optional[Dict]:
+        """
+        Resolve an object by id or by name, like the OpenNebula CLI does
+
+        :param reference: the id or the name of the object, ``str``
+        :return: the object or None if it is not found, ``Optional[Dict]``
+        """
+        if reference.isdigit() and reference in self.objects:
+            return self.get(id=reference)
+        needle = f'"NAME":{json.dumps(reference)}'
+        for id, data in self.objects.items():
+            if isinstance(data, str):
+                if needle not in data:
+                    continue
+                data = self.get(id=id)
+            if data.get("NAME") == reference:
+                return data
+        return None
+
+    def get(self, id: str) -> Dict:
+        """
+        Get an object of the pool, parsing its line on first use
+
+        :param id: the id of the object, ``str``
+        :return: the object, ``Dict``
+        """
+        data = self.objects[id]
+        if isinstance(data, str):
+            data = json.loads(data)
+            self.objects[id] = data
+        return data
+
+    def save(self) -> None:
+        """
+        Write the objects and the state of the pool, each file atomically
+        """
+        for path, content in (
+            (self.objects_path, "\n".join(self.dump())),
+            (
+                self.meta_path,
+                json.dumps({"next_id": self.next_id, "transitions": self.transitions}),
+            ),
+        ):
+            with open(file=f"{path}.tmp", mode="wt", encoding="utf-8") as file:
+                file.write(content)
+            os.replace(f"{path}.tmp", path)
+        self.changed = False
+
+
+class Frontend:
+    """
+    State of a simulated frontend, with its pools loaded on demand
+    """
+
+    def __init__(self, directory: str, config: Dict):
+        self.directory = directory
+        self.config = config
+        self.now = time.time()
+        self.pools: Dict[str, Pool] = {}
+
+    def add(self, cli: str, data: Dict) -> str:
+        """
+        Add an object to a pool with the next free id
+
+        :param cli: the command that owns the pool, ``str``
+        :param data: the object without its id, ``Dict``
+        :return: the id of the new object, ``str``
+        """
+        pool = self.pool(cli=cli)
+        id = str(pool.next_id)
+        pool.next_id += 1
+        pool.objects[id] = {"ID": id, **data}
+        pool.changed = True
+        return id
+
+    def changed(self, cli: str) -> None:
+        """
+        Mark a pool as changed so it is written when the command ends
+
+        :param cli: the command that owns the pool, ``str``
+        """
+        self.pool(cli=cli).changed = True
+
+    def delete(self, cli: str, id: str) -> None:
+        """
+        Remove an object from a pool
+
+        :param cli: the command that owns the pool, ``str``
+        :param id: the id of the object, ``str``
+        """
+        pool = self.pool(cli=cli)
+        pool.objects.pop(id, None)
+        pool.changed = True
+
+    def find(self, cli: str, reference: str) -> Optional[Dict]:
+        """
+        Resolve an object of a pool by id or by name
+
+        :param cli: the command that owns the pool, ``str``
+        :param reference: the id or the name of the object, ``str``
+        :return: the object or None if it is not found, ``Optional[Dict]``
+        """
+        return self.pool(cli=cli).find(reference=reference)
+
+    def pool(self, cli: str) -> Pool:
+        """
+        Get a pool, applying the state transitions that are already due
+
+        :param cli: the command that owns the pool, ``str``
+        :return: the pool, ``Pool``
+        """
+        if cli not in self.pools:
+            self.pools[cli] = Pool(directory=self.directory, cli=cli, now=self.now)
+        return self.pools[cli]
+
+    def save(self) -> None:
+        """
+        Write the pools changed by the command
+        """
+        for pool in self.pools.values():
+            if pool.changed:
+                pool.save()
+
+    def schedule(
+        self,
+        cli: str,
+        id: str,
+        delay: float,
+        values: Optional[Dict[str, Any]] = None,
+        delete: bool = False,
+    ) -> None:
+        """
+        Schedule a change of an object after a delay
+
+        :param cli: the command that owns the pool, ``str``
+        :param id: the id of the object, ``str``
+        :param delay: the seconds until the change is applied, ``float``
+        :param values: the dotted paths and the values set by the change, ``Optional[Dict[str, Any]]``
+        :param delete: whether the change removes the object, ``bool``
+        """
+        transition = {"at": self.now + delay, "id": id}
+        if delete:
+            transition["delete"] = True
+        else:
+            transition["set"] = values
+        pool = self.pool(cli=cli)
+        pool.transitions.append(transition)
+        pool.changed = True
+
+    @property
+    def transition(self) -> float:
+        """
+        The seconds a created resource takes to reach its final state
+        """
+        return float(os.getenv("ONESIM_TRANSITION", self.config["transition"]))
+
+
+@contextmanager
+def locked(directory: str, exclusive: bool) -> Iterator[None]:
+    """
+    Hold the lock of a simulated frontend while a command runs
+
+    :param directory: the directory of the simulated frontend, ``str``
+    :param exclusive: whether the command changes the state, ``bool``
+    """
+    with open(file=os.path.join(directory, "lock"), mode="a") as file:
+        fcntl.flock(file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def parse_template(data: str) -> Dict[str, Any]:
+    """
+    Parse an OpenNebula template into a dict, vector attributes become nested dicts
+
+    :param data: the template, ``str``
+    :return: the attributes of the template, ``Dict[str, Any]``
+    """
+    attributes: Dict[str, Any] = {}
+    for match in TEMPLATE_ATTRIBUTE_PATTERN.finditer(data):
+        if match.group("vector") is not None:
+            value: Any = parse_template(data=match.group("vector"))
+        elif match.group("quoted") is not None:
+            value = match.group("quoted").replace('\\"', '"')
+        else:
+            value = match.group("plain")
+        attributes[match.group("key")] = value
+    return attributes
+
+
+def pool_path(directory: str, cli: str, extension: str) -> str:
+    """
+    Get the path of a file of a pool
+
+    :param directory: the directory of the simulated frontend, ``str``
+    :param cli: the command that owns the pool, ``str``
+    :param extension: json for the state of the pool or jsonl for its objects, ``str``
+    :return: the path of the file, ``str``
+    """
+    return os.path.join(directory, "pools", f"{cli}.{extension}")
+
+
+def set_path(data: Dict, path: str, value: Any) -> None:
+    """
+    Set a value in a nested dict using a dotted path
+
+    :param data: the dict to update, ``Dict``
+    :param path: the dotted path of the key, ``str``
+    :param value: the value to set, ``Any``
+    """
+    *parents, key = path.split(".")
+    for parent in parents:
+        data = data.setdefault(parent, {})
+    data[key] = value
+
+
+def shape(objects: List[Dict]) -> Any:
+    """
+    Shape a list of objects like the XML to JSON conversion of OpenNebula
+
+    :param objects: the objects of the pool, ``List[Dict]``
+    :return: None when empty, the object when alone or the list otherwise, ``Any``
+    """
+    if not objects:
+        return None
+    if len(objects) == 1:
+        return objects[0]
+    return objects
+
+
+# ##############################################################################
+# ##                          SYNTHETIC POOLS                                 ##
+# ##############################################################################
+
+
+def generate_pool(cli: str, size: int, rng: random.Random) -> List[Dict]:
+    """
+    Generate the objects of a synthetic pool with string ids starting at 0
+
+    :param cli: the command that owns the pool, ``str``
+    :param size: the number of objects, ``int``
+    :param rng: the random generator, ``random.Random``
+    :return: the objects of the pool, ``List[Dict]``
+    """
+    return [
+        {"ID": str(id), **GENERATORS[cli](id=id, size=size, rng=rng)}
+        for id in range(size)
+    ]
+
+
+def _acl(id: int, size: int, rng: random.Random) -> Dict:
+    resources = rng.choice(["VM+NET+IMAGE+TEMPLATE/*", "DOCUMENT/*", "HOST/*"])
+    rights = rng.choice(["USE", "CREATE", "USE+MANAGE"])
+    return {
+        "USER": f"@{id % max(size, 1)}",
+        "RESOURCE": resources,
+        "RIGHTS": rights,
+        "STRING": f"@{id % max(size, 1)} {resources} {rights}",
+    }
+
+
+def _datastore(id: int, size: int, rng: random.Random) -> Dict:
+    names = ["system", "default", "files"]
+    return {
+        "NAME": names[id] if id < len(names) else f"datastore-{id}",
+        "TYPE": str(rng.randint(0, 2)),
+        "STATE": "0",
+    }
+
+
+def _flow(id: int, size: int, rng: random.Random) -> Dict:
+    roles = []
+    for role in range(rng.randint(1, 3)):
+        nodes = [
+            {
+                "deploy_id": rng.randint(0, 10 * size),
+                "vm_info": {
+                    "VM": {
+                        "ID": str(rng.randint(0, 10 * size)),
+                        "NAME": f"role-{role}_{node}_(service_{id})",
+                        "STATE": VM_STATE_ACTIVE,
+                    }
+                },
+            }
+            for node in range(rng.randint(1, 2))
+        ]
+        roles.append(
+            {"name": f"role-{role}", "cardinality": len(nodes), "nodes": nodes}
+        )
+    return {
+        "NAME": f"service-{id}",
+        "TEMPLATE": {
+            "BODY": {
+                "name": f"service-{id}",
+                "state": rng.choice([FLOW_STATE_RUNNING] * 8 + [FLOW_STATE_DEPLOYING]),
+                "roles": roles,
+                "custom_attrs_values": {"ONEAPP_SITE": f"site-{id % 7}"},
+            }
+        },
+    }
+
+
+def _flow_template(id: int, size: int, rng: random.Random) -> Dict:
+    return {
+        "NAME": f"flow-template-{id}",
+        "TEMPLATE": {
+            "BODY": {
+                "name": f"flow-template-{id}",
+                "roles": [
+                    {"name": f"role-{role}", "vm_template": rng.randint(0, 10 * size)}
+                    for role in range(rng.randint(1, 3))
+                ],
+                "custom_attrs": {"ONEAPP_SITE": "M|text|Site name| |"},
+                "networks": {"Public": "M|network|Public network| |id:"},
+            }
+        },
+    }
+
+
+def _group(id: int, size: int, rng: random.Random) -> Dict:
+    names = ["oneadmin", "users"]
+    admins = [str(rng.randint(0, max(size, 2))) for _ in range(rng.randint(0, 2))]
+    return {
+        "NAME": names[id] if id < len(names) else f"group-{id}",
+        "ADMINS": {"ID": shape(objects=admins)} if admins else {},
+    }
+
+
+def _host(id: int, size: int, rng: random.Random) -> Dict:
+    total_cpu = rng.choice([800, 1600, 3200])
+    total_mem = rng.choice([16, 32, 64]) * 1024 * 1024
+    features = "sse4_2,avx,avx2" if rng.random() < 0.8 else "sse4_2"
+    return {
+        "NAME": f"host-{id}",
+        "STATE": "2",
+        "HOST_SHARE": {
+            "CPU_USAGE": str(rng.randint(0, total_cpu)),
+            "TOTAL_CPU": str(total_cpu),
+            "MEM_USAGE": str(rng.randint(0, total_mem)),
+            "TOTAL_MEM": str(total_mem),
+        },
+        "TEMPLATE": {
+            "KVM_CPU_FEATURES": features,
+            "KVM_CPU_MODEL": rng.choice(["Skylake-Server-IBRS", "EPYC-Rome"]),
+        },
+    }
+
+
+def _image(id: int, size: int, rng: random.Random) -> Dict:
+    template = {"DEV_PREFIX": "vd"}
+    if rng.random() < 0.2:
+        template.update(
+            {
+                "ONE_6GSB_MARKETPLACE_APPLIANCE_NAME": f"appliance-{id % 50}",
+                "ONE_6GSB_MARKETPLACE_APPLIANCE_VERSION": f"v{rng.randint(1, 3)}.0.0",
+                "ONE_6GSB_MARKETPLACE_APPLIANCE_SOFTWARE_VERSION": f"{rng.randint(1, 9)}.{rng.randint(0, 9)}",
+            }
+        )
+    return {
+        "NAME": f"image-{id}",
+        "STATE": rng.choice([IMAGE_STATE_READY] * 9 + [IMAGE_STATE_LOCKED]),
+        "UID": "0",
+        "GID": "0",
+        "TEMPLATE": template,
+    }
+
+
+def _market(id: int, size: int, rng: random.Random) -> Dict:
+    name = "OpenNebula Public" if id == 0 else f"marketplace-{id}"
+    return {
+        "NAME": name,
+        "MARKET_MAD": "one",
+        "TEMPLATE": {"ENDPOINT": f"https://marketplace-{id}.example.org"},
+    }
+
+
+def _marketapp(id: int, size: int, rng: random.Random) -> Dict:
+    market_id = rng.randint(0, 3)
+    app_type = rng.choice(
+        [MARKETAPP_TYPE_IMAGE] * 6
+        + [MARKETAPP_TYPE_VMTEMPLATE] * 3
+        + [MARKETAPP_TYPE_SERVICE_TEMPLATE]
+    )
+    return {
+        "NAME": f"appliance-{id}",
+        "TYPE": app_type,
+        "MARKETPLACE": "OpenNebula Public"
+        if market_id == 0
+        else f"marketplace-{market_id}",
+        "MARKETPLACE_ID": str(market_id),
+        "TEMPLATE": {
+            "SIMULATOR_IMAGES": str(
+                1 if app_type == MARKETAPP_TYPE_IMAGE else rng.randint(1, 3)
+            )
+        },
+    }
+
+
+def _template(id: int, size: int, rng: random.Random) -> Dict:
+    disks = [
+        {"IMAGE_ID": str(rng.randint(0, 10 * size))} for _ in range(rng.randint(1, 3))
+    ]
+    return {
+        "NAME": f"template-{id}",
+        "UID": "0",
+        "GID": "0",
+        "TEMPLATE": {"DISK": shape(objects=disks), "MEMORY": "2048", "CPU": "1"},
+    }
+
+
+def _user(id: int, size: int, rng: random.Random) -> Dict:
+    names = ["oneadmin", "serveradmin"]
+    return {
+        "NAME": names[id] if id < len(names) else f"user-{id}",
+        "GID": str(rng.randint(0, 1)),
+        "TEMPLATE": {"SSH_PUBLIC_KEY": f"ssh-ed25519 AAAA{id:08d} user-{id}"},
+    }
+
+
+def _vm(id: int, size: int, rng: random.Random) -> Dict:
+    nics = [
+        {"NIC_ID": str(nic), "IP": f"10.{nic}.{id // 256 % 256}.{id % 256}"}
+        for nic in range(rng.randint(1, 2))
+    ]
+    disks = [
+        {"DISK_ID": str(disk), "SIZE": str(rng.choice([2048, 10240, 20480]))}
+        for disk in range(rng.randint(1, 2))
+    ]
+    return {
+        "NAME": f"vm-{id}",
+        "STATE": rng.choice([VM_STATE_ACTIVE] * 8 + [VM_STATE_PENDING, "8"]),
+        "LCM_STATE": VM_LCM_STATE_RUNNING,
+        "UID": "0",
+        "GID": "0",
+        "TEMPLATE": {
+            "NIC": shape(objects=nics),
+            "DISK": shape(objects=disks),
+            "CPU_MODEL": {"MODEL": "host-passthrough"},
+            "TEMPLATE_ID": str(rng.randint(0, size)),
+        },
+        "USER_TEMPLATE": {"ONEAPP_SITE": f"site-{id % 7}"},
+    }
+
+
+def _vnet(id: int, size: int, rng: random.Random) -> Dict:
+    return {"NAME": f"vnet-{id}", "BRIDGE": f"br{id}", "VLAN_ID": str(100 + id)}
+
+
+GENERATORS = {
+    "oneacl": _acl,
+    "onedatastore": _datastore,
+    "oneflow": _flow,
+    "oneflow-template": _flow_template,
+    "onegroup": _group,
+    "onehost": _host,
+    "oneimage": _image,
+    "onemarket": _market,
+    "onemarketapp": _marketapp,
+    "onetemplate": _template,
+    "oneuser": _user,
+    "onevm": _vm,
+    "onevnet": _vnet,
+}
+
+
+# ##############################################################################
+# ##                              COMMANDS                                    ##
+# ##############################################################################
+
+
+def _not_found(cli: str, reference: str) -> CommandResult:
+    return "", f"{POOLS[cli][1]} named {reference} not found.", 255
+
+
+def _usage(cli: str, action: str) -> CommandResult:
+    return "", f"{cli}: action {action} not supported by the simulator", 255
+
+
+def _created(id: str, prefix: str = "ID") -> CommandResult:
+    return f"{prefix}: {id}", "", 0
+
+
+def _owner(
+    frontend: Frontend, username: str, group_name: Optional[str]
+) -> Tuple[Optional[Dict], Optional[Dict], Optional[CommandResult]]:
+    user = frontend.find(cli="oneuser", reference=username)
+    if user is None:
+        return None, None, _not_found(cli="oneuser", reference=username)
+    group = None
+    if group_name is not None:
+        group = frontend.find(cli="onegroup", reference=group_name)
+        if group is None:
+            return None, None, _not_found(cli="onegroup", reference=group_name)
+    return user, group, None
+
+
+def command_chgrp(
+    frontend: Frontend, cli: str, args: List[str], options: Dict, input: str
+) -> CommandResult:
+    data = frontend.find(cli=cli, reference=args[0])
+    if data is None:
+        return _not_found(cli=cli, reference=args[0])
+    group = frontend.find(cli="onegroup", reference=args[1])
+    if group is None:
+        return _not_found(cli="onegroup", reference=args[1])
+    data.update({"GID": group["ID"], "GNAME": group["NAME"]})
+    frontend.changed(cli=cli)
+    return "", "", 0
+
+
+def command_chown(
+    frontend: Frontend, cli: str, args: List[str], options: Dict, input: str
+) -> CommandResult:
+    data = frontend.find(cli=cli, reference=args[0])
+    if data is None:
+        return _not_found(cli=cli, reference=args[0])
+    user, group, error = _owner(
+        frontend=frontend,
+        username=args[1],
+        group_name=args[2] if len(args) > 2 else None,
+    )
+    if error is not None:
+        return error
+    data.update({"UID": user["ID"], "UNAME": user["NAME"]})
+    if group is not None:
+        data.update({"GID": group["ID"], "GNAME": group["NAME"]})
+    frontend.changed(cli=cli)
+    return "", "", 0
+
+
+def command_create(
+    frontend: Frontend, cli: str, args: List[str], options: Dict, input: str
+) -> CommandResult:
+    if cli == "oneacl":
+        # USER RESOURCE RIGHTS and an optional ZONE
+        user, resource, rights = args[0].split(" ")[:3]
+        id = frontend.add(
+            cli=cli,
+            data={
+                "USER": user,
+                "RESOURCE": resource,
+                "RIGHTS": rights,
+                "STRING": args[0],
+            },
+        )
+    elif cli == "onemarket":
+        with open(file=args[0], mode="rt", encoding="utf-8") as file:
+            template = parse_template(data=file.read())
+        id = frontend.add(
+            cli=cli,
+            data={
+                "NAME": template.get("NAME", f"marketplace-{args[0]}"),
+                "MARKET_MAD": template.get("MARKET_MAD", "one"),
+                "TEMPLATE": template,
+            },
+        )
+    else:
+        if frontend.find(cli=cli, reference=args[0]) is not None:
+            return (
+                "",
+                f"[one.{cli[3:]}.allocate] NAME is already taken by {POOLS[cli][1]}.",
+                255,
+            )
+        data = {"NAME": args[0], "TEMPLATE": {}}
+        if cli == "onegroup":
+            data["ADMINS"] = {}
+        elif cli == "oneuser":
+            data["GID"] = "1"
+        id = frontend.add(cli=cli, data=data)
+    return _created(id=id)
+
+
+def command_addadmin(
+    frontend: Frontend, cli: str, args: List[str], options: Dict, input: str
+) -> CommandResult:
+    group = frontend.find(cli=cli, reference=args[0])
+    if group is None:
+        return _not_found(cli=cli, reference=args[0])
+    user = frontend.find(cli="oneuser", reference=args[1])
+    if user is None:
+        return _not_found(cli="oneuser", reference=args[1])
+    admins = group.get("ADMINS", {}).get("ID")
+    admins = [] if admins is None else [admins] if isinstance(admins, str) else admins
+    if user["ID"] not in admins:
+        admins.append(user["ID"])
+    group["ADMINS"] = {"ID": shape(objects=admins)}
+    frontend.changed(cli=cli)
+    return "", "", 0
+
+
+def command_delete(
+    frontend: Frontend, cli: str, args: List[str], options: Dict, input: str
+) -> CommandResult:
+    data = frontend.find(cli=cli, reference=args[0])
+    if data is None:
+        return _not_found(cli=cli, reference=args[0])
+    if cli == "onetemplate" and "--recursive" in options:
+        disks = data.get("TEMPLATE", {}).get("DISK") or []
+        for disk in [disks] if isinstance(disks, dict) else disks:
+            if "IMAGE_ID" in disk:
+                frontend.delete(cli="oneimage", id=disk["IMAGE_ID"])
+    frontend.delete(cli=cli, id=data["ID"])
+    return "", "", 0
+
+
+def command_deploy(
+    frontend: Frontend, cli: str, args: List[str], options: Dict, input: str
+) -> CommandResult:
+    vm = frontend.find(cli=cli, reference=args[0])
+    if vm is None:
+        return _not_found(cli=cli, reference=args[0])
+    if frontend.find(cli="onehost", reference=args[1]) is None:
+        return _not_found(cli="onehost", reference=args[1])
+    if vm["STATE"] not in (VM_STATE_PENDING, VM_STATE_UNDEPLOYED):
+        return (
+            "",
+            f"[one.vm.deploy] Wrong state to perform action on VM {vm['ID']}",
+            255,
+        )
+    frontend.schedule(
+        cli=cli,
+        id=vm["ID"],
+        delay=frontend.transition,
+        values={"STATE": VM_STATE_ACTIVE, "LCM_STATE": VM_LCM_STATE_RUNNING},
+    )
+    return "", "", 0
+
+
+def command_disk_resize(
+    frontend: Frontend, cli: str, args: List[str], options: Dict, input: str
+) -> CommandResult:
+    vm = frontend.find(cli=cli, reference=args[0])
+    if vm is None:
+        return _not_found(cli=cli, reference=args[0])
+    disks = vm["TEMPLATE"].get("DISK") or []
+    for disk in [disks] if isinstance(disks, dict) else disks:
+        if disk.get("DISK_ID") == args[1]:
+            disk["SIZE"] = args[2].rstrip("M")
+            frontend.changed(cli=cli)
+            return "", "", 0
+    return "", f"[one.vm.diskresize] Cannot find disk {args[1]}", 255
+
+
+def command_export(
+    frontend: Frontend, cli: str, args: List[str], options: Dict, input: str
+) -> CommandResult:
+    appliance = frontend.find(cli=cli, reference=args[0])
+    if appliance is None:
+        return _not_found(cli=cli, reference=args[0])
+    datastore_name = options.get("--datastore", "default")
+    if frontend.find(cli="onedatastore", reference=datastore_name) is None:
+        return _not_found(cli="onedatastore", reference=datastore_name)
+    name = args[1]
+    # The SIMULATOR_* attributes describe what the appliance holds in the marketplace
+    attributes = appliance.get("TEMPLATE", {})
+    disks = int(attributes.get("SIMULATOR_IMAGES", "1"))
+    image_ids = []
+    for disk in range(disks):
+        image_id = frontend.add(
+            cli="oneimage",
+            data={
+                "NAME": name if disks == 1 else f"{name}-disk-{disk}",
+                "STATE": IMAGE_STATE_LOCKED,
+                "UID": "0",
+                "GID": "0",
+                "TEMPLATE": {"DEV_PREFIX": "vd"},
+            },
+        )
+        frontend.schedule(
+            cli="oneimage",
+            id=image_id,
+            delay=frontend.transition,
+            values={"STATE": IMAGE_STATE_READY},
+        )
+        image_ids.append(image_id)
+    template_id = frontend.add(
+        cli="onetemplate",
+        data={
+            "NAME": name,
+            "UID": "0",
+            "GID": "0",
+            "TEMPLATE": {
+                "DISK": shape(objects=[{"IMAGE_ID": id} for id in image_ids]),
+                "MEMORY": "2048",
+                "CPU": "1",
+                "USER_INPUTS": attributes.get("SIMULATOR_USER_INPUTS", {}),
+            },
+        },
+    )
+    lines = ["IMAGE", *[f"    ID: {id}" for id in image_ids]]
+    lines += ["VMTEMPLATE", f"    ID: {template_id}"]
+    if appliance.get("TYPE") == MARKETAPP_TYPE_SERVICE_TEMPLATE:
+        service = attributes.get("SIMULATOR_SERVICE", {})
+        service_id = frontend.add(
+            cli="oneflow-template",
+            data={
+                "NAME": name,
+                "TEMPLATE": {
+                    "BODY": {
+                        "name": name,
+                        "roles": [
+                            {"name": role, "vm_template": int(template_id)}
+                            for role in service.get("roles", ["main"])
+                        ],
+                        "custom_attrs": service.get("custom_attrs", {}),
+                        "networks": service.get("networks", {}),
+                    }
+                },
+            },
+        )
+        lines += ["SERVICE_TEMPLATE", f"    ID: {service_id}"]
+    return "\n".join(lines), "", 0
+
+
+def command_instantiate(
+    frontend: Frontend, cli: str, args: List[str], options: Dict, input: str
+) -> CommandResult:
+    template = frontend.find(cli=cli, reference=args[0])
+    if template is None:
+        return _not_found(cli=cli, reference=args[0])
+    if cli == "onetemplate":
+        vm_id = _start_vm(
+            frontend=frontend,
+            name=options.get("--name", f"{template['NAME']}-{frontend.now:.0f}"),
+            template=template,
+            attributes=dict(
+                item.partition("=")[::2]
+                for item in options.get("--user-inputs", "").split(",")
+                if item
+            ),
+        )
+        return _created(id=vm_id, prefix="VM ID")
+    data = json.loads(input) if input else {}
+    service_name = data.get("name", f"{template['NAME']}-{frontend.now:.0f}")
+    service_id = str(frontend.pool(cli="oneflow").next_id)
+    roles = []
+    for role in template["TEMPLATE"]["BODY"].get("roles", []):
+        vm_template = frontend.find(
+            cli="onetemplate", reference=str(role["vm_template"])
+        )
+        vm_name = f"{role['name']}_0_(service_{service_id})"
+        vm_id = _start_vm(
+            frontend=frontend,
+            name=vm_name,
+            template=vm_template or {},
+            attributes=data.get("custom_attrs_values", {}),
+        )
+        roles.append(
+            {
+                "name": role["name"],
+                "cardinality": 1,
+                "nodes": [
+                    {
+                        "deploy_id": int(vm_id),
+                        "vm_info": {"VM": {"ID": vm_id, "NAME": vm_name}},
+                    }
+                ],
+            }
+        )
+    frontend.add(
+        cli="oneflow",
+        data={
+            "NAME": service_name,
+            "UID": "0",
+            "GID": "0",
+            "TEMPLATE": {
+                "BODY": {
+                    "name": service_name,
+                    "state": FLOW_STATE_PENDING,
+                    "roles": roles,
+                    "custom_attrs_values": data.get("custom_attrs_values", {}),
+                    "networks_values": data.get("networks_values", []),
+                }
+            },
+        },
+    )
+    frontend.schedule(
+        cli="oneflow",
+        id=service_id,
+        delay=frontend.transition / 2,
+        values={"TEMPLATE.BODY.state": FLOW_STATE_DEPLOYING},
+    )
+    frontend.schedule(
+        cli="oneflow",
+        id=service_id,
+        delay=frontend.transition,
+        values={"TEMPLATE.BODY.state": FLOW_STATE_RUNNING},
+    )
+    return _created(id=service_id)
+
+
+def command_list(
+    frontend: Frontend, cli: str, args: List[str], options: Dict, input: str
+) -> CommandResult:
+    pool_name, element = POOLS[cli]
+    lines = frontend.pool(cli=cli).dump()
+    _list_latency(frontend=frontend, count=len(lines))
+    if "-j" not in options and "--json" not in options:
+        rows = []
+        for line in lines:
+            data = json.loads(line)
+            rows.append(f"{data['ID']:>6} {data.get('NAME', data.get('STRING', ''))}")
+        return "\n".join(["    ID NAME", *rows]), "", 0
+    # The pool is printed from the stored lines, parsing 100k objects would dominate
+    if not lines:
+        return json.dumps({pool_name: {}}), "", 0
+    pool = lines[0] if len(lines) == 1 else f"[{','.join(lines)}]"
+    return f'{{"{pool_name}":{{"{element}":{pool}}}}}', "", 0
+
+
+def command_rename(
+    frontend: Frontend, cli: str, args: List[str], options: Dict, input: str
+) -> CommandResult:
+    data = frontend.find(cli=cli, reference=args[0])
+    if data is None:
+        return _not_found(cli=cli, reference=args[0])
+    data["NAME"] = args[1]
+    frontend.changed(cli=cli)
+    return "", "", 0
+
+
+def command_show(
+    frontend: Frontend, cli: str, args: List[str], options: Dict, input: str
+) -> CommandResult:
+    data = frontend.find(cli=cli, reference=args[0])
+    if data is None:
+        return _not_found(cli=cli, reference=args[0])
+    if "-j" not in options and "--json" not in options:
+        return f"ID : {data['ID']}\nNAME : {data.get('NAME', '')}", "", 0
+    return json.dumps({POOLS[cli][1]: data}), "", 0
+
+
+def command_terminate(
+    frontend: Frontend, cli: str, args: List[str], options: Dict, input: str
+) -> CommandResult:
+    vm = frontend.find(cli=cli, reference=args[0])
+    if vm is None:
+        return _not_found(cli=cli, reference=args[0])
+    frontend.schedule(cli=cli, id=vm["ID"], delay=frontend.transition, delete=True)
+    return "", "", 0
+
+
+def command_undeploy(
+    frontend: Frontend, cli: str, args: List[str], options: Dict, input: str
+) -> CommandResult:
+    vm = frontend.find(cli=cli, reference=args[0])
+    if vm is None:
+        return _not_found(cli=cli, reference=args[0])
+    frontend.schedule(
+        cli=cli,
+        id=vm["ID"],
+        delay=frontend.transition,
+        values={"STATE": VM_STATE_UNDEPLOYED, "LCM_STATE": "0"},
+    )
+    return "", "", 0
+
+
+def command_update(
+    frontend: Frontend, cli: str, args: List[str], options: Dict, input: str
+) -> CommandResult:
+    data = frontend.find(cli=cli, reference=args[0])
+    if data is None:
+        return _not_found(cli=cli, reference=args[0])
+    if len(args) > 1:
+        with open(file=args[1], mode="rt", encoding="utf-8") as file:
+            input = file.read()
+    attributes = parse_template(data=input)
+    if "--append" in options:
+        data.setdefault("TEMPLATE", {}).update(attributes)
+    else:
+        data["TEMPLATE"] = attributes
+    frontend.changed(cli=cli)
+    return "", "", 0
+
+
+def command_updateconf(
+    frontend: Frontend, cli: str, args: List[str], options: Dict, input: str
+) -> CommandResult:
+    vm = frontend.find(cli=cli, reference=args[0])
+    if vm is None:
+        return _not_found(cli=cli, reference=args[0])
+    vm["TEMPLATE"].update(parse_template(data=input))
+    frontend.changed(cli=cli)
+    return "", "", 0
+
+
+def _list_latency(frontend: Frontend, count: int) -> None:
+    per_object = float(frontend.config.get("list_latency_per_object", 0.0))
+    if per_object:
+        time.sleep(per_object * count)
+
+
+def _start_vm(
+    frontend: Frontend, name: str, template: Dict, attributes: Dict[str, str]
+) -> str:
+    # The appliances publish the public key they generate through OneGate
+    user_template = {**attributes, "SSH_KEY": f"ssh-ed25519 AAAA{len(name):08d} {name}"}
+    vm_id = frontend.add(
+        cli="onevm",
+        data={
+            "NAME": name,
+            "STATE": VM_STATE_PENDING,
+            "LCM_STATE": "0",
+            "UID": "0",
+            "GID": "0",
+            "TEMPLATE": {
+                "NIC": {
+                    "NIC_ID": "0",
+                    "IP": f"10.0.{frontend.now % 256:.0f}.{len(name) % 256}",
+                },
+                "DISK": shape(
+                    objects=[
+                        {"DISK_ID": "0", "SIZE": "10240"},
+                    ]
+                ),
+                "CPU_MODEL": {"MODEL": "host-passthrough"},
+                "TEMPLATE_ID": template.get("ID", "0"),
+            },
+            "USER_TEMPLATE": user_template,
+        },
+    )
+    frontend.schedule(
+        cli="onevm",
+        id=vm_id,
+        delay=frontend.transition,
+        values={"STATE": VM_STATE_ACTIVE, "LCM_STATE": VM_LCM_STATE_RUNNING},
+    )
+    return vm_id
+
+
+COMMANDS = {
+    "addadmin": command_addadmin,
+    "chgrp": command_chgrp,
+    "chown": command_chown,
+    "create": command_create,
+    "delete": command_delete,
+    "deploy": command_deploy,
+    "disk-resize": command_disk_resize,
+    "export": command_export,
+    "instantiate": command_instantiate,
+    "list": command_list,
+    "rename": command_rename,
+    "show": command_show,
+    "terminate": command_terminate,
+    "undeploy": command_undeploy,
+    "update": command_update,
+    "updateconf": command_updateconf,
+}
+
+READ_ONLY_COMMANDS = {"list", "show"}
+
+STDIN_COMMANDS = {
+    "oneflow-template": ("instantiate",),
+    "oneuser": ("update",),
+    "onevm": ("updateconf",),
+}
+
+
+def run_cli(cli: str, argv: List[str]) -> int:
+    """
+    Run a simulated OpenNebula command and print its answer
+
+    :param cli: the name of the command, ``str``
+    :param argv: the arguments of the command, ``List[str]``
+    :return: the return code of the command, ``int``
+    """
+    directory = os.getenv("ONESIM_DIR") or os.path.dirname(
+        os.path.dirname(os.path.abspath(sys.argv[0]))
+    )
+    with open(
+        file=os.path.join(directory, "config.json"), mode="rt", encoding="utf-8"
+    ) as file:
+        config = json.load(file)
+    latency = float(os.getenv("ONESIM_LATENCY", config["latency"]))
+    time.sleep(max(0.0, latency + random.uniform(0, float(config["jitter"]))))
+    if random.random() < float(os.getenv("ONESIM_ERROR_RATE", config["error_rate"])):
+        print(TRANSIENT_ERROR, file=sys.stderr)
+        return 255
+    if not argv:
+        print(f"{cli}: missing action", file=sys.stderr)
+        return 255
+    action, args, options = argv[0], [], {}
+    index = 1
+    while index < len(argv):
+        if argv[index] in OPTIONS_WITH_VALUE and index + 1 < len(argv):
+            options[argv[index]] = argv[index + 1]
+            index += 1
+        elif argv[index].startswith("-"):
+            options[argv[index]] = True
+        else:
+            args.append(argv[index])
+        index += 1
+    command = COMMANDS.get(action)
+    input = ""
+    if action in STDIN_COMMANDS.get(cli, ()) and not sys.stdin.isatty():
+        input = sys.stdin.read()
+    with locked(directory=directory, exclusive=action not in READ_ONLY_COMMANDS):
+        frontend = Frontend(directory=directory, config=config)
+        if command is None:
+            stdout, stderr, rc = _usage(cli=cli, action=action)
+        else:
+            try:
+                stdout, stderr, rc = command(
+                    frontend=frontend, cli=cli, args=args, options=options, input=input
+                )
+            except (IndexError, ValueError) as e:
+                stdout, stderr, rc = "", f"{cli} {action}: invalid arguments ({e})", 255
+        if action not in READ_ONLY_COMMANDS:
+            frontend.save()
+    if stdout:
+        print(stdout)
+    if stderr:
+        print(stderr, file=sys.stderr)
+    return rc
+
+
+# ##############################################################################
+# ##                               SETUP                                      ##
+# ##############################################################################
+
+
+def init(
+    directory: str,
+    seed: int,
+    size: int,
+    sizes: Dict[str, int],
+    latency: float,
+    jitter: float,
+    list_latency_per_object: float,
+    transition: float,
+    error_rate: float,
+) -> None:
+    """
+    Create a simulated frontend with synthetic pools and the links to its commands
+
+    :param directory: the directory of the simulated frontend, ``str``
+    :param seed: the seed of the synthetic pools, ``int``
+    :param size: the default number of objects of every pool, ``int``
+    :param sizes: the number of objects of specific pools, ``Dict[str, int]``
+    :param latency: the seconds every command waits before answering, ``float``
+    :param jitter: the maximum random seconds added to the latency, ``float``
+    :param list_latency_per_object: the seconds a list command waits per object in the pool, ``float``
+    :param transition: the seconds a created resource takes to reach its final state, ``float``
+    :param error_rate: the probability of a command failing with a transient error, ``float``
+    """
+    rng = random.Random(seed)
+    os.makedirs(os.path.join(directory, "bin"), exist_ok=True)
+    os.makedirs(os.path.join(directory, "pools"), exist_ok=True)
+    config = {
+        "seed": seed,
+        "latency": latency,
+        "jitter": jitter,
+        "list_latency_per_object": list_latency_per_object,
+        "transition": transition,
+        "error_rate": error_rate,
+    }
+    with open(
+        file=os.path.join(directory, "config.json"), mode="wt", encoding="utf-8"
+    ) as file:
+        json.dump(config, file, indent=2)
+    script = os.path.abspath(__file__)
+    for cli in POOLS:
+        objects = generate_pool(cli=cli, size=sizes.get(cli, size), rng=rng)
+        with open(
+            file=pool_path(directory=directory, cli=cli, extension="jsonl"),
+            mode="wt",
+            encoding="utf-8",
+        ) as file:
+            for data in objects:
+                file.write(json.dumps(data, separators=(",", ":")) + "\n")
+        with open(
+            file=pool_path(directory=directory, cli=cli, extension="json"),
+            mode="wt",
+            encoding="utf-8",
+        ) as file:
+            json.dump({"next_id": len(objects), "transitions": []}, file)
+        link = os.path.join(directory, "bin", cli)
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(script, link)
+    print(f"Simulated OpenNebula frontend created in {directory}")
+    print(f"export PATH={os.path.join(directory, 'bin')}:$PATH")
+
+
+def main() -> int:
+    cli = os.path.basename(sys.argv[0])
+    if cli in POOLS:
+        return run_cli(cli=cli, argv=sys.argv[1:])
+    parser = argparse.ArgumentParser(description="Simulated OpenNebula CLI")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    init_parser = subparsers.add_parser("init", help="create a simulated frontend")
+    init_parser.add_argument("--dir", required=True, help="directory of the frontend")
+    init_parser.add_argument("--seed", type=int, default=0)
+    init_parser.add_argument("--size", type=int, default=10, help="objects per pool")
+    init_parser.add_argument(
+        "--pool",
+        action="append",
+        default=[],
+        metavar="CLI=SIZE",
+        help="objects of one pool, e.g. onevm=100000",
+    )
+    init_parser.add_argument("--latency", type=float, default=0.0)
+    init_parser.add_argument("--jitter", type=float, default=0.0)
+    init_parser.add_argument("--list-latency-per-object", type=float, default=0.0)
+    init_parser.add_argument("--transition", type=float, default=10.0)
+    init_parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    sizes = {}
+    for item in args.pool:
+        cli, _, value = item.partition("=")
+        if cli not in POOLS or not value.isdigit():
+            parser.error(f"invalid pool size {item}")
+        sizes[cli] = int(value)
+    init(
+        directory=os.path.abspath(args.dir),
+        seed=args.seed,
+        size=args.size,
+        sizes=sizes,
+        latency=args.latency,
+        jitter=args.jitter,
+        list_latency_per_object=args.list_latency_per_object,
+        transition=args.transition,
+        error_rate=args.error_rate,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Show which components are enabled in every site of the sites repository
+
+The core.yaml of each site is read from its branch without a checkout and
+decrypted in memory with the token of the sites, then a component by site
+matrix is printed:
+
+    python3 scripts/sites_inventory.py --token-file .temp/sites_token
+    python3 scripts/sites_inventory.py --token-file token --output inventory.json
+
+The core.yaml files are decrypted in a pool of processes when the cryptography
+package is installed, otherwise each one is passed through ansible-vault. The
+URL of the repository is read from the .env file of ``--root`` unless it is
+given, and the git cache of TOOLKIT_INSTALLER_GIT_CACHE_PATH is used when it is
+set. The GitHub token of a private repository is read from GITHUB_TOKEN.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+from dotenv import dotenv_values
+
+
+def report(inventory: Dict[str, Dict], matrix: Dict[str, List[str]]) -> None:
+    """
+    Print a row per site with a mark in the columns of its components, and the sites of each component
+
+    :param inventory: the inventory of the sites, ``Dict[str, Dict]``
+    :param matrix: the sites by component, ``Dict[str, List[str]]``
+    """
+    components = list(matrix)
+    width = max([len("site"), *(len(site) for site in inventory)])
+    print(" ".join([f"{'site':<{width}}", *components]))
+    for site, site_inventory in inventory.items():
+        if "error" in site_inventory:
+            print(f"{site:<{width}} error: {site_inventory['error']}")
+            continue
+        marks = [
+            f"{'x' if component in site_inventory['components'] else '.':^{len(component)}}"
+            for component in components
+        ]
+        print(" ".join([f"{site:<{width}}", *marks]))
+    print(
+        " ".join(
+            [
+                f"{'sites':<{width}}",
+                *(
+                    f"{len(matrix[component]):^{len(component)}}"
+                    for component in components
+                ),
+            ]
+        )
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description="Show which components are enabled in every site"
+    )
+    parser.add_argument(
+        "--root",
+        default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        help="checkout whose utils package and .env file are used",
+    )
+    parser.add_argument(
+        "--token-file",
+        required=True,
+        help="file with the ansible-vault token of the sites",
+    )
+    parser.add_argument("--url", help="URL of the sites, SITES_HTTPS_URL by default")
+    parser.add_argument(
+        "--path",
+        help="bare repository used without the git cache, .temp/<repository>-inventory.git by default",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="decryption workers, one per CPU by default"
+    )
+    parser.add_argument(
+        "--output", help="file where the inventory and the matrix are saved"
+    )
+    args = parser.parse_args()
+    root = os.path.abspath(args.root)
+    dotenv = dotenv_values(os.path.join(root, ".env"))
+    url = args.url or dotenv["SITES_HTTPS_URL"]
+    path = args.path or os.path.join(
+        ".temp", f"{dotenv['SITES_REPOSITORY_NAME']}-inventory.git"
+    )
+    os.environ.setdefault(
+        "TOOLKIT_INSTALLER_GIT_CACHE_PATH",
+        dotenv.get("TOOLKIT_INSTALLER_GIT_CACHE_PATH") or "",
+    )
+    sys.path.insert(0, root)
+    from utils.sites import component_site_matrix, sites_inventory
+
+    start = time.perf_counter()
+    inventory = sites_inventory(
+        https_url=url,
+        path=os.path.abspath(path),
+        token_path=os.path.abspath(args.token_file),
+        token=os.getenv("GITHUB_TOKEN"),
+        workers=args.workers,
+    )
+    matrix = component_site_matrix(inventory=inventory)
+    seconds = time.perf_counter() - start
+    report(inventory=inventory, matrix=matrix)
+    errors = sum(
+        1 for site_inventory in inventory.values() if "error" in site_inventory
+    )
+    print(f"{len(inventory)} sites read in {seconds:.2f} s, {errors} with errors")
+    if args.output:
+        with open(args.output, mode="wt", encoding="utf-8") as file:
+            json.dump({"sites": inventory, "matrix": matrix}, file, indent=2)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
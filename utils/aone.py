@@ -0,0 +1,633 @@
+"""
+Async OpenNebula CLI Read Functions
+
+Awaitable counterparts of the list and show functions of utils/one.py, meant to
+be gathered when several independent facts are needed at once:
+
+    users, groups, acls = await asyncio.gather(
+        aone.user_list(), aone.group_list(), aone.acl_list()
+    )
+
+Every function returns the same data and raises the same exceptions as its
+synchronous twin. Lookups built on several reads, such as the VM of a flow
+role, run their synchronous twin in a worker thread. Identical commands and
+appliance downloads in flight at the same time, here or in utils/one.py, run
+only once (see utils/singleflight.py) and every caller gets its own parsed copy
+of the output.
+OpenNebula commands share the AIMD concurrency window of utils/one.py (see
+utils/limiter.py) that shrinks when oned slows down or times out, and transient
+failures are retried as utils/retry.py says.
+
+The installer is synchronous and waits for several reads at once with gather:
+
+    usernames, groups_names = aone.gather(aone.user_names(), aone.group_names())
+
+================================================================================
+                              FUNCTION INDEX
+================================================================================
+- GATHER: gather
+- ACL: acl_list
+- DATASTORE: datastore_list
+- ONEFLOW: flow_custom_attr_value_by_id, flow_list, flow_role_vm_name_by_id, flow_show, flow_show_by_id
+- ONEFLOW TEMPLATE: flow_template_show
+- GROUP: group_list, group_names, group_show
+- HOST: host_list, host_show
+- IMAGES: image_list, image_show
+- MARKETPLACE: market_list, market_show
+- MARKETAPP: marketapp_curl, marketapp_list, marketapp_show
+- TEMPLATE: template_list, template_show
+- USER: user_list, user_names, user_show
+- VM: vm_cpu_model, vm_list, vm_show, vm_show_by_id, vm_user_template_param
+- NETWORKS: vnet_list, vnet_show
+================================================================================
+"""
+
+import asyncio
+from typing import Awaitable, Dict, List, Optional
+
+from utils.cli import join_command
+from utils.exceptions import CommandFailed, InvalidData, ToolkitError
+from utils.file import loads_json
+from utils.logs import msg
+from utils.one import (
+    oneflow_custom_attr_value_by_id,
+    oneflow_role_vm_name_by_id,
+    onegroups_names,
+    oneusernames,
+    onevm_cpu_model,
+    onevm_user_template_param,
+)
+from utils.retry import (
+    HTTP_READ_RETRY,
+    ONE_LIMITER,
+    ONE_READ_RETRY,
+    retry_command_async,
+)
+from utils.singleflight import HTTP_READS, ONE_READS
+
+
+async def _query(
+    command: List[str], subject: str, required: Optional[str] = None
+) -> Dict | None:
+    """
+    Run a read command and parse its JSON output
+
+    :param command: the argument vector to run, ``List[str]``
+    :param subject: the resource described in the debug logs, ``str``
+    :param required: the error message raised if the command fails, None to return None instead, ``Optional[str]``
+    :return: the parsed output of the command, ``Dict | None``
+    """
+    stdout, stderr, rc = await ONE_READS.do_async(
+        key=tuple(command),
+        function=lambda: retry_command_async(
+            command=command, policy=ONE_READ_RETRY, limiter=ONE_LIMITER
+        ),
+    )
+    if rc != 0:
+        if required is not None:
+            raise CommandFailed(
+                f"{required}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+                command=command,
+                stderr=stderr,
+                rc=rc,
+            )
+        msg(
+            level="debug",
+            message=f"{subject} not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+        )
+        return None
+    msg(
+        level="debug",
+        message=f"{subject} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
+    )
+    return loads_json(data=stdout)
+
+
+def _one_of(
+    name_key: str,
+    name: Optional[str],
+    id_key: str,
+    id: Optional[int],
+) -> str:
+    """
+    Check that exactly one of a name or an id is given and return it as a CLI argument
+
+    :param name_key: the name of the name parameter, ``str``
+    :param name: the name of the resource, ``Optional[str]``
+    :param id_key: the name of the id parameter, ``str``
+    :param id: the id of the resource, ``Optional[int]``
+    :return: the name or the id of the resource, ``str``
+    """
+    if name is None and id is None:
+        raise ToolkitError(f"Either {name_key} or {id_key} must be provided")
+    if name is not None and id is not None:
+        raise ToolkitError(f"Either {name_key} or {id_key} must be provided, not both")
+    return name if name is not None else str(id)
+
+
+# ##############################################################################
+# ##                                 GATHER                                   ##
+# ##############################################################################
+
+
+def gather(*reads: Awaitable) -> List:
+    """
+    Wait for several independent reads at once from synchronous code, such as the installer
+
+    :param reads: the reads to wait for, ``Awaitable``
+    :return: the results in the order of the reads, ``List``
+    """
+
+    async def _gather() -> List:
+        return await asyncio.gather(*reads)
+
+    return asyncio.run(_gather())
+
+
+# ##############################################################################
+# ##                                  ACL                                     ##
+# ##############################################################################
+
+
+async def acl_list() -> Dict | None:
+    """
+    Get the list of ACLs in OpenNebula
+
+    :return: the list of ACLs, ``Dict``
+    """
+    return await _query(command=["oneacl", "list", "-j"], subject="OpenNebula ACLs")
+
+
+# ##############################################################################
+# ##                               DATASTORE                                  ##
+# ##############################################################################
+
+
+async def datastore_list() -> Dict:
+    """
+    Get the list of datastores in OpenNebula
+
+    :return: the list of datastores, ``Dict``
+    """
+    return await _query(
+        command=["onedatastore", "list", "-j"],
+        subject="OpenNebula datastores",
+        required="OpenNebula datastores not found. Create a datastore in OpenNebula before adding an appliance",
+    )
+
+
+# ##############################################################################
+# ##                                ONEFLOW                                   ##
+# ##############################################################################
+
+
+async def flow_list() -> List | None:
+    """
+    Get the list of services in OpenNebula
+
+    :return: the list of services, ``List``
+    """
+    return await _query(
+        command=["oneflow", "list", "-j"], subject="OpenNebula services"
+    )
+
+
+async def flow_custom_attr_value_by_id(oneflow_id: int, attr_key: str) -> str:
+    """
+    Get the value of a custom attribute of a service in OpenNebula by ID
+
+    :param oneflow_id: the ID of the service, ``int``
+    :param attr_key: the key of the custom attribute, ``str``
+    :return: the value of the custom attribute, ``str``
+    """
+    return await asyncio.to_thread(
+        oneflow_custom_attr_value_by_id, oneflow_id=oneflow_id, attr_key=attr_key
+    )
+
+
+async def flow_role_vm_name_by_id(oneflow_id: int, oneflow_role: str) -> str:
+    """
+    Get the name of the VM of a role in a service in OpenNebula by ID
+
+    :param oneflow_id: the ID of the service, ``int``
+    :param oneflow_role: the name of the role, ``str``
+    :return: the name of the VM, ``str``
+    """
+    return await asyncio.to_thread(
+        oneflow_role_vm_name_by_id, oneflow_id=oneflow_id, oneflow_role=oneflow_role
+    )
+
+
+async def flow_show(oneflow_name: str) -> Dict | None:
+    """
+    Get the details of a service in OpenNebula
+
+    :param oneflow_name: the name of the service, ``str``
+    :return: the details of the service, ``Dict``
+    """
+    return await _query(
+        command=["oneflow", "show", oneflow_name, "-j"],
+        subject=f"Service {oneflow_name}",
+    )
+
+
+async def flow_show_by_id(oneflow_id: int) -> Dict | None:
+    """
+    Get the details of a service in OpenNebula by ID
+
+    :param oneflow_id: the ID of the service, ``int``
+    :return: the details of the service, ``Dict``
+    """
+    return await _query(
+        command=["oneflow", "show", str(oneflow_id), "-j"],
+        subject=f"Service with ID {oneflow_id}",
+    )
+
+
+# ##############################################################################
+# ##                            ONEFLOW TEMPLATE                              ##
+# ##############################################################################
+
+
+async def flow_template_show(oneflow_template_name: str) -> Dict | None:
+    """
+    Get the details of a service template in OpenNebula
+
+    :param oneflow_template_name: the name of the service, ``str``
+    :return: the details of the service, ``Dict``
+    """
+    return await _query(
+        command=["oneflow-template", "show", oneflow_template_name, "-j"],
+        subject=f"Service {oneflow_template_name}",
+    )
+
+
+# ##############################################################################
+# ##                                 GROUP                                    ##
+# ##############################################################################
+
+
+async def group_list() -> Dict | None:
+    """
+    Get the list of groups in OpenNebula
+
+    :return: the list of groups, ``Dict``
+    """
+    return await _query(command=["onegroup", "list", "-j"], subject="OpenNebula groups")
+
+
+async def group_names() -> List[str]:
+    """
+    Get the list of groups names in OpenNebula
+
+    :return: the list of groups names, ``List[str]``
+    """
+    return await asyncio.to_thread(onegroups_names)
+
+
+async def group_show(group_name: str) -> Dict | None:
+    """
+    Get the details of a group in OpenNebula
+
+    :param group_name: the name of the group, ``str``
+    :return: the details of the group, ``Dict``
+    """
+    return await _query(
+        command=["onegroup", "show", group_name, "-j"], subject=f"Group {group_name}"
+    )
+
+
+# ##############################################################################
+# ##                                  HOST                                    ##
+# ##############################################################################
+
+
+async def host_list() -> Dict | None:
+    """
+    Get the list of hosts in OpenNebula
+
+    :return: the list of hosts, ``Dict``
+    """
+    return await _query(command=["onehost", "list", "-j"], subject="OpenNebula hosts")
+
+
+async def host_show(host_name: str) -> Dict | None:
+    """
+    Get the details of a host in OpenNebula
+
+    :param host_name: the name of the host, ``str``
+    :return: the details of the host, ``Dict``
+    """
+    return await _query(
+        command=["onehost", "show", host_name, "-j"], subject=f"Host {host_name}"
+    )
+
+
+# ##############################################################################
+# ##                                 IMAGES                                   ##
+# ##############################################################################
+
+
+async def image_list() -> Dict | None:
+    """
+    Get the list of images in OpenNebula
+
+    :return: the list of images, ``Dict``
+    """
+    return await _query(command=["oneimage", "list", "-j"], subject="OpenNebula images")
+
+
+async def image_show(
+    image_name: Optional[str] = None, image_id: Optional[int] = None
+) -> Dict | None:
+    """
+    Get the details of an image in OpenNebula
+
+    :param image_name: the name of the image, ``str``
+    :param image_id: the id of the image, ``int``
+    :return: the details of the image, ``Dict``
+    """
+    image = _one_of(
+        name_key="image_name",
+        name=image_name,
+        id_key="image_id",
+        id=image_id,
+    )
+    return await _query(
+        command=["oneimage", "show", image, "-j"],
+        subject=f"Image {image_name}" if image_name else f"Image with id {image_id}",
+    )
+
+
+# ##############################################################################
+# ##                              MARKETPLACE                                 ##
+# ##############################################################################
+
+
+async def market_list() -> Dict | None:
+    """
+    Get the list of marketplaces in OpenNebula
+
+    :return: the list of marketplaces, ``Dict``
+    """
+    return await _query(
+        command=["onemarket", "list", "-j"], subject="OpenNebula marketplaces"
+    )
+
+
+async def market_show(marketplace_name: str) -> Dict | None:
+    """
+    Get the details of a marketplace in OpenNebula
+
+    :param marketplace_name: the name of the marketplace, ``str``
+    :return: the details of the marketplace, ``Dict``
+    """
+    return await _query(
+        command=["onemarket", "show", marketplace_name, "-j"],
+        subject=f"Marketplace {marketplace_name}",
+    )
+
+
+# ##############################################################################
+# ##                               MARKETAPP                                  ##
+# ##############################################################################
+
+
+async def marketapp_curl(appliance_url: str) -> Dict:
+    """
+    Get the data of an appliance using the url in OpenNebula
+
+    :param appliance_url: the url of the appliance, ``str``
+    :return: the data of the appliance, ``Dict``
+    """
+    command = [
+        "curl",
+        "-s",
+        "-w",
+        "%{http_code}",
+        "-H",
+        "Accept: application/json",
+        appliance_url,
+    ]
+    stdout, stderr, rc = await HTTP_READS.do_async(
+        key=("GET", appliance_url),
+        function=lambda: retry_command_async(command=command, policy=HTTP_READ_RETRY),
+    )
+    data, status_code = stdout[:-3].strip(), stdout[-3:]
+    if status_code != "200":
+        raise CommandFailed(
+            f"Could not get appliance data from url {appliance_url}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
+        )
+    return loads_json(data=data)
+
+
+async def marketapp_list() -> Dict | None:
+    """
+    Get the list of appliances of every marketplace in OpenNebula
+
+    :return: the list of appliances, ``Dict``
+    """
+    return await _query(
+        command=["onemarketapp", "list", "-j"], subject="OpenNebula appliances"
+    )
+
+
+async def marketapp_show(appliance_name: str, marketplace_name: str) -> Dict:
+    """
+    Get the details of an appliance in OpenNebula
+
+    :param appliance_name: the name of the appliance, ``str``
+    :param marketplace_name: the name of the marketplace, ``str``
+    :return: the details of the appliance, ``Dict``
+    """
+    appliance = await _query(
+        command=["onemarketapp", "show", appliance_name, "-j"],
+        subject=f"OpenNebula appliance {appliance_name}",
+        required=f"OpenNebula appliance {appliance_name} not found in marketplace {marketplace_name}",
+    )
+    if (
+        "MARKETPLACEAPP" not in appliance
+        or "MARKETPLACE" not in appliance["MARKETPLACEAPP"]
+    ):
+        raise InvalidData(
+            f"MARKETPLACEAPP key not found in appliance {appliance_name} or MARKETPLACE key not found in MARKETPLACE"
+        )
+    if appliance["MARKETPLACEAPP"]["MARKETPLACE"] != marketplace_name:
+        raise ToolkitError(
+            f"Appliance {appliance_name} not in {marketplace_name} marketplace"
+        )
+    return appliance
+
+
+# ##############################################################################
+# ##                                TEMPLATE                                  ##
+# ##############################################################################
+
+
+async def template_list() -> Dict | None:
+    """
+    Get the list of templates in OpenNebula
+
+    :return: the list of templates, ``Dict``
+    """
+    return await _query(
+        command=["onetemplate", "list", "-j"], subject="OpenNebula templates"
+    )
+
+
+async def template_show(
+    template_name: Optional[str] = None, template_id: Optional[int] = None
+) -> Dict | None:
+    """
+    Get the details of a template in OpenNebula
+
+    :param template_name: the name of the template, ``str``
+    :param template_id: the id of the template, ``int``
+    :return: the details of the template, ``Dict``
+    """
+    template = _one_of(
+        name_key="template_name",
+        name=template_name,
+        id_key="template_id",
+        id=template_id,
+    )
+    return await _query(
+        command=["onetemplate", "show", template, "-j"],
+        subject=f"Template {template_name}"
+        if template_name
+        else f"Template with id {template_id}",
+    )
+
+
+# ##############################################################################
+# ##                                  USER                                    ##
+# ##############################################################################
+
+
+async def user_list() -> Dict | None:
+    """
+    Get the list of users in OpenNebula
+
+    :return: the list of users, ``Dict``
+    """
+    return await _query(command=["oneuser", "list", "-j"], subject="OpenNebula users")
+
+
+async def user_names() -> List[str]:
+    """
+    Get the list of usernames in OpenNebula
+
+    :return: the list of usernames, ``List[str]``
+    """
+    return await asyncio.to_thread(oneusernames)
+
+
+async def user_show(
+    username: Optional[str] = None, user_id: Optional[int] = None
+) -> Dict | None:
+    """
+    Get the details of an user in OpenNebula
+
+    :param username: the name of the user, ``str``
+    :param user_id: the id of the user, ``int``
+    :return: the details of the user, ``Dict``
+    """
+    user = _one_of(name_key="username", name=username, id_key="user_id", id=user_id)
+    return await _query(
+        command=["oneuser", "show", user, "-j"],
+        subject=f"User {username}" if username else f"User with id {user_id}",
+    )
+
+
+# ##############################################################################
+# ##                                   VM                                     ##
+# ##############################################################################
+
+
+async def vm_cpu_model(vm_name: str) -> str:
+    """
+    Get the CPU model of a VM in OpenNebula
+
+    :param vm_name: the name of the VM, ``str``
+    :return: the CPU model of the VM, ``str``
+    """
+    return await asyncio.to_thread(onevm_cpu_model, vm_name=vm_name)
+
+
+async def vm_list() -> Dict | None:
+    """
+    Get the list of VMs in OpenNebula
+
+    :return: the list of VMs, ``Dict``
+    """
+    return await _query(command=["onevm", "list", "-j"], subject="OpenNebula VMs")
+
+
+async def vm_show(vm_name: str) -> Dict | None:
+    """
+    Get the details of a VM in OpenNebula
+
+    :param vm_name: the name of the VM, ``str``
+    :return: the details of the VM, ``Dict``
+    """
+    return await _query(
+        command=["onevm", "show", vm_name, "-j"], subject=f"VM {vm_name}"
+    )
+
+
+async def vm_user_template_param(vm_name: str, param: str) -> Dict:
+    """
+    Get the value of a user template parameter of a VM in OpenNebula
+
+    :param vm_name: the name of the VM, ``str``
+    :param param: the name of the parameter, ``str``
+    :return: the value of the parameter, ``Dict``
+    """
+    return await asyncio.to_thread(
+        onevm_user_template_param, vm_name=vm_name, param=param
+    )
+
+
+async def vm_show_by_id(vm_id: int) -> Dict | None:
+    """
+    Get the details of a VM in OpenNebula by ID
+
+    :param vm_id: the ID of the VM, ``int``
+    :return: the details of the VM, ``Dict``
+    """
+    return await _query(
+        command=["onevm", "show", str(vm_id), "-j"], subject=f"VM with ID {vm_id}"
+    )
+
+
+# ##############################################################################
+# ##                                NETWORKS                                  ##
+# ##############################################################################
+
+
+async def vnet_list() -> Dict:
+    """
+    Get the list of VNets in OpenNebula
+
+    :return: the list of vnets, ``Dict``
+    """
+    return await _query(
+        command=["onevnet", "list", "-j"],
+        subject="Vnets",
+        required="Vnets not found. Create a vnet in OpenNebula before adding an appliance",
+    )
+
+
+async def vnet_show(vnet_name: str) -> Dict | None:
+    """
+    Get the details of a VNet in OpenNebula
+
+    :param vnet_name: the name of the vnet, ``str``
+    :return: the details of the vnet, ``Dict``
+    """
+    return await _query(
+        command=["onevnet", "show", vnet_name, "-j"], subject=f"Vnet {vnet_name}"
+    )
@@ -0,0 +1,186 @@
+import json
+import os
+import re
+import shlex
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from utils.exceptions import CommandTimeout, ConfigurationError, NotFound
+from utils.logs import msg
+from utils.trace import redact_command
+
+CASSETTE_MODES = ("record", "replay")
+
+# Values that change on every run, replaced in the keys so a replay finds the
+# commands that carry them, such as the timestamp in the name of a service. The
+# working directory is replaced too, the temporary files are created inside it
+VOLATILE_PATTERNS = [
+    (re.compile(r"\b\d{8}-\d{6}\b"), "<timestamp>"),
+]
+
+_cassette: Optional["Cassette"] = None
+_cassette_loaded = False
+
+
+class Cassette:
+    """
+    File with the results of the commands of a run, recorded to be replayed offline
+
+    Only the results are recorded, not the side effects of the commands: the
+    working copies created by git, the files changed by ansible-vault and the
+    objects read by GitCatFile, which does not go through the cassette. A replay
+    runs the programs listed in passthrough for real so the files they create are
+    there. The outputs are recorded as received, with the passwords and tokens
+    OpenNebula returns, so the file is only readable by its owner
+    """
+
+    def __init__(self, path: str, mode: str, passthrough: Tuple[str, ...] = ()):
+        if mode not in CASSETTE_MODES:
+            raise ConfigurationError(
+                f"Invalid cassette mode {mode}. Options: {', '.join(CASSETTE_MODES)}"
+            )
+        self.path = path
+        self.mode = mode
+        self.passthrough = passthrough
+        self.replayed = 0
+        self._entries: Dict[str, List[Dict]] = defaultdict(list)
+        self._positions: Dict[str, int] = defaultdict(int)
+        self._file: Optional[TextIO] = None
+        self._lock = threading.Lock()
+        if mode == "record":
+            msg(
+                level="warning",
+                message=f"Recording the commands to cassette {path}. It holds the outputs of OpenNebula, including passwords and tokens: keep it private",
+            )
+        elif mode == "replay":
+            if not os.path.isfile(path):
+                raise NotFound(f"Cassette {path} not found")
+            with open(path, mode="rt", encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]].append(entry)
+            msg(
+                level="info",
+                message=f"Replaying {sum(map(len, self._entries.values()))} commands from cassette {path}",
+            )
+
+    @staticmethod
+    def key(command: str | List[str], input: Optional[str]) -> str:
+        """
+        Get the key that identifies a command, credentials and volatile values are left out so a replay can use other tokens
+
+        :param command: the argument vector or shell line, ``str | List[str]``
+        :param input: the data sent to the stdin of the command, ``Optional[str]``
+        :return: the key of the command, ``str``
+        """
+        command = redact_command(command=command).replace(os.getcwd(), "<cwd>")
+        if input is not None:
+            input = input.replace(os.getcwd(), "<cwd>")
+        for pattern, replacement in VOLATILE_PATTERNS:
+            command = pattern.sub(replacement, command)
+            if input is not None:
+                input = pattern.sub(replacement, input)
+        return json.dumps([command, input])
+
+    def passes(self, command: str | List[str]) -> bool:
+        """
+        Check whether a command runs for real during a replay instead of being served from the cassette
+
+        :param command: the argument vector or shell line, ``str | List[str]``
+        :return: whether the program of the command is in passthrough, ``bool``
+        """
+        if self.mode != "replay":
+            return False
+        if isinstance(command, str):
+            command = shlex.split(command)
+        return bool(command) and os.path.basename(command[0]) in self.passthrough
+
+    def record(
+        self,
+        command: str | List[str],
+        input: Optional[str],
+        stdout: str,
+        stderr: str,
+        rc: Optional[int],
+    ) -> None:
+        """
+        Append the result of a command to the cassette
+
+        :param command: the argument vector or shell line run, ``str | List[str]``
+        :param input: the data sent to the stdin of the command, ``Optional[str]``
+        :param stdout: the output of the command, ``str``
+        :param stderr: the error of the command, ``str``
+        :param rc: the return code of the command, None if it timed out, ``Optional[int]``
+        """
+        entry = {
+            "key": self.key(command=command, input=input),
+            "stdout": stdout,
+            "stderr": stderr,
+            "rc": rc,
+        }
+        # Commands finish in several threads at once
+        with self._lock:
+            if self._file is None:
+                self._file = os.fdopen(
+                    os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600),
+                    mode="wt",
+                    encoding="utf-8",
+                )
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+
+    def replay(
+        self, command: str | List[str], input: Optional[str]
+    ) -> Tuple[str, str, int]:
+        """
+        Get the next recorded result of a command, the last one is repeated once all were served
+
+        :param command: the argument vector or shell line, ``str | List[str]``
+        :param input: the data sent to the stdin of the command, ``Optional[str]``
+        :return: the stdout, stderr and return code recorded, ``Tuple[str, str, int]``
+        """
+        key = self.key(command=command, input=input)
+        entries = self._entries.get(key)
+        if not entries:
+            raise NotFound(
+                f"Command not recorded in cassette {self.path}: {redact_command(command=command)}"
+            )
+        with self._lock:
+            position = self._positions[key]
+            entry = entries[min(position, len(entries) - 1)]
+            self._positions[key] = position + 1
+            self.replayed += 1
+        if entry["rc"] is None:
+            raise CommandTimeout(
+                f"Command timed out when it was recorded. Command executed: {redact_command(command=command)}. Error received: {entry['stderr']}",
+                command=command,
+                stderr=entry["stderr"],
+            )
+        return entry["stdout"], entry["stderr"], entry["rc"]
+
+
+def get_cassette() -> Optional[Cassette]:
+    """
+    Get the cassette of the run, enabled when TOOLKIT_INSTALLER_CASSETTE_MODE is record or replay
+
+    The file is set with TOOLKIT_INSTALLER_CASSETTE_PATH and the programs run for real during a replay with TOOLKIT_INSTALLER_CASSETTE_PASSTHROUGH
+
+    :return: the cassette or None if commands run against the real backends, ``Optional[Cassette]``
+    """
+    global _cassette, _cassette_loaded
+    if not _cassette_loaded:
+        mode = os.getenv("TOOLKIT_INSTALLER_CASSETTE_MODE", "")
+        if mode:
+            path = os.getenv("TOOLKIT_INSTALLER_CASSETTE_PATH", "")
+            if not path:
+                raise ConfigurationError(
+                    "TOOLKIT_INSTALLER_CASSETTE_PATH is required when TOOLKIT_INSTALLER_CASSETTE_MODE is set"
+                )
+            passthrough = os.getenv("TOOLKIT_INSTALLER_CASSETTE_PASSTHROUGH", "")
+            _cassette = Cassette(
+                path=path, mode=mode, passthrough=tuple(passthrough.split())
+            )
+        _cassette_loaded = True
+    return _cassette
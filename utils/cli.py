@@ -1,24 +1,511 @@
+import asyncio
+import os
+import shlex
+import shutil
 import subprocess
-from typing import Tuple
+import threading
+from functools import lru_cache
+from time import monotonic, time
+from typing import List, Optional, Tuple, Union
 
+from utils.cassette import get_cassette
+from utils.exceptions import CommandTimeout
+from utils.limiter import AIMDLimiter, ConcurrencyLimit
 from utils.logs import msg
+from utils.trace import get_phase, get_tracer
 
+Command = Union[str, List[str]]
 
-def run_command(command: str) -> Tuple[str, str, int]:
+READ_CHUNK_SIZE = 64 * 1024
+
+_commands_limit: Optional[ConcurrencyLimit] = None
+_commands_limit_lock = threading.Lock()
+
+
+@lru_cache(maxsize=None)
+def _which(program: str) -> Optional[str]:
     """
-    Run a command in the shell and return the result
+    Resolve a program to its absolute path once per process
 
-    :param command: the command to run, ``str``
-    :return: the stdout, stderr and return code of the command, ``Tuple[str, str, int]``
+    :param program: the name or path of the program, ``str``
+    :return: the absolute path of the program or None if it is not found, ``Optional[str]``
+    """
+    return shutil.which(program)
+
+
+def _command_limit() -> ConcurrencyLimit:
+    """
+    Get the limit of the number of commands running at the same time, shared by the synchronous and asynchronous callers
+
+    The limit is read from TOOLKIT_INSTALLER_MAX_CONCURRENT_COMMANDS, 8 by default
+
+    :return: the limit of the commands, ``ConcurrencyLimit``
+    """
+    global _commands_limit
+    if _commands_limit is None:
+        with _commands_limit_lock:
+            if _commands_limit is None:
+                limit = os.getenv("TOOLKIT_INSTALLER_MAX_CONCURRENT_COMMANDS", "8")
+                _commands_limit = ConcurrencyLimit(
+                    name="commands",
+                    limit=max(1, int(limit)) if limit.isdigit() else 8,
+                )
+    return _commands_limit
+
+
+def _log_command(command: Command, stdout: str, stderr: str, return_code: int) -> None:
+    """
+    Log the result of a command at debug level
+
+    :param command: the argument vector or shell line, ``Command``
+    :param stdout: the output of the command, ``str``
+    :param stderr: the error of the command, ``str``
+    :param return_code: the return code of the command, ``int``
     """
-    result = subprocess.run(
-        command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-    )
-    stdout = result.stdout.strip()
-    stderr = result.stderr.strip()
-    return_code = result.returncode
     msg(
         level="debug",
-        message=f"Command executed: {command}. Command output: {stdout}. Error received: {stderr}. Return code: {return_code}",
+        message=f"Command executed: {join_command(command)}. Command output: {stdout}. Error received: {stderr}. Return code: {return_code}",
+    )
+
+
+def _trace_command(
+    command: Command,
+    started_at: float,
+    start: float,
+    result: Optional[Tuple[str, str, int]],
+) -> None:
+    """
+    Record a command in the trace file
+
+    :param command: the argument vector or shell line, ``Command``
+    :param started_at: the epoch time when the command started, ``float``
+    :param start: the monotonic time when the command started, ``float``
+    :param result: the stdout, stderr and return code, None if the command did not finish, ``Optional[Tuple[str, str, int]]``
+    """
+    stdout, stderr, return_code = result if result else ("", "", None)
+    get_tracer().record(
+        command=command,
+        start=started_at,
+        duration=monotonic() - start,
+        rc=return_code,
+        stdout_bytes=len(stdout.encode()),
+        stderr_bytes=len(stderr.encode()),
+        phase=get_phase(),
+    )
+
+
+def _timeout_error(command: Command, timeout: float, stderr: str) -> CommandTimeout:
+    """
+    Build the error of a command that did not finish in time
+
+    :param command: the argument vector or shell line, ``Command``
+    :param timeout: the maximum seconds the command could run, ``float``
+    :param stderr: the error received before it was killed, ``str``
+    :return: the error, ``CommandTimeout``
+    """
+    return CommandTimeout(
+        f"Command did not finish in {timeout} seconds. Command executed: {join_command(command)}. Error received: {stderr}",
+        command=command,
+        stderr=stderr,
+    )
+
+
+# ##############################################################################
+# ##                              SYNCHRONOUS                                 ##
+# ##############################################################################
+
+
+def _execute(
+    command: Command,
+    input: Optional[str],
+    timeout: Optional[float],
+    limiter: Optional[AIMDLimiter],
+) -> Tuple[str, str, int]:
+    """
+    Run a command in the current thread within the global limit and the limit of its backend
+
+    :param command: the argument vector or shell line to run, ``Command``
+    :param input: the data sent to the stdin of the command, ``Optional[str]``
+    :param timeout: the maximum seconds the command can run, ``Optional[float]``
+    :param limiter: the concurrency limiter of the backend the command talks to, ``Optional[AIMDLimiter]``
+    :return: the stdout, stderr and return code of the command, ``Tuple[str, str, int]``
+    """
+    # The backend limit is taken first, so commands queued for a slow backend do not hold global slots
+    if limiter is not None:
+        limiter.acquire()
+    latency = 0.0
+    overloaded = False
+    try:
+        command_limit = _command_limit()
+        command_limit.acquire()
+        try:
+            start = monotonic()
+            try:
+                stdout, stderr, return_code = _spawn(
+                    command=command, input=input, timeout=timeout
+                )
+            except CommandTimeout:
+                overloaded = True
+                raise
+            finally:
+                latency = monotonic() - start
+        finally:
+            command_limit.release()
+        overloaded = (
+            limiter is not None
+            and return_code != 0
+            and limiter.is_overloaded(stderr=stderr)
+        )
+        return stdout, stderr, return_code
+    finally:
+        if limiter is not None:
+            limiter.release(latency=latency, overloaded=overloaded)
+
+
+def _spawn(
+    command: Command, input: Optional[str], timeout: Optional[float]
+) -> Tuple[str, str, int]:
+    """
+    Start a process and collect its output, recording it when tracing is enabled
+
+    :param command: the argument vector or shell line to run, ``Command``
+    :param input: the data sent to the stdin of the command, ``Optional[str]``
+    :param timeout: the maximum seconds the command can run, ``Optional[float]``
+    :return: the stdout, stderr and return code of the command, ``Tuple[str, str, int]``
+    """
+    if get_tracer() is None:
+        return _spawn_backend(command=command, input=input, timeout=timeout)
+    started_at = time()
+    start = monotonic()
+    result = None
+    try:
+        result = _spawn_backend(command=command, input=input, timeout=timeout)
+        return result
+    finally:
+        _trace_command(
+            command=command, started_at=started_at, start=start, result=result
+        )
+
+
+def _spawn_backend(
+    command: Command, input: Optional[str], timeout: Optional[float]
+) -> Tuple[str, str, int]:
+    """
+    Run a command in a process, or serve it from the cassette when replaying
+
+    :param command: the argument vector or shell line to run, ``Command``
+    :param input: the data sent to the stdin of the command, ``Optional[str]``
+    :param timeout: the maximum seconds the command can run, ``Optional[float]``
+    :return: the stdout, stderr and return code of the command, ``Tuple[str, str, int]``
+    """
+    cassette = get_cassette()
+    if cassette is None or cassette.passes(command=command):
+        return _spawn_process(command=command, input=input, timeout=timeout)
+    if cassette.mode == "replay":
+        return cassette.replay(command=command, input=input)
+    try:
+        stdout, stderr, return_code = _spawn_process(
+            command=command, input=input, timeout=timeout
+        )
+    except CommandTimeout as e:
+        cassette.record(
+            command=command, input=input, stdout="", stderr=e.stderr or "", rc=None
+        )
+        raise
+    cassette.record(
+        command=command, input=input, stdout=stdout, stderr=stderr, rc=return_code
+    )
+    return stdout, stderr, return_code
+
+
+def _spawn_process(
+    command: Command, input: Optional[str], timeout: Optional[float]
+) -> Tuple[str, str, int]:
+    """
+    Start a process in the current thread, feed its stdin and collect its output
+
+    :param command: the argument vector or shell line to run, ``Command``
+    :param input: the data sent to the stdin of the command, ``Optional[str]``
+    :param timeout: the maximum seconds the command can run, ``Optional[float]``
+    :return: the stdout, stderr and return code of the command, ``Tuple[str, str, int]``
+    """
+    if isinstance(command, str):
+        args = command
+    else:
+        executable = _which(command[0])
+        if executable is None:
+            return "", f"{command[0]}: command not found", 127
+        args = [executable, *command[1:]]
+    try:
+        # An absolute executable and close_fds=False let subprocess use posix_spawn
+        process = subprocess.run(
+            args,
+            input=input,
+            capture_output=True,
+            timeout=timeout,
+            shell=isinstance(command, str),
+            close_fds=False,
+            encoding="utf-8",
+            errors="replace",
+        )
+    except subprocess.TimeoutExpired as e:
+        stderr = e.stderr or ""
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode(errors="replace")
+        raise _timeout_error(
+            command=command, timeout=timeout, stderr=stderr.strip()
+        ) from None
+    return process.stdout.strip(), process.stderr.strip(), process.returncode
+
+
+# ##############################################################################
+# ##                              ASYNCHRONOUS                                ##
+# ##############################################################################
+
+
+async def _feed_stream(stream: asyncio.StreamWriter, data: str) -> None:
+    """
+    Write data to the stdin of a process and close it
+
+    :param stream: the stdin of the process, ``asyncio.StreamWriter``
+    :param data: the data to write, ``str``
+    """
+    try:
+        stream.write(data.encode())
+        await stream.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass
+    finally:
+        stream.close()
+
+
+async def _read_stream(stream: asyncio.StreamReader, chunks: List[bytes]) -> None:
+    """
+    Read the output of a process chunk by chunk until it is closed
+
+    :param stream: the stdout or stderr of the process, ``asyncio.StreamReader``
+    :param chunks: the list where the chunks read are appended, ``List[bytes]``
+    """
+    while chunk := await stream.read(READ_CHUNK_SIZE):
+        chunks.append(chunk)
+
+
+async def _execute_async(
+    command: Command,
+    input: Optional[str],
+    timeout: Optional[float],
+    limiter: Optional[AIMDLimiter],
+) -> Tuple[str, str, int]:
+    """
+    Run a command in the running event loop within the global limit and the limit of its backend
+
+    :param command: the argument vector or shell line to run, ``Command``
+    :param input: the data sent to the stdin of the command, ``Optional[str]``
+    :param timeout: the maximum seconds the command can run, ``Optional[float]``
+    :param limiter: the concurrency limiter of the backend the command talks to, ``Optional[AIMDLimiter]``
+    :return: the stdout, stderr and return code of the command, ``Tuple[str, str, int]``
+    """
+    if limiter is not None:
+        await limiter.acquire_async()
+    latency = 0.0
+    overloaded = False
+    try:
+        command_limit = _command_limit()
+        await command_limit.acquire_async()
+        try:
+            start = monotonic()
+            try:
+                stdout, stderr, return_code = await _spawn_async(
+                    command=command, input=input, timeout=timeout
+                )
+            except CommandTimeout:
+                overloaded = True
+                raise
+            finally:
+                latency = monotonic() - start
+        finally:
+            command_limit.release()
+        overloaded = (
+            limiter is not None
+            and return_code != 0
+            and limiter.is_overloaded(stderr=stderr)
+        )
+        return stdout, stderr, return_code
+    finally:
+        if limiter is not None:
+            limiter.release(latency=latency, overloaded=overloaded)
+
+
+async def _spawn_async(
+    command: Command, input: Optional[str], timeout: Optional[float]
+) -> Tuple[str, str, int]:
+    """
+    Start a process without blocking the event loop and collect its output, recording it when tracing is enabled
+
+    :param command: the argument vector or shell line to run, ``Command``
+    :param input: the data sent to the stdin of the command, ``Optional[str]``
+    :param timeout: the maximum seconds the command can run, ``Optional[float]``
+    :return: the stdout, stderr and return code of the command, ``Tuple[str, str, int]``
+    """
+    if get_tracer() is None:
+        return await _spawn_backend_async(command=command, input=input, timeout=timeout)
+    started_at = time()
+    start = monotonic()
+    result = None
+    try:
+        result = await _spawn_backend_async(
+            command=command, input=input, timeout=timeout
+        )
+        return result
+    finally:
+        _trace_command(
+            command=command, started_at=started_at, start=start, result=result
+        )
+
+
+async def _spawn_backend_async(
+    command: Command, input: Optional[str], timeout: Optional[float]
+) -> Tuple[str, str, int]:
+    """
+    Run a command in a process without blocking the event loop, or serve it from the cassette when replaying
+
+    :param command: the argument vector or shell line to run, ``Command``
+    :param input: the data sent to the stdin of the command, ``Optional[str]``
+    :param timeout: the maximum seconds the command can run, ``Optional[float]``
+    :return: the stdout, stderr and return code of the command, ``Tuple[str, str, int]``
+    """
+    cassette = get_cassette()
+    if cassette is None or cassette.passes(command=command):
+        return await _spawn_process_async(command=command, input=input, timeout=timeout)
+    if cassette.mode == "replay":
+        return cassette.replay(command=command, input=input)
+    try:
+        stdout, stderr, return_code = await _spawn_process_async(
+            command=command, input=input, timeout=timeout
+        )
+    except CommandTimeout as e:
+        cassette.record(
+            command=command, input=input, stdout="", stderr=e.stderr or "", rc=None
+        )
+        raise
+    cassette.record(
+        command=command, input=input, stdout=stdout, stderr=stderr, rc=return_code
+    )
+    return stdout, stderr, return_code
+
+
+async def _spawn_process_async(
+    command: Command, input: Optional[str], timeout: Optional[float]
+) -> Tuple[str, str, int]:
+    """
+    Start a process without blocking the event loop, feed its stdin and collect its output
+
+    :param command: the argument vector or shell line to run, ``Command``
+    :param input: the data sent to the stdin of the command, ``Optional[str]``
+    :param timeout: the maximum seconds the command can run, ``Optional[float]``
+    :return: the stdout, stderr and return code of the command, ``Tuple[str, str, int]``
+    """
+    stdin = asyncio.subprocess.PIPE if input is not None else None
+    pipe = asyncio.subprocess.PIPE
+    if isinstance(command, str):
+        process = await asyncio.create_subprocess_shell(
+            command, stdin=stdin, stdout=pipe, stderr=pipe
+        )
+    else:
+        executable = _which(command[0])
+        if executable is None:
+            return "", f"{command[0]}: command not found", 127
+        # An absolute executable and close_fds=False let subprocess use posix_spawn
+        process = await asyncio.create_subprocess_exec(
+            executable,
+            *command[1:],
+            stdin=stdin,
+            stdout=pipe,
+            stderr=pipe,
+            close_fds=False,
+        )
+    stdout_chunks: List[bytes] = []
+    stderr_chunks: List[bytes] = []
+    streams = [
+        _read_stream(stream=process.stdout, chunks=stdout_chunks),
+        _read_stream(stream=process.stderr, chunks=stderr_chunks),
+    ]
+    if input is not None:
+        streams.append(_feed_stream(stream=process.stdin, data=input))
+    try:
+        async with asyncio.timeout(timeout):
+            await asyncio.gather(*streams)
+            return_code = await process.wait()
+    except BaseException as e:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        if isinstance(e, TimeoutError):
+            stderr = b"".join(stderr_chunks).decode(errors="replace").strip()
+            raise _timeout_error(
+                command=command, timeout=timeout, stderr=stderr
+            ) from None
+        raise
+    stdout = b"".join(stdout_chunks).decode(errors="replace").strip()
+    stderr = b"".join(stderr_chunks).decode(errors="replace").strip()
+    return stdout, stderr, return_code
+
+
+def join_command(command: Command) -> str:
+    """
+    Render a command as a shell line, used for logs and error messages
+
+    :param command: the argument vector or shell line, ``Command``
+    :return: the command as a single string, ``str``
+    """
+    if isinstance(command, str):
+        return command
+    return shlex.join(command)
+
+
+def run_command(
+    command: Command,
+    input: Optional[str] = None,
+    timeout: Optional[float] = None,
+    limiter: Optional[AIMDLimiter] = None,
+) -> Tuple[str, str, int]:
+    """
+    Run a command and return the result
+
+    An argument vector is executed directly (through posix_spawn where the platform allows it), a string is run by the shell and should only be used when pipes are needed
+
+    :param command: the argument vector or shell line to run, ``Command``
+    :param input: the data sent to the stdin of the command, ``Optional[str]``
+    :param timeout: the maximum seconds the command can run, ``Optional[float]``
+    :param limiter: the concurrency limiter of the backend the command talks to, ``Optional[AIMDLimiter]``
+    :return: the stdout, stderr and return code of the command, ``Tuple[str, str, int]``
+    """
+    stdout, stderr, return_code = _execute(
+        command=command, input=input, timeout=timeout, limiter=limiter
+    )
+    _log_command(command=command, stdout=stdout, stderr=stderr, return_code=return_code)
+    return stdout, stderr, return_code
+
+
+async def run_command_async(
+    command: Command,
+    input: Optional[str] = None,
+    timeout: Optional[float] = None,
+    limiter: Optional[AIMDLimiter] = None,
+) -> Tuple[str, str, int]:
+    """
+    Run a command without blocking the event loop and return the result
+
+    The TOOLKIT_INSTALLER_MAX_CONCURRENT_COMMANDS limit and the backend limiters are shared with run_command, so they apply to the whole process whatever thread or loop runs the command
+
+    :param command: the argument vector or shell line to run, ``Command``
+    :param input: the data sent to the stdin of the command, ``Optional[str]``
+    :param timeout: the maximum seconds the command can run, ``Optional[float]``
+    :param limiter: the concurrency limiter of the backend the command talks to, ``Optional[AIMDLimiter]``
+    :return: the stdout, stderr and return code of the command, ``Tuple[str, str, int]``
+    """
+    stdout, stderr, return_code = await _execute_async(
+        command=command, input=input, timeout=timeout, limiter=limiter
     )
+    _log_command(command=command, stdout=stdout, stderr=stderr, return_code=return_code)
     return stdout, stderr, return_code
@@ -0,0 +1,65 @@
+from typing import List, Optional, Union
+
+
+class ToolkitError(Exception):
+    """
+    Base exception raised by the toolkit installer library
+    """
+
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+class CommandFailed(ToolkitError):
+    """
+    A command returned a non-zero return code or an unexpected answer
+    """
+
+    def __init__(
+        self,
+        message: str,
+        command: Optional[Union[str, List[str]]] = None,
+        stderr: Optional[str] = None,
+        rc: Optional[int] = None,
+    ):
+        super().__init__(message)
+        self.command = command
+        self.stderr = stderr
+        self.rc = rc
+
+
+class CommandTimeout(CommandFailed):
+    """
+    A command did not finish before its timeout and was killed
+    """
+
+
+class ConfigurationError(ToolkitError):
+    """
+    A required setting is missing or has an invalid value
+    """
+
+
+class InvalidData(ToolkitError):
+    """
+    Data returned by OpenNebula, GitHub or a file does not have the expected structure
+    """
+
+
+class InvalidState(ToolkitError):
+    """
+    A resource is in a state that does not allow to continue
+    """
+
+
+class NotFound(ToolkitError):
+    """
+    A resource does not exist
+    """
+
+
+class StateTimeout(ToolkitError):
+    """
+    A resource did not reach the expected state in time
+    """
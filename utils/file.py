@@ -3,6 +3,7 @@ from typing import Dict, List
 
 import yaml
 
+from utils.exceptions import NotFound
 from utils.logs import msg
 from utils.os import is_file
 from utils.questionary import ask_confirm, ask_text
@@ -38,7 +39,7 @@ def load_file(file_path: str, mode: str = "rt", encoding: str = "utf-8") -> str:
     :return: the content of the file, ``str``
     """
     if not is_file(path=file_path):
-        msg(level="error", message=f"File not found: {file_path}")
+        raise NotFound(f"File not found: {file_path}")
     with open(file=file_path, mode=mode, encoding=encoding) as file:
         return file.read()
 
@@ -53,7 +54,7 @@ def load_yaml(file_path: str, mode: str = "rt", encoding: str = "utf-8") -> Dict
     :return: the data loaded from the YAML file, ``Dict``
     """
     if not is_file(path=file_path):
-        msg(level="error", message=f"File not found: {file_path}")
+        raise NotFound(f"File not found: {file_path}")
     with open(file=file_path, mode=mode, encoding=encoding) as yaml_file:
         return yaml.safe_load(stream=yaml_file)
 
@@ -1,9 +1,210 @@
-from typing import List
+import fcntl
+import hashlib
+import os
+import re
+import subprocess
+from time import monotonic, time
+from typing import Dict, List, Optional, TextIO
 
-from utils.cli import run_command
-from utils.file import loads_json
+from utils.cli import join_command, run_command
+from utils.exceptions import CommandFailed, InvalidData, NotFound
 from utils.logs import msg
 from utils.os import exist_directory
+from utils.retry import GIT_REMOTE_RETRY, retry_command
+from utils.trace import get_tracer
+
+MIRROR_FETCH_REFSPECS = ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"]
+
+REF_INVENTORY_FORMAT = "%09".join(
+    ["%(refname)", "%(upstream:short)", "%(upstream:track,nobracket)", "%(HEAD)"]
+)
+
+_ref_inventories: Dict[str, "GitRefs"] = {}
+
+
+class GitBranch:
+    """
+    A local or remote-tracking branch with the state of its upstream
+    """
+
+    def __init__(
+        self, name: str, remote: Optional[str], upstream: str, track: str, head: bool
+    ):
+        self.name = name
+        self.remote = remote
+        self.upstream = upstream
+        self.track = track
+        self.head = head
+
+    @property
+    def gone(self) -> bool:
+        """
+        Whether the branch tracks a remote branch that no longer exists
+        """
+        return self.remote is None and self.track == "gone"
+
+
+class GitRefs:
+    """
+    Inventory of the branches of a repository read with a single for-each-ref
+    """
+
+    def __init__(self, path: str, branches: List[GitBranch]):
+        self.path = path
+        self.branches = branches
+
+    def current(self) -> str:
+        """
+        Get the branch checked out, empty when the HEAD is detached
+        """
+        for branch in self.branches:
+            if branch.head:
+                return branch.name
+        return ""
+
+    def names(self) -> List[str]:
+        """
+        Get the names of the local and remote branches, without the remote prefix
+        """
+        return sorted(
+            {
+                branch.name
+                for branch in self.branches
+                if branch.remote in (None, "origin") and branch.name != "HEAD"
+            }
+        )
+
+
+class GitCatFile:
+    """
+    A long-lived git cat-file --batch process that reads the objects of a repository without a checkout
+
+    The process is traced as a single command when it is closed
+    """
+
+    def __init__(self, path: str):
+        if not exist_directory(path=path):
+            raise NotFound(
+                f"Repository {path} does not exist. Cannot read objects from it"
+            )
+        self.path = path
+        self.command = ["git", "-C", path, "cat-file", "--batch"]
+        self.started_at = time()
+        self.start = monotonic()
+        self.read_bytes = 0
+        self.process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+    def __enter__(self) -> "GitCatFile":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Stop the process and trace it
+        """
+        self.process.stdin.close()
+        stderr = self.process.stderr.read().decode(errors="replace").strip()
+        rc = self.process.wait()
+        self.process.stdout.close()
+        self.process.stderr.close()
+        tracer = get_tracer()
+        if tracer is not None:
+            tracer.record(
+                command=self.command,
+                start=self.started_at,
+                duration=monotonic() - self.start,
+                rc=rc,
+                stdout_bytes=self.read_bytes,
+                stderr_bytes=len(stderr.encode()),
+            )
+        msg(
+            level="debug",
+            message=f"Objects read from the repository {self.path}. Command executed: {join_command(self.command)}. Output received: {self.read_bytes} bytes. Error received: {stderr}. Return code: {rc}",
+        )
+
+    def read(self, object: str) -> Optional[bytes]:
+        """
+        Read an object, such as <tree>:<path> for a file of a tree
+
+        :param object: the name of the object, ``str``
+        :return: the content of the object or None if it does not exist, ``Optional[bytes]``
+        """
+        self.process.stdin.write(f"{object}\n".encode())
+        self.process.stdin.flush()
+        header = self.process.stdout.readline().decode().rstrip("\n")
+        if not header:
+            raise CommandFailed(
+                f"Process {join_command(self.command)} stopped while reading the object {object}",
+                command=self.command,
+                stderr="",
+                rc=self.process.poll(),
+            )
+        if header.endswith((" missing", " ambiguous")):
+            return None
+        size = int(header.rsplit(" ", 1)[1])
+        data = self.process.stdout.read(size)
+        self.process.stdout.read(1)
+        self.read_bytes += len(header) + size + 2
+        return data
+
+    def subtrees(self, tree: str) -> List[str]:
+        """
+        Get the names of the directories of a tree
+
+        :param tree: the SHA of the tree, ``str``
+        :return: the names of the directories, ``List[str]``
+        """
+        data = self.read(object=tree)
+        if data is None:
+            raise NotFound(f"Tree {tree} not found in repository {self.path}")
+        names = []
+        hash_size = len(tree) // 2
+        offset = 0
+        while offset < len(data):
+            separator = data.index(b"\0", offset)
+            mode, name = data[offset:separator].decode().split(" ", 1)
+            if mode == "40000":
+                names.append(name)
+            offset = separator + 1 + hash_size
+        return names
+
+
+def _authenticated_url(https_url: str, token: Optional[str]) -> str:
+    """
+    Add the token to the URL of a GitHub repository
+
+    :param https_url: the URL of the GitHub repository, ``str``
+    :param token: the token to access the repository, ``Optional[str]``
+    :return: the URL with the token, ``str``
+    """
+    if token:
+        return https_url.replace("https://", f"https://{token}@")
+    return https_url
+
+
+def _mirror_lock(mirror_path: str) -> TextIO:
+    """
+    Take an exclusive lock on a mirror so several installers on one host do not update it at the same time
+
+    The lock is released when the returned file is closed
+
+    :param mirror_path: the path to the bare mirror, ``str``
+    :return: the open lock file, ``TextIO``
+    """
+    lock = open(f"{mirror_path}.lock", mode="a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+    except OSError:
+        lock.close()
+        raise
+    return lock
 
 
 def git_add(path: str) -> None:
@@ -13,20 +214,21 @@ def git_add(path: str) -> None:
     :param path: the path to the repository, ``str``
     """
     if not exist_directory(path=path):
-        msg(
-            level="error",
-            message=f"Repository {path} does not exist. Cannot add files to the staging area",
+        raise NotFound(
+            f"Repository {path} does not exist. Cannot add files to the staging area"
         )
-    command = f"git -C {path} add -A"
+    command = ["git", "-C", path, "add", "-A"]
     stdout, stderr, rc = run_command(command=command)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Failed to add files to the staging area in the repository {path}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Failed to add files to the staging area in the repository {path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Files added to the staging area in the repository {path}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Files added to the staging area in the repository {path}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
@@ -37,33 +239,46 @@ def git_branches(path: str) -> List[str]:
     :param path: the path to the repository, ``str``
     :return: the list of branches, ``List[str]``
     """
+    return git_refs(path=path).names()
+
+
+def git_changed_paths(path: str, old_ref: str, new_ref: str) -> List[str]:
+    """
+    Get the paths of the files that differ between two commits, comparing their trees only
+
+    :param path: the path to the repository, ``str``
+    :param old_ref: the old commit, ``str``
+    :param new_ref: the new commit, ``str``
+    :return: the paths of the files added, changed or removed, ``List[str]``
+    """
     if not exist_directory(path=path):
-        msg(
-            level="error",
-            message=f"Repository {path} does not exist. Cannot get the list of branches",
+        raise NotFound(
+            f"Repository {path} does not exist. Cannot compare {old_ref} with {new_ref}"
         )
-    command = f"git -C {path} branch -a"
+    command = [
+        "git",
+        "-C",
+        path,
+        "diff-tree",
+        "-r",
+        "--name-only",
+        "--no-commit-id",
+        old_ref,
+        new_ref,
+    ]
     stdout, stderr, rc = run_command(command=command)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Failed to get the list of branches in the repository {path}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Failed to compare {old_ref} with {new_ref} in the repository {path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"List of branches in the repository {path} found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Files changed between {old_ref} and {new_ref} in the repository {path} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
-
-    branches = set()
-    for line in stdout.splitlines():
-        line = line.strip().replace("*", "").strip()
-        if "HEAD" in line:
-            continue
-        if line.startswith("remotes/origin/"):
-            line = line[len("remotes/origin/") :]
-        branches.add(line)
-
-    return sorted(branches)
+    return stdout.splitlines()
 
 
 def git_checkout(path: str, ref: str) -> None:
@@ -73,16 +288,16 @@ def git_checkout(path: str, ref: str) -> None:
     :param path: the path to the repository, ``str``
     :param ref: the branch or commit to checkout, ``str``
     """
+    _ref_inventories.pop(path, None)
     if not exist_directory(path=path):
-        msg(
-            level="error",
-            message=f"Repository {path} does not exist. Cannot checkout branch, tag or commit {ref}",
+        raise NotFound(
+            f"Repository {path} does not exist. Cannot checkout branch, tag or commit {ref}"
         )
-    command = f"git -C {path} checkout {ref} --"
+    command = ["git", "-C", path, "checkout", ref, "--"]
     stdout, _, rc = run_command(command=command)
     msg(
         level="debug",
-        message=f"Checkout branch, tag or commit {ref} in the repository {path}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Checkout branch, tag or commit {ref} in the repository {path}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
@@ -93,11 +308,8 @@ def git_clean_fd(path: str) -> None:
     :param path: the path to the repository, ``str``
     """
     if not exist_directory(path=path):
-        msg(
-            level="error",
-            message=f"Repository {path} does not exist. Cannot clean the repository",
-        )
-    command = f"git -C {path} clean -fd"
+        raise NotFound(f"Repository {path} does not exist. Cannot clean the repository")
+    command = ["git", "-C", path, "clean", "-fd"]
     run_command(command=command)
 
 
@@ -105,23 +317,30 @@ def git_clone(https_url: str, path: str, token: str = None) -> None:
     """
     Clone a GitHub repository to the specified path
 
+    When TOOLKIT_INSTALLER_GIT_CACHE_PATH is set, the objects are borrowed from a shared bare mirror of the repository, so only the objects missing in the mirror are downloaded
+
     :param https_url: the URL of the GitHub repository, ``str``
     :param path: the local path to clone the repository into, ``str``
     :param token: the token to access the repository, ``str``
     """
-    if token:
-        https_url = https_url.replace("https://", f"https://{token}@")
+    _ref_inventories.pop(path, None)
     if not exist_directory(path=path):
-        command = f"git clone {https_url} {path}"
-        stdout, stderr, rc = run_command(command=command)
+        mirror_path = git_mirror(https_url=https_url, token=token)
+        command = ["git", "clone"]
+        if mirror_path:
+            command += ["--reference", mirror_path]
+        command += [_authenticated_url(https_url=https_url, token=token), path]
+        stdout, stderr, rc = retry_command(command=command, policy=GIT_REMOTE_RETRY)
         if rc != 0:
-            msg(
-                level="error",
-                message=f"Failed to clone the GitHub repository at {https_url} to the path {path}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            raise CommandFailed(
+                f"Failed to clone the GitHub repository at {https_url} to the path {path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+                command=command,
+                stderr=stderr,
+                rc=rc,
             )
         msg(
             level="debug",
-            message=f"GitHub repository at {https_url} cloned to the path {path}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"GitHub repository at {https_url} cloned to the path {path}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
 
 
@@ -133,73 +352,111 @@ def git_commit(path: str, message: str) -> None:
     :param message: the commit message, ``str``
     """
     if not exist_directory(path=path):
-        msg(
-            level="error",
-            message=f"Repository {path} does not exist. Cannot commit the staged files",
+        raise NotFound(
+            f"Repository {path} does not exist. Cannot commit the staged files"
         )
-    command = f'git -C {path} commit -m "{message}"'
+    command = ["git", "-C", path, "commit", "-m", message]
     stdout, stderr, rc = run_command(command=command)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Failed to commit the staged files in the repository {path}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Failed to commit the staged files in the repository {path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Staged files committed in the repository {path}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Staged files committed in the repository {path}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
-def git_create_branch(path: str, new_branch: str, base_branch: str) -> None:
+def git_commit_changes(path: str, message: str) -> bool:
     """
-    Create a new branch in the repository
+    Commit every change of the working copy, skipping the commit when there is none
+
+    The porcelain status decides whether the files need to be staged first. When only tracked files changed they are committed with --all, without a separate add
 
     :param path: the path to the repository, ``str``
-    :param new_branch: the name of the new branch, ``str``
-    :param base_branch: the name of the base branch, ``str``
+    :param message: the commit message, ``str``
+    :return: whether a commit was created, ``bool``
     """
     if not exist_directory(path=path):
+        raise NotFound(f"Repository {path} does not exist. Cannot commit the changes")
+    command = ["git", "-C", path, "status", "--porcelain"]
+    stdout, stderr, rc = run_command(command=command)
+    if rc != 0:
+        raise CommandFailed(
+            f"Failed to get the status of the repository {path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
+        )
+    if not stdout:
         msg(
-            level="error",
-            message=f"Repository {path} does not exist. Cannot create a new branch {new_branch}",
+            level="debug",
+            message=f"No changes to commit in the repository {path}. Command executed: {join_command(command)}. Return code: {rc}",
         )
-    command = f"git -C {path} switch -c {new_branch} {base_branch}"
+        return False
+    if any(line.startswith("??") for line in stdout.splitlines()):
+        git_add(path=path)
+        git_commit(path=path, message=message)
+        return True
+    command = ["git", "-C", path, "commit", "--all", "-m", message]
     stdout, stderr, rc = run_command(command=command)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Failed to create a new branch {new_branch} in the repository {path}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Failed to commit the changes in the repository {path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"New branch {new_branch} created in the repository {path}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Changes committed in the repository {path}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
+    return True
 
 
-def git_current_branch(path: str) -> str:
+def git_create_branch(
+    path: str, new_branch: str, base_branch: str, reset: bool = False
+) -> None:
     """
-    Get the current branch of the repository
+    Create a new branch in the repository
 
     :param path: the path to the repository, ``str``
-    :return: the current branch, ``str``
+    :param new_branch: the name of the new branch, ``str``
+    :param base_branch: the name of the base branch, ``str``
+    :param reset: whether a local branch with the same name is reset to the base branch instead of failing, ``bool``
     """
+    _ref_inventories.pop(path, None)
     if not exist_directory(path=path):
-        msg(
-            level="error",
-            message=f"Repository {path} does not exist. Cannot get the current branch",
+        raise NotFound(
+            f"Repository {path} does not exist. Cannot create a new branch {new_branch}"
         )
-    command = f"git -C {path} branch --show-current"
+    command = ["git", "-C", path, "switch", "-C" if reset else "-c"]
+    command += [new_branch, base_branch]
     stdout, stderr, rc = run_command(command=command)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Failed to get the current branch of the repository {path}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Failed to create a new branch {new_branch} in the repository {path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Current branch of the repository {path} found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"New branch {new_branch} created in the repository {path}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
-    return stdout
+
+
+def git_current_branch(path: str) -> str:
+    """
+    Get the current branch of the repository
+
+    :param path: the path to the repository, ``str``
+    :return: the current branch, ``str``
+    """
+    return git_refs(path=path).current()
 
 
 def git_detect_changes(path: str) -> bool:
@@ -210,263 +467,572 @@ def git_detect_changes(path: str) -> bool:
     :return: ``True`` if changes detected, ``False`` otherwise
     """
     if not exist_directory(path=path):
-        msg(
-            level="error",
-            message=f"Repository {path} does not exist. Cannot detect changes",
-        )
-    command = f"git -C {path} status --porcelain"
+        raise NotFound(f"Repository {path} does not exist. Cannot detect changes")
+    command = ["git", "-C", path, "status", "--porcelain"]
     stdout, _, rc = run_command(command=command)
     msg(
         level="debug",
-        message=f"Changes detected in the repository {path}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Changes detected in the repository {path}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
     return bool(stdout)
 
 
-def git_fetch_prune(path: str) -> None:
+def git_fetch_branch(https_url: str, path: str, branch: str, token: str = None) -> None:
     """
-    Fetch and prune the remote branches
+    Fetch only the tip of a branch and check it out, discarding the local changes
+
+    The working copy is created if it does not exist, the branch tracks the remote branch so it can be pushed
+
+    :param https_url: the URL of the GitHub repository, ``str``
+    :param path: the local path of the working copy, ``str``
+    :param branch: the branch to fetch and checkout, ``str``
+    :param token: the token to access the repository, ``str``
+    """
+    _ref_inventories.pop(path, None)
+    url = _authenticated_url(https_url=https_url, token=token)
+    if not exist_directory(path=path):
+        commands = [
+            ["git", "init", "--quiet", path],
+            ["git", "-C", path, "remote", "add", "origin", url],
+        ]
+    else:
+        commands = [["git", "-C", path, "remote", "set-url", "origin", url]]
+    commands += [
+        [
+            "git",
+            "-C",
+            path,
+            "fetch",
+            "--depth=1",
+            "--no-tags",
+            "origin",
+            f"+refs/heads/{branch}:refs/remotes/origin/{branch}",
+        ],
+        ["git", "-C", path, "checkout", "--force", "-B", branch, f"origin/{branch}"],
+        ["git", "-C", path, "clean", "-fd"],
+    ]
+    for command in commands:
+        if "fetch" in command:
+            stdout, stderr, rc = retry_command(command=command, policy=GIT_REMOTE_RETRY)
+        else:
+            stdout, stderr, rc = run_command(command=command)
+        if rc != 0:
+            raise CommandFailed(
+                f"Failed to fetch the branch {branch} of the GitHub repository at {https_url} to the path {path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+                command=command,
+                stderr=stderr,
+                rc=rc,
+            )
+    msg(
+        level="debug",
+        message=f"Branch {branch} of the GitHub repository at {https_url} fetched and checked out to the path {path}. Output received: {stdout}. Return code: {rc}",
+    )
+
+
+def git_fetch_commit(path: str, commit: str) -> None:
+    """
+    Fetch a commit with depth 1 and without blobs unless it is already in the repository
 
     :param path: the path to the repository, ``str``
+    :param commit: the full SHA of the commit, ``str``
     """
     if not exist_directory(path=path):
-        msg(
-            level="error",
-            message=f"Repository {path} does not exist. Cannot fetch and prune the remote branches",
+        raise NotFound(
+            f"Repository {path} does not exist. Cannot fetch the commit {commit}"
         )
-    command = f"git -C {path} fetch --prune"
-    stdout, stderr, rc = run_command(command=command)
+    _, _, rc = run_command(
+        command=["git", "-C", path, "cat-file", "-e", f"{commit}^{{commit}}"]
+    )
+    if rc == 0:
+        return
+    command = [
+        "git",
+        "-C",
+        path,
+        "fetch",
+        "--depth=1",
+        "--filter=blob:none",
+        "--no-tags",
+        "origin",
+        commit,
+    ]
+    stdout, stderr, rc = retry_command(command=command, policy=GIT_REMOTE_RETRY)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Failed to fetch and prune the remote branches in the repository {path}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Failed to fetch the commit {commit} in the repository {path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Remote branches fetched and pruned in the repository {path}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Commit {commit} fetched in the repository {path}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
-def git_pull(path: str) -> None:
+def git_fetch_heads(https_url: str, path: str, token: str = None) -> None:
     """
-    Pull the changes from the remote repository
+    Fetch the tip of every branch into a bare repository, removing the branches deleted in the remote
 
-    :param path: the path to the repository, ``str``
+    The repository is created if it does not exist. The token is only passed on the command line, it is never stored in the repository
+
+    :param https_url: the URL of the GitHub repository, ``str``
+    :param path: the local path of the bare repository, ``str``
+    :param token: the token to access the repository, ``str``
     """
+    _ref_inventories.pop(path, None)
     if not exist_directory(path=path):
-        msg(
-            level="error",
-            message=f"Repository {path} does not exist. Cannot pull changes from the remote repository",
+        command = ["git", "init", "--quiet", "--bare", path]
+        stdout, stderr, rc = run_command(command=command)
+        if rc != 0:
+            raise CommandFailed(
+                f"Failed to create the repository {path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+                command=command,
+                stderr=stderr,
+                rc=rc,
+            )
+    url = _authenticated_url(https_url=https_url, token=token)
+    command = ["git", "-C", path, "fetch", "--depth=1", "--prune", "--no-tags", url]
+    command += ["+refs/heads/*:refs/heads/*"]
+    stdout, stderr, rc = retry_command(command=command, policy=GIT_REMOTE_RETRY)
+    if rc != 0:
+        raise CommandFailed(
+            f"Failed to fetch the branches of the repository {https_url} into {path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
-    command = f"git -C {path} pull"
-    stdout, _, rc = run_command(command=command)
     msg(
         level="debug",
-        message=f"Changes pulled from the remote repository {path}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Branches of the repository {https_url} fetched into {path}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
-def git_push(path: str) -> None:
+def git_fetch_prune(path: str) -> None:
     """
-    Push the committed changes to the remote repository
+    Fetch and prune the remote branches
 
     :param path: the path to the repository, ``str``
     """
+    _ref_inventories.pop(path, None)
     if not exist_directory(path=path):
-        msg(
-            level="error",
-            message=f"Repository {path} does not exist. Cannot push the committed changes to the remote repository",
+        raise NotFound(
+            f"Repository {path} does not exist. Cannot fetch and prune the remote branches"
         )
-    current_branch = git_current_branch(path=path)
-    check_upstream_cmd = (
-        f"git -C {path} rev-parse --abbrev-ref --symbolic-full-name @{{u}}"
-    )
-    stdout, _, rc = run_command(command=check_upstream_cmd)
+    command = ["git", "-C", path, "fetch", "--prune"]
+    stdout, stderr, rc = retry_command(command=command, policy=GIT_REMOTE_RETRY)
     if rc != 0:
-        command = f"git -C {path} push --set-upstream origin {current_branch}"
-    else:
-        command = f"git -C {path} push"
-    stdout, stderr, rc = run_command(command=command)
-    if rc != 0:
-        msg(
-            level="error",
-            message=f"Failed to push the committed changes to the remote repository {path}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Failed to fetch and prune the remote branches in the repository {path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Committed changes pushed to the remote repository {path}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Remote branches fetched and pruned in the repository {path}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
-def git_reset_hard(path: str) -> None:
+def git_mirror(https_url: str, token: str = None) -> Optional[str]:
     """
-    Reset the repository to the last commit
+    Create or update the shared bare mirror of a GitHub repository
 
-    :raise GitError:
+    The mirrors are stored in TOOLKIT_INSTALLER_GIT_CACHE_PATH and updated with an incremental fetch. The token is only passed on the command line, it is never stored in the mirror
+
+    :param https_url: the URL of the GitHub repository, ``str``
+    :param token: the token to access the repository, ``str``
+    :return: the path to the mirror or None if the cache is disabled or cannot be used, ``Optional[str]``
     """
-    if not exist_directory(path=path):
+    cache_path = os.getenv("TOOLKIT_INSTALLER_GIT_CACHE_PATH", "")
+    if not cache_path:
+        return None
+    name = os.path.basename(https_url.rstrip("/")).removesuffix(".git")
+    url_hash = hashlib.sha256(https_url.encode()).hexdigest()[:12]
+    mirror_path = os.path.join(cache_path, f"{name}-{url_hash}.git")
+    try:
+        os.makedirs(cache_path, exist_ok=True)
+        lock = _mirror_lock(mirror_path=mirror_path)
+    except OSError as e:
         msg(
-            level="error",
-            message=f"Repository {path} does not exist. Cannot reset the repository to the last commit",
+            level="warning",
+            message=f"Git cache {cache_path} cannot be used, the repository {https_url} is cloned without it. Error received: {e}",
         )
-    command = f"git -C {path} reset --hard"
-    run_command(command=command)
+        return None
+    url = _authenticated_url(https_url=https_url, token=token)
+    with lock:
+        created = not exist_directory(path=mirror_path)
+        if created:
+            # The clones borrow objects from the mirror, so they must never be pruned
+            command = ["git", "clone", "--mirror", "--config", "gc.pruneExpire=never"]
+            command += [url, mirror_path]
+        else:
+            command = ["git", "-C", mirror_path, "fetch", "--prune", url]
+            command += MIRROR_FETCH_REFSPECS
+        stdout, stderr, rc = retry_command(command=command, policy=GIT_REMOTE_RETRY)
+        if rc != 0:
+            msg(
+                level="warning",
+                message=f"Failed to update the mirror {mirror_path} of the repository {https_url}, it is cloned without it. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            )
+            return None
+        if created and url != https_url:
+            run_command(
+                command=[
+                    "git",
+                    "-C",
+                    mirror_path,
+                    "remote",
+                    "set-url",
+                    "origin",
+                    https_url,
+                ]
+            )
+    msg(
+        level="debug",
+        message=f"Mirror {mirror_path} of the repository {https_url} updated. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
+    )
+    return mirror_path
 
 
-def git_switch(
-    path: str, branch: str = None, tag: str = None, commit: str = None
-) -> None:
+def git_pull(path: str) -> None:
     """
-    Switch to the specified branch
+    Pull the changes from the remote repository
 
     :param path: the path to the repository, ``str``
-    :param branch: the branch to switch, ``str``
-    :param tag: the tag to switch, ``str``
-    :param commit: the commit to switch, ``str``
     """
+    _ref_inventories.pop(path, None)
     if not exist_directory(path=path):
-        msg(
-            level="error",
-            message=f"Repository {path} does not exist. Cannot switch to the branch {branch}",
+        raise NotFound(
+            f"Repository {path} does not exist. Cannot pull changes from the remote repository"
         )
-    if branch and tag is None and commit is None:
-        command = f"git -C {path} switch {branch}"
-    elif tag and branch is None and commit is None:
-        command = f"git -C {path} switch --detach {tag}"
-    elif commit and branch is None and tag is None:
-        command = f"git -C {path} switch --detach {commit}"
-    else:
-        msg(
-            level="error",
-            message="Invalid switch command. You must specify either a branch, a tag or a commit",
+    command = ["git", "-C", path, "pull"]
+    stdout, _, rc = retry_command(command=command, policy=GIT_REMOTE_RETRY)
+    msg(
+        level="debug",
+        message=f"Changes pulled from the remote repository {path}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
+    )
+
+
+def git_push(path: str) -> None:
+    """
+    Push the committed changes of the current branch to the remote repository
+
+    :param path: the path to the repository, ``str``
+    """
+    git_push_branches(path=path, branches=[git_current_branch(path=path)])
+
+
+def git_push_branches(path: str, branches: List[str]) -> None:
+    """
+    Push several branches to the remote repository in a single push, setting their upstream
+
+    The branches are committed locally first, for instance one per site in a bulk update, and negotiated with the remote at once
+
+    :param path: the path to the repository, ``str``
+    :param branches: the branches to push, ``List[str]``
+    """
+    if not exist_directory(path=path):
+        raise NotFound(
+            f"Repository {path} does not exist. Cannot push the committed changes to the remote repository"
         )
+    if not branches:
+        return
+    command = [
+        "git",
+        "-C",
+        path,
+        "push",
+        "--porcelain",
+        "--set-upstream",
+        "origin",
+        *[f"refs/heads/{branch}:refs/heads/{branch}" for branch in branches],
+    ]
     stdout, stderr, rc = run_command(command=command)
+    _ref_inventories.pop(path, None)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Failed to switch to the branch {branch} in the repository {path}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        # Each ref is reported as <flag> TAB <from>:<to> TAB <summary>, ! when it was rejected
+        rejected = [
+            line.split("\t")[1].rsplit(":refs/heads/", 1)[-1]
+            for line in stdout.splitlines()
+            if line.startswith("!") and line.count("\t") >= 2
+        ]
+        raise CommandFailed(
+            f"Failed to push the branches {', '.join(rejected or branches)} to the remote repository {path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Switched to the branch {branch} in the repository {path}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Committed changes of the branches {', '.join(branches)} pushed to the remote repository {path}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
-def git_sync_branches(path: str) -> None:
+def git_refs(path: str) -> GitRefs:
     """
-    Synchronize the local branches with the remote branches
+    Get the inventory of the branches of the repository
+
+    The inventory is read once and served from memory until a function of this module changes the refs of the repository
 
     :param path: the path to the repository, ``str``
+    :return: the inventory of the branches, ``GitRefs``
     """
+    if path in _ref_inventories:
+        return _ref_inventories[path]
     if not exist_directory(path=path):
-        msg(
-            level="error",
-            message=f"Repository {path} does not exist. Cannot synchronize the local branches with the remote branches",
+        raise NotFound(
+            f"Repository {path} does not exist. Cannot get the list of branches"
         )
-    command = f"git -C {path} branch -vv | grep ': gone]' | awk '{{print $1}}' | xargs -r git -C {path} branch -D"
+    command = [
+        "git",
+        "-C",
+        path,
+        "for-each-ref",
+        f"--format={REF_INVENTORY_FORMAT}",
+        "refs/heads",
+        "refs/remotes",
+    ]
     stdout, stderr, rc = run_command(command=command)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Failed to synchronize the local branches with the remote branches in the repository {path}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Failed to get the list of branches in the repository {path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Local branches synchronized with the remote branches in the repository {path}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"List of branches in the repository {path} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
+    branches = []
+    for line in stdout.splitlines():
+        # The output is stripped, so the empty fields of the last line can be missing
+        fields = line.split("\t")
+        refname, upstream, track, head = fields + [""] * (4 - len(fields))
+        if refname.startswith("refs/heads/"):
+            name, remote = refname[len("refs/heads/") :], None
+        else:
+            remote, _, name = refname[len("refs/remotes/") :].partition("/")
+        branches.append(
+            GitBranch(
+                name=name,
+                remote=remote,
+                upstream=upstream,
+                track=track,
+                head=head == "*",
+            )
+        )
+    refs = GitRefs(path=path, branches=branches)
+    _ref_inventories[path] = refs
+    return refs
 
 
-def git_team_access(
-    token: str, organization_name: str, team_name: str, username: str
-) -> None:
+def git_remote_branches(https_url: str, token: str = None) -> List[str]:
     """
-    Check if the user has access to the team
+    Get the branches of a GitHub repository without cloning it
 
-    :param token: the GitHub token, ``str``
-    :param organization_name: the GitHub organization name, ``str``
-    :param team_name: the GitHub team name, ``str``
-    :param username: the GitHub username, ``str``
+    :param https_url: the URL of the GitHub repository, ``str``
+    :param token: the token to access the repository, ``str``
+    :return: the list of branches, ``List[str]``
     """
-    team_id = git_team_id(
-        token=token, organization_name=organization_name, team_name=team_name
-    )
-    command = f'curl -s -w "%{{http_code}}" -H "Accept: application/vnd.github+json" -H "Authorization: Bearer {token}" -H "X-GitHub-Api-Version: 2022-11-28" https://api.github.com/orgs/{organization_name}/team/{team_id}/memberships/{username}'
-    stdout, stderr, rc = run_command(command=command)
-    status_code = stdout[-3:]
-    if status_code != "200":
-        msg(
-            level="error",
-            message=f"Failed to validate if user {username} has access to the team {team_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+    command = [
+        "git",
+        "ls-remote",
+        "--heads",
+        _authenticated_url(https_url=https_url, token=token),
+    ]
+    stdout, stderr, rc = retry_command(command=command, policy=GIT_REMOTE_RETRY)
+    if rc != 0:
+        raise CommandFailed(
+            f"Failed to list the branches of the GitHub repository at {https_url}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"User {username} has access to the team {team_name}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Branches of the GitHub repository at {https_url} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
+    branches = []
+    for line in stdout.splitlines():
+        _, _, ref = line.partition("\t")
+        if ref.startswith("refs/heads/"):
+            branches.append(ref[len("refs/heads/") :])
+    return sorted(branches)
+
+
+def git_reset_hard(path: str) -> None:
+    """
+    Reset the repository to the last commit
+
+    :raise GitError:
+    """
+    if not exist_directory(path=path):
+        raise NotFound(
+            f"Repository {path} does not exist. Cannot reset the repository to the last commit"
+        )
+    command = ["git", "-C", path, "reset", "--hard"]
+    run_command(command=command)
 
 
-def git_team_id(token: str, organization_name: str, team_name: str) -> str:
+def git_rev_parse(path: str, ref: str) -> str:
     """
-    Get the team id
+    Get the SHA of an object, such as HEAD for the commit checked out or HEAD^{tree} for its tree
 
-    :param token: the GitHub token, ``str``
-    :param organization_name: the GitHub organization name, ``str``
-    :param team_name: the GitHub team name, ``str``
-    :return: the id of the team, ``str``
+    :param path: the path to the repository, ``str``
+    :param ref: the name of the object, ``str``
+    :return: the SHA of the object, ``str``
     """
-    command = f'curl -s -w "%{{http_code}}" -H "Accept: application/vnd.github+json" -H "Authorization: Bearer {token}" -H "X-GitHub-Api-Version: 2022-11-28" https://api.github.com/orgs/{organization_name}/teams'
+    if not exist_directory(path=path):
+        raise NotFound(f"Repository {path} does not exist. Cannot get the SHA of {ref}")
+    command = ["git", "-C", path, "rev-parse", "--verify", ref]
     stdout, stderr, rc = run_command(command=command)
-    teams, status_code = stdout[:-3].strip(), stdout[-3:]
-    if status_code != "200":
-        msg(
-            level="error",
-            message=f"Failed to get the id of team {team_name} in the organization {organization_name}. Invalid token provided. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+    if rc != 0:
+        raise CommandFailed(
+            f"Failed to get the SHA of {ref} in the repository {path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
-    teams = loads_json(data=teams)
-    for team in teams:
-        if team["name"] == team_name:
-            team_id = team["id"]
-            msg(
-                level="debug",
-                message=f"Team {team_name} found with id {team_id} in the organization {organization_name}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+    msg(
+        level="debug",
+        message=f"SHA of {ref} in the repository {path} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
+    )
+    return stdout
+
+
+def git_ref_refspec(ref: str) -> str:
+    """
+    Get the refspec that fetches a ref given as tags/<tag>, <branch> or a full commit SHA
+
+    :param ref: the tag, branch or commit, ``str``
+    :return: the refspec of the ref in the remote repository, ``str``
+    """
+    if ref.startswith("tags/"):
+        return f"refs/{ref}"
+    if re.fullmatch(r"[0-9a-f]{40}", ref):
+        return ref
+    return f"refs/heads/{ref}"
+
+
+def git_sparse_checkout(
+    https_url: str, path: str, ref: str, patterns: List[str], token: str = None
+) -> None:
+    """
+    Checkout only the files matching the patterns of a single ref of a GitHub repository
+
+    The ref is fetched with depth 1 and without blobs, the blobs of the files matching the patterns are downloaded by the checkout
+
+    :param https_url: the URL of the GitHub repository, ``str``
+    :param path: the local path to checkout the repository into, ``str``
+    :param ref: the tag as tags/<tag>, the branch or the full commit SHA to checkout, ``str``
+    :param patterns: the sparse-checkout patterns of the files to checkout, ``List[str]``
+    :param token: the token to access the repository, ``str``
+    """
+    _ref_inventories.pop(path, None)
+    url = _authenticated_url(https_url=https_url, token=token)
+    if not exist_directory(path=path):
+        commands = [
+            ["git", "init", "--quiet", path],
+            ["git", "-C", path, "remote", "add", "origin", url],
+        ]
+    else:
+        commands = [["git", "-C", path, "remote", "set-url", "origin", url]]
+    commands += [
+        ["git", "-C", path, "sparse-checkout", "set", "--no-cone", *patterns],
+        [
+            "git",
+            "-C",
+            path,
+            "fetch",
+            "--depth=1",
+            "--filter=blob:none",
+            "--no-tags",
+            "origin",
+            git_ref_refspec(ref=ref),
+        ],
+        ["git", "-C", path, "checkout", "--force", "--detach", "FETCH_HEAD"],
+    ]
+    for command in commands:
+        if "fetch" in command or "checkout" in command:
+            stdout, stderr, rc = retry_command(command=command, policy=GIT_REMOTE_RETRY)
+        else:
+            stdout, stderr, rc = run_command(command=command)
+        if rc != 0:
+            raise CommandFailed(
+                f"Failed to checkout the ref {ref} of the GitHub repository at {https_url} to the path {path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+                command=command,
+                stderr=stderr,
+                rc=rc,
             )
-            return team_id
     msg(
-        level="error",
-        message=f"Failed to get the id of team {team_name} in the organization {organization_name}. Team not found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        level="debug",
+        message=f"Ref {ref} of the GitHub repository at {https_url} checked out to the path {path} with the patterns {patterns}. Output received: {stdout}. Return code: {rc}",
     )
 
 
-def git_validate_token(
-    token: str, organization_name: str, repository_name: str, username: str
+def git_switch(
+    path: str, branch: str = None, tag: str = None, commit: str = None
 ) -> None:
     """
-    Validate the GitHub token
+    Switch to the specified branch
 
-    :param token: the GitHub token, ``str``
-    :param organization_name: the GitHub organization name, ``str``
-    :param repository_name: the GitHub repository name, ``str``
-    :param username: the GitHub username, ``str``
+    :param path: the path to the repository, ``str``
+    :param branch: the branch to switch, ``str``
+    :param tag: the tag to switch, ``str``
+    :param commit: the commit to switch, ``str``
     """
-    command = f'curl -s -w "%{{http_code}}" -H "Accept: application/vnd.github+json" -H "Authorization: Bearer {token}" -H "X-GitHub-Api-Version: 2022-11-28" https://api.github.com/repos/{organization_name}/{repository_name}/collaborators/{username}/permission'
-    stdout, stderr, rc = run_command(command=command)
-    permission, status_code = stdout[:-3].strip(), stdout[-3:]
-    if status_code != "200":
-        msg(
-            level="error",
-            message=f"Failed to validate the GitHub token provided by user {username}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+    _ref_inventories.pop(path, None)
+    if not exist_directory(path=path):
+        raise NotFound(
+            f"Repository {path} does not exist. Cannot switch to the branch {branch}"
         )
-    permission = loads_json(data=permission)
-    if "permission" not in permission:
-        msg(
-            level="error",
-            message=f"permission key not found in the response when try to validate the GitHub token provided by user {username}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+    if branch and tag is None and commit is None:
+        command = ["git", "-C", path, "switch", branch]
+    elif tag and branch is None and commit is None:
+        command = ["git", "-C", path, "switch", "--detach", tag]
+    elif commit and branch is None and tag is None:
+        command = ["git", "-C", path, "switch", "--detach", commit]
+    else:
+        raise InvalidData(
+            "Invalid switch command. You must specify either a branch, a tag or a commit"
         )
-    if permission["permission"] != "write" and permission["permission"] != "admin":
-        msg(
-            level="error",
-            message=f"User {username} does not have write or admin permission in the repository {repository_name}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+    stdout, stderr, rc = run_command(command=command)
+    if rc != 0:
+        raise CommandFailed(
+            f"Failed to switch to the branch {branch} in the repository {path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
+        )
+    msg(
+        level="debug",
+        message=f"Switched to the branch {branch} in the repository {path}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
+    )
+
+
+def git_sync_branches(path: str) -> None:
+    """
+    Delete the local branches whose remote branch no longer exists
+
+    :param path: the path to the repository, ``str``
+    """
+    refs = git_refs(path=path)
+    gone = [branch.name for branch in refs.branches if branch.gone]
+    if not gone:
+        return
+    command = ["git", "-C", path, "branch", "-D", *gone]
+    stdout, stderr, rc = run_command(command=command)
+    if rc != 0:
+        raise CommandFailed(
+            f"Failed to synchronize the local branches with the remote branches in the repository {path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
+    refs.branches = [branch for branch in refs.branches if not branch.gone]
     msg(
         level="debug",
-        message=f"GitHub token provided by user {username} is valid. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Local branches synchronized with the remote branches in the repository {path}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
@@ -0,0 +1,415 @@
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPMessage
+from time import monotonic, sleep, time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from utils.cassette import get_cassette
+from utils.exceptions import CommandFailed, InvalidData, InvalidState, NotFound
+from utils.logs import msg
+from utils.os import is_file, join_path, make_directory
+from utils.retry import HTTP_READ_RETRY
+from utils.singleflight import HTTP_READS
+from utils.trace import get_tracer
+
+GITHUB_API_VERSION = "2022-11-28"
+
+# Largest page the list endpoints return
+GITHUB_PAGE_SIZE = 100
+
+# Bump when the format of the cached responses changes so older caches are not reused
+RESPONSE_CACHE_VERSION = 1
+
+LINK_NEXT_PATTERN = re.compile(r'<([^>]+)>\s*;\s*rel="next"')
+
+
+def github_team_slug(team_name: str) -> str:
+    """
+    Get the slug GitHub gives a team from its name
+
+    :param team_name: the GitHub team name, ``str``
+    :return: the slug of the team, ``str``
+    """
+    return re.sub(r"[^a-z0-9_]+", "-", team_name.lower()).strip("-")
+
+
+class GitHubResponse:
+    """
+    A response of the GitHub API, with the URL of the next page when the list has more
+    """
+
+    def __init__(self, url: str, status: int, body: Any, next_url: Optional[str]):
+        self.url = url
+        self.status = status
+        self.body = body
+        self.next_url = next_url
+
+    def message(self) -> str:
+        """
+        Get the error message GitHub gives in the body, or the status when there is none
+        """
+        if isinstance(self.body, Dict) and "message" in self.body:
+            return f"{self.body['message']} (HTTP {self.status})"
+        return f"HTTP {self.status}" if self.status else str(self.body)
+
+
+class GitHubClient:
+    """
+    Client of the GitHub REST API that revalidates the responses it already has with their ETag
+
+    GitHub answers a conditional request for an unchanged resource with a 304, which does not count against the rate limit of the token
+    """
+
+    def __init__(
+        self, token: str, api_url: str, cache_path: str, timeout: float = 30.0
+    ):
+        self.token = token
+        self.api_url = api_url.rstrip("/")
+        self.cache_path = cache_path
+        self.timeout = timeout
+        # The responses are cached by token, the answers depend on who asks
+        self._token_key = hashlib.sha256(token.encode()).hexdigest()
+
+    def _cache_file_path(self, url: str) -> str:
+        key = hashlib.sha256(f"{self._token_key} {url}".encode()).hexdigest()
+        return join_path(self.cache_path, f"v{RESPONSE_CACHE_VERSION}-{key}.json")
+
+    def _load_cached(self, url: str) -> Optional[Dict]:
+        cache_file_path = self._cache_file_path(url=url)
+        if not is_file(path=cache_file_path):
+            return None
+        try:
+            with open(file=cache_file_path, mode="rt", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            msg(
+                level="debug",
+                message=f"Cached response of {url} in {cache_file_path} cannot be read, it is requested again: {e}",
+            )
+            return None
+
+    def _save_cached(
+        self, url: str, etag: str, body: Any, next_url: Optional[str]
+    ) -> None:
+        cache_file_path = self._cache_file_path(url=url)
+        make_directory(path=self.cache_path)
+        # Written aside and renamed so another installer never reads a partial response
+        with open(file=f"{cache_file_path}.tmp", mode="wt", encoding="utf-8") as file:
+            json.dump(
+                {"etag": etag, "body": body, "next_url": next_url},
+                file,
+                separators=(",", ":"),
+            )
+        os.replace(f"{cache_file_path}.tmp", cache_file_path)
+
+    def _open(
+        self, url: str, etag: Optional[str]
+    ) -> Tuple[int, str, Optional[HTTPMessage], str]:
+        """
+        Send a GET request
+
+        :param url: the URL of the resource, ``str``
+        :param etag: the ETag of the cached response, sent as If-None-Match, ``Optional[str]``
+        :return: the status, the body, the headers and the error of the request, the status is 0 when it was not answered, ``Tuple[int, str, Optional[HTTPMessage], str]``
+        """
+        headers = {
+            "Accept": "application/vnd.github+json",
+            "Authorization": f"Bearer {self.token}",
+            "X-GitHub-Api-Version": GITHUB_API_VERSION,
+        }
+        if etag:
+            headers["If-None-Match"] = etag
+        try:
+            with urlopen(
+                Request(url=url, headers=headers), timeout=self.timeout
+            ) as response:
+                return response.status, response.read().decode(), response.headers, ""
+        except HTTPError as e:
+            return e.code, e.read().decode(errors="replace"), e.headers, ""
+        except OSError as e:
+            return 0, "", None, str(e)
+
+    def _fetch(self, url: str) -> GitHubResponse:
+        """
+        Get a resource, revalidating the cached response and retrying transient failures
+
+        :param url: the URL of the resource, ``str``
+        :return: the response, ``GitHubResponse``
+        """
+        cached = self._load_cached(url=url)
+        policy = HTTP_READ_RETRY
+        deadline = monotonic() + policy.deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            status, body, headers, error = self._open(
+                url=url, etag=cached["etag"] if cached else None
+            )
+            if not policy.is_retryable(stdout=f"{status:03d}", stderr=error, rc=0):
+                if attempt > 1 and status:
+                    policy.recovered += 1
+                break
+            delay = policy.next_delay(attempt=attempt, deadline=deadline)
+            if delay is None:
+                break
+            msg(
+                level="warning",
+                message=f"Transient failure in attempt {attempt} of {policy.max_attempts} ({policy.name}). Retrying in {delay:.1f} seconds. Request sent: GET {url}. Error received: {error or f'HTTP {status}'}",
+            )
+            sleep(delay)
+        if status == 304 and cached is not None:
+            msg(level="debug", message=f"GitHub response of {url} not modified")
+            return GitHubResponse(
+                url=url, status=200, body=cached["body"], next_url=cached["next_url"]
+            )
+        if not status:
+            return GitHubResponse(url=url, status=0, body=error, next_url=None)
+        try:
+            data = json.loads(body) if body else None
+        except ValueError:
+            data = body
+        link = LINK_NEXT_PATTERN.search(headers.get("Link", "")) if headers else None
+        response = GitHubResponse(
+            url=url, status=status, body=data, next_url=link.group(1) if link else None
+        )
+        etag = headers.get("ETag") if headers else None
+        if status == 200 and etag:
+            self._save_cached(url=url, etag=etag, body=data, next_url=response.next_url)
+        return response
+
+    def request(self, path: str) -> GitHubResponse:
+        """
+        Get a resource of the API, whatever the status of the answer, sharing the response of an identical request already in flight
+
+        :param path: the path of the resource, or the URL of a page given by a previous response, ``str``
+        :return: the response, ``GitHubResponse``
+        """
+        url = path if "://" in path else f"{self.api_url}{path}"
+        return HTTP_READS.do(
+            key=("GET", url, self._token_key), function=lambda: self._request(url=url)
+        )
+
+    def _request(self, url: str) -> GitHubResponse:
+        """
+        Get a resource of the API, from the cassette when replaying
+
+        :param url: the URL of the resource, ``str``
+        :return: the response, ``GitHubResponse``
+        """
+        # Traced and recorded like a command so the requests of a run are accounted for
+        command = ["github", "GET", url]
+        cassette = get_cassette()
+        if cassette is not None and cassette.mode == "replay":
+            stdout, _, _ = cassette.replay(command=command, input=None)
+            return GitHubResponse(url=url, **json.loads(stdout))
+        tracer = get_tracer()
+        started_at = time()
+        start = monotonic()
+        response = self._fetch(url=url)
+        stdout = json.dumps(
+            {
+                "status": response.status,
+                "body": response.body,
+                "next_url": response.next_url,
+            }
+        )
+        rc = 0 if response.status else 1
+        if tracer is not None:
+            tracer.record(
+                command=command,
+                start=started_at,
+                duration=monotonic() - start,
+                rc=rc,
+                stdout_bytes=len(stdout.encode()),
+                stderr_bytes=0,
+            )
+        if cassette is not None:
+            cassette.record(
+                command=command, input=None, stdout=stdout, stderr="", rc=rc
+            )
+        return response
+
+    def get(self, path: str) -> GitHubResponse:
+        """
+        Get a resource of the API that must exist
+
+        :param path: the path of the resource, or the URL of a page given by a previous response, ``str``
+        :return: the response, ``GitHubResponse``
+        """
+        response = self.request(path=path)
+        if response.status == 404:
+            raise NotFound(
+                f"GitHub resource {response.url} not found: {response.message()}"
+            )
+        if response.status != 200:
+            raise CommandFailed(
+                f"Failed to get the GitHub resource {response.url}. Error received: {response.message()}",
+                command=["github", "GET", response.url],
+                stderr=response.message(),
+            )
+        return response
+
+    def get_pages(self, path: str) -> List:
+        """
+        Get every item of a list of the API, following the next links of the pages
+
+        :param path: the path of the list, ``str``
+        :return: the items of all the pages, ``List``
+        """
+        separator = "&" if "?" in path else "?"
+        url: Optional[str] = f"{path}{separator}per_page={GITHUB_PAGE_SIZE}"
+        items = []
+        while url:
+            response = self.get(path=url)
+            if not isinstance(response.body, List):
+                raise InvalidData(
+                    f"GitHub resource {response.url} is not a list: {response.body}"
+                )
+            items.extend(response.body)
+            url = response.next_url
+        return items
+
+    def team(self, organization_name: str, team_name: str) -> Dict:
+        """
+        Get a team by its name
+
+        :param organization_name: the GitHub organization name, ``str``
+        :param team_name: the GitHub team name or slug, ``str``
+        :return: the team, ``Dict``
+        """
+        slug = github_team_slug(team_name=team_name)
+        response = self.request(path=f"/orgs/{organization_name}/teams/{slug}")
+        if response.status == 200:
+            return response.body
+        if response.status != 404:
+            raise CommandFailed(
+                f"Failed to get the team {team_name} in the organization {organization_name}. Error received: {response.message()}",
+                command=["github", "GET", response.url],
+                stderr=response.message(),
+            )
+        # A team keeps its slug when it is renamed, so its name is looked for in the list
+        for team in self.get_pages(path=f"/orgs/{organization_name}/teams"):
+            if team_name in (team.get("name"), team.get("slug")):
+                return team
+        raise NotFound(
+            f"Team {team_name} not found in the organization {organization_name}"
+        )
+
+    def team_membership(
+        self, organization_name: str, team_name: str, username: str
+    ) -> Dict:
+        """
+        Get the membership of a user in a team
+
+        :param organization_name: the GitHub organization name, ``str``
+        :param team_name: the GitHub team name or slug, ``str``
+        :param username: the GitHub username, ``str``
+        :return: the membership, with its role and state, ``Dict``
+        """
+        slug = github_team_slug(team_name=team_name)
+        response = self.request(
+            path=f"/orgs/{organization_name}/teams/{slug}/memberships/{username}"
+        )
+        if response.status == 404:
+            # Either the user is not a member or the slug is not the one derived from the name
+            team = self.team(organization_name=organization_name, team_name=team_name)
+            if team["slug"] != slug:
+                response = self.request(
+                    path=f"/orgs/{organization_name}/teams/{team['slug']}/memberships/{username}"
+                )
+        if response.status == 404:
+            raise NotFound(
+                f"User {username} is not a member of the team {team_name} in the organization {organization_name}"
+            )
+        if response.status != 200:
+            raise CommandFailed(
+                f"Failed to validate if user {username} has access to the team {team_name}. Error received: {response.message()}",
+                command=["github", "GET", response.url],
+                stderr=response.message(),
+            )
+        return response.body
+
+    def repository_permission(
+        self, organization_name: str, repository_name: str, username: str
+    ) -> str:
+        """
+        Get the permission of a user in a repository
+
+        :param organization_name: the GitHub organization name, ``str``
+        :param repository_name: the GitHub repository name, ``str``
+        :param username: the GitHub username, ``str``
+        :return: the permission, such as read, write or admin, ``str``
+        """
+        response = self.request(
+            path=f"/repos/{organization_name}/{repository_name}/collaborators/{username}/permission"
+        )
+        if response.status != 200:
+            raise CommandFailed(
+                f"Failed to validate the GitHub token provided by user {username}. Error received: {response.message()}",
+                command=["github", "GET", response.url],
+                stderr=response.message(),
+            )
+        if not isinstance(response.body, Dict) or "permission" not in response.body:
+            raise InvalidData(
+                f"permission key not found in the response when try to validate the GitHub token provided by user {username}. Output received: {response.body}"
+            )
+        return response.body["permission"]
+
+
+def github_validate_access(
+    token: str,
+    organization_name: str,
+    repository_name: str,
+    team_name: str,
+    username: str,
+    api_url: str,
+    cache_path: str,
+) -> None:
+    """
+    Validate that the token of the user can write to the repository and that the user is an active member of the team
+
+    Both checks are sent at the same time. Unlike a plain membership lookup, a membership whose invitation is still pending is rejected
+
+    :param token: the GitHub token, ``str``
+    :param organization_name: the GitHub organization name, ``str``
+    :param repository_name: the GitHub repository name, ``str``
+    :param team_name: the GitHub team name, ``str``
+    :param username: the GitHub username, ``str``
+    :param api_url: the URL of the GitHub API, ``str``
+    :param cache_path: the directory of the cached responses, ``str``
+    """
+    client = GitHubClient(token=token, api_url=api_url, cache_path=cache_path)
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="github") as executor:
+        permission_future = executor.submit(
+            client.repository_permission,
+            organization_name=organization_name,
+            repository_name=repository_name,
+            username=username,
+        )
+        membership_future = executor.submit(
+            client.team_membership,
+            organization_name=organization_name,
+            team_name=team_name,
+            username=username,
+        )
+        permission = permission_future.result()
+        membership = membership_future.result()
+    if permission not in ("write", "admin"):
+        raise InvalidState(
+            f"User {username} does not have write or admin permission in the repository {repository_name}. Permission found: {permission}"
+        )
+    # A pending invitation is answered with 200 too, but its user cannot push
+    # the site branch, at the end of the run, until it is accepted
+    if membership.get("state") != "active":
+        raise InvalidState(
+            f"Membership of user {username} in the team {team_name} is {membership.get('state')}. Accept the invitation to the team before running the installer"
+        )
+    msg(
+        level="debug",
+        message=f"GitHub token provided by user {username} is valid. Permission in the repository {repository_name}: {permission}. Role in the team {team_name}: {membership.get('role')}",
+    )
@@ -0,0 +1,169 @@
+import json
+import os
+from typing import Dict, List, Optional, Set
+
+import yaml
+
+from utils.exceptions import CommandFailed, InvalidData
+from utils.git import (
+    GitCatFile,
+    git_changed_paths,
+    git_checkout,
+    git_clone,
+    git_fetch_commit,
+    git_fetch_prune,
+    git_pull,
+    git_rev_parse,
+    git_sparse_checkout,
+    git_sync_branches,
+)
+from utils.logs import msg
+from utils.os import is_file, join_path, make_directory
+
+COMPONENT_METADATA_PATH = ".tnlcm/public.yaml"
+
+# Commit of the library the site was last updated with, stored in the site directory
+SITE_LIBRARY_COMMIT_FILE = ".library_commit"
+
+# Bump when the validation changes so older caches are not reused
+METADATA_CACHE_VERSION = 1
+
+
+def _validate_component(component: str, data: Dict, ref: str) -> None:
+    """
+    Validate the metadata every component must have
+
+    :param component: the name of the component, ``str``
+    :param data: the content of the public.yaml of the component, ``Dict``
+    :param ref: the ref of the library, used in the error messages, ``str``
+    """
+    if not isinstance(data, Dict) or "metadata" not in data:
+        raise InvalidData(
+            f"Metadata not found in component {component} using ref {ref}"
+        )
+    metadata = data["metadata"]
+    if not isinstance(metadata, Dict):
+        raise InvalidData(
+            f"Metadata for component {component} using ref {ref} is not a dictionary"
+        )
+    if "long_description" not in metadata:
+        raise InvalidData(
+            f"Long description not found in component {component} using ref {ref}"
+        )
+    if not isinstance(metadata["long_description"], str):
+        raise InvalidData(
+            f"Long description for component {component} using ref {ref} is not a string"
+        )
+
+
+def read_library_components(path: str, ref: str, cache_path: str) -> Dict[str, Dict]:
+    """
+    Get the validated public.yaml of every component of the library checked out in the path
+
+    The files are read from the git object store through a single cat-file process and the result is cached by the SHA of the tree checked out, so a later run at the same ref only loads the cache
+
+    :param path: the path to the library repository, ``str``
+    :param ref: the ref of the library, used in the error messages, ``str``
+    :param cache_path: the directory of the metadata caches, ``str``
+    :return: the content of the public.yaml by component name, sorted by name, ``Dict[str, Dict]``
+    """
+    tree = git_rev_parse(path=path, ref="HEAD^{tree}")
+    cache_file_path = join_path(cache_path, f"v{METADATA_CACHE_VERSION}-{tree}.json")
+    if is_file(path=cache_file_path):
+        with open(file=cache_file_path, mode="rt", encoding="utf-8") as file:
+            components = json.load(file)
+        msg(
+            level="debug",
+            message=f"Metadata of {len(components)} components loaded from the cache {cache_file_path}",
+        )
+        return components
+    components = {}
+    with GitCatFile(path=path) as cat_file:
+        for component in sorted(cat_file.subtrees(tree=tree)):
+            if component.startswith("."):
+                continue
+            data = cat_file.read(object=f"{tree}:{component}/{COMPONENT_METADATA_PATH}")
+            if data is None:
+                msg(
+                    level="debug",
+                    message=f"Directory {component} has no {COMPONENT_METADATA_PATH}, it is not a component",
+                )
+                continue
+            try:
+                component_data = yaml.safe_load(data)
+            except yaml.YAMLError as e:
+                raise InvalidData(
+                    f"Metadata of component {component} using ref {ref} is not valid YAML: {e}"
+                ) from None
+            _validate_component(component=component, data=component_data, ref=ref)
+            components[component] = component_data
+    make_directory(path=cache_path)
+    # Written aside and renamed so another installer never reads a partial cache
+    with open(file=f"{cache_file_path}.tmp", mode="wt", encoding="utf-8") as file:
+        json.dump(components, file, separators=(",", ":"), default=str)
+    os.replace(f"{cache_file_path}.tmp", cache_file_path)
+    msg(
+        level="debug",
+        message=f"Metadata of {len(components)} components read from the tree {tree} and cached in {cache_file_path}",
+    )
+    return components
+
+
+def library_changed_components(
+    path: str, old_commit: str, new_commit: str
+) -> Optional[Set[str]]:
+    """
+    Get the components whose metadata was added or changed between two commits of the library
+
+    :param path: the path to the library repository, ``str``
+    :param old_commit: the commit the site was last updated with, ``str``
+    :param new_commit: the commit checked out, ``str``
+    :return: the names of the components or None if the old commit cannot be fetched, ``Optional[Set[str]]``
+    """
+    try:
+        git_fetch_commit(path=path, commit=old_commit)
+    except CommandFailed as e:
+        msg(
+            level="warning",
+            message=f"Commit {old_commit} of the library cannot be fetched, every component is shown. Error received: {e.stderr}",
+        )
+        return None
+    metadata_directory = os.path.dirname(COMPONENT_METADATA_PATH)
+    components = set()
+    for changed_path in git_changed_paths(
+        path=path, old_ref=old_commit, new_ref=new_commit
+    ):
+        parts = changed_path.split("/")
+        if len(parts) > 2 and parts[1] == metadata_directory:
+            components.add(parts[0])
+    return components
+
+
+def prepare_library(
+    https_url: str,
+    path: str,
+    ref: str,
+    checkout: str,
+    patterns: List[str],
+    cache_path: str,
+) -> Dict[str, Dict]:
+    """
+    Checkout the library at the ref and read the metadata of its components
+
+    :param https_url: the URL of the library repository, ``str``
+    :param path: the local path to checkout the library into, ``str``
+    :param ref: the tag as tags/<tag>, the branch or the commit to checkout, ``str``
+    :param checkout: sparse to checkout only the files matching the patterns, full to clone the whole repository, ``str``
+    :param patterns: the sparse-checkout patterns of the files needed, ``List[str]``
+    :param cache_path: the directory of the metadata caches, ``str``
+    :return: the content of the public.yaml by component name, sorted by name, ``Dict[str, Dict]``
+    """
+    if checkout == "sparse":
+        git_sparse_checkout(https_url=https_url, path=path, ref=ref, patterns=patterns)
+    else:
+        git_clone(https_url=https_url, path=path)
+        git_pull(path=path)
+        git_fetch_prune(path=path)
+        git_sync_branches(path=path)
+        git_checkout(path=path, ref=ref)
+    return read_library_components(path=path, ref=ref, cache_path=cache_path)
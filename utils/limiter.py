@@ -0,0 +1,189 @@
+import asyncio
+import re
+import threading
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+from utils.logs import msg
+from utils.metrics import register_metrics
+
+
+def _wake_waiter(waiter: asyncio.Future) -> None:
+    """
+    Wake a coroutine waiting for a slot, so it checks the window again
+
+    :param waiter: the future the coroutine awaits, ``asyncio.Future``
+    """
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class ConcurrencyLimit:
+    """
+    Number of calls allowed to run at the same time, shared by threads and event loops
+    """
+
+    def __init__(self, name: str, limit: int):
+        self.name = name
+        self.limit = float(limit)
+        self.inflight = 0
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+    @property
+    def window(self) -> int:
+        """
+        The number of calls allowed to run at the same time
+        """
+        return max(1, int(self.limit))
+
+    def acquire(self) -> None:
+        """
+        Block the current thread until a call fits in the current window
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.inflight < self.window)
+            self.inflight += 1
+
+    async def acquire_async(self) -> None:
+        """
+        Wait without blocking the event loop until a call fits in the current window
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self.inflight < self.window:
+                    self.inflight += 1
+                    return
+                waiter = loop.create_future()
+                self._waiters.append((loop, waiter))
+            try:
+                await waiter
+            finally:
+                with self._lock:
+                    if (loop, waiter) in self._waiters:
+                        self._waiters.remove((loop, waiter))
+
+    def release(self, latency: float = 0.0, overloaded: bool = False) -> None:
+        """
+        Free the slot of a finished call and wake the calls waiting for one
+
+        :param latency: the seconds the call took, ``float``
+        :param overloaded: whether the call failed because the backend is overloaded, ``bool``
+        """
+        with self._lock:
+            self._adapt(latency=latency, overloaded=overloaded)
+            self.inflight -= 1
+            self._condition.notify_all()
+            waiters, self._waiters = self._waiters, []
+        for loop, waiter in waiters:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(_wake_waiter, waiter)
+
+    def _adapt(self, latency: float, overloaded: bool) -> None:
+        """
+        Adapt the window to the outcome of a call, called with the lock held. The window of a plain limit is fixed
+
+        :param latency: the seconds the call took, ``float``
+        :param overloaded: whether the call failed because the backend is overloaded, ``bool``
+        """
+
+
+class AIMDLimiter(ConcurrencyLimit):
+    """
+    Concurrency limit that grows additively while calls are healthy and shrinks multiplicatively when they slow down or fail
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 2,
+        min_limit: int = 1,
+        max_limit: int = 8,
+        latency_target: float = 3.0,
+        decrease_factor: float = 0.5,
+        overload_pattern: Optional[re.Pattern] = None,
+    ):
+        super().__init__(name=name, limit=initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.overload_pattern = overload_pattern
+        self.calls = 0
+        self.errors = 0
+        self.increases = 0
+        self.decreases = 0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+        self._last_decrease = float("-inf")
+        register_metrics(name=name, provider=self.metrics)
+
+    @property
+    def window(self) -> int:
+        """
+        The number of calls allowed to run at the same time
+        """
+        return max(self.min_limit, int(self.limit))
+
+    def is_overloaded(self, stderr: str) -> bool:
+        """
+        Check if the error of a failed call means that the backend is overloaded
+
+        :param stderr: the error received, ``str``
+        :return: whether the backend is overloaded, ``bool``
+        """
+        return self.overload_pattern is not None and bool(
+            self.overload_pattern.search(stderr)
+        )
+
+    def _adapt(self, latency: float, overloaded: bool) -> None:
+        """
+        Adapt the window to the outcome of a call, called with the lock held
+
+        :param latency: the seconds the call took, ``float``
+        :param overloaded: whether the call failed because the backend is overloaded, ``bool``
+        """
+        self.calls += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        if overloaded:
+            self.errors += 1
+        now = monotonic()
+        if overloaded or latency > self.latency_target:
+            # Calls started before the cut finish afterwards, only react once per period
+            if now - self._last_decrease >= self.latency_target:
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                self._last_decrease = now
+                self.decreases += 1
+                msg(
+                    level="debug",
+                    message=f"{self.name} window decreased to {self.window}. Latency: {latency:.2f}s. Overloaded: {overloaded}",
+                )
+        elif self.limit < self.max_limit:
+            # One more slot after a full window of healthy calls
+            self.limit = min(self.max_limit, self.limit + 1 / self.window)
+            self.increases += 1
+
+    def metrics(self) -> Dict[str, float]:
+        """
+        Get the current window and the counters of the limiter
+
+        :return: the limits, window, calls, error rate and latencies, ``Dict[str, float]``
+        """
+        return {
+            "window": self.window,
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "inflight": self.inflight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.calls, 3) if self.calls else 0.0,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "avg_latency": round(self.total_latency / self.calls, 3)
+            if self.calls
+            else 0.0,
+            "max_latency": round(self.max_latency, 3),
+        }
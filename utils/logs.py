@@ -1,6 +1,8 @@
 import logging
 import os
 import sys
+import threading
+from typing import List, Optional, Tuple
 
 LOG_LEVELS_AND_FORMATS = {
     "DEBUG": ("\x1b[38;21m", logging.DEBUG),
@@ -12,6 +14,8 @@ LOG_LEVELS_AND_FORMATS = {
 
 RESET_COLOR = "\x1b[0m"
 
+_thread_messages = threading.local()
+
 
 class CustomFormatter(logging.Formatter):
     """
@@ -29,7 +33,45 @@ class CustomFormatter(logging.Formatter):
         return formatter.format(record)
 
 
-def msg(level: str, message: str) -> None:
+class MessageBuffer:
+    """
+    Messages of background threads, kept until the thread that waits for their work logs them
+    """
+
+    def __init__(self):
+        self.messages: List[Tuple[str, str]] = []
+        self._lock = threading.Lock()
+
+    def append(self, level: str, message: str) -> None:
+        """
+        Keep a message of a background thread
+
+        :param level: Logging level (debug, info, warning, error, critical)
+        :param message: Message to log
+        """
+        with self._lock:
+            self.messages.append((level, message))
+
+    def flush(self) -> None:
+        """
+        Log the messages kept so far, in the order they were sent
+        """
+        with self._lock:
+            messages, self.messages = self.messages, []
+        for level, message in messages:
+            _log(level=level, message=message)
+
+
+def buffer_thread_messages(buffer: Optional[MessageBuffer]) -> None:
+    """
+    Keep the messages of the current thread in a buffer instead of logging them, or log them again without one
+
+    :param buffer: the buffer of the messages, ``Optional[MessageBuffer]``
+    """
+    _thread_messages.buffer = buffer
+
+
+def _log(level: str, message: str) -> None:
     """
     Logs a message with a specific level and optional color
 
@@ -49,8 +91,19 @@ def msg(level: str, message: str) -> None:
 
     log_func(message)
 
-    if level in {"ERROR", "CRITICAL"}:
-        sys.exit(1)
+
+def msg(level: str, message: str) -> None:
+    """
+    Logs a message with a specific level and optional color, or keeps it in the buffer of the current thread
+
+    :param level: Logging level (debug, info, warning, error, critical)
+    :param message: Message to log
+    """
+    buffer = getattr(_thread_messages, "buffer", None)
+    if buffer is not None:
+        buffer.append(level=level, message=message)
+        return
+    _log(level=level, message=message)
 
 
 def setup_logger() -> None:
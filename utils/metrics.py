@@ -0,0 +1,33 @@
+from typing import Callable, Dict
+
+from utils.logs import msg
+
+_metrics_providers: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+
+def log_run_metrics() -> None:
+    """
+    Log the metrics collected during the run
+    """
+    for name, values in run_metrics().items():
+        summary = ", ".join(f"{key}={value}" for key, value in values.items())
+        msg(level="debug", message=f"Run metrics of {name}: {summary}")
+
+
+def register_metrics(name: str, provider: Callable[[], Dict[str, float]]) -> None:
+    """
+    Register a function that returns the current metrics of a component
+
+    :param name: the name of the component, ``str``
+    :param provider: the function that returns the metrics, ``Callable[[], Dict[str, float]]``
+    """
+    _metrics_providers[name] = provider
+
+
+def run_metrics() -> Dict[str, Dict[str, float]]:
+    """
+    Get the current metrics of every registered component
+
+    :return: the metrics of each component, ``Dict[str, Dict[str, float]]``
+    """
+    return {name: provider() for name, provider in _metrics_providers.items()}
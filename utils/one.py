@@ -5,7 +5,8 @@ OpenNebula CLI Wrapper Functions
                               FUNCTION INDEX
 ================================================================================
 - OPENNEBULA MANAGEMENT (line ~93):
-    check_one_health, get_oned_conf_path, onegate_endpoint, restart_one
+    check_one_health, get_oned_conf_path, one_rpc_ping, one_units_state,
+    onegate_endpoint, restart_one
 
 - ACL MANAGEMENT (line ~181):
     check_group_acl, oneacl_create, oneacl_list
@@ -42,11 +43,12 @@ OpenNebula CLI Wrapper Functions
 - MARKETPLACE MANAGEMENT (line ~2101):
     get_marketplace_monitoring_interval, update_marketplace_monitoring_interval,
     onemarket_create, onemarket_endpoint, onemarket_list, onemarket_show,
-    onemarkets_names
+    onemarkets_bootstrap, onemarkets_names
 
 - MARKETAPP MANAGEMENT (line ~2316):
     onemarketapp_add, onemarketapp_instantiate, onemarketapp_export,
-    onemarketapp_curl, onemarketapp_description, onemarketapp_name,
+    onemarketapp_curl, onemarketapp_description, onemarketapp_list,
+    onemarketapps_marketplace_ids, onemarketapp_name,
     onemarketapp_show, onemarketapp_type, onemarketapp_version
 
 - TEMPLATE MANAGEMENT (line ~3184):
@@ -73,16 +75,28 @@ OpenNebula CLI Wrapper Functions
 ================================================================================
 """
 
+import json
 import os
 import re
 from datetime import datetime
 from textwrap import dedent
-from time import sleep
-from typing import Dict, List, Optional, Tuple
-
-from utils.cli import run_command
-from utils.file import load_file, loads_json, save_file, save_json_file
+from time import monotonic, sleep, time
+from typing import Dict, List, Optional, Set, Tuple
+from xmlrpc.client import Fault, ProtocolError, ServerProxy, Transport
+
+from utils.cassette import get_cassette
+from utils.cli import join_command, run_command
+from utils.exceptions import (
+    CommandFailed,
+    InvalidData,
+    InvalidState,
+    NotFound,
+    StateTimeout,
+    ToolkitError,
+)
+from utils.file import load_file, loads_json, save_file
 from utils.logs import msg
+from utils.oned import load_oned_conf
 from utils.os import TEMP_DIRECTORY, join_path
 from utils.parser import gb_to_mb
 from utils.questionary import (
@@ -91,39 +105,87 @@ from utils.questionary import (
     ask_select,
     ask_text,
 )
+from utils.retry import (
+    HTTP_READ_RETRY,
+    ONE_LIMITER,
+    ONE_READ_RETRY,
+    retry_command,
+)
+from utils.singleflight import HTTP_READS, ONE_READS
+from utils.trace import get_tracer
+
+
+class TimeoutTransport(Transport):
+    """
+    XML-RPC transport with a connection timeout
+    """
+
+    def __init__(self, timeout: float):
+        super().__init__()
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        """
+        Create the HTTP connection applying the timeout
+        """
+        connection = super().make_connection(host)
+        connection.timeout = self.timeout
+        return connection
+
+
+def _one_read(command: List[str]) -> Tuple[str, str, int]:
+    """
+    Run a read command of the OpenNebula CLI, sharing the result of an identical read already in flight
+
+    :param command: the argument vector to run, ``List[str]``
+    :return: the stdout, stderr and return code of the command, ``Tuple[str, str, int]``
+    """
+    return ONE_READS.do(
+        key=tuple(command),
+        function=lambda: retry_command(
+            command=command, policy=ONE_READ_RETRY, limiter=ONE_LIMITER
+        ),
+    )
 
 
 # ##############################################################################
 # ##                         OPENNEBULA MANAGEMENT                            ##
 # ##############################################################################
-def check_one_health() -> None:
+def check_one_health(timeout: int = 120) -> None:
     """
-    Check OpenNebula health
+    Check OpenNebula health waiting with backoff until oned answers requests
+
+    :param timeout: the maximum time in seconds to wait for OpenNebula to be healthy, ``int``
     """
-    command = "systemctl list-units | grep opennebula"
-    stdout, stderr, rc = run_command(command=command)
-    if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not check OpenNebula health. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
-        )
-    all_running = True
-    errors = []
-    for line in stdout.strip().split("\n"):
-        service_status = re.search(r"(\S+)\s+loaded active (\S+)", line)
-        if service_status:
-            service_name, status = service_status.groups()
-            if status != "running" and "timer" not in service_name:
-                all_running = False
-                errors.append(f"{service_name} is {status}")
-    if not all_running:
+    deadline = monotonic() + timeout
+    delay = 0.5
+    while True:
+        errors = []
+        units_state = one_units_state()
+        if "opennebula.service" not in units_state:
+            errors.append("opennebula.service is not loaded")
+        for unit, (active_state, sub_state) in units_state.items():
+            if not unit.endswith(".service") or active_state == "inactive":
+                continue
+            if active_state != "active" or sub_state != "running":
+                errors.append(f"{unit} is {active_state} ({sub_state})")
+        if not errors and not one_rpc_ping():
+            errors.append("oned is not answering XML-RPC requests")
+        if not errors:
+            break
+        if monotonic() + delay > deadline:
+            raise StateTimeout(
+                f"OpenNebula healthcheck failed after {timeout} seconds: {', '.join(errors)}"
+            )
         msg(
-            level="error",
-            message=f"OpenNebula healthcheck failed. Following services are not running: {', '.join(errors)}",
+            level="debug",
+            message=f"OpenNebula not healthy yet, retrying in {delay} seconds: {', '.join(errors)}",
         )
+        sleep(delay)
+        delay = min(delay * 2, 5)
     msg(
         level="debug",
-        message="OpenNebula healthcheck passed. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"OpenNebula healthcheck passed. Units state: {units_state}",
     )
 
 
@@ -133,6 +195,10 @@ def get_oned_conf_path() -> str:
 
     :return: the path to the oned.conf file, ``str``
     """
+    # Self-contained installations keep their configuration under ONE_LOCATION
+    one_location = os.getenv("ONE_LOCATION")
+    if one_location:
+        return os.path.join(one_location, "etc", "oned.conf")
     return os.path.join("/etc", "one", "oned.conf")
 
 
@@ -143,41 +209,132 @@ def onegate_endpoint() -> str:
     :return: the endpoint of the OneGate service, ``str``
     """
     oned_conf_path = get_oned_conf_path()
-    oned_conf = load_file(file_path=oned_conf_path)
-    match = re.search(
-        r"^\s*ONEGATE_ENDPOINT\s*=\s*\"([^\"]+)\"",
-        oned_conf,
-        re.MULTILINE,
-    )
-    if match is None:
-        msg(
-            level="error",
-            message=f"ONEGATE_ENDPOINT key not found in the OpenNebula configuration file {oned_conf}",
+    url = load_oned_conf(path=oned_conf_path).onegate_endpoint
+    if url is None:
+        raise InvalidData(
+            f"ONEGATE_ENDPOINT key not found in the OpenNebula configuration file {oned_conf_path}"
         )
-    url = match.group(1)
     ip_match = re.search(r"(\d{1,3}(?:\.\d{1,3}){3})", url)
     if ip_match is None:
-        msg(
-            level="error",
-            message=f"ONEGATE_ENDPOINT key in the OpenNebula configuration file {oned_conf} does not contain an IP address defined",
+        raise InvalidData(
+            f"ONEGATE_ENDPOINT key in the OpenNebula configuration file {oned_conf_path} does not contain an IP address defined"
         )
     return ip_match.group(1)
 
 
+def one_rpc_ping(timeout: float = 2.0) -> bool:
+    """
+    Check if oned answers a lightweight XML-RPC request
+
+    :param timeout: the maximum time in seconds to wait for the answer, ``float``
+    :return: whether oned answered, ``bool``
+    """
+    # The ping is traced like a command so the RPCs of a run are accounted for
+    tracer = get_tracer()
+    command = ["one.system.version"]
+    started_at = time()
+    start = monotonic()
+    stderr, rc = _one_rpc_version(command=command, timeout=timeout)
+    if tracer is not None:
+        tracer.record(
+            command=command,
+            start=started_at,
+            duration=monotonic() - start,
+            rc=rc,
+            stdout_bytes=0,
+            stderr_bytes=len(stderr.encode()),
+        )
+    return rc == 0
+
+
+def _one_rpc_version(command: List[str], timeout: float) -> Tuple[str, int]:
+    """
+    Call one.system.version, or serve it from the cassette when replaying
+
+    :param command: the name the request is recorded with, ``List[str]``
+    :param timeout: the maximum time in seconds to wait for the answer, ``float``
+    :return: the error received and the return code of the request, ``Tuple[str, int]``
+    """
+    # The ping is part of the recorded run so offline replays do not need oned
+    cassette = get_cassette()
+    if cassette is not None and cassette.mode == "replay":
+        _, stderr, rc = cassette.replay(command=command, input=None)
+        return stderr, rc
+    endpoint = os.getenv("ONE_XMLRPC")
+    if endpoint is None:
+        oned_conf = load_oned_conf(path=get_oned_conf_path())
+        endpoint = f"http://localhost:{oned_conf.port}/RPC2"
+    one_auth_path = os.getenv(
+        "ONE_AUTH", os.path.join(os.path.expanduser("~"), ".one", "one_auth")
+    )
+    session = ""
+    if os.path.isfile(one_auth_path):
+        session = load_file(file_path=one_auth_path).strip()
+    stderr, rc = "", 0
+    try:
+        server = ServerProxy(uri=endpoint, transport=TimeoutTransport(timeout=timeout))
+        server.one.system.version(session)
+    except Fault as e:
+        # oned received the call and answered it, an authentication error does not mean it is down
+        msg(
+            level="debug",
+            message=f"oned XML-RPC endpoint {endpoint} answered with a fault: {e}",
+        )
+    except (OSError, ProtocolError) as e:
+        msg(
+            level="debug",
+            message=f"oned XML-RPC endpoint {endpoint} not answering: {e}",
+        )
+        stderr, rc = str(e), 1
+    if cassette is not None:
+        cassette.record(command=command, input=None, stdout="", stderr=stderr, rc=rc)
+    return stderr, rc
+
+
+def one_units_state() -> Dict[str, Tuple[str, str]]:
+    """
+    Get the state of the OpenNebula systemd units with a single query
+
+    :return: the active and sub state of each unit, ``Dict[str, Tuple[str, str]]``
+    """
+    command = ["systemctl", "show", "--property=Id,ActiveState,SubState", "opennebula*"]
+    stdout, stderr, rc = run_command(command=command)
+    if rc != 0:
+        raise CommandFailed(
+            f"Could not check OpenNebula health. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
+        )
+    units_state = {}
+    for block in stdout.split("\n\n"):
+        properties = dict(
+            line.split("=", 1) for line in block.splitlines() if "=" in line
+        )
+        if "Id" in properties:
+            units_state[properties["Id"]] = (
+                properties.get("ActiveState", ""),
+                properties.get("SubState", ""),
+            )
+    return units_state
+
+
 def restart_one() -> None:
     """
     Restart the OpenNebula daemon
     """
-    command = "systemctl restart opennebula"
+    command = ["systemctl", "restart", "opennebula"]
     stdout, stderr, rc = run_command(command=command)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not restart OpenNebula daemon. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not restart OpenNebula daemon. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"OpenNebula daemon restarted. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"OpenNebula daemon restarted. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
@@ -199,21 +356,19 @@ def check_group_acl(group_id: str, resources: str, rights: str) -> bool:
     if acls is None:
         return False
     if "ACL_POOL" not in acls or "ACL" not in acls["ACL_POOL"]:
-        msg(
-            level="error",
-            message="ACL_POOL key not found in acls or ACL key not found in ACL_POOL",
+        raise InvalidData(
+            "ACL_POOL key not found in acls or ACL key not found in ACL_POOL"
         )
     acl_pool = acls["ACL_POOL"]["ACL"]
     if acl_pool is None:
         return False
+    if isinstance(acl_pool, Dict):
+        acl_pool = [acl_pool]
     for acl in acl_pool:
         if acl is None:
-            msg(level="error", message="ACL is empty")
+            raise InvalidData("ACL is empty")
         if "STRING" not in acl:
-            msg(
-                level="error",
-                message="STRING key not found in acl",
-            )
+            raise InvalidData("STRING key not found in acl")
         acl_string = f"@{group_id} {resources} {rights}"
         if acl_string == acl["STRING"]:
             return True
@@ -238,16 +393,18 @@ def oneacl_create(group_id: int, resources: str, rights: str) -> None:
             message=f"Group with id {group_id} already has ACL. Resources: {resources}. Rights: {rights}",
         )
     else:
-        command = f'oneacl create "@{group_id} {resources} {rights}"'
-        stdout, stderr, rc = run_command(command=command)
+        command = ["oneacl", "create", f"@{group_id} {resources} {rights}"]
+        stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
         if rc != 0:
-            msg(
-                level="error",
-                message=f"Could not add ACL to group with id {group_id}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            raise CommandFailed(
+                f"Could not add ACL to group with id {group_id}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+                command=command,
+                stderr=stderr,
+                rc=rc,
             )
         msg(
             level="debug",
-            message=f"ACL added to group with id {group_id}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"ACL added to group with id {group_id}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return int(re.search(r"ID:\s*(\d+)", stdout).group(1))
 
@@ -258,18 +415,18 @@ def oneacl_list() -> Dict | None:
 
     :return: the list of ACLs, ``Dict``
     """
-    command = "oneacl list -j"
-    stdout, stderr, rc = run_command(command=command)
+    command = ["oneacl", "list", "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
         msg(
             level="debug",
-            message=f"Could not get OpenNebula ACLs. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            message=f"Could not get OpenNebula ACLs. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
         )
         return None
     else:
         msg(
             level="debug",
-            message=f"OpenNebula ACLs found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"OpenNebula ACLs found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -285,17 +442,19 @@ def onedatastore_list() -> Dict:
 
     :return: the list of datastores, ``Dict``
     """
-    command = "onedatastore list -j"
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onedatastore", "list", "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"OpenNebula datastores not found. Create a datastore in OpenNebula before adding an appliance. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"OpenNebula datastores not found. Create a datastore in OpenNebula before adding an appliance. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     else:
         msg(
             level="debug",
-            message=f"OpenNebula datastores found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"OpenNebula datastores found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -312,24 +471,19 @@ def onedatastores_names() -> List[str]:
         "DATASTORE_POOL" not in datastores
         or "DATASTORE" not in datastores["DATASTORE_POOL"]
     ):
-        msg(
-            level="error",
-            message="DATASTORE_POOL key not found in datastores or DATASTORE key not found in DATASTORE_POOL",
+        raise InvalidData(
+            "DATASTORE_POOL key not found in datastores or DATASTORE key not found in DATASTORE_POOL"
         )
     datastore_pool = datastores["DATASTORE_POOL"]["DATASTORE"]
     if datastore_pool is None:
-        msg(
-            level="error",
-            message="OpenNebula datastores not found. Create a datastore in OpenNebula before adding an appliance",
+        raise NotFound(
+            "OpenNebula datastores not found. Create a datastore in OpenNebula before adding an appliance"
         )
     for datastore in datastore_pool:
         if datastore is None:
-            msg(level="error", message="Datastore is empty")
+            raise InvalidData("Datastore is empty")
         if "NAME" not in datastore:
-            msg(
-                level="error",
-                message="NAME key not found in datastore",
-            )
+            raise InvalidData("NAME key not found in datastore")
         datastores_names.append(datastore["NAME"])
     return datastores_names
 
@@ -347,16 +501,18 @@ def oneflow_chown(oneflow_name: str, username: str, group_name: str) -> None:
     :param username: the name of the user, ``str``
     :param group_name: the name of the group, ``str``
     """
-    command = f'oneflow chown "{oneflow_name}" "{username}" "{group_name}"'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["oneflow", "chown", oneflow_name, username, group_name]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not change owner of service {oneflow_name} to {username}:{group_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not change owner of service {oneflow_name} to {username}:{group_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Owner of service {oneflow_name} changed to {username}:{group_name}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Owner of service {oneflow_name} changed to {username}:{group_name}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
@@ -370,35 +526,28 @@ def oneflow_custom_attr_value(oneflow_name: str, attr_key: str) -> str:
     """
     oneflow = oneflow_show(oneflow_name=oneflow_name)
     if oneflow is None:
-        msg(
-            level="error",
-            message=f"Service {oneflow_name} not found",
-        )
+        raise NotFound(f"Service {oneflow_name} not found")
     if (
         "DOCUMENT" not in oneflow
         or "TEMPLATE" not in oneflow["DOCUMENT"]
         or "BODY" not in oneflow["DOCUMENT"]["TEMPLATE"]
     ):
-        msg(
-            level="error",
-            message=f"DOCUMENT key not found in service {oneflow_name} or TEMPLATE key not found in DOCUMENT or BODY key not found in TEMPLATE",
+        raise InvalidData(
+            f"DOCUMENT key not found in service {oneflow_name} or TEMPLATE key not found in DOCUMENT or BODY key not found in TEMPLATE"
         )
     if "custom_attrs_values" not in oneflow["DOCUMENT"]["TEMPLATE"]["BODY"]:
-        msg(
-            level="error",
-            message=f"custom_attrs_values key not found in service {oneflow_name}",
+        raise InvalidData(
+            f"custom_attrs_values key not found in service {oneflow_name}"
         )
     custom_attrs_values = oneflow["DOCUMENT"]["TEMPLATE"]["BODY"]["custom_attrs_values"]
     if attr_key not in custom_attrs_values:
-        msg(
-            level="error",
-            message=f"Custom attribute {attr_key} not found in service {oneflow_name}",
+        raise NotFound(
+            f"Custom attribute {attr_key} not found in service {oneflow_name}"
         )
     attr_value = custom_attrs_values[attr_key]
     if attr_value is None:
-        msg(
-            level="error",
-            message=f"Could not get value of custom attribute {attr_key} in service {oneflow_name}",
+        raise InvalidData(
+            f"Could not get value of custom attribute {attr_key} in service {oneflow_name}"
         )
     return attr_value
 
@@ -412,21 +561,14 @@ def oneflow_id(oneflow_name: str) -> int:
     """
     oneflow = oneflow_show(oneflow_name=oneflow_name)
     if oneflow is None:
-        msg(
-            level="error",
-            message=f"Service {oneflow_name} not found",
-        )
+        raise NotFound(f"Service {oneflow_name} not found")
     if "DOCUMENT" not in oneflow or "ID" not in oneflow["DOCUMENT"]:
-        msg(
-            level="error",
-            message=f"DOCUMENT key not found in service {oneflow_name} or ID key not found in DOCUMENT",
+        raise InvalidData(
+            f"DOCUMENT key not found in service {oneflow_name} or ID key not found in DOCUMENT"
         )
     id = oneflow["DOCUMENT"]["ID"]
     if id is None:
-        msg(
-            level="error",
-            message=f"Could not get id of service {oneflow_name}",
-        )
+        raise InvalidData(f"Could not get id of service {oneflow_name}")
     return id
 
 
@@ -436,18 +578,18 @@ def oneflow_list() -> List | None:
 
     :return: the list of services, ``List``
     """
-    command = "oneflow list -j"
-    stdout, stderr, rc = run_command(command=command)
+    command = ["oneflow", "list", "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
         msg(
             level="debug",
-            message=f"OpenNebula services not found. Create a service in OpenNebula before adding an appliance. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            message=f"OpenNebula services not found. Create a service in OpenNebula before adding an appliance. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
         )
         return None
     else:
         msg(
             level="debug",
-            message=f"OpenNebula services found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"OpenNebula services found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -463,16 +605,10 @@ def oneflow_role_info(oneflow_name: str, oneflow_role: str) -> Dict:
     roles = oneflow_roles(oneflow_name=oneflow_name)
     for role in roles:
         if "name" not in role:
-            msg(
-                level="error",
-                message="name key not found in role",
-            )
+            raise InvalidData("name key not found in role")
         if role["name"] == oneflow_role:
             return role
-    msg(
-        level="error",
-        message=f"Role {oneflow_role} not found in service {oneflow_name}",
-    )
+    raise NotFound(f"Role {oneflow_role} not found in service {oneflow_name}")
 
 
 def oneflow_role_vm_name(oneflow_name: str, oneflow_role: str) -> str:
@@ -485,21 +621,14 @@ def oneflow_role_vm_name(oneflow_name: str, oneflow_role: str) -> str:
     """
     role = oneflow_role_info(oneflow_name=oneflow_name, oneflow_role=oneflow_role)
     if "nodes" not in role:
-        msg(
-            level="error",
-            message=f"nodes key not found in role {oneflow_role}",
-        )
+        raise InvalidData(f"nodes key not found in role {oneflow_role}")
     for node in role["nodes"]:
         if "vm_info" not in node or "VM" not in node["vm_info"]:
-            msg(
-                level="error",
-                message=f"vm_info key not found in role {oneflow_role} or VM key not found in vm_info",
+            raise InvalidData(
+                f"vm_info key not found in role {oneflow_role} or VM key not found in vm_info"
             )
         if "NAME" not in node["vm_info"]["VM"]:
-            msg(
-                level="error",
-                message=f"NAME key not found in role {oneflow_role}",
-            )
+            raise InvalidData(f"NAME key not found in role {oneflow_role}")
         return node["vm_info"]["VM"]["NAME"]
 
 
@@ -512,30 +641,20 @@ def oneflow_roles(oneflow_name: str) -> List:
     """
     oneflow = oneflow_show(oneflow_name=oneflow_name)
     if oneflow is None:
-        msg(
-            level="error",
-            message=f"Service {oneflow_name} not found",
-        )
+        raise NotFound(f"Service {oneflow_name} not found")
     if (
         "DOCUMENT" not in oneflow
         or "TEMPLATE" not in oneflow["DOCUMENT"]
         or "BODY" not in oneflow["DOCUMENT"]["TEMPLATE"]
     ):
-        msg(
-            level="error",
-            message=f"DOCUMENT key not found in service {oneflow_name} or TEMPLATE key not found in DOCUMENT or BODY key not found in TEMPLATE",
+        raise InvalidData(
+            f"DOCUMENT key not found in service {oneflow_name} or TEMPLATE key not found in DOCUMENT or BODY key not found in TEMPLATE"
         )
     if "roles" not in oneflow["DOCUMENT"]["TEMPLATE"]["BODY"]:
-        msg(
-            level="error",
-            message=f"roles key not found in service {oneflow_name}",
-        )
+        raise InvalidData(f"roles key not found in service {oneflow_name}")
     roles = oneflow["DOCUMENT"]["TEMPLATE"]["BODY"]["roles"]
     if roles is None:
-        msg(
-            level="error",
-            message=f"Could not get roles of service {oneflow_name}",
-        )
+        raise InvalidData(f"Could not get roles of service {oneflow_name}")
     return roles
 
 
@@ -550,21 +669,14 @@ def oneflow_roles_vm_names(oneflow_name: str) -> List[str]:
     roles_vm_names = []
     for role in roles:
         if "nodes" not in role:
-            msg(
-                level="error",
-                message="nodes key not found in role",
-            )
+            raise InvalidData("nodes key not found in role")
         for node in role["nodes"]:
             if "vm_info" not in node or "VM" not in node["vm_info"]:
-                msg(
-                    level="error",
-                    message="vm_info key not found in role or VM key not found in vm_info",
+                raise InvalidData(
+                    "vm_info key not found in role or VM key not found in vm_info"
                 )
             if "NAME" not in node["vm_info"]["VM"]:
-                msg(
-                    level="error",
-                    message="NAME key not found in role",
-                )
+                raise InvalidData("NAME key not found in role")
             vm_name = node["vm_info"]["VM"]["NAME"]
             roles_vm_names.append(vm_name)
     return roles_vm_names
@@ -577,18 +689,18 @@ def oneflow_show(oneflow_name: str) -> Dict | None:
     :param oneflow_name: the name of the service, ``str``
     :return: the details of the service, ``Dict``
     """
-    command = f'oneflow show "{oneflow_name}" -j'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["oneflow", "show", oneflow_name, "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
         msg(
             level="debug",
-            message=f"Service {oneflow_name} not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            message=f"Service {oneflow_name} not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
         )
         return None
     else:
         msg(
             level="debug",
-            message=f"Service {oneflow_name} found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"Service {oneflow_name} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -600,18 +712,18 @@ def oneflow_show_by_id(oneflow_id: int) -> Dict | None:
     :param oneflow_id: the ID of the service, ``int``
     :return: the details of the service, ``Dict``
     """
-    command = f'oneflow show {oneflow_id} -j'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["oneflow", "show", str(oneflow_id), "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
         msg(
             level="debug",
-            message=f"Service with ID {oneflow_id} not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            message=f"Service with ID {oneflow_id} not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
         )
         return None
     else:
         msg(
             level="debug",
-            message=f"Service with ID {oneflow_id} found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"Service with ID {oneflow_id} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -625,30 +737,20 @@ def oneflow_state_by_id(oneflow_id: int) -> int:
     """
     oneflow = oneflow_show_by_id(oneflow_id=oneflow_id)
     if oneflow is None:
-        msg(
-            level="error",
-            message=f"Service with ID {oneflow_id} not found",
-        )
+        raise NotFound(f"Service with ID {oneflow_id} not found")
     if (
         "DOCUMENT" not in oneflow
         or "TEMPLATE" not in oneflow["DOCUMENT"]
         or "BODY" not in oneflow["DOCUMENT"]["TEMPLATE"]
     ):
-        msg(
-            level="error",
-            message=f"DOCUMENT key not found in service ID {oneflow_id} or TEMPLATE key not found in DOCUMENT or BODY key not found in TEMPLATE",
+        raise InvalidData(
+            f"DOCUMENT key not found in service ID {oneflow_id} or TEMPLATE key not found in DOCUMENT or BODY key not found in TEMPLATE"
         )
     if "state" not in oneflow["DOCUMENT"]["TEMPLATE"]["BODY"]:
-        msg(
-            level="error",
-            message=f"state key not found in service ID {oneflow_id}",
-        )
+        raise InvalidData(f"state key not found in service ID {oneflow_id}")
     state = oneflow["DOCUMENT"]["TEMPLATE"]["BODY"]["state"]
     if state is None:
-        msg(
-            level="error",
-            message=f"Could not get state of service ID {oneflow_id}",
-        )
+        raise InvalidData(f"Could not get state of service ID {oneflow_id}")
     return state
 
 
@@ -661,14 +763,10 @@ def oneflow_name_by_id(oneflow_id: int) -> str:
     """
     oneflow = oneflow_show_by_id(oneflow_id=oneflow_id)
     if oneflow is None:
-        msg(
-            level="error",
-            message=f"Service with ID {oneflow_id} not found",
-        )
+        raise NotFound(f"Service with ID {oneflow_id} not found")
     if "DOCUMENT" not in oneflow or "NAME" not in oneflow["DOCUMENT"]:
-        msg(
-            level="error",
-            message=f"DOCUMENT key not found in service ID {oneflow_id} or NAME key not found in DOCUMENT",
+        raise InvalidData(
+            f"DOCUMENT key not found in service ID {oneflow_id} or NAME key not found in DOCUMENT"
         )
     return oneflow["DOCUMENT"]["NAME"]
 
@@ -682,30 +780,20 @@ def oneflow_roles_by_id(oneflow_id: int) -> List:
     """
     oneflow = oneflow_show_by_id(oneflow_id=oneflow_id)
     if oneflow is None:
-        msg(
-            level="error",
-            message=f"Service with ID {oneflow_id} not found",
-        )
+        raise NotFound(f"Service with ID {oneflow_id} not found")
     if (
         "DOCUMENT" not in oneflow
         or "TEMPLATE" not in oneflow["DOCUMENT"]
         or "BODY" not in oneflow["DOCUMENT"]["TEMPLATE"]
     ):
-        msg(
-            level="error",
-            message=f"DOCUMENT key not found in service ID {oneflow_id} or TEMPLATE key not found in DOCUMENT or BODY key not found in TEMPLATE",
+        raise InvalidData(
+            f"DOCUMENT key not found in service ID {oneflow_id} or TEMPLATE key not found in DOCUMENT or BODY key not found in TEMPLATE"
         )
     if "roles" not in oneflow["DOCUMENT"]["TEMPLATE"]["BODY"]:
-        msg(
-            level="error",
-            message=f"roles key not found in service ID {oneflow_id}",
-        )
+        raise InvalidData(f"roles key not found in service ID {oneflow_id}")
     roles = oneflow["DOCUMENT"]["TEMPLATE"]["BODY"]["roles"]
     if roles is None:
-        msg(
-            level="error",
-            message=f"Could not get roles of service ID {oneflow_id}",
-        )
+        raise InvalidData(f"Could not get roles of service ID {oneflow_id}")
     return roles
 
 
@@ -720,21 +808,14 @@ def oneflow_roles_vm_names_by_id(oneflow_id: int) -> List[str]:
     roles_vm_names = []
     for role in roles:
         if "nodes" not in role:
-            msg(
-                level="error",
-                message="nodes key not found in role",
-            )
+            raise InvalidData("nodes key not found in role")
         for node in role["nodes"]:
             if "vm_info" not in node or "VM" not in node["vm_info"]:
-                msg(
-                    level="error",
-                    message="vm_info key not found in role or VM key not found in vm_info",
+                raise InvalidData(
+                    "vm_info key not found in role or VM key not found in vm_info"
                 )
             if "NAME" not in node["vm_info"]["VM"]:
-                msg(
-                    level="error",
-                    message="NAME key not found in role",
-                )
+                raise InvalidData("NAME key not found in role")
             vm_name = node["vm_info"]["VM"]["NAME"]
             roles_vm_names.append(vm_name)
     return roles_vm_names
@@ -748,16 +829,18 @@ def oneflow_chown_by_id(oneflow_id: int, username: str, group_name: str) -> None
     :param username: the name of the user, ``str``
     :param group_name: the name of the group, ``str``
     """
-    command = f'oneflow chown {oneflow_id} "{username}" "{group_name}"'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["oneflow", "chown", str(oneflow_id), username, group_name]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not change owner of service ID {oneflow_id} to {username}:{group_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not change owner of service ID {oneflow_id} to {username}:{group_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Owner of service ID {oneflow_id} changed to {username}:{group_name}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Owner of service ID {oneflow_id} changed to {username}:{group_name}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
@@ -772,16 +855,10 @@ def oneflow_role_info_by_id(oneflow_id: int, oneflow_role: str) -> Dict:
     roles = oneflow_roles_by_id(oneflow_id=oneflow_id)
     for role in roles:
         if "name" not in role:
-            msg(
-                level="error",
-                message="name key not found in role",
-            )
+            raise InvalidData("name key not found in role")
         if role["name"] == oneflow_role:
             return role
-    msg(
-        level="error",
-        message=f"Role {oneflow_role} not found in service ID {oneflow_id}",
-    )
+    raise NotFound(f"Role {oneflow_role} not found in service ID {oneflow_id}")
 
 
 def oneflow_role_vm_name_by_id(oneflow_id: int, oneflow_role: str) -> str:
@@ -794,21 +871,14 @@ def oneflow_role_vm_name_by_id(oneflow_id: int, oneflow_role: str) -> str:
     """
     role = oneflow_role_info_by_id(oneflow_id=oneflow_id, oneflow_role=oneflow_role)
     if "nodes" not in role:
-        msg(
-            level="error",
-            message=f"nodes key not found in role {oneflow_role}",
-        )
+        raise InvalidData(f"nodes key not found in role {oneflow_role}")
     for node in role["nodes"]:
         if "vm_info" not in node or "VM" not in node["vm_info"]:
-            msg(
-                level="error",
-                message=f"vm_info key not found in role {oneflow_role} or VM key not found in vm_info",
+            raise InvalidData(
+                f"vm_info key not found in role {oneflow_role} or VM key not found in vm_info"
             )
         if "NAME" not in node["vm_info"]["VM"]:
-            msg(
-                level="error",
-                message=f"NAME key not found in role {oneflow_role}",
-            )
+            raise InvalidData(f"NAME key not found in role {oneflow_role}")
         return node["vm_info"]["VM"]["NAME"]
 
 
@@ -822,35 +892,28 @@ def oneflow_custom_attr_value_by_id(oneflow_id: int, attr_key: str) -> str:
     """
     oneflow = oneflow_show_by_id(oneflow_id=oneflow_id)
     if oneflow is None:
-        msg(
-            level="error",
-            message=f"Service with ID {oneflow_id} not found",
-        )
+        raise NotFound(f"Service with ID {oneflow_id} not found")
     if (
         "DOCUMENT" not in oneflow
         or "TEMPLATE" not in oneflow["DOCUMENT"]
         or "BODY" not in oneflow["DOCUMENT"]["TEMPLATE"]
     ):
-        msg(
-            level="error",
-            message=f"DOCUMENT key not found in service ID {oneflow_id} or TEMPLATE key not found in DOCUMENT or BODY key not found in TEMPLATE",
+        raise InvalidData(
+            f"DOCUMENT key not found in service ID {oneflow_id} or TEMPLATE key not found in DOCUMENT or BODY key not found in TEMPLATE"
         )
     if "custom_attrs_values" not in oneflow["DOCUMENT"]["TEMPLATE"]["BODY"]:
-        msg(
-            level="error",
-            message=f"custom_attrs_values key not found in service ID {oneflow_id}",
+        raise InvalidData(
+            f"custom_attrs_values key not found in service ID {oneflow_id}"
         )
     custom_attrs_values = oneflow["DOCUMENT"]["TEMPLATE"]["BODY"]["custom_attrs_values"]
     if attr_key not in custom_attrs_values:
-        msg(
-            level="error",
-            message=f"Custom attribute {attr_key} not found in service ID {oneflow_id}",
+        raise NotFound(
+            f"Custom attribute {attr_key} not found in service ID {oneflow_id}"
         )
     attr_value = custom_attrs_values[attr_key]
     if attr_value is None:
-        msg(
-            level="error",
-            message=f"Could not get value of custom attribute {attr_key} in service ID {oneflow_id}",
+        raise InvalidData(
+            f"Could not get value of custom attribute {attr_key} in service ID {oneflow_id}"
         )
     return attr_value
 
@@ -864,30 +927,20 @@ def oneflow_state(oneflow_name: str) -> int:
     """
     oneflow = oneflow_show(oneflow_name=oneflow_name)
     if oneflow is None:
-        msg(
-            level="error",
-            message=f"Service {oneflow_name} not found",
-        )
+        raise NotFound(f"Service {oneflow_name} not found")
     if (
         "DOCUMENT" not in oneflow
         or "TEMPLATE" not in oneflow["DOCUMENT"]
         or "BODY" not in oneflow["DOCUMENT"]["TEMPLATE"]
     ):
-        msg(
-            level="error",
-            message=f"DOCUMENT key not found in service {oneflow_name} or TEMPLATE key not found in DOCUMENT or BODY key not found in TEMPLATE",
+        raise InvalidData(
+            f"DOCUMENT key not found in service {oneflow_name} or TEMPLATE key not found in DOCUMENT or BODY key not found in TEMPLATE"
         )
     if "state" not in oneflow["DOCUMENT"]["TEMPLATE"]["BODY"]:
-        msg(
-            level="error",
-            message=f"state key not found in service {oneflow_name}",
-        )
+        raise InvalidData(f"state key not found in service {oneflow_name}")
     state = oneflow["DOCUMENT"]["TEMPLATE"]["BODY"]["state"]
     if state is None:
-        msg(
-            level="error",
-            message=f"Could not get state of service {oneflow_name}",
-        )
+        raise InvalidData(f"Could not get state of service {oneflow_name}")
     return state
 
 
@@ -902,10 +955,7 @@ def oneflows_names() -> List[str]:
     if oneflows:
         for oneflow in oneflows:
             if "NAME" not in oneflow:
-                msg(
-                    level="error",
-                    message="NAME key not found in service",
-                )
+                raise InvalidData("NAME key not found in service")
             oneflows_names.append(oneflow["NAME"])
     return oneflows_names
 
@@ -927,18 +977,24 @@ def oneflow_template_chown(
     :param username: the name of the user, ``str``
     :param group_name: the name of the group, ``str``
     """
-    command = (
-        f'oneflow-template chown "{oneflow_template_name}" "{username}" "{group_name}"'
-    )
-    stdout, stderr, rc = run_command(command=command)
+    command = [
+        "oneflow-template",
+        "chown",
+        oneflow_template_name,
+        username,
+        group_name,
+    ]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not change owner of service {oneflow_template_name} to {username}:{group_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not change owner of service {oneflow_template_name} to {username}:{group_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Owner of service {oneflow_template_name} changed to {username}:{group_name}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Owner of service {oneflow_template_name} changed to {username}:{group_name}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
@@ -955,23 +1011,18 @@ def oneflow_template_custom_attrs(
         oneflow_template_name=oneflow_template_name
     )
     if oneflow_template is None:
-        msg(
-            level="error",
-            message=f"Service {oneflow_template_name} not found",
-        )
+        raise NotFound(f"Service {oneflow_template_name} not found")
     if (
         "DOCUMENT" not in oneflow_template
         or "TEMPLATE" not in oneflow_template["DOCUMENT"]
         or "BODY" not in oneflow_template["DOCUMENT"]["TEMPLATE"]
     ):
-        msg(
-            level="error",
-            message=f"DOCUMENT key not found in service {oneflow_template_name} or TEMPLATE key not found in DOCUMENT or BODY key not found in TEMPLATE",
+        raise InvalidData(
+            f"DOCUMENT key not found in service {oneflow_template_name} or TEMPLATE key not found in DOCUMENT or BODY key not found in TEMPLATE"
         )
     if "custom_attrs" not in oneflow_template["DOCUMENT"]["TEMPLATE"]["BODY"]:
-        msg(
-            level="error",
-            message=f"custom_attrs key not found in service {oneflow_template_name}",
+        raise InvalidData(
+            f"custom_attrs key not found in service {oneflow_template_name}"
         )
     custom_attrs = oneflow_template["DOCUMENT"]["TEMPLATE"]["BODY"]["custom_attrs"]
     if custom_attrs is None:
@@ -992,10 +1043,7 @@ def oneflow_template_ids(
     template_ids = []
     for role in roles:
         if "vm_template" not in role:
-            msg(
-                level="error",
-                message="vm_template key not found in role",
-            )
+            raise InvalidData("vm_template key not found in role")
         template_ids.append(int(role["vm_template"]))
     return template_ids
 
@@ -1091,9 +1139,8 @@ def oneflow_template_instantiate(
                     )
                     attrs[attr_key] = attr_value
                 else:
-                    msg(
-                        level="error",
-                        message=f"Error instantiating service {oneflow_template_name}. Input type {input_type} not supported for custom attribute {attr_key}",
+                    raise InvalidData(
+                        f"Error instantiating service {oneflow_template_name}. Input type {input_type} not supported for custom attribute {attr_key}"
                     )
             elif field_type == "M":
                 if input_type == "boolean":
@@ -1122,14 +1169,12 @@ def oneflow_template_instantiate(
                     )
                     attrs[attr_key] = attr_value
                 else:
-                    msg(
-                        level="error",
-                        message=f"Error instantiating service {oneflow_template_name}. Input type {input_type} not supported for custom attribute {attr_key}",
+                    raise InvalidData(
+                        f"Error instantiating service {oneflow_template_name}. Input type {input_type} not supported for custom attribute {attr_key}"
                     )
             else:
-                msg(
-                    level="error",
-                    message=f"Error instantiating service {oneflow_template_name}. Field type {field_type} not supported for custom attribute {attr_key}",
+                raise InvalidData(
+                    f"Error instantiating service {oneflow_template_name}. Field type {field_type} not supported for custom attribute {attr_key}"
                 )
         custom_attrs_values["custom_attrs_values"] = attrs
     networks = oneflow_template_networks(oneflow_template_name=oneflow_template_name)
@@ -1157,14 +1202,12 @@ def oneflow_template_instantiate(
                     nets[network_key] = {"id": str(vnet_id)}
                     networks_values_list.append(nets)
                 else:
-                    msg(
-                        level="error",
-                        message=f"Error instantiating service {oneflow_template_name}. Input type {input_type} not supported for network",
+                    raise InvalidData(
+                        f"Error instantiating service {oneflow_template_name}. Input type {input_type} not supported for network"
                     )
             else:
-                msg(
-                    level="error",
-                    message=f"Error instantiating service {oneflow_template_name}. Field type {field_type} not supported for network",
+                raise InvalidData(
+                    f"Error instantiating service {oneflow_template_name}. Field type {field_type} not supported for network"
                 )
         networks_values["networks_values"] = networks_values_list
     if custom_attrs_values:
@@ -1175,30 +1218,27 @@ def oneflow_template_instantiate(
     timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
     unique_service_name = f"{oneflow_template_name} - {username} - {timestamp}"
     data["name"] = unique_service_name
-    # Always save data to file since we now always have at least the name
-    custom_attrs_path = join_path(
-        TEMP_DIRECTORY, f"{oneflow_template_name}_service_custom_attrs.json"
+    # The custom attributes are sent through stdin since we now always have at least the name
+    command = ["oneflow-template", "instantiate", oneflow_template_name]
+    stdout, stderr, rc = run_command(
+        command=command, input=json.dumps(data), limiter=ONE_LIMITER
     )
-    save_json_file(data=data, file_path=custom_attrs_path)
-    command = f'oneflow-template instantiate "{oneflow_template_name}" < "{custom_attrs_path}"'
-    stdout, stderr, rc = run_command(command=command)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not instantiate service {oneflow_template_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not instantiate service {oneflow_template_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Service {oneflow_template_name} instantiated. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Service {oneflow_template_name} instantiated. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
     sleep(5)
     # Capture the service ID from the instantiate command output
     service_id_match = re.search(r"ID:\s*(\d+)", stdout)
     if not service_id_match:
-        msg(
-            level="error",
-            message=f"Could not get service ID from instantiate output: {stdout}",
-        )
+        raise InvalidData(f"Could not get service ID from instantiate output: {stdout}")
     service_id = int(service_id_match.group(1))
     service_name = oneflow_name_by_id(oneflow_id=service_id)
     
@@ -1262,24 +1302,17 @@ def oneflow_template_networks(
         oneflow_template_name=oneflow_template_name
     )
     if oneflow_template is None:
-        msg(
-            level="error",
-            message=f"Service {oneflow_template_name} not found",
-        )
+        raise NotFound(f"Service {oneflow_template_name} not found")
     if (
         "DOCUMENT" not in oneflow_template
         or "TEMPLATE" not in oneflow_template["DOCUMENT"]
         or "BODY" not in oneflow_template["DOCUMENT"]["TEMPLATE"]
     ):
-        msg(
-            level="error",
-            message=f"DOCUMENT key not found in service {oneflow_template_name} or TEMPLATE key not found in DOCUMENT or BODY key not found in TEMPLATE",
+        raise InvalidData(
+            f"DOCUMENT key not found in service {oneflow_template_name} or TEMPLATE key not found in DOCUMENT or BODY key not found in TEMPLATE"
         )
     if "networks" not in oneflow_template["DOCUMENT"]["TEMPLATE"]["BODY"]:
-        msg(
-            level="error",
-            message=f"networks key not found in service {oneflow_template_name}",
-        )
+        raise InvalidData(f"networks key not found in service {oneflow_template_name}")
     networks = oneflow_template["DOCUMENT"]["TEMPLATE"]["BODY"]["networks"]
     if networks is None:
         return None
@@ -1299,30 +1332,20 @@ def oneflow_template_roles(
         oneflow_template_name=oneflow_template_name
     )
     if oneflow_template is None:
-        msg(
-            level="error",
-            message=f"Service {oneflow_template_name} not found",
-        )
+        raise NotFound(f"Service {oneflow_template_name} not found")
     if (
         "DOCUMENT" not in oneflow_template
         or "TEMPLATE" not in oneflow_template["DOCUMENT"]
         or "BODY" not in oneflow_template["DOCUMENT"]["TEMPLATE"]
     ):
-        msg(
-            level="error",
-            message=f"DOCUMENT key not found in service {oneflow_template_name} or TEMPLATE key not found in DOCUMENT or BODY key not found in TEMPLATE",
+        raise InvalidData(
+            f"DOCUMENT key not found in service {oneflow_template_name} or TEMPLATE key not found in DOCUMENT or BODY key not found in TEMPLATE"
         )
     if "roles" not in oneflow_template["DOCUMENT"]["TEMPLATE"]["BODY"]:
-        msg(
-            level="error",
-            message=f"roles key not found in service {oneflow_template_name}",
-        )
+        raise InvalidData(f"roles key not found in service {oneflow_template_name}")
     roles = oneflow_template["DOCUMENT"]["TEMPLATE"]["BODY"]["roles"]
     if roles is None:
-        msg(
-            level="error",
-            message=f"Could not get roles of service {oneflow_template_name}",
-        )
+        raise InvalidData(f"Could not get roles of service {oneflow_template_name}")
     return roles
 
 
@@ -1335,18 +1358,18 @@ def oneflow_template_show(
     :param oneflow_template_name: the name of the service, ``str``
     :return: the details of the service, ``Dict``
     """
-    command = f'oneflow-template show "{oneflow_template_name}" -j'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["oneflow-template", "show", oneflow_template_name, "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
         msg(
             level="debug",
-            message=f"Service {oneflow_template_name} not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            message=f"Service {oneflow_template_name} not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
         )
         return None
     else:
         msg(
             level="debug",
-            message=f"Service {oneflow_template_name} found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"Service {oneflow_template_name} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -1380,14 +1403,10 @@ def check_group_admin(username: str, group_name: str) -> bool:
     """
     group = onegroup_show(group_name=group_name)
     if group is None:
-        msg(
-            level="error",
-            message=f"Group {group_name} not found",
-        )
+        raise NotFound(f"Group {group_name} not found")
     if "GROUP" not in group or "ADMINS" not in group["GROUP"]:
-        msg(
-            level="error",
-            message=f"GROUP key not found in group {group_name} or ADMINS key not found in GROUP",
+        raise InvalidData(
+            f"GROUP key not found in group {group_name} or ADMINS key not found in GROUP"
         )
     if "ID" not in group["GROUP"]["ADMINS"]:
         return False
@@ -1400,10 +1419,7 @@ def check_group_admin(username: str, group_name: str) -> bool:
             if user == username:
                 return True
     else:
-        msg(
-            level="error",
-            message=f"ADMINS key not found in group {group_name}",
-        )
+        raise InvalidData(f"ADMINS key not found in group {group_name}")
     return False
 
 
@@ -1420,16 +1436,18 @@ def onegroup_addadmin(username: str, group_name: str) -> None:
             message=f"User {username} is already admin of group {group_name}",
         )
     else:
-        command = f'onegroup addadmin "{group_name}" "{username}"'
-        stdout, stderr, rc = run_command(command=command)
+        command = ["onegroup", "addadmin", group_name, username]
+        stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
         if rc != 0:
-            msg(
-                level="error",
-                message=f"Could not assign user {username} as admin to group {group_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            raise CommandFailed(
+                f"Could not assign user {username} as admin to group {group_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+                command=command,
+                stderr=stderr,
+                rc=rc,
             )
         msg(
             level="debug",
-            message=f"User {username} assigned as admin to group {group_name}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"User {username} assigned as admin to group {group_name}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
 
 
@@ -1440,16 +1458,18 @@ def onegroup_create(group_name: str) -> int:
     :param group_name: the name of the group, ``str``
     :return: the id of the group, ``int``
     """
-    command = f'onegroup create "{group_name}"'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onegroup", "create", group_name]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not create group {group_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not create group {group_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Group {group_name} created. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Group {group_name} created. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
     return re.search(r"ID:\s*(\d+)", stdout).group(1)
 
@@ -1463,21 +1483,14 @@ def onegroup_id(group_name: str) -> int:
     """
     group = onegroup_show(group_name=group_name)
     if group is None:
-        msg(
-            level="error",
-            message=f"Group {group_name} not found",
-        )
+        raise NotFound(f"Group {group_name} not found")
     if "GROUP" not in group or "ID" not in group["GROUP"]:
-        msg(
-            level="error",
-            message=f"GROUP key not found in group {group_name} or ID key not found in GROUP",
+        raise InvalidData(
+            f"GROUP key not found in group {group_name} or ID key not found in GROUP"
         )
     group_id = group["GROUP"]["ID"]
     if group_id is None:
-        msg(
-            level="error",
-            message=f"Could not get id of group {group_name}",
-        )
+        raise InvalidData(f"Could not get id of group {group_name}")
     return int(group_id)
 
 
@@ -1487,18 +1500,18 @@ def onegroup_list() -> Dict | None:
 
     :return: the list of groups, ``Dict``
     """
-    command = "onegroup list -j"
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onegroup", "list", "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
         msg(
             level="debug",
-            message=f"OpenNebula groups not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            message=f"OpenNebula groups not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
         )
         return None
     else:
         msg(
             level="debug",
-            message=f"OpenNebula groups found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"OpenNebula groups found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -1510,18 +1523,18 @@ def onegroup_show(group_name: str) -> Dict | None:
     :param group_name: the name of the group, ``str``
     :return: the details of the group, ``Dict``
     """
-    command = f'onegroup show "{group_name}" -j'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onegroup", "show", group_name, "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
         msg(
             level="debug",
-            message=f"Group {group_name} not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            message=f"Group {group_name} not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
         )
         return None
     else:
         msg(
             level="debug",
-            message=f"Group {group_name} found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"Group {group_name} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -1537,18 +1550,14 @@ def onegroups_names() -> List[str]:
     if groups is None:
         return []
     if "GROUP_POOL" not in groups or "GROUP" not in groups["GROUP_POOL"]:
-        msg(
-            level="error",
-            message="GROUP_POOL key not found in groups or GROUP key not found in GROUP_POOL",
+        raise InvalidData(
+            "GROUP_POOL key not found in groups or GROUP key not found in GROUP_POOL"
         )
     for group in groups["GROUP_POOL"]["GROUP"]:
         if group is None:
-            msg(level="error", message="Group is empty")
+            raise InvalidData("Group is empty")
         if "NAME" not in group:
-            msg(
-                level="error",
-                message=f"NAME key not found in group {group}",
-            )
+            raise InvalidData(f"NAME key not found in group {group}")
         groups_names.append(group["NAME"])
     return groups_names
 
@@ -1567,30 +1576,22 @@ def onehost_available_cpu(host_name: str) -> float:
     """
     host = onehost_show(host_name=host_name)
     if host is None:
-        msg(
-            level="error",
-            message=f"Host {host_name} not found",
-        )
+        raise NotFound(f"Host {host_name} not found")
     if "HOST" not in host or "HOST_SHARE" not in host["HOST"]:
-        msg(
-            level="error",
-            message=f"HOST key not found in host {host_name} or HOST_SHARE key not found in HOST",
+        raise InvalidData(
+            f"HOST key not found in host {host_name} or HOST_SHARE key not found in HOST"
         )
     if (
         "CPU_USAGE" not in host["HOST"]["HOST_SHARE"]
         or "TOTAL_CPU" not in host["HOST"]["HOST_SHARE"]
     ):
-        msg(
-            level="error",
-            message=f"CPU_USAGE key not found in host {host_name} or TOTAL_CPU key not found in HOST",
+        raise InvalidData(
+            f"CPU_USAGE key not found in host {host_name} or TOTAL_CPU key not found in HOST"
         )
     cpu_usage = int(host["HOST"]["HOST_SHARE"]["CPU_USAGE"])
     total_cpu = int(host["HOST"]["HOST_SHARE"]["TOTAL_CPU"])
     if cpu_usage is None or total_cpu is None:
-        msg(
-            level="error",
-            message=f"Could not get CPU usage of host {host_name}",
-        )
+        raise InvalidData(f"Could not get CPU usage of host {host_name}")
     return round((total_cpu - cpu_usage) / total_cpu * 100, 2)
 
 
@@ -1603,30 +1604,22 @@ def onehost_available_mem(host_name: str) -> float:
     """
     host = onehost_show(host_name=host_name)
     if host is None:
-        msg(
-            level="error",
-            message=f"Host {host_name} not found",
-        )
+        raise NotFound(f"Host {host_name} not found")
     if "HOST" not in host or "HOST_SHARE" not in host["HOST"]:
-        msg(
-            level="error",
-            message=f"HOST key not found in host {host_name} or HOST_SHARE key not found in HOST",
+        raise InvalidData(
+            f"HOST key not found in host {host_name} or HOST_SHARE key not found in HOST"
         )
     if (
         "MEM_USAGE" not in host["HOST"]["HOST_SHARE"]
         or "TOTAL_MEM" not in host["HOST"]["HOST_SHARE"]
     ):
-        msg(
-            level="error",
-            message=f"MEM_USAGE key not found in host {host_name} or TOTAL_MEM key not found in HOST",
+        raise InvalidData(
+            f"MEM_USAGE key not found in host {host_name} or TOTAL_MEM key not found in HOST"
         )
     mem_usage = int(host["HOST"]["HOST_SHARE"]["MEM_USAGE"])
     total_mem = int(host["HOST"]["HOST_SHARE"]["TOTAL_MEM"])
     if mem_usage is None or total_mem is None:
-        msg(
-            level="error",
-            message=f"Could not get memory usage of host {host_name}",
-        )
+        raise InvalidData(f"Could not get memory usage of host {host_name}")
     return round((total_mem - mem_usage) / total_mem * 100, 2)
 
 
@@ -1639,26 +1632,16 @@ def onehost_cpu_model(host_name: str) -> str:
     """
     host = onehost_show(host_name=host_name)
     if host is None:
-        msg(
-            level="error",
-            message=f"Host {host_name} not found",
-        )
+        raise NotFound(f"Host {host_name} not found")
     if "HOST" not in host or "TEMPLATE" not in host["HOST"]:
-        msg(
-            level="error",
-            message=f"HOST key not found in host {host_name} or TEMPLATE key not found in HOST",
+        raise InvalidData(
+            f"HOST key not found in host {host_name} or TEMPLATE key not found in HOST"
         )
     if "KVM_CPU_MODEL" not in host["HOST"]["TEMPLATE"]:
-        msg(
-            level="error",
-            message=f"KVM_CPU_MODEL key not found in host {host_name}",
-        )
+        raise InvalidData(f"KVM_CPU_MODEL key not found in host {host_name}")
     cpu_model = host["HOST"]["TEMPLATE"]["KVM_CPU_MODEL"]
     if cpu_model is None:
-        msg(
-            level="error",
-            message=f"Could not get CPU model of host {host_name}",
-        )
+        raise InvalidData(f"Could not get CPU model of host {host_name}")
     return cpu_model
 
 
@@ -1668,18 +1651,19 @@ def onehost_list() -> Dict | None:
 
     :return: the list of hosts, ``Dict``
     """
-    command = "onehost list -j"
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onehost", "list", "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"OpenNebula hosts not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"OpenNebula hosts not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
-        return None
     else:
         msg(
             level="debug",
-            message=f"OpenNebula hosts found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"OpenNebula hosts found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -1691,18 +1675,18 @@ def onehost_show(host_name: str) -> Dict | None:
     :param host_name: the name of the host, ``str``
     :return: the details of the host, ``Dict``
     """
-    command = f'onehost show "{host_name}" -j'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onehost", "show", host_name, "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
         msg(
             level="debug",
-            message=f"Host {host_name} not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            message=f"Host {host_name} not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
         )
         return None
     else:
         msg(
             level="debug",
-            message=f"Host {host_name} found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"Host {host_name} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -1720,22 +1704,20 @@ def onehosts_avx_cpu_mem(
     hosts = onehost_list()
     hosts_with_avx = []
     if "HOST_POOL" not in hosts or "HOST" not in hosts["HOST_POOL"]:
-        msg(
-            level="error",
-            message="HOST_POOL key not found in hosts or HOST key not found in HOST_POOL",
+        raise InvalidData(
+            "HOST_POOL key not found in hosts or HOST key not found in HOST_POOL"
         )
     hosts_pool = hosts["HOST_POOL"]["HOST"]
     if not hosts_pool:
-        msg(level="error", message="Hosts list is empty")
+        raise InvalidData("Hosts list is empty")
     elif isinstance(hosts_pool, Dict):
         if (
             "NAME" not in hosts_pool
             or "TEMPLATE" not in hosts_pool
             or "KVM_CPU_FEATURES" not in hosts_pool["TEMPLATE"]
         ):
-            msg(
-                level="error",
-                message="TEMPLATE key not found in host or NAME key not found in host or KVM_CPU_FEATURES key not found in TEMPLATE",
+            raise InvalidData(
+                "TEMPLATE key not found in host or NAME key not found in host or KVM_CPU_FEATURES key not found in TEMPLATE"
             )
         host_name = hosts_pool["NAME"]
         kvm_cpu_features = hosts_pool["TEMPLATE"]["KVM_CPU_FEATURES"]
@@ -1754,9 +1736,8 @@ def onehosts_avx_cpu_mem(
                 or "TEMPLATE" not in host
                 or "KVM_CPU_FEATURES" not in host["TEMPLATE"]
             ):
-                msg(
-                    level="error",
-                    message="TEMPLATE key not found in host or NAME key not found in host or KVM_CPU_FEATURES key not found in TEMPLATE",
+                raise InvalidData(
+                    "TEMPLATE key not found in host or NAME key not found in host or KVM_CPU_FEATURES key not found in TEMPLATE"
                 )
             host_name = host["NAME"]
             kvm_cpu_features = host["TEMPLATE"]["KVM_CPU_FEATURES"]
@@ -1769,7 +1750,7 @@ def onehosts_avx_cpu_mem(
             ):
                 hosts_with_avx.append(host_name)
     else:
-        msg(level="error", message="Hosts not found")
+        raise NotFound("Hosts not found")
     return hosts_with_avx
 
 
@@ -1786,16 +1767,18 @@ def oneimage_chown(image_name: str, username: str, group_name: str) -> None:
     :param username: the name of the user, ``str``
     :param group_name: the name of the group, ``str``
     """
-    command = f'oneimage chown "{image_name}" "{username}" "{group_name}"'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["oneimage", "chown", image_name, username, group_name]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not change owner of image {image_name} to {username}:{group_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not change owner of image {image_name} to {username}:{group_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Owner of image {image_name} changed to {username}:{group_name}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Owner of image {image_name} changed to {username}:{group_name}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
@@ -1808,21 +1791,14 @@ def oneimage_name(image_id: int) -> str:
     """
     image = oneimage_show(image_id=image_id)
     if image is None:
-        msg(
-            level="error",
-            message=f"Image with id {image_id} not found",
-        )
+        raise NotFound(f"Image with id {image_id} not found")
     if "IMAGE" not in image or "NAME" not in image["IMAGE"]:
-        msg(
-            level="error",
-            message=f"IMAGE key not found in image id {image_id} or NAME key not found in IMAGE",
+        raise InvalidData(
+            f"IMAGE key not found in image id {image_id} or NAME key not found in IMAGE"
         )
     image_name = image["IMAGE"]["NAME"]
     if image_name is None:
-        msg(
-            level="error",
-            message=f"Could not get name of image with id {image_id}",
-        )
+        raise InvalidData(f"Could not get name of image with id {image_id}")
     return image_name
 
 
@@ -1847,16 +1823,18 @@ def oneimage_delete(image_name: str) -> None:
 
     :param image_name: the name of the image, ``str``
     """
-    command = f'oneimage delete "{image_name}"'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["oneimage", "delete", image_name]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not remove image {image_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not remove image {image_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Image {image_name} removed. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Image {image_name} removed. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
@@ -1866,18 +1844,18 @@ def oneimage_list() -> Dict | None:
 
     :return: the list of images, ``Dict``
     """
-    command = "oneimage list -j"
-    stdout, stderr, rc = run_command(command=command)
+    command = ["oneimage", "list", "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
         msg(
             level="debug",
-            message=f"OpenNebula images not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            message=f"OpenNebula images not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
         )
         return None
     else:
         msg(
             level="debug",
-            message=f"OpenNebula images found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"OpenNebula images found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         stdout = loads_json(data=stdout)
         if "IMAGE_POOL" in stdout and "IMAGE" not in stdout["IMAGE_POOL"]:
@@ -1892,16 +1870,18 @@ def oneimage_rename(old_name: str, new_name: str) -> None:
     :param old_name: the old name of the image, ``str``
     :param new_name: the new name of the image, ``str``
     """
-    command = f'oneimage rename "{old_name}" "{new_name}"'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["oneimage", "rename", old_name, new_name]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not rename image {old_name} to {new_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not rename image {old_name} to {new_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Image {old_name} renamed to {new_name}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Image {old_name} renamed to {new_name}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
@@ -1917,43 +1897,37 @@ def oneimage_show(
     :return: the details of the image, ``Dict``
     """
     if image_id is None and image_name is None:
-        msg(
-            level="error",
-            message="Either image_name or image_id must be provided",
-        )
+        raise ToolkitError("Either image_name or image_id must be provided")
     if image_id is not None and image_name is not None:
-        msg(
-            level="error",
-            message="Either image_name or image_id must be provided, not both",
-        )
+        raise ToolkitError("Either image_name or image_id must be provided, not both")
     if image_name is None:
-        command = f"oneimage show {image_id} -j"
-        stdout, stderr, rc = run_command(command=command)
+        command = ["oneimage", "show", str(image_id), "-j"]
+        stdout, stderr, rc = _one_read(command=command)
         if rc != 0:
             msg(
                 level="debug",
-                message=f"Image with id {image_id} not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+                message=f"Image with id {image_id} not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
             )
             return None
         else:
             msg(
                 level="debug",
-                message=f"Image with id {image_id} found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+                message=f"Image with id {image_id} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
             )
             return loads_json(data=stdout)
     else:
-        command = f'oneimage show "{image_name}" -j'
-        stdout, stderr, rc = run_command(command=command)
+        command = ["oneimage", "show", image_name, "-j"]
+        stdout, stderr, rc = _one_read(command=command)
         if rc != 0:
             msg(
                 level="debug",
-                message=f"Image {image_name} not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+                message=f"Image {image_name} not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
             )
             return None
         else:
             msg(
                 level="debug",
-                message=f"Image {image_name} found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+                message=f"Image {image_name} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
             )
             return loads_json(data=stdout)
 
@@ -1967,21 +1941,12 @@ def oneimage_state(image_name: str) -> str:
     """
     image = oneimage_show(image_name=image_name)
     if image is None:
-        msg(
-            level="error",
-            message=f"Image {image_name} not found",
-        )
+        raise NotFound(f"Image {image_name} not found")
     if "IMAGE" not in image or "STATE" not in image["IMAGE"]:
-        msg(
-            level="error",
-            message=f"Could not get state of image with name {image_name}",
-        )
+        raise InvalidData(f"Could not get state of image with name {image_name}")
     image_state = image["IMAGE"]["STATE"]
     if image_state is None:
-        msg(
-            level="error",
-            message=f"Could not get state of image with name {image_name}",
-        )
+        raise InvalidData(f"Could not get state of image with name {image_name}")
     return image_state
 
 
@@ -1995,16 +1960,18 @@ def oneimage_update(
     :param image_name: the name of the image, ``str``
     :param file_path: the path to the file with params, ``str``
     """
-    command = f'oneimage update "{image_name}" --append {file_path}'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["oneimage", "update", image_name, "--append", file_path]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not update image {image_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not update image {image_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Image {image_name} updated. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Image {image_name} updated. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
@@ -2017,30 +1984,18 @@ def oneimage_version(image_name: str) -> str:
     """
     image = oneimage_show(image_name=image_name)
     if image is None:
-        msg(
-            level="error",
-            message=f"Image {image_name} not found",
-        )
+        raise NotFound(f"Image {image_name} not found")
     if "IMAGE" not in image or "TEMPLATE" not in image["IMAGE"]:
-        msg(
-            level="error",
-            message=f"Could not get version of image with name {image_name}",
-        )
+        raise InvalidData(f"Could not get version of image with name {image_name}")
     if (
         "ONE_6GSB_MARKETPLACE_APPLIANCE_VERSION" not in image["IMAGE"]["TEMPLATE"]
         or "ONE_6GSB_MARKETPLACE_APPLIANCE_SOFTWARE_VERSION"
         not in image["IMAGE"]["TEMPLATE"]
     ):
-        msg(
-            level="error",
-            message=f"Could not get version of image with name {image_name}",
-        )
+        raise InvalidData(f"Could not get version of image with name {image_name}")
     image_version = f"{image['IMAGE']['TEMPLATE']['ONE_6GSB_MARKETPLACE_APPLIANCE_VERSION']}-{image['IMAGE']['TEMPLATE']['ONE_6GSB_MARKETPLACE_APPLIANCE_SOFTWARE_VERSION']}"
     if image_version is None:
-        msg(
-            level="error",
-            message=f"Could not get version of image with name {image_name}",
-        )
+        raise InvalidData(f"Could not get version of image with name {image_name}")
     return image_version
 
 
@@ -2057,17 +2012,18 @@ def oneimages_attribute(attribute: str, value: str) -> List[str]:
     if not images:
         return images_names
     if "IMAGE_POOL" not in images or "IMAGE" not in images["IMAGE_POOL"]:
-        msg(
-            level="error",
-            message="IMAGE_POOL key not found in images or IMAGE key not found in IMAGE_POOL",
+        raise InvalidData(
+            "IMAGE_POOL key not found in images or IMAGE key not found in IMAGE_POOL"
         )
-    for image in images["IMAGE_POOL"]["IMAGE"]:
+    image_pool = images["IMAGE_POOL"]["IMAGE"]
+    if isinstance(image_pool, Dict):
+        image_pool = [image_pool]
+    for image in image_pool:
         if image is None:
-            msg(level="error", message="Image is empty")
+            raise InvalidData("Image is empty")
         if "NAME" not in image or "TEMPLATE" not in image:
-            msg(
-                level="error",
-                message=f"NAME key not found in image {image} or TEMPLATE key not found in image",
+            raise InvalidData(
+                f"NAME key not found in image {image} or TEMPLATE key not found in image"
             )
         if attribute in image["TEMPLATE"]:
             if image["TEMPLATE"][attribute] == value:
@@ -2087,18 +2043,17 @@ def oneimages_names() -> List[str]:
     if images is None:
         return []
     if "IMAGE_POOL" not in images or "IMAGE" not in images["IMAGE_POOL"]:
-        msg(
-            level="error",
-            message="IMAGE_POOL key not found in images or IMAGE key not found in IMAGE_POOL",
+        raise InvalidData(
+            "IMAGE_POOL key not found in images or IMAGE key not found in IMAGE_POOL"
         )
-    for image in images["IMAGE_POOL"]["IMAGE"]:
+    image_pool = images["IMAGE_POOL"]["IMAGE"]
+    if isinstance(image_pool, Dict):
+        image_pool = [image_pool]
+    for image in image_pool:
         if image is None:
-            msg(level="error", message="Image is empty")
+            raise InvalidData("Image is empty")
         if "NAME" not in image:
-            msg(
-                level="error",
-                message=f"NAME key not found in image {image}",
-            )
+            raise InvalidData(f"NAME key not found in image {image}")
         images_names.append(image["NAME"])
     return images_names
 
@@ -2114,19 +2069,9 @@ def get_marketplace_monitoring_interval() -> int:
 
     :return: the interval in seconds, ``int``
     """
-    oned_conf_path = get_oned_conf_path()
-    oned_conf = load_file(file_path=oned_conf_path)
-    match = re.search(
-        r"^\s*MONITORING_INTERVAL_MARKET\s*=\s*\"?(\d+)\"?",
-        oned_conf,
-        re.MULTILINE,
-    )
-    if match is None:
-        msg(
-            level="error",
-            message="Could not get marketplace monitoring interval",
-        )
-    data = int(match.group(1))
+    data = load_oned_conf(path=get_oned_conf_path()).monitoring_interval_market
+    if data is None:
+        raise InvalidData("Could not get marketplace monitoring interval")
     msg(
         level="debug",
         message=f"Marketplace monitoring interval is {data}",
@@ -2142,16 +2087,8 @@ def update_marketplace_monitoring_interval(
 
     :param interval: the interval in seconds, ``int``
     """
-    oned_conf_path = get_oned_conf_path()
-    oned_conf = load_file(file_path=oned_conf_path)
-    pattern = r"^\s*MONITORING_INTERVAL_MARKET\s*=\s*\"?(\d+)\"?"
-    updated_conf = re.sub(
-        pattern,
-        f"MONITORING_INTERVAL_MARKET = {interval}",
-        oned_conf,
-        flags=re.MULTILINE,
-    )
-    save_file(data=updated_conf, file_path=oned_conf_path)
+    oned_conf = load_oned_conf(path=get_oned_conf_path())
+    oned_conf.update(key="MONITORING_INTERVAL_MARKET", value=str(interval))
     msg(
         level="debug",
         message=f"OpenNebula marketplace monitoring interval updated to {interval}",
@@ -2162,15 +2099,13 @@ def onemarket_create(
     marketplace_name: str,
     marketplace_description: str,
     marketplace_endpoint: str,
-    marketplace_monitoring_interval: int,
-) -> int | None:
+) -> int:
     """
     Add a marketplace in OpenNebula
 
     :param marketplace_name: the name of the marketplace, ``str``
     :param marketplace_description: the description of the marketplace, ``str``
     :param marketplace_endpoint: the endpoint of the marketplace, ``str``
-    :param marketplace_monitoring_interval: the interval to refresh the marketplace, ``int``
     :return: the id of the marketplace, ``int``
     """
     marketplace_content = dedent(f"""
@@ -2186,30 +2121,93 @@ def onemarket_create(
         data=marketplace_content,
         file_path=marketplace_content_path,
     )
-    command = f"onemarket create {marketplace_content_path}"
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onemarket", "create", marketplace_content_path]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not create marketplace {marketplace_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
-        )
-    else:
-        msg(
-            level="debug",
-            message=f"Marketplace {marketplace_name} created. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not create marketplace {marketplace_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
-        marketplace_old_monitoring_interval = get_marketplace_monitoring_interval()
-        update_marketplace_monitoring_interval(interval=marketplace_monitoring_interval)
-        restart_one()
-        sleep(marketplace_monitoring_interval + 5)
-        check_one_health()
-        update_marketplace_monitoring_interval(
-            interval=marketplace_old_monitoring_interval
-        )
-        restart_one()
+    msg(
+        level="debug",
+        message=f"Marketplace {marketplace_name} created. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
+    )
+    return int(re.search(r"ID:\s*(\d+)", stdout).group(1))
+
+
+def onemarkets_bootstrap(
+    marketplaces: List[Dict[str, str]],
+    marketplace_monitoring_interval: int,
+    timeout: int = 600,
+) -> List[str]:
+    """
+    Create the missing marketplaces in OpenNebula and wait until they list their appliances
+
+    The monitoring interval is lowered once for all the new marketplaces and the appliances pool
+    is polled until every new marketplace reports at least one appliance
+
+    :param marketplaces: the marketplaces with the keys name, description and endpoint, ``List[Dict[str, str]]``
+    :param marketplace_monitoring_interval: the interval to refresh the marketplaces, ``int``
+    :param timeout: the maximum time in seconds to wait for the marketplaces to be populated, ``int``
+    :return: the names of the marketplaces created, ``List[str]``
+    """
+    created_marketplaces = {}
+    for marketplace in marketplaces:
+        if onemarket_show(marketplace_name=marketplace["name"]):
+            msg(
+                level="debug",
+                message=f"Marketplace {marketplace['name']} already exists",
+            )
+            continue
+        marketplace_id = onemarket_create(
+            marketplace_name=marketplace["name"],
+            marketplace_description=marketplace["description"],
+            marketplace_endpoint=marketplace["endpoint"],
+        )
+        created_marketplaces[str(marketplace_id)] = marketplace["name"]
+    if not created_marketplaces:
+        return []
+    marketplace_old_monitoring_interval = get_marketplace_monitoring_interval()
+    update_marketplace_monitoring_interval(interval=marketplace_monitoring_interval)
+    restart_one()
+    failed = True
+    try:
         check_one_health()
-        return int(re.search(r"ID:\s*(\d+)", stdout).group(1))
-    return None
+        msg(
+            level="info",
+            message=f"Waiting for marketplaces {', '.join(created_marketplaces.values())} to be populated",
+        )
+        pending_marketplaces = set(created_marketplaces)
+        deadline = monotonic() + timeout
+        while True:
+            pending_marketplaces -= onemarketapps_marketplace_ids()
+            if not pending_marketplaces:
+                break
+            if monotonic() >= deadline:
+                raise StateTimeout(
+                    f"Marketplaces {', '.join(created_marketplaces[marketplace_id] for marketplace_id in sorted(pending_marketplaces))} have no appliances after {timeout} seconds"
+                )
+            # The last poll is not delayed past the deadline
+            sleep(min(marketplace_monitoring_interval, max(0.0, deadline - monotonic())))
+        failed = False
+    finally:
+        try:
+            update_marketplace_monitoring_interval(
+                interval=marketplace_old_monitoring_interval
+            )
+            restart_one()
+            check_one_health()
+        except Exception as e:
+            if not failed:
+                raise
+            # The error that stopped the wait is the one raised
+            msg(
+                level="error",
+                message=f"Failed to restore the marketplace monitoring interval to {marketplace_old_monitoring_interval}: {e}",
+            )
+    return list(created_marketplaces.values())
 
 
 def onemarket_endpoint(marketplace_name: str) -> str:
@@ -2221,25 +2219,18 @@ def onemarket_endpoint(marketplace_name: str) -> str:
     """
     marketplace = onemarket_show(marketplace_name=marketplace_name)
     if marketplace is None:
-        msg(
-            level="error",
-            message=f"Marketplace {marketplace_name} not found",
-        )
+        raise NotFound(f"Marketplace {marketplace_name} not found")
     if (
         "MARKETPLACE" not in marketplace
         or "TEMPLATE" not in marketplace["MARKETPLACE"]
         or "ENDPOINT" not in marketplace["MARKETPLACE"]["TEMPLATE"]
     ):
-        msg(
-            level="error",
-            message=f"MARKETPLACE key not found in marketplace {marketplace_name} or TEMPLATE key not found in MARKETPLACE or ENDPOINT key not found in TEMPLATE",
+        raise InvalidData(
+            f"MARKETPLACE key not found in marketplace {marketplace_name} or TEMPLATE key not found in MARKETPLACE or ENDPOINT key not found in TEMPLATE"
         )
     marketplace_endpoint = marketplace["MARKETPLACE"]["TEMPLATE"]["ENDPOINT"]
     if marketplace_endpoint is None:
-        msg(
-            level="error",
-            message=f"Could not get URL of marketplace {marketplace_name}",
-        )
+        raise InvalidData(f"Could not get URL of marketplace {marketplace_name}")
     return marketplace_endpoint
 
 
@@ -2249,18 +2240,18 @@ def onemarket_list() -> Dict | None:
 
     :return: the list of marketplaces, ``Dict``
     """
-    command = "onemarket list -j"
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onemarket", "list", "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
         msg(
             level="debug",
-            message=f"OpenNebula marketplaces not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            message=f"OpenNebula marketplaces not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
         )
         return None
     else:
         msg(
             level="debug",
-            message=f"OpenNebula marketplaces found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"OpenNebula marketplaces found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -2272,18 +2263,18 @@ def onemarket_show(marketplace_name: str) -> Dict | None:
     :param marketplace_name: the name of the market, ``str``
     :return: the details of the marketplace, ``Dict``
     """
-    command = f'onemarket show "{marketplace_name}" -j'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onemarket", "show", marketplace_name, "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
         msg(
             level="debug",
-            message=f"Marketplace {marketplace_name} not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            message=f"Marketplace {marketplace_name} not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
         )
         return None
     else:
         msg(
             level="debug",
-            message=f"Marketplace {marketplace_name} found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"Marketplace {marketplace_name} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -2302,18 +2293,14 @@ def onemarkets_names() -> List[str]:
         "MARKETPLACE_POOL" not in marketplaces
         or "MARKETPLACE" not in marketplaces["MARKETPLACE_POOL"]
     ):
-        msg(
-            level="error",
-            message="MARKETPLACE_POOL key not found in marketplaces or MARKETPLACE key not found in MARKETPLACE_POOL",
+        raise InvalidData(
+            "MARKETPLACE_POOL key not found in marketplaces or MARKETPLACE key not found in MARKETPLACE_POOL"
         )
     for marketplace in marketplaces["MARKETPLACE_POOL"]["MARKETPLACE"]:
         if marketplace is None:
-            msg(level="error", message="Marketplace is empty")
+            raise InvalidData("Marketplace is empty")
         if "NAME" not in marketplace:
-            msg(
-                level="error",
-                message=f"NAME key not found in marketplace {marketplace}",
-            )
+            raise InvalidData(f"NAME key not found in marketplace {marketplace}")
         marketplaces_names.append(marketplace["NAME"])
     return marketplaces_names
 
@@ -2397,10 +2384,7 @@ def onemarketapp_add(
                     sleep(10)
                     image_state = oneimage_state(image_name=image_name)
                     if image_state == "5":
-                        msg(
-                            level="error",
-                            message=f"Image {image_name} is in error state",
-                        )
+                        raise InvalidState(f"Image {image_name} is in error state")
                 oneimage_update(
                     image_name=image_name, file_path=version_attribute_template_path
                 )
@@ -2452,10 +2436,7 @@ def onemarketapp_add(
                         sleep(10)
                         image_state = oneimage_state(image_name=image_name)
                         if image_state == "5":
-                            msg(
-                                level="error",
-                                message=f"Image {image_name} is in error state",
-                            )
+                            raise InvalidState(f"Image {image_name} is in error state")
                     oneimage_update(
                         image_name=image_name, file_path=version_attribute_template_path
                     )
@@ -2535,10 +2516,7 @@ def onemarketapp_add(
                         sleep(10)
                         image_state = oneimage_state(image_name=image_name)
                         if image_state == "5":
-                            msg(
-                                level="error",
-                                message=f"Image {image_name} is in error state",
-                            )
+                            raise InvalidState(f"Image {image_name} is in error state")
                     oneimage_update(
                         image_name=image_name,
                         file_path=version_attribute_template_path,
@@ -2593,9 +2571,8 @@ def onemarketapp_add(
                             sleep(10)
                             image_state = oneimage_state(image_name=image_name)
                             if image_state == "5":
-                                msg(
-                                    level="error",
-                                    message=f"Image {image_name} is in error state",
+                                raise InvalidState(
+                                    f"Image {image_name} is in error state"
                                 )
                         oneimage_update(
                             image_name=image_name,
@@ -2678,10 +2655,7 @@ def onemarketapp_add(
                         sleep(10)
                         image_state = oneimage_state(image_name=image_name)
                         if image_state == "5":
-                            msg(
-                                level="error",
-                                message=f"Image {image_name} is in error state",
-                            )
+                            raise InvalidState(f"Image {image_name} is in error state")
                     oneimage_update(
                         image_name=image_name,
                         file_path=version_attribute_template_path,
@@ -2743,9 +2717,8 @@ def onemarketapp_add(
                             sleep(10)
                             image_state = oneimage_state(image_name=image_name)
                             if image_state == "5":
-                                msg(
-                                    level="error",
-                                    message=f"Image {image_name} is in error state",
+                                raise InvalidState(
+                                    f"Image {image_name} is in error state"
                                 )
                         oneimage_update(
                             image_name=image_name,
@@ -2819,7 +2792,7 @@ def onemarketapp_add(
                 service_details = oneflow_template_show(oneflow_template_name=appliance_name)
                 if service_details and "DOCUMENT" in service_details:
                     returned_template_id = int(service_details["DOCUMENT"]["ID"])
-        except (Exception, SystemExit):
+        except (ToolkitError, KeyError, TypeError, ValueError):
             pass  # Best-effort lookup: keep None values if we can't get the IDs
     
     return is_added, appliance_name, returned_template_id, returned_image_id
@@ -2889,9 +2862,8 @@ def onemarketapp_instantiate(
             vm_id = vms_running_with_ids[vm_name]
             # Use ID-based functions from here to avoid conflicts with VMs of the same name
             if onevm_state_by_id(vm_id=vm_id) != "3":  # 3 means running
-                msg(
-                    level="error",
-                    message=f"Virtual machine {vm_name} (ID: {vm_id}) is not in RUNNING state",
+                raise InvalidState(
+                    f"Virtual machine {vm_name} (ID: {vm_id}) is not in RUNNING state"
                 )
             onevm_chown_by_id(
                 vm_id=vm_id,
@@ -2914,9 +2886,8 @@ def onemarketapp_instantiate(
             service_id = oneflow_id(oneflow_name=service_name)
             # Use ID-based functions from here to avoid conflicts with services of the same name
             if oneflow_state_by_id(oneflow_id=service_id) != 2:  # 2 means running
-                msg(
-                    level="error",
-                    message=f"Service {service_name} (ID: {service_id}) is not in RUNNING state",
+                raise InvalidState(
+                    f"Service {service_name} (ID: {service_id}) is not in RUNNING state"
                 )
             roles_vm_names = oneflow_roles_vm_names_by_id(oneflow_id=service_id)
             if roles_vm_names:
@@ -3003,16 +2974,25 @@ def onemarketapp_export(
     :param datastore_name: the name of the datastore, ``str``
     :return: the ids of the images, templates and services, ``Tuple[List[int], List[int], int]``
     """
-    command = f'onemarketapp export "{appliance_name}" "{appliance_new_name}" --datastore "{datastore_name}"'
-    stdout, stderr, rc = run_command(command=command)
+    command = [
+        "onemarketapp",
+        "export",
+        appliance_name,
+        appliance_new_name,
+        "--datastore",
+        datastore_name,
+    ]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not export appliance {appliance_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not export appliance {appliance_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Appliance {appliance_name} exported. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Appliance {appliance_name} exported. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
     image_ids = [
         int(id_)
@@ -3057,15 +3037,26 @@ def onemarketapp_curl(appliance_url: str) -> Dict:
     :param appliance_url: the url of the appliance, ``str``
     :return: the data of the appliance, ``Dict``
     """
-    command = (
-        f'curl -s -w "%{{http_code}}" -H "Accept: application/json" {appliance_url}'
+    command = [
+        "curl",
+        "-s",
+        "-w",
+        "%{http_code}",
+        "-H",
+        "Accept: application/json",
+        appliance_url,
+    ]
+    stdout, stderr, rc = HTTP_READS.do(
+        key=("GET", appliance_url),
+        function=lambda: retry_command(command=command, policy=HTTP_READ_RETRY),
     )
-    stdout, stderr, rc = run_command(command=command)
     data, status_code = stdout[:-3].strip(), stdout[-3:]
     if status_code != "200":
-        msg(
-            level="error",
-            message=f"Could not get appliance data from url {appliance_url}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not get appliance data from url {appliance_url}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     return loads_json(data=data)
 
@@ -3079,19 +3070,59 @@ def onemarketapp_description(appliance_url: str) -> str:
     """
     appliance = onemarketapp_curl(appliance_url=appliance_url)
     if "description" not in appliance:
-        msg(
-            level="error",
-            message=f"Could not get description of appliance from url {appliance_url}",
+        raise InvalidData(
+            f"Could not get description of appliance from url {appliance_url}"
         )
     appliance_description = appliance["description"]
     if appliance_description is None:
-        msg(
-            level="error",
-            message=f"Could not get description of appliance from url {appliance_url}",
+        raise InvalidData(
+            f"Could not get description of appliance from url {appliance_url}"
         )
     return appliance_description
 
 
+def onemarketapp_list() -> Dict | None:
+    """
+    Get the list of appliances of all the marketplaces in OpenNebula
+
+    :return: the list of appliances, ``Dict``
+    """
+    command = ["onemarketapp", "list", "-j"]
+    stdout, stderr, rc = _one_read(command=command)
+    if rc != 0:
+        msg(
+            level="debug",
+            message=f"OpenNebula appliances not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+        )
+        return None
+    msg(
+        level="debug",
+        message=f"OpenNebula appliances found. Command executed: {join_command(command)}. Return code: {rc}",
+    )
+    return loads_json(data=stdout)
+
+
+def onemarketapps_marketplace_ids() -> Set[str]:
+    """
+    Get the ids of the marketplaces that have at least one appliance in OpenNebula
+
+    :return: the ids of the marketplaces, ``Set[str]``
+    """
+    appliances = onemarketapp_list()
+    if not appliances or "MARKETPLACEAPP_POOL" not in appliances:
+        return set()
+    appliance_pool = appliances["MARKETPLACEAPP_POOL"].get("MARKETPLACEAPP")
+    if not appliance_pool:
+        return set()
+    if isinstance(appliance_pool, Dict):
+        appliance_pool = [appliance_pool]
+    return {
+        str(appliance["MARKETPLACE_ID"])
+        for appliance in appliance_pool
+        if appliance and "MARKETPLACE_ID" in appliance
+    }
+
+
 def onemarketapp_name(appliance_url: str) -> str:
     """
     Get the name of an appliance using the url in OpenNebula
@@ -3101,16 +3132,10 @@ def onemarketapp_name(appliance_url: str) -> str:
     """
     appliance = onemarketapp_curl(appliance_url=appliance_url)
     if "name" not in appliance:
-        msg(
-            level="error",
-            message=f"Could not get name of appliance from url {appliance_url}",
-        )
+        raise InvalidData(f"Could not get name of appliance from url {appliance_url}")
     appliance_name = appliance["name"]
     if appliance_name is None:
-        msg(
-            level="error",
-            message=f"Could not get name of appliance from url {appliance_url}",
-        )
+        raise InvalidData(f"Could not get name of appliance from url {appliance_url}")
     return appliance_name
 
 
@@ -3122,31 +3147,31 @@ def onemarketapp_show(appliance_name: str, marketplace_name: str) -> Dict:
     :param marketplace_name: the name of the marketplace, ``str``
     :return: the details of the appliance, ``Dict``
     """
-    command = f'onemarketapp show "{appliance_name}" -j'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onemarketapp", "show", appliance_name, "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"OpenNebula appliance {appliance_name} not found in marketplace {marketplace_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"OpenNebula appliance {appliance_name} not found in marketplace {marketplace_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     else:
         msg(
             level="debug",
-            message=f"OpenNebula appliance {appliance_name} found in marketplace {marketplace_name}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"OpenNebula appliance {appliance_name} found in marketplace {marketplace_name}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         appliance = loads_json(data=stdout)
         if (
             "MARKETPLACEAPP" not in appliance
             or "MARKETPLACE" not in appliance["MARKETPLACEAPP"]
         ):
-            msg(
-                level="error",
-                message=f"MARKETPLACEAPP key not found in appliance {appliance_name} or MARKETPLACE key not found in MARKETPLACE",
+            raise InvalidData(
+                f"MARKETPLACEAPP key not found in appliance {appliance_name} or MARKETPLACE key not found in MARKETPLACE"
             )
         if appliance["MARKETPLACEAPP"]["MARKETPLACE"] != marketplace_name:
-            msg(
-                level="error",
-                message=f"Appliance {appliance_name} not in {marketplace_name} marketplace",
+            raise ToolkitError(
+                f"Appliance {appliance_name} not in {marketplace_name} marketplace"
             )
         msg(
             level="debug",
@@ -3168,9 +3193,8 @@ def onemarketapp_type(appliance_name: str, marketplace_name: str) -> str:
         marketplace_name=marketplace_name,
     )
     if "MARKETPLACEAPP" not in appliance or "TYPE" not in appliance["MARKETPLACEAPP"]:
-        msg(
-            level="error",
-            message=f"MARKETPLACEAPP key not found in appliance {appliance_name} or TYPE key not found in MARKETPLACEAPP",
+        raise InvalidData(
+            f"MARKETPLACEAPP key not found in appliance {appliance_name} or TYPE key not found in MARKETPLACEAPP"
         )
     appliance_type = appliance["MARKETPLACEAPP"]["TYPE"]
     if appliance_type == "1":
@@ -3192,10 +3216,7 @@ def onemarketapp_type(appliance_name: str, marketplace_name: str) -> str:
         )
         return "SERVICE"
     else:
-        msg(
-            level="error",
-            message=f"Appliance {appliance_name} has unknown type",
-        )
+        raise InvalidData(f"Appliance {appliance_name} has unknown type")
 
 
 def onemarketapp_version(appliance_url: str) -> Tuple[str, str]:
@@ -3208,11 +3229,9 @@ def onemarketapp_version(appliance_url: str) -> Tuple[str, str]:
     appliance = onemarketapp_curl(appliance_url=appliance_url)
 
     if "version" not in appliance or appliance["version"] is None:
-        msg(
-            level="error",
-            message=f"Could not get version of appliance from url {appliance_url}",
+        raise InvalidData(
+            f"Could not get version of appliance from url {appliance_url}"
         )
-        return "", ""
 
     appliance_version_full = appliance["version"]
     parts = appliance_version_full.split("-", 1)
@@ -3236,16 +3255,18 @@ def onetemplate_chown(template_name: str, username: str, group_name: str) -> Non
     :param username: the name of the user, ``str``
     :param group_name: the name of the group, ``str``
     """
-    command = f'onetemplate chown "{template_name}" "{username}" "{group_name}"'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onetemplate", "chown", template_name, username, group_name]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not change owner of template {template_name} to {username}:{group_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not change owner of template {template_name} to {username}:{group_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Owner of template {template_name} changed to {username}:{group_name}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Owner of template {template_name} changed to {username}:{group_name}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
@@ -3255,16 +3276,18 @@ def onetemplate_delete(template_name: str) -> None:
 
     :param template_name: the name of the template, ``str``
     """
-    command = f'onetemplate delete "{template_name}" --recursive'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onetemplate", "delete", template_name, "--recursive"]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not remove template {template_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not remove template {template_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Template {template_name} removed. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Template {template_name} removed. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
@@ -3277,21 +3300,14 @@ def onetemplate_id(template_name: str) -> int:
     """
     template = onetemplate_show(template_name=template_name)
     if template is None:
-        msg(
-            level="error",
-            message=f"Template {template_name} not found",
-        )
+        raise NotFound(f"Template {template_name} not found")
     if "VMTEMPLATE" not in template or "ID" not in template["VMTEMPLATE"]:
-        msg(
-            level="error",
-            message=f"VMTEMPLATE key not found in template {template_name} or ID key not found in VMTEMPLATE",
+        raise InvalidData(
+            f"VMTEMPLATE key not found in template {template_name} or ID key not found in VMTEMPLATE"
         )
     template_id = int(template["VMTEMPLATE"]["ID"])
     if template_id is None:
-        msg(
-            level="error",
-            message=f"Could not get id of template {template_name}",
-        )
+        raise InvalidData(f"Could not get id of template {template_name}")
     return template_id
 
 
@@ -3307,102 +3323,68 @@ def onetemplate_image_ids(
     :return: the list of image ids, ``List[int]``
     """
     if template_id is None and template_name is None:
-        msg(
-            level="error",
-            message="Either template_name or template_id must be provided",
-        )
+        raise ToolkitError("Either template_name or template_id must be provided")
     if template_id is not None and template_name is not None:
-        msg(
-            level="error",
-            message="Either template_name or template_id must be provided, not both",
+        raise ToolkitError(
+            "Either template_name or template_id must be provided, not both"
         )
     if template_id is None:
         template = onetemplate_show(template_name=template_name)
         if template is None:
-            msg(
-                level="error",
-                message=f"Template {template_name} not found",
-            )
+            raise NotFound(f"Template {template_name} not found")
         if (
             "VMTEMPLATE" not in template
             or "TEMPLATE" not in template["VMTEMPLATE"]
             or "DISK" not in template["VMTEMPLATE"]["TEMPLATE"]
         ):
-            msg(
-                level="error",
-                message=f"VMTEMPLATE key not found in template {template_name} or TEMPLATE key not found in VMTEMPLATE or DISK key not found in TEMPLATE",
+            raise InvalidData(
+                f"VMTEMPLATE key not found in template {template_name} or TEMPLATE key not found in VMTEMPLATE or DISK key not found in TEMPLATE"
             )
         template_image_ids = template["VMTEMPLATE"]["TEMPLATE"]["DISK"]
         image_ids = []
         if template_image_ids is None:
-            msg(
-                level="error",
-                message=f"Could not get image id of template {template_name}",
-            )
+            raise InvalidData(f"Could not get image id of template {template_name}")
         elif isinstance(template_image_ids, Dict):
             if "IMAGE_ID" not in template_image_ids:
-                msg(
-                    level="error",
-                    message="IMAGE_ID key not found in DISK",
-                )
+                raise InvalidData("IMAGE_ID key not found in DISK")
             image_ids.append(int(template_image_ids["IMAGE_ID"]))
         elif isinstance(template_image_ids, List):
             for disk in template_image_ids:
                 if "IMAGE_ID" not in disk:
-                    msg(
-                        level="error",
-                        message="IMAGE_ID key not found in DISK",
-                    )
+                    raise InvalidData("IMAGE_ID key not found in DISK")
                 image_ids.append(int(disk["IMAGE_ID"]))
         else:
-            msg(
-                level="error",
-                message="Invalid type of DISK",
-            )
+            raise InvalidData("Invalid type of DISK")
         return image_ids
     else:
         template = onetemplate_show(template_id=template_id)
         if template is None:
-            msg(
-                level="error",
-                message=f"Template with id {template_id} not found",
-            )
+            raise NotFound(f"Template with id {template_id} not found")
         if (
             "VMTEMPLATE" not in template
             or "TEMPLATE" not in template["VMTEMPLATE"]
             or "DISK" not in template["VMTEMPLATE"]["TEMPLATE"]
         ):
-            msg(
-                level="error",
-                message=f"VMTEMPLATE key not found in template id {template_id} or TEMPLATE key not found in VMTEMPLATE or DISK key not found in TEMPLATE",
+            raise InvalidData(
+                f"VMTEMPLATE key not found in template id {template_id} or TEMPLATE key not found in VMTEMPLATE or DISK key not found in TEMPLATE"
             )
         template_image_ids = template["VMTEMPLATE"]["TEMPLATE"]["DISK"]
         image_ids = []
         if template_image_ids is None:
-            msg(
-                level="error",
-                message=f"Could not get image id of template with id {template_id}",
+            raise InvalidData(
+                f"Could not get image id of template with id {template_id}"
             )
         elif isinstance(template_image_ids, Dict):
             if "IMAGE_ID" not in template_image_ids:
-                msg(
-                    level="error",
-                    message="IMAGE_ID key not found in DISK",
-                )
+                raise InvalidData("IMAGE_ID key not found in DISK")
             image_ids.append(int(template_image_ids["IMAGE_ID"]))
         elif isinstance(template_image_ids, List):
             for disk in template_image_ids:
                 if "IMAGE_ID" not in disk:
-                    msg(
-                        level="error",
-                        message="IMAGE_ID key not found in DISK",
-                    )
+                    raise InvalidData("IMAGE_ID key not found in DISK")
                 image_ids.append(int(disk["IMAGE_ID"]))
         else:
-            msg(
-                level="error",
-                message="Invalid type of DISK",
-            )
+            raise InvalidData("Invalid type of DISK")
         return image_ids
 
 
@@ -3445,9 +3427,8 @@ def onetemplate_instantiate(template_name: str, username: str, group_name: str)
                     )
                     attrs[attr_key] = attr_value
                 else:
-                    msg(
-                        level="error",
-                        message=f"Error instantiating template {template_name}. Invalid input type {input_type}",
+                    raise InvalidData(
+                        f"Error instantiating template {template_name}. Invalid input type {input_type}"
                     )
             elif field_type == "M":
                 if input_type == "boolean":
@@ -3476,28 +3457,36 @@ def onetemplate_instantiate(template_name: str, username: str, group_name: str)
                     )
                     attrs[attr_key] = attr_value
                 else:
-                    msg(
-                        level="error",
-                        message=f"Error instantiating template {template_name}. Invalid input type {input_type}",
+                    raise InvalidData(
+                        f"Error instantiating template {template_name}. Invalid input type {input_type}"
                     )
             else:
-                msg(
-                    level="error",
-                    message=f"Error instantiating template {template_name}. Invalid field type {field_type}",
+                raise InvalidData(
+                    f"Error instantiating template {template_name}. Invalid field type {field_type}"
                 )
-        user_inputs = ",".join([f'"{key}={value}"' for key, value in attrs.items()])
-        command = f'onetemplate instantiate "{template_name}" --name "{template_name}" --user-inputs {user_inputs}'
+        user_inputs = ",".join([f"{key}={value}" for key, value in attrs.items()])
+        command = [
+            "onetemplate",
+            "instantiate",
+            template_name,
+            "--name",
+            template_name,
+            "--user-inputs",
+            user_inputs,
+        ]
     else:
-        command = f'onetemplate instantiate "{template_name}" --name "{template_name}"'
-    stdout, stderr, rc = run_command(command=command)
+        command = ["onetemplate", "instantiate", template_name, "--name", template_name]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not instantiate template {template_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not instantiate template {template_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Template {template_name} instantiated. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Template {template_name} instantiated. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
     onevm_chown(vm_name=template_name, username=username, group_name=group_name)
 
@@ -3511,21 +3500,14 @@ def onetemplate_name(template_id: int) -> str:
     """
     template = onetemplate_show(template_id=template_id)
     if template is None:
-        msg(
-            level="error",
-            message=f"Template with id {template_id} not found",
-        )
+        raise NotFound(f"Template with id {template_id} not found")
     if "VMTEMPLATE" not in template or "NAME" not in template["VMTEMPLATE"]:
-        msg(
-            level="error",
-            message=f"VMTEMPLATE key not found in template id {template_id} or NAME key not found in VMTEMPLATE",
+        raise InvalidData(
+            f"VMTEMPLATE key not found in template id {template_id} or NAME key not found in VMTEMPLATE"
         )
     template_name = template["VMTEMPLATE"]["NAME"]
     if template_name is None:
-        msg(
-            level="error",
-            message=f"Could not get name of template with id {template_id}",
-        )
+        raise InvalidData(f"Could not get name of template with id {template_id}")
     return template_name
 
 
@@ -3535,18 +3517,18 @@ def onetemplate_list() -> Dict | None:
 
     :return: the list of templates, ``Dict``
     """
-    command = "onetemplate list -j"
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onetemplate", "list", "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
         msg(
             level="debug",
-            message=f"OpenNebula templates not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            message=f"OpenNebula templates not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
         )
         return None
     else:
         msg(
             level="debug",
-            message=f"OpenNebula templates found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"OpenNebula templates found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -3558,16 +3540,18 @@ def onetemplate_rename(old_name: str, new_name: str) -> None:
     :param old_name: the old name of the template, ``str``
     :param new_name: the new name of the template, ``str``
     """
-    command = f'onetemplate rename "{old_name}" "{new_name}"'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onetemplate", "rename", old_name, new_name]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not rename template {old_name} to {new_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not rename template {old_name} to {new_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Template {old_name} renamed to {new_name}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Template {old_name} renamed to {new_name}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
@@ -3583,43 +3567,39 @@ def onetemplate_show(
     :return: the details of the template, ``Dict``
     """
     if template_id is None and template_name is None:
-        msg(
-            level="error",
-            message="Either template_name or template_id must be provided",
-        )
+        raise ToolkitError("Either template_name or template_id must be provided")
     if template_id is not None and template_name is not None:
-        msg(
-            level="error",
-            message="Either template_name or template_id must be provided, not both",
+        raise ToolkitError(
+            "Either template_name or template_id must be provided, not both"
         )
     if template_name is None:
-        command = f"onetemplate show {template_id} -j"
-        stdout, stderr, rc = run_command(command=command)
+        command = ["onetemplate", "show", str(template_id), "-j"]
+        stdout, stderr, rc = _one_read(command=command)
         if rc != 0:
             msg(
                 level="debug",
-                message=f"Template with id {template_id} not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+                message=f"Template with id {template_id} not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
             )
             return None
         else:
             msg(
                 level="debug",
-                message=f"Template with id {template_id} found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+                message=f"Template with id {template_id} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
             )
             return loads_json(data=stdout)
     else:
-        command = f'onetemplate show "{template_name}" -j'
-        stdout, stderr, rc = run_command(command=command)
+        command = ["onetemplate", "show", template_name, "-j"]
+        stdout, stderr, rc = _one_read(command=command)
         if rc != 0:
             msg(
                 level="debug",
-                message=f"Template {template_name} not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+                message=f"Template {template_name} not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
             )
             return None
         else:
             msg(
                 level="debug",
-                message=f"Template {template_name} found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+                message=f"Template {template_name} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
             )
             return loads_json(data=stdout)
 
@@ -3633,20 +3613,13 @@ def onetemplate_user_inputs(template_name: str) -> Dict | None:
     """
     onetemplate = onetemplate_show(template_name=template_name)
     if onetemplate is None:
-        msg(
-            level="error",
-            message=f"Template {template_name} not found",
-        )
+        raise NotFound(f"Template {template_name} not found")
     if "VMTEMPLATE" not in onetemplate or "TEMPLATE" not in onetemplate["VMTEMPLATE"]:
-        msg(
-            level="error",
-            message=f"VMTEMPLATE key not found in template {template_name} or TEMPLATE key not found in VMTEMPLATE",
+        raise InvalidData(
+            f"VMTEMPLATE key not found in template {template_name} or TEMPLATE key not found in VMTEMPLATE"
         )
     if "USER_INPUTS" not in onetemplate["VMTEMPLATE"]["TEMPLATE"]:
-        msg(
-            level="error",
-            message="USER_INPUTS key not found in TEMPLATE",
-        )
+        raise InvalidData("USER_INPUTS key not found in TEMPLATE")
     return onetemplate["VMTEMPLATE"]["TEMPLATE"]["USER_INPUTS"]
 
 
@@ -3664,18 +3637,14 @@ def onetemplates_names() -> List[str]:
         "VMTEMPLATE_POOL" not in templates
         or "VMTEMPLATE" not in templates["VMTEMPLATE_POOL"]
     ):
-        msg(
-            level="error",
-            message="VMTEMPLATE_POOL key not found in templates or VMTEMPLATE key not found in VMTEMPLATE_POOL",
+        raise InvalidData(
+            "VMTEMPLATE_POOL key not found in templates or VMTEMPLATE key not found in VMTEMPLATE_POOL"
         )
     for template in templates["VMTEMPLATE_POOL"]["VMTEMPLATE"]:
         if template is None:
-            msg(level="error", message="Template is empty")
+            raise InvalidData("Template is empty")
         if "NAME" not in template:
-            msg(
-                level="error",
-                message=f"NAME key not found in template {template}",
-            )
+            raise InvalidData(f"NAME key not found in template {template}")
         templates_names.append(template["NAME"])
     return templates_names
 
@@ -3692,16 +3661,18 @@ def oneuser_chgrp(username: str, group_name: str) -> None:
     :param username: the name of the user, ``str``
     :param group_name: the name of the group, ``str``
     """
-    command = f'oneuser chgrp "{username}" "{group_name}"'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["oneuser", "chgrp", username, group_name]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not assign user {username} to group {group_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not assign user {username} to group {group_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"User {username} assigned to group {group_name}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"User {username} assigned to group {group_name}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
@@ -3713,16 +3684,18 @@ def oneuser_create(username: str, password: str) -> int:
     :param password: the password of the user, ``str``
     :return: the id of the user, ``int``
     """
-    command = f'oneuser create "{username}" "{password}"'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["oneuser", "create", username, password]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not create user {username} with password {password}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not create user {username} with password {password}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"User {username} created with password {password}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"User {username} created with password {password}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
     return re.search(r"ID:\s*(\d+)", stdout).group(1)
 
@@ -3733,18 +3706,18 @@ def oneuser_list() -> Dict | None:
 
     :return: the list of users, ``Dict``
     """
-    command = "oneuser list -j"
-    stdout, stderr, rc = run_command(command=command)
+    command = ["oneuser", "list", "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
         msg(
             level="debug",
-            message=f"OpenNebula users not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            message=f"OpenNebula users not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
         )
         return None
     else:
         msg(
             level="debug",
-            message=f"OpenNebula users found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"OpenNebula users found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -3758,14 +3731,10 @@ def oneuser_public_ssh_keys(username: str) -> List[str]:
     """
     user = oneuser_show(username=username)
     if user is None:
-        msg(
-            level="error",
-            message=f"User {username} not found",
-        )
+        raise NotFound(f"User {username} not found")
     if "USER" not in user or "TEMPLATE" not in user["USER"]:
-        msg(
-            level="error",
-            message=f"USER key not found in user {username} or TEMPLATE key not found in USER",
+        raise InvalidData(
+            f"USER key not found in user {username} or TEMPLATE key not found in USER"
         )
     if "SSH_PUBLIC_KEY" not in user["USER"]["TEMPLATE"]:
         return ""
@@ -3787,43 +3756,37 @@ def oneuser_show(
     :return: the details of the user, ``Dict``
     """
     if username is None and user_id is None:
-        msg(
-            level="error",
-            message="Either username or user_id must be provided",
-        )
+        raise ToolkitError("Either username or user_id must be provided")
     if username is not None and user_id is not None:
-        msg(
-            level="error",
-            message="Either username or user_id must be provided, not both",
-        )
+        raise ToolkitError("Either username or user_id must be provided, not both")
     if username is None:
-        command = f"oneuser show {user_id} -j"
-        stdout, stderr, rc = run_command(command=command)
+        command = ["oneuser", "show", str(user_id), "-j"]
+        stdout, stderr, rc = _one_read(command=command)
         if rc != 0:
             msg(
                 level="debug",
-                message=f"User with id {user_id} not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+                message=f"User with id {user_id} not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
             )
             return None
         else:
             msg(
                 level="debug",
-                message=f"User with id {user_id} found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+                message=f"User with id {user_id} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
             )
             return loads_json(data=stdout)
     else:
-        command = f'oneuser show "{username}" -j'
-        stdout, stderr, rc = run_command(command=command)
+        command = ["oneuser", "show", username, "-j"]
+        stdout, stderr, rc = _one_read(command=command)
         if rc != 0:
             msg(
                 level="debug",
-                message=f"User {username} not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+                message=f"User {username} not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
             )
             return None
         else:
             msg(
                 level="debug",
-                message=f"User {username} found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+                message=f"User {username} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
             )
             return loads_json(data=stdout)
 
@@ -3839,16 +3802,22 @@ def oneuser_update_public_ssh_key(username: str, public_ssh_key: str) -> None:
     if public_ssh_key not in public_ssh_keys:
         all_public_ssh_keys = "\n".join(public_ssh_keys)
         all_public_ssh_keys += f"\n{public_ssh_key}"
-        command = f'echo \'SSH_PUBLIC_KEY="{all_public_ssh_keys}"\' | oneuser update "{username}" --append'
-        stdout, stderr, rc = run_command(command=command)
+        command = ["oneuser", "update", username, "--append"]
+        stdout, stderr, rc = run_command(
+            command=command,
+            input=f'SSH_PUBLIC_KEY="{all_public_ssh_keys}"\n',
+            limiter=ONE_LIMITER,
+        )
         if rc != 0:
-            msg(
-                level="error",
-                message=f"Could not update SSH key of user {username} to {public_ssh_key}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            raise CommandFailed(
+                f"Could not update SSH key of user {username} to {public_ssh_key}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+                command=command,
+                stderr=stderr,
+                rc=rc,
             )
         msg(
             level="debug",
-            message=f"SSH key of user {username} updated to {public_ssh_key}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"SSH key of user {username} updated to {public_ssh_key}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
     else:
         msg(
@@ -3866,21 +3835,14 @@ def oneusername(user_id: int) -> str:
     """
     user = oneuser_show(user_id=user_id)
     if user is None:
-        msg(
-            level="error",
-            message=f"User with id {user_id} not found",
-        )
+        raise NotFound(f"User with id {user_id} not found")
     if "USER" not in user or "NAME" not in user["USER"]:
-        msg(
-            level="error",
-            message=f"USER key not found in user id {user_id} or NAME key not found in USER",
+        raise InvalidData(
+            f"USER key not found in user id {user_id} or NAME key not found in USER"
         )
     username = user["USER"]["NAME"]
     if username is None:
-        msg(
-            level="error",
-            message=f"Could not get name of user with id {user_id}",
-        )
+        raise InvalidData(f"Could not get name of user with id {user_id}")
     return username
 
 
@@ -3893,21 +3855,14 @@ def oneusername_id(username: str) -> int:
     """
     user = oneuser_show(username=username)
     if user is None:
-        msg(
-            level="error",
-            message=f"User {username} not found",
-        )
+        raise NotFound(f"User {username} not found")
     if "USER" not in user or "ID" not in user["USER"]:
-        msg(
-            level="error",
-            message=f"USER key not found in user {username} or ID key not found in USER",
+        raise InvalidData(
+            f"USER key not found in user {username} or ID key not found in USER"
         )
     username_id = user["USER"]["ID"]
     if username_id is None:
-        msg(
-            level="error",
-            message=f"Could not get id of user {username}",
-        )
+        raise InvalidData(f"Could not get id of user {username}")
     return int(username_id)
 
 
@@ -3922,21 +3877,17 @@ def oneusernames() -> List[str]:
     if users is None:
         return []
     if "USER_POOL" not in users or "USER" not in users["USER_POOL"]:
-        msg(
-            level="error",
-            message="USER_POOL key not found in users or USER key not found in USER_POOL",
+        raise InvalidData(
+            "USER_POOL key not found in users or USER key not found in USER_POOL"
         )
     user_pool = users["USER_POOL"]["USER"]
     if user_pool is None:
         return []
     for user in user_pool:
         if user is None:
-            msg(level="error", message="User is empty")
+            raise InvalidData("User is empty")
         if "NAME" not in user:
-            msg(
-                level="error",
-                message="NAME key not found in user",
-            )
+            raise InvalidData("NAME key not found in user")
         usernames.append(user["NAME"])
     return usernames
 
@@ -3954,16 +3905,18 @@ def onevm_chown(vm_name: str, username: str, group_name: str) -> None:
     :param username: the name of the user, ``str``
     :param group_name: the name of the group, ``str``
     """
-    command = f'onevm chown "{vm_name}" "{username}" "{group_name}"'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onevm", "chown", vm_name, username, group_name]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not change owner of VM {vm_name} to {username}:{group_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not change owner of VM {vm_name} to {username}:{group_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Owner of VM {vm_name} changed to {username}:{group_name}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Owner of VM {vm_name} changed to {username}:{group_name}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
@@ -3975,16 +3928,18 @@ def onevm_chown_by_id(vm_id: int, username: str, group_name: str) -> None:
     :param username: the name of the user, ``str``
     :param group_name: the name of the group, ``str``
     """
-    command = f'onevm chown {vm_id} "{username}" "{group_name}"'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onevm", "chown", str(vm_id), username, group_name]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not change owner of VM ID {vm_id} to {username}:{group_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not change owner of VM ID {vm_id} to {username}:{group_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Owner of VM ID {vm_id} changed to {username}:{group_name}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Owner of VM ID {vm_id} changed to {username}:{group_name}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
@@ -3997,26 +3952,19 @@ def onevm_cpu_model(vm_name: str) -> str:
     """
     vm = onevm_show(vm_name=vm_name)
     if vm is None:
-        msg(
-            level="error",
-            message=f"VM {vm_name} not found",
-        )
+        raise NotFound(f"VM {vm_name} not found")
     if (
         "VM" not in vm
         or "TEMPLATE" not in vm["VM"]
         or "CPU_MODEL" not in vm["VM"]["TEMPLATE"]
         or "MODEL" not in vm["VM"]["TEMPLATE"]["CPU_MODEL"]
     ):
-        msg(
-            level="error",
-            message=f"VM key not found in vm {vm_name} or TEMPLATE key not found in VM or CPU_MODEL key not found in TEMPLATE or MODEL key not found in CPU_MODEL",
+        raise InvalidData(
+            f"VM key not found in vm {vm_name} or TEMPLATE key not found in VM or CPU_MODEL key not found in TEMPLATE or MODEL key not found in CPU_MODEL"
         )
     cpu_model = vm["VM"]["TEMPLATE"]["CPU_MODEL"]["MODEL"]
     if cpu_model is None:
-        msg(
-            level="error",
-            message=f"Could not get CPU model of VM {vm_name}",
-        )
+        raise InvalidData(f"Could not get CPU model of VM {vm_name}")
     return cpu_model
 
 
@@ -4027,16 +3975,18 @@ def onevm_deploy(vm_name: str, host_name: str) -> None:
     :param vm_name: the name of the VM, ``str``
     :param host_name: the name of the host, ``str``
     """
-    command = f'onevm deploy "{vm_name}" "{host_name}"'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onevm", "deploy", vm_name, host_name]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not deploy VM {vm_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not deploy VM {vm_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"VM {vm_name} deployed. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"VM {vm_name} deployed. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
     state = onevm_state(vm_name=vm_name)
     while state != "3":
@@ -4055,9 +4005,8 @@ def onevm_disk_resize(vm_name: str, disk_id: int, size: int) -> None:
     size_mb = gb_to_mb(gb=size)
     disk_size = onevm_disk_size(vm_name=vm_name, disk_id=disk_id)
     if disk_size > size_mb:
-        msg(
-            level="error",
-            message=f"Disk {disk_id} of VM {vm_name} has a size of {disk_size}M which is greater than or equal to the new size {size_mb}M to be upgraded",
+        raise ToolkitError(
+            f"Disk {disk_id} of VM {vm_name} has a size of {disk_size}M which is greater than or equal to the new size {size_mb}M to be upgraded"
         )
     elif disk_size == size_mb:
         msg(
@@ -4065,16 +4014,18 @@ def onevm_disk_resize(vm_name: str, disk_id: int, size: int) -> None:
             message=f"Disk {disk_id} of VM {vm_name} has a size of {disk_size}M which is equal to the new size {size_mb}M to be upgraded",
         )
     else:
-        command = f'onevm disk-resize "{vm_name}" {disk_id} {size_mb}M'
-        stdout, stderr, rc = run_command(command=command)
+        command = ["onevm", "disk-resize", vm_name, str(disk_id), f"{size_mb}M"]
+        stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
         if rc != 0:
-            msg(
-                level="error",
-                message=f"Could not resize disk of VM {vm_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            raise CommandFailed(
+                f"Could not resize disk of VM {vm_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+                command=command,
+                stderr=stderr,
+                rc=rc,
             )
         msg(
             level="debug",
-            message=f"Disk of VM {vm_name} resized successfully to {size_mb}M. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"Disk of VM {vm_name} resized successfully to {size_mb}M. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
 
 
@@ -4088,24 +4039,22 @@ def onevm_disk_size(vm_name: str, disk_id: int) -> int:
     """
     vm = onevm_show(vm_name=vm_name)
     if vm is None:
-        msg(level="error", message=f"VM {vm_name} not found")
+        raise NotFound(f"VM {vm_name} not found")
     if (
         "VM" not in vm
         or "TEMPLATE" not in vm["VM"]
         or "DISK" not in vm["VM"]["TEMPLATE"]
     ):
-        msg(
-            level="error",
-            message=f"VM key not found in vm {vm_name} or TEMPLATE key not found in VM or DISK key not found in TEMPLATE",
+        raise InvalidData(
+            f"VM key not found in vm {vm_name} or TEMPLATE key not found in VM or DISK key not found in TEMPLATE"
         )
     disks = vm["VM"]["TEMPLATE"]["DISK"]
+    if isinstance(disks, Dict):
+        disks = [disks]
     for disk in disks:
-        if disk["DISK_ID"] == disk_id:
+        if disk["DISK_ID"] == str(disk_id):
             return int(disk["SIZE"])
-    msg(
-        level="error",
-        message=f"Disk {disk_id} not found in VM {vm_name}",
-    )
+    raise NotFound(f"Disk {disk_id} not found in VM {vm_name}")
 
 
 def onevm_id(vm_name: str) -> int:
@@ -4117,15 +4066,12 @@ def onevm_id(vm_name: str) -> int:
     """
     vm = onevm_show(vm_name=vm_name)
     if vm is None:
-        msg(level="error", message=f"VM {vm_name} not found")
+        raise NotFound(f"VM {vm_name} not found")
     if "VM" not in vm or "ID" not in vm["VM"]:
-        msg(
-            level="error",
-            message=f"VM key not found in vm {vm_name} or ID key not found in VM",
-        )
+        raise InvalidData(f"VM key not found in vm {vm_name} or ID key not found in VM")
     vm_id = int(vm["VM"]["ID"])
     if vm_id is None:
-        msg(level="error", message=f"Could not get ID of VM {vm_name}")
+        raise InvalidData(f"Could not get ID of VM {vm_name}")
     return vm_id
 
 
@@ -4138,25 +4084,20 @@ def onevm_ip(vm_name: str) -> str:
     """
     vm = onevm_show(vm_name=vm_name)
     if vm is None:
-        msg(level="error", message=f"VM {vm_name} not found")
+        raise NotFound(f"VM {vm_name} not found")
     if "VM" not in vm or "TEMPLATE" not in vm["VM"]:
-        msg(
-            level="error",
-            message=f"VM key not found in vm {vm_name} or TEMPLATE key not found in VM",
+        raise InvalidData(
+            f"VM key not found in vm {vm_name} or TEMPLATE key not found in VM"
         )
     if "NIC" not in vm["VM"]["TEMPLATE"]:
-        msg(
-            level="error",
-            message="NIC key not found in TEMPLATE",
-        )
+        raise InvalidData("NIC key not found in TEMPLATE")
     nics = vm["VM"]["TEMPLATE"]["NIC"]
+    if isinstance(nics, Dict):
+        nics = [nics]
     for nic in nics:
         if "IP" in nic:
             return nic["IP"]
-    msg(
-        level="error",
-        message=f"IP not found in VM {vm_name}",
-    )
+    raise NotFound(f"IP not found in VM {vm_name}")
 
 
 def onevm_list() -> Dict | None:
@@ -4165,18 +4106,18 @@ def onevm_list() -> Dict | None:
 
     :return: the list of VMs, ``Dict``
     """
-    command = "onevm list -j"
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onevm", "list", "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
         msg(
             level="debug",
-            message=f"OpenNebula VMs not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            message=f"OpenNebula VMs not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
         )
         return None
     else:
         msg(
             level="debug",
-            message=f"OpenNebula VMs found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"OpenNebula VMs found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -4190,23 +4131,16 @@ def onevm_template_id(vm_name: str) -> str:
     """
     vm = onevm_show(vm_name=vm_name)
     if vm is None:
-        msg(level="error", message=f"VM {vm_name} not found")
+        raise NotFound(f"VM {vm_name} not found")
     if "VM" not in vm or "TEMPLATE" not in vm["VM"]:
-        msg(
-            level="error",
-            message=f"VM key not found in vm {vm_name} or TEMPLATE key not found in VM",
+        raise InvalidData(
+            f"VM key not found in vm {vm_name} or TEMPLATE key not found in VM"
         )
     if "TEMPLATE_ID" not in vm["VM"]["TEMPLATE"]:
-        msg(
-            level="error",
-            message="TEMPLATE_ID key not found in TEMPLATE",
-        )
+        raise InvalidData("TEMPLATE_ID key not found in TEMPLATE")
     template_id = vm["VM"]["TEMPLATE"]["TEMPLATE_ID"]
     if template_id is None:
-        msg(
-            level="error",
-            message=f"Could not get template id of VM {vm_name}",
-        )
+        raise InvalidData(f"Could not get template id of VM {vm_name}")
     return template_id
 
 
@@ -4216,16 +4150,18 @@ def onevm_terminate_hard(vm_name: str) -> None:
 
     :param vm_name: the name of the VM, ``str``
     """
-    command = f'onevm terminate "{vm_name}" --hard'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onevm", "terminate", vm_name, "--hard"]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not remove VM {vm_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not remove VM {vm_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"VM {vm_name} removed. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"VM {vm_name} removed. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
     onevm_data = onevm_show(vm_name=vm_name)
     while onevm_data is not None:
@@ -4240,18 +4176,18 @@ def onevm_show(vm_name: str) -> Dict | None:
     :param vm_name: the name of the VM, ``str``
     :return: the details of the VM, ``Dict``
     """
-    command = f'onevm show "{vm_name}" -j'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onevm", "show", vm_name, "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
         msg(
             level="debug",
-            message=f"VM {vm_name} not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            message=f"VM {vm_name} not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
         )
         return None
     else:
         msg(
             level="debug",
-            message=f"VM {vm_name} found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"VM {vm_name} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -4263,18 +4199,18 @@ def onevm_show_by_id(vm_id: int) -> Dict | None:
     :param vm_id: the ID of the VM, ``int``
     :return: the details of the VM, ``Dict``
     """
-    command = f"onevm show {vm_id} -j"
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onevm", "show", str(vm_id), "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
         msg(
             level="debug",
-            message=f"VM ID {vm_id} not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            message=f"VM ID {vm_id} not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
         )
         return None
     else:
         msg(
             level="debug",
-            message=f"VM ID {vm_id} found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"VM ID {vm_id} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -4288,25 +4224,20 @@ def onevm_ip_by_id(vm_id: int) -> str:
     """
     vm = onevm_show_by_id(vm_id=vm_id)
     if vm is None:
-        msg(level="error", message=f"VM ID {vm_id} not found")
+        raise NotFound(f"VM ID {vm_id} not found")
     if "VM" not in vm or "TEMPLATE" not in vm["VM"]:
-        msg(
-            level="error",
-            message=f"VM key not found in VM ID {vm_id} or TEMPLATE key not found in VM",
+        raise InvalidData(
+            f"VM key not found in VM ID {vm_id} or TEMPLATE key not found in VM"
         )
     if "NIC" not in vm["VM"]["TEMPLATE"]:
-        msg(
-            level="error",
-            message=f"NIC key not found in TEMPLATE for VM ID {vm_id}",
-        )
+        raise InvalidData(f"NIC key not found in TEMPLATE for VM ID {vm_id}")
     nics = vm["VM"]["TEMPLATE"]["NIC"]
+    if isinstance(nics, Dict):
+        nics = [nics]
     for nic in nics:
         if "IP" in nic:
             return nic["IP"]
-    msg(
-        level="error",
-        message=f"IP not found in VM ID {vm_id}",
-    )
+    raise NotFound(f"IP not found in VM ID {vm_id}")
 
 
 def onevm_state(vm_name: str) -> str:
@@ -4318,15 +4249,14 @@ def onevm_state(vm_name: str) -> str:
     """
     vm = onevm_show(vm_name=vm_name)
     if vm is None:
-        msg(level="error", message=f"VM {vm_name} not found")
+        raise NotFound(f"VM {vm_name} not found")
     if "VM" not in vm or "STATE" not in vm["VM"]:
-        msg(
-            level="error",
-            message=f"VM key not found in vm {vm_name} or STATE key not found in VM",
+        raise InvalidData(
+            f"VM key not found in vm {vm_name} or STATE key not found in VM"
         )
     vm_state = vm["VM"]["STATE"]
     if vm_state is None:
-        msg(level="error", message=f"Could not get state of VM {vm_name}")
+        raise InvalidData(f"Could not get state of VM {vm_name}")
     return vm_state
 
 
@@ -4339,15 +4269,14 @@ def onevm_state_by_id(vm_id: int) -> str:
     """
     vm = onevm_show_by_id(vm_id=vm_id)
     if vm is None:
-        msg(level="error", message=f"VM ID {vm_id} not found")
+        raise NotFound(f"VM ID {vm_id} not found")
     if "VM" not in vm or "STATE" not in vm["VM"]:
-        msg(
-            level="error",
-            message=f"VM key not found in VM ID {vm_id} or STATE key not found in VM",
+        raise InvalidData(
+            f"VM key not found in VM ID {vm_id} or STATE key not found in VM"
         )
     vm_state = vm["VM"]["STATE"]
     if vm_state is None:
-        msg(level="error", message=f"Could not get state of VM ID {vm_id}")
+        raise InvalidData(f"Could not get state of VM ID {vm_id}")
     return vm_state
 
 
@@ -4357,16 +4286,18 @@ def onevm_undeploy_hard(vm_name: str) -> None:
 
     :param vm_name: the name of the VM, ``str``
     """
-    command = f'onevm undeploy "{vm_name}" --hard'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onevm", "undeploy", vm_name, "--hard"]
+    stdout, stderr, rc = run_command(command=command, limiter=ONE_LIMITER)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not undeploy VM {vm_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not undeploy VM {vm_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"VM {vm_name} undeployed. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"VM {vm_name} undeployed. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
     state = onevm_state(vm_name=vm_name)
     while state != "9":
@@ -4381,16 +4312,22 @@ def onevm_updateconf_cpu_model(vm_name: str, cpu_model: str) -> None:
     :param vm_name: the name of the VM, ``str``
     :param file_path: the path of the file, ``str``
     """
-    command = f'echo \'CPU_MODEL=[MODEL="{cpu_model}"]\' | onevm updateconf "{vm_name}"'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onevm", "updateconf", vm_name]
+    stdout, stderr, rc = run_command(
+        command=command,
+        input=f'CPU_MODEL=[MODEL="{cpu_model}"]\n',
+        limiter=ONE_LIMITER,
+    )
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Could not update configuration of VM {vm_name}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Could not update configuration of VM {vm_name}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"Configuration of VM {vm_name} updated. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"Configuration of VM {vm_name} updated. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
@@ -4404,20 +4341,13 @@ def onevm_user_input(vm_name, user_input: str) -> str:
     """
     vm = onevm_show(vm_name=vm_name)
     if vm is None:
-        msg(
-            level="error",
-            message=f"VM {vm_name} not found",
-        )
+        raise NotFound(f"VM {vm_name} not found")
     if "VM" not in vm or "USER_TEMPLATE" not in vm["VM"]:
-        msg(
-            level="error",
-            message=f"VM key not found in VM {vm_name} or USER_TEMPLATE key not found in VM",
+        raise InvalidData(
+            f"VM key not found in VM {vm_name} or USER_TEMPLATE key not found in VM"
         )
     if user_input not in vm["VM"]["USER_TEMPLATE"]:
-        msg(
-            level="error",
-            message=f"User input {user_input} not found in VM {vm_name}",
-        )
+        raise NotFound(f"User input {user_input} not found in VM {vm_name}")
     return vm["VM"]["USER_TEMPLATE"][user_input]
 
 
@@ -4431,20 +4361,13 @@ def onevm_user_input_by_id(vm_id: int, user_input: str) -> str:
     """
     vm = onevm_show_by_id(vm_id=vm_id)
     if vm is None:
-        msg(
-            level="error",
-            message=f"VM ID {vm_id} not found",
-        )
+        raise NotFound(f"VM ID {vm_id} not found")
     if "VM" not in vm or "USER_TEMPLATE" not in vm["VM"]:
-        msg(
-            level="error",
-            message=f"VM key not found in VM ID {vm_id} or USER_TEMPLATE key not found in VM",
+        raise InvalidData(
+            f"VM key not found in VM ID {vm_id} or USER_TEMPLATE key not found in VM"
         )
     if user_input not in vm["VM"]["USER_TEMPLATE"]:
-        msg(
-            level="error",
-            message=f"User input {user_input} not found in VM ID {vm_id}",
-        )
+        raise NotFound(f"User input {user_input} not found in VM ID {vm_id}")
     return vm["VM"]["USER_TEMPLATE"][user_input]
 
 
@@ -4457,18 +4380,14 @@ def onevm_user_template(vm_name: str) -> Dict:
     """
     vm = onevm_show(vm_name=vm_name)
     if vm is None:
-        msg(level="error", message=f"VM {vm_name} not found")
+        raise NotFound(f"VM {vm_name} not found")
     if "VM" not in vm or "USER_TEMPLATE" not in vm["VM"]:
-        msg(
-            level="error",
-            message=f"VM key not found in vm {vm_name} or USER_TEMPLATE key not found in VM",
+        raise InvalidData(
+            f"VM key not found in vm {vm_name} or USER_TEMPLATE key not found in VM"
         )
     user_template = vm["VM"]["USER_TEMPLATE"]
     if user_template is None:
-        msg(
-            level="error",
-            message=f"Could not get user template of VM {vm_name}",
-        )
+        raise InvalidData(f"Could not get user template of VM {vm_name}")
     return user_template
 
 
@@ -4482,15 +4401,11 @@ def onevm_user_template_param(vm_name: str, param: str) -> Dict:
     """
     user_template = onevm_user_template(vm_name=vm_name)
     if param not in user_template:
-        msg(
-            level="error",
-            message=f"Parameter {param} not found in user template of VM {vm_name}",
-        )
+        raise NotFound(f"Parameter {param} not found in user template of VM {vm_name}")
     value = user_template[param]
     if value is None:
-        msg(
-            level="error",
-            message=f"Could not get value of parameter {param} in user template of VM {vm_name}",
+        raise InvalidData(
+            f"Could not get value of parameter {param} in user template of VM {vm_name}"
         )
     return value
 
@@ -4506,18 +4421,15 @@ def onevms_names() -> List[str]:
     if vms is None:
         return []
     if "VM_POOL" not in vms or "VM" not in vms["VM_POOL"]:
-        msg(
-            level="error",
-            message="VM_POOL key not found in vms or VM key not found in VM_POOL",
-        )
-    for vm in vms["VM_POOL"]["VM"]:
+        raise InvalidData("VM_POOL key not found in vms or VM key not found in VM_POOL")
+    vm_pool = vms["VM_POOL"]["VM"]
+    if isinstance(vm_pool, Dict):
+        vm_pool = [vm_pool]
+    for vm in vm_pool:
         if vm is None:
-            msg(level="error", message="VM is empty")
+            raise InvalidData("VM is empty")
         if "NAME" not in vm:
-            msg(
-                level="error",
-                message="NAME key not found in vm",
-            )
+            raise InvalidData("NAME key not found in vm")
         vms_names.append(vm["NAME"])
     return vms_names
 
@@ -4533,23 +4445,17 @@ def onevms_running() -> List[str]:
     if vms is None:
         return []
     if "VM_POOL" not in vms or "VM" not in vms["VM_POOL"]:
-        msg(
-            level="error",
-            message="VM_POOL key not found in vms or VM key not found in VM_POOL",
-        )
-    for vm in vms["VM_POOL"]["VM"]:
+        raise InvalidData("VM_POOL key not found in vms or VM key not found in VM_POOL")
+    vm_pool = vms["VM_POOL"]["VM"]
+    if isinstance(vm_pool, Dict):
+        vm_pool = [vm_pool]
+    for vm in vm_pool:
         if vm is None:
-            msg(level="error", message="VM is empty")
+            raise InvalidData("VM is empty")
         if "NAME" not in vm:
-            msg(
-                level="error",
-                message="NAME key not found in vm",
-            )
+            raise InvalidData("NAME key not found in vm")
         if "STATE" not in vm:
-            msg(
-                level="error",
-                message="STATE key not found in vm",
-            )
+            raise InvalidData("STATE key not found in vm")
         if vm["STATE"] == "3":
             vms_names.append(vm["NAME"])
     return vms_names
@@ -4566,28 +4472,19 @@ def onevms_running_with_ids() -> Dict[str, int]:
     if vms is None:
         return {}
     if "VM_POOL" not in vms or "VM" not in vms["VM_POOL"]:
-        msg(
-            level="error",
-            message="VM_POOL key not found in vms or VM key not found in VM_POOL",
-        )
-    for vm in vms["VM_POOL"]["VM"]:
+        raise InvalidData("VM_POOL key not found in vms or VM key not found in VM_POOL")
+    vm_pool = vms["VM_POOL"]["VM"]
+    if isinstance(vm_pool, Dict):
+        vm_pool = [vm_pool]
+    for vm in vm_pool:
         if vm is None:
-            msg(level="error", message="VM is empty")
+            raise InvalidData("VM is empty")
         if "NAME" not in vm:
-            msg(
-                level="error",
-                message="NAME key not found in vm",
-            )
+            raise InvalidData("NAME key not found in vm")
         if "ID" not in vm:
-            msg(
-                level="error",
-                message="ID key not found in vm",
-            )
+            raise InvalidData("ID key not found in vm")
         if "STATE" not in vm:
-            msg(
-                level="error",
-                message="STATE key not found in vm",
-            )
+            raise InvalidData("STATE key not found in vm")
         if vm["STATE"] == "3":
             vms_dict[vm["NAME"]] = int(vm["ID"])
     return vms_dict
@@ -4607,21 +4504,14 @@ def onevnet_id(vnet_name: str) -> int:
     """
     vnet = onevnet_show(vnet_name=vnet_name)
     if vnet is None:
-        msg(
-            level="error",
-            message=f"Vnet {vnet_name} not found",
-        )
+        raise NotFound(f"Vnet {vnet_name} not found")
     if "VNET" not in vnet or "ID" not in vnet["VNET"]:
-        msg(
-            level="error",
-            message=f"VNET key not found in vnet {vnet_name} or ID key not found in VNET",
+        raise InvalidData(
+            f"VNET key not found in vnet {vnet_name} or ID key not found in VNET"
         )
     vnet_id = vnet["VNET"]["ID"]
     if vnet_id is None:
-        msg(
-            level="error",
-            message=f"Could not get id of vnet {vnet_name}",
-        )
+        raise InvalidData(f"Could not get id of vnet {vnet_name}")
     return vnet_id
 
 
@@ -4631,17 +4521,19 @@ def onevnet_list() -> Dict:
 
     :return: the list of vnets, ``Dict``
     """
-    command = "onevnet list -j"
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onevnet", "list", "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Vnets not found. Create a vnet in OpenNebula before adding an appliance. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Vnets not found. Create a vnet in OpenNebula before adding an appliance. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     else:
         msg(
             level="debug",
-            message=f"Vnets found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"Vnets found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -4653,18 +4545,18 @@ def onevnet_show(vnet_name: str) -> Dict | None:
     :param vnet_name: the name of the vnet, ``str``
     :return: the details of the vnet, ``Dict``
     """
-    command = f'onevnet show "{vnet_name}" -j'
-    stdout, stderr, rc = run_command(command=command)
+    command = ["onevnet", "show", vnet_name, "-j"]
+    stdout, stderr, rc = _one_read(command=command)
     if rc != 0:
         msg(
             level="debug",
-            message=f"Vnet {vnet_name} not found. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+            message=f"Vnet {vnet_name} not found. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
         )
         return None
     else:
         msg(
             level="debug",
-            message=f"Vnet {vnet_name} found. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+            message=f"Vnet {vnet_name} found. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
         )
         return loads_json(data=stdout)
 
@@ -4678,17 +4570,13 @@ def onevnets_names() -> List[str]:
     vnets = onevnet_list()
     vnets_names = []
     if "VNET_POOL" not in vnets or "VNET" not in vnets["VNET_POOL"]:
-        msg(
-            level="error",
-            message="VNET_POOL key not found in vnets or VNET key not found in VNET_POOL",
+        raise InvalidData(
+            "VNET_POOL key not found in vnets or VNET key not found in VNET_POOL"
         )
     for vnet in vnets["VNET_POOL"]["VNET"]:
         if vnet is None:
-            msg(level="error", message="Vnet is empty")
+            raise InvalidData("Vnet is empty")
         if "NAME" not in vnet:
-            msg(
-                level="error",
-                message="NAME key not found in vnet",
-            )
+            raise InvalidData("NAME key not found in vnet")
         vnets_names.append(vnet["NAME"])
     return vnets_names
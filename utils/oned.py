@@ -0,0 +1,143 @@
+import os
+import re
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from utils.exceptions import NotFound
+from utils.logs import msg
+
+# The value is made of quoted strings, which can contain a #, and unquoted text
+ONED_CONF_KEY_PATTERN = re.compile(
+    r'^(?P<prefix>\s*(?P<key>[A-Z][A-Z0-9_]*)\s*=\s*)(?P<value>(?:"[^"\n]*"|[^"\[#\n])*?)(?P<suffix>\s*(?:#.*)?)$'
+)
+
+# A # followed by an even number of quotes is outside a quoted string
+ONED_CONF_COMMENT_PATTERN = re.compile(r'#(?=(?:[^"]*"[^"]*")*[^"]*$)')
+
+_oned_conf_cache: Dict[str, Tuple[Tuple[int, int], "OnedConf"]] = {}
+
+
+class OnedConf:
+    """
+    Parsed view of the top level settings of the oned.conf file
+    """
+
+    def __init__(self, path: str, lines: List[str]):
+        self.path = path
+        self.lines = lines
+        self.settings: Dict[str, Tuple[int, str]] = {}
+        depth = 0
+        for index, line in enumerate(lines):
+            content = ONED_CONF_COMMENT_PATTERN.split(line, maxsplit=1)[0]
+            if depth == 0:
+                match = ONED_CONF_KEY_PATTERN.match(line.rstrip("\n"))
+                if match and "[" not in content:
+                    self.settings[match.group("key")] = (
+                        index,
+                        match.group("value").strip(),
+                    )
+            depth += content.count("[") - content.count("]")
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """
+        Get the value of a top level setting without quotes
+
+        :param key: the name of the setting, ``str``
+        :param default: the value returned if the setting is not defined, ``Optional[str]``
+        :return: the value of the setting, ``Optional[str]``
+        """
+        if key not in self.settings:
+            return default
+        return self.settings[key][1].strip('"')
+
+    @property
+    def onegate_endpoint(self) -> Optional[str]:
+        """
+        The ONEGATE_ENDPOINT setting
+        """
+        return self.get(key="ONEGATE_ENDPOINT")
+
+    @property
+    def monitoring_interval_market(self) -> Optional[int]:
+        """
+        The MONITORING_INTERVAL_MARKET setting in seconds
+        """
+        value = self.get(key="MONITORING_INTERVAL_MARKET")
+        return int(value) if value is not None and value.isdigit() else None
+
+    @property
+    def port(self) -> int:
+        """
+        The PORT setting of the XML-RPC server, 2633 by default
+        """
+        value = self.get(key="PORT", default="2633")
+        return int(value) if value.isdigit() else 2633
+
+    def update(self, key: str, value: str) -> None:
+        """
+        Patch the line of a top level setting and write the file atomically
+
+        :param key: the name of the setting, ``str``
+        :param value: the new raw value of the setting (quotes included if needed), ``str``
+        """
+        lines = list(self.lines)
+        if key in self.settings:
+            index = self.settings[key][0]
+            line = lines[index]
+            newline = "\n" if line.endswith("\n") else ""
+            match = ONED_CONF_KEY_PATTERN.match(line.rstrip("\n"))
+            lines[index] = (
+                f"{match.group('prefix')}{value}{match.group('suffix')}{newline}"
+            )
+        else:
+            if lines and not lines[-1].endswith("\n"):
+                lines[-1] += "\n"
+            lines.append(f"{key} = {value}\n")
+        write_oned_conf(path=self.path, lines=lines)
+
+
+def load_oned_conf(path: str) -> OnedConf:
+    """
+    Load the oned.conf file, reusing the parsed result while its mtime and size do not change
+
+    :param path: the path to the oned.conf file, ``str``
+    :return: the parsed configuration, ``OnedConf``
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise NotFound(f"File not found: {path}")
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _oned_conf_cache.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    with open(file=path, mode="rt", encoding="utf-8") as file:
+        oned_conf = OnedConf(path=path, lines=file.readlines())
+    _oned_conf_cache[path] = (signature, oned_conf)
+    msg(level="debug", message=f"OpenNebula configuration file {path} parsed")
+    return oned_conf
+
+
+def write_oned_conf(path: str, lines: List[str]) -> None:
+    """
+    Atomically replace the oned.conf file keeping its permissions and owner
+
+    :param path: the path to the oned.conf file, ``str``
+    :param lines: the lines of the new file, ``List[str]``
+    """
+    stat = os.stat(path)
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".oned.conf.")
+    try:
+        with os.fdopen(fd, mode="wt", encoding="utf-8") as file:
+            file.writelines(lines)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temp_path, stat.st_mode & 0o7777)
+        if os.geteuid() == 0:
+            os.chown(temp_path, stat.st_uid, stat.st_gid)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    _oned_conf_cache.pop(path, None)
@@ -2,6 +2,7 @@ import os
 import shutil
 from typing import List
 
+from utils.exceptions import ConfigurationError
 from utils.logs import msg
 
 CURRENT_DIRECTORY = os.getcwd()
@@ -29,7 +30,7 @@ def get_dotenv_var(key: str) -> str:
     """
     value = os.getenv(key=key)
     if value is None:
-        msg(level="error", message=f"Environment variable {key} not found")
+        raise ConfigurationError(f"Environment variable {key} not found")
     msg(level="debug", message=f"Environment variable {key} value: {value}")
     return value
 
@@ -1,11 +1,31 @@
 import base64
+import hashlib
+import hmac
+from binascii import Error as BinasciiError
+from binascii import unhexlify
 from typing import Dict
 
 import yaml
 
-from utils.cli import run_command
+from utils.cli import join_command, run_command
+from utils.exceptions import CommandFailed, InvalidData
 from utils.logs import msg
 
+try:
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    from cryptography.hazmat.primitives.padding import PKCS7
+except ImportError:
+    # Without the cryptography package the data is decrypted by ansible-vault
+    Cipher = None
+
+VAULT_HEADER = "$ANSIBLE_VAULT;"
+
+# Key derivation of the AES256 cipher of Ansible Vault
+VAULT_PBKDF2_ITERATIONS = 10000
+
+# Whether ansible_decrypt_data decrypts in this process instead of running ansible-vault
+VAULT_IN_MEMORY = Cipher is not None
+
 
 def ansible_decrypt(data_path: str, token_path: str) -> None:
     """
@@ -14,19 +34,85 @@ def ansible_decrypt(data_path: str, token_path: str) -> None:
     :param data_path: the path to the file to be decrypted, ``str``
     :param token_path: the path to the token file, ``str``
     """
-    command = f"ansible-vault decrypt {data_path} --vault-password={token_path}"
+    command = ["ansible-vault", "decrypt", data_path, f"--vault-password={token_path}"]
     stdout, stderr, rc = run_command(command=command)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Error decrypting file: {data_path}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Error decrypting file: {data_path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"File decrypted successfully: {data_path}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"File decrypted successfully: {data_path}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
+def ansible_decrypt_data(data: str, token_path: str) -> str:
+    """
+    Decrypt Ansible Vault data without writing it to a file
+
+    The AES256 cipher of Ansible Vault is applied in this process when the cryptography package is installed, otherwise the data is passed through the stdin of ansible-vault
+
+    :param data: the encrypted data, ``str``
+    :param token_path: the path to the token file, ``str``
+    :return: the decrypted data, ``str``
+    """
+    if not VAULT_IN_MEMORY:
+        command = [
+            "ansible-vault",
+            "decrypt",
+            f"--vault-password={token_path}",
+            "--output=-",
+        ]
+        stdout, stderr, rc = run_command(command=command, input=data)
+        if rc != 0:
+            raise CommandFailed(
+                f"Error decrypting data. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+                command=command,
+                stderr=stderr,
+                rc=rc,
+            )
+        return stdout
+    lines = data.strip().splitlines()
+    # $ANSIBLE_VAULT;<version>;<cipher>[;<vault id>]
+    header = lines[0].split(";") if lines else []
+    if (
+        len(header) < 3
+        or header[0] != VAULT_HEADER.rstrip(";")
+        or header[2] != "AES256"
+    ):
+        raise InvalidData(
+            f"Data is not encrypted with the AES256 cipher of Ansible Vault: {lines[0] if lines else ''}"
+        )
+    try:
+        salt, expected_hmac, ciphertext = (
+            unhexlify(part) for part in unhexlify("".join(lines[1:])).split(b"\n", 2)
+        )
+    except (BinasciiError, ValueError):
+        raise InvalidData("Ansible Vault data is malformed") from None
+    with open(file=token_path, mode="rt", encoding="utf-8") as file:
+        password = file.read().strip()
+    key = hashlib.pbkdf2_hmac(
+        "sha256", password.encode(), salt, VAULT_PBKDF2_ITERATIONS, dklen=80
+    )
+    if not hmac.compare_digest(
+        hmac.new(key[32:64], ciphertext, hashlib.sha256).digest(), expected_hmac
+    ):
+        raise InvalidData(
+            f"Ansible Vault data cannot be decrypted with the token in {token_path}"
+        )
+    decryptor = Cipher(algorithms.AES(key[:32]), modes.CTR(key[64:])).decryptor()
+    unpadder = PKCS7(algorithms.AES.block_size).unpadder()
+    padded = decryptor.update(ciphertext) + decryptor.finalize()
+    try:
+        plaintext = unpadder.update(padded) + unpadder.finalize()
+    except ValueError:
+        raise InvalidData("Ansible Vault data is malformed") from None
+    return plaintext.decode(encoding="utf-8")
+
+
 def ansible_encrypt(data_path: str, token_path: str) -> None:
     """
     Encrypt a file using Ansible Vault
@@ -34,16 +120,18 @@ def ansible_encrypt(data_path: str, token_path: str) -> None:
     :param data_path: the path to the file to be encrypted, ``str``
     :param token_path: the path to the token file, ``str``
     """
-    command = f"ansible-vault encrypt {data_path} --vault-password={token_path}"
+    command = ["ansible-vault", "encrypt", data_path, f"--vault-password={token_path}"]
     stdout, stderr, rc = run_command(command=command)
     if rc != 0:
-        msg(
-            level="error",
-            message=f"Error encrypting file: {data_path}. Command executed: {command}. Error received: {stderr}. Return code: {rc}",
+        raise CommandFailed(
+            f"Error encrypting file: {data_path}. Command executed: {join_command(command)}. Error received: {stderr}. Return code: {rc}",
+            command=command,
+            stderr=stderr,
+            rc=rc,
         )
     msg(
         level="debug",
-        message=f"File encrypted successfully: {data_path}. Command executed: {command}. Output received: {stdout}. Return code: {rc}",
+        message=f"File encrypted successfully: {data_path}. Command executed: {join_command(command)}. Output received: {stdout}. Return code: {rc}",
     )
 
 
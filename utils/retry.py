@@ -0,0 +1,235 @@
+import asyncio
+import random
+import re
+from time import monotonic, sleep
+from typing import Dict, FrozenSet, Optional, Tuple
+
+from utils.cli import Command, join_command, run_command, run_command_async
+from utils.exceptions import CommandTimeout
+from utils.limiter import AIMDLimiter
+from utils.logs import msg
+from utils.metrics import register_metrics
+
+
+class RetryPolicy:
+    """
+    Declarative retry policy for a class of idempotent operations
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        deadline: float = 60.0,
+        return_codes: FrozenSet[int] = frozenset(),
+        stderr_pattern: Optional[re.Pattern] = None,
+        http_statuses: FrozenSet[str] = frozenset(),
+        retry_timeouts: bool = True,
+    ):
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.return_codes = return_codes
+        self.stderr_pattern = stderr_pattern
+        self.http_statuses = http_statuses
+        self.retry_timeouts = retry_timeouts
+        self.retries = 0
+        self.recovered = 0
+        self.exhausted = 0
+        register_metrics(name=f"{name} retries", provider=self.metrics)
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Get the seconds to wait after a failed attempt, exponential with full jitter
+
+        :param attempt: the number of the failed attempt, starting at 1, ``int``
+        :return: the seconds to wait, ``float``
+        """
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        )
+
+    def is_retryable(self, stdout: str, stderr: str, rc: int) -> bool:
+        """
+        Check if the result of a command is a transient failure
+
+        The HTTP status is read from the last three characters of stdout, as written by curl -w "%{http_code}"
+
+        :param stdout: the output of the command, ``str``
+        :param stderr: the error of the command, ``str``
+        :param rc: the return code of the command, ``int``
+        :return: whether the command should be retried, ``bool``
+        """
+        if rc in self.return_codes:
+            return True
+        if rc != 0 and self.stderr_pattern is not None:
+            if self.stderr_pattern.search(stderr):
+                return True
+        return bool(self.http_statuses) and stdout[-3:] in self.http_statuses
+
+    def metrics(self) -> Dict[str, int]:
+        """
+        Get the counters of the policy
+
+        :return: the number of retries, operations recovered and operations that ran out of attempts, ``Dict[str, int]``
+        """
+        return {
+            "retries": self.retries,
+            "recovered": self.recovered,
+            "exhausted": self.exhausted,
+        }
+
+    def next_delay(self, attempt: int, deadline: float) -> Optional[float]:
+        """
+        Get the seconds to wait before the next attempt, or None if the budget is spent
+
+        :param attempt: the number of the failed attempt, starting at 1, ``int``
+        :param deadline: the monotonic time at which the operation must give up, ``float``
+        :return: the seconds to wait, ``Optional[float]``
+        """
+        delay = self.backoff(attempt=attempt)
+        if attempt >= self.max_attempts or monotonic() + delay > deadline:
+            self.exhausted += 1
+            return None
+        self.retries += 1
+        return delay
+
+
+# Errors of the OpenNebula CLI while oned or the OneFlow server are restarting or overloaded
+ONE_TRANSIENT_ERRORS = re.compile(
+    r"ECONNREFUSED|ECONNRESET|Connection refused|Failed to open TCP connection|execution expired|timed? ?out|Service Unavailable|Server is not running",
+    re.IGNORECASE,
+)
+
+ONE_READ_RETRY = RetryPolicy(
+    name="OpenNebula reads", stderr_pattern=ONE_TRANSIENT_ERRORS
+)
+
+# Concurrency window of every OpenNebula CLI command, cut when oned answers slowly or with those errors
+ONE_LIMITER = AIMDLimiter(
+    name="OpenNebula concurrency", overload_pattern=ONE_TRANSIENT_ERRORS
+)
+
+# Network errors of git against a remote
+GIT_REMOTE_RETRY = RetryPolicy(
+    name="git remote",
+    stderr_pattern=re.compile(
+        r"Could not resolve host|Connection (?:timed out|reset|refused)|Operation timed out|early EOF|RPC failed|The requested URL returned error: (?:429|5\d\d)|gnutls_handshake|SSL_read|remote end hung up",
+        re.IGNORECASE,
+    ),
+)
+
+# curl network errors (resolve, connect, timeout, TLS, empty reply, receive) and transient HTTP statuses
+HTTP_READ_RETRY = RetryPolicy(
+    name="HTTP reads",
+    return_codes=frozenset({6, 7, 28, 35, 52, 56}),
+    http_statuses=frozenset({"000", "408", "429", "500", "502", "503", "504"}),
+)
+
+
+def _log_retry(
+    policy: RetryPolicy, command: Command, attempt: int, delay: float, error: str
+) -> None:
+    """
+    Log that an attempt failed and is going to be retried
+
+    :param policy: the retry policy, ``RetryPolicy``
+    :param command: the command that failed, ``Command``
+    :param attempt: the number of the failed attempt, ``int``
+    :param delay: the seconds until the next attempt, ``float``
+    :param error: the error received, ``str``
+    """
+    msg(
+        level="warning",
+        message=f"Transient failure in attempt {attempt} of {policy.max_attempts} ({policy.name}). Retrying in {delay:.1f} seconds. Command executed: {join_command(command)}. Error received: {error}",
+    )
+
+
+def retry_command(
+    command: Command,
+    policy: RetryPolicy,
+    input: Optional[str] = None,
+    timeout: Optional[float] = None,
+    limiter: Optional[AIMDLimiter] = None,
+) -> Tuple[str, str, int]:
+    """
+    Run an idempotent command, retrying transient failures as the policy says
+
+    :param command: the argument vector or shell line to run, ``Command``
+    :param policy: the retry policy of the operation, ``RetryPolicy``
+    :param input: the data sent to the stdin of the command, ``Optional[str]``
+    :param timeout: the maximum seconds each attempt can run, ``Optional[float]``
+    :param limiter: the concurrency limiter of the backend the command talks to, ``Optional[AIMDLimiter]``
+    :return: the stdout, stderr and return code of the last attempt, ``Tuple[str, str, int]``
+    """
+    deadline = monotonic() + policy.deadline
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            stdout, stderr, rc = run_command(
+                command=command, input=input, timeout=timeout, limiter=limiter
+            )
+        except CommandTimeout as e:
+            delay = policy.next_delay(attempt=attempt, deadline=deadline)
+            if not policy.retry_timeouts or delay is None:
+                raise
+            _log_retry(policy, command, attempt, delay, e.message)
+            sleep(delay)
+            continue
+        if not policy.is_retryable(stdout=stdout, stderr=stderr, rc=rc):
+            if attempt > 1 and rc == 0:
+                policy.recovered += 1
+            return stdout, stderr, rc
+        delay = policy.next_delay(attempt=attempt, deadline=deadline)
+        if delay is None:
+            return stdout, stderr, rc
+        _log_retry(policy, command, attempt, delay, stderr or stdout[-3:])
+        sleep(delay)
+
+
+async def retry_command_async(
+    command: Command,
+    policy: RetryPolicy,
+    input: Optional[str] = None,
+    timeout: Optional[float] = None,
+    limiter: Optional[AIMDLimiter] = None,
+) -> Tuple[str, str, int]:
+    """
+    Run an idempotent command without blocking the event loop, retrying transient failures as the policy says
+
+    :param command: the argument vector or shell line to run, ``Command``
+    :param policy: the retry policy of the operation, ``RetryPolicy``
+    :param input: the data sent to the stdin of the command, ``Optional[str]``
+    :param timeout: the maximum seconds each attempt can run, ``Optional[float]``
+    :param limiter: the concurrency limiter of the backend the command talks to, ``Optional[AIMDLimiter]``
+    :return: the stdout, stderr and return code of the last attempt, ``Tuple[str, str, int]``
+    """
+    deadline = monotonic() + policy.deadline
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            stdout, stderr, rc = await run_command_async(
+                command=command, input=input, timeout=timeout, limiter=limiter
+            )
+        except CommandTimeout as e:
+            delay = policy.next_delay(attempt=attempt, deadline=deadline)
+            if not policy.retry_timeouts or delay is None:
+                raise
+            _log_retry(policy, command, attempt, delay, e.message)
+            await asyncio.sleep(delay)
+            continue
+        if not policy.is_retryable(stdout=stdout, stderr=stderr, rc=rc):
+            if attempt > 1 and rc == 0:
+                policy.recovered += 1
+            return stdout, stderr, rc
+        delay = policy.next_delay(attempt=attempt, deadline=deadline)
+        if delay is None:
+            return stdout, stderr, rc
+        _log_retry(policy, command, attempt, delay, stderr or stdout[-3:])
+        await asyncio.sleep(delay)
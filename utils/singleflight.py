@@ -0,0 +1,116 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+from utils.metrics import register_metrics
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Group of calls where concurrent calls with the same key share one execution, whether they come from threads or event loops
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.executions = 0
+        self.deduplicated = 0
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        register_metrics(name=name, provider=self.metrics)
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        """
+        Get the call in flight with a key, starting a new one if there is none
+
+        :param key: the key that identifies identical calls, ``Hashable``
+        :return: the result of the call and whether the caller has to run it, ``Tuple[Future, bool]``
+        """
+        with self._lock:
+            self.calls += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self.deduplicated += 1
+                return future, False
+            self.executions += 1
+            future = Future()
+            self._inflight[key] = future
+            return future, True
+
+    def _leave(self, key: Hashable) -> None:
+        """
+        Forget the call in flight with a key, the next call runs again
+
+        :param key: the key that identifies identical calls, ``Hashable``
+        """
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def do(self, key: Hashable, function: Callable[[], T]) -> T:
+        """
+        Run a call in the current thread unless one with the same key is already in flight, then wait for its result
+
+        :param key: the key that identifies identical calls, ``Hashable``
+        :param function: the function that makes the call, ``Callable[[], T]``
+        :return: the result of the call, ``T``
+        """
+        future, leader = self._join(key=key)
+        if not leader:
+            return future.result()
+        try:
+            result = function()
+        except BaseException as e:
+            self._leave(key=key)
+            future.set_exception(e)
+            raise
+        self._leave(key=key)
+        future.set_result(result)
+        return result
+
+    async def do_async(self, key: Hashable, function: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run a call in the running event loop unless one with the same key is already in flight, then wait for its result
+
+        :param key: the key that identifies identical calls, ``Hashable``
+        :param function: the function that starts the call, ``Callable[[], Awaitable[T]]``
+        :return: the result of the call, ``T``
+        """
+        future, leader = self._join(key=key)
+        if leader:
+            task = asyncio.ensure_future(function())
+
+            def _finish(task: asyncio.Task) -> None:
+                self._leave(key=key)
+                if task.cancelled():
+                    future.cancel()
+                elif task.exception() is not None:
+                    future.set_exception(task.exception())
+                else:
+                    future.set_result(task.result())
+
+            task.add_done_callback(_finish)
+        # A caller being cancelled must not cancel the call for the others
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def metrics(self) -> Dict[str, int]:
+        """
+        Get the counters of the group
+
+        :return: the number of calls, executions, deduplicated and in flight calls, ``Dict[str, int]``
+        """
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "deduplicated": self.deduplicated,
+            "inflight": len(self._inflight),
+        }
+
+
+# Reads of the OpenNebula CLI, keyed by their argument vector
+ONE_READS = SingleFlight(name="OpenNebula reads")
+
+# HTTP GET requests, keyed by their method and URL
+HTTP_READS = SingleFlight(name="HTTP reads")
@@ -0,0 +1,149 @@
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import yaml
+
+from utils.exceptions import ToolkitError
+from utils.git import GitCatFile, git_fetch_heads, git_mirror, git_refs
+from utils.logs import msg
+from utils.parser import VAULT_HEADER, VAULT_IN_MEMORY, ansible_decrypt_data
+
+SITE_CORE_FILE = "core.yaml"
+
+# Variables of a component that hold the OpenNebula template or image of an appliance
+APPLIANCE_VARIABLE_SUFFIXES = ("template_id", "image_id")
+
+
+def _site_components(
+    site: str, data: bytes, token_path: str
+) -> Tuple[str, Optional[Dict[str, Dict]], Optional[str]]:
+    """
+    Decrypt and parse the core.yaml of a site, run in the workers of the pool
+
+    :param site: the name of the site, ``str``
+    :param data: the content of the core.yaml, encrypted or not, ``bytes``
+    :param token_path: the path to the token file of the sites, ``str``
+    :return: the site, its components with the appliance variables and the error if it cannot be read, ``Tuple[str, Optional[Dict[str, Dict]], Optional[str]]``
+    """
+    try:
+        text = data.decode(encoding="utf-8")
+        if text.startswith(VAULT_HEADER):
+            text = ansible_decrypt_data(data=text, token_path=token_path)
+        core = yaml.safe_load(text)
+    except (ToolkitError, UnicodeDecodeError, yaml.YAMLError) as e:
+        return site, None, str(getattr(e, "message", e))
+    if not isinstance(core, Dict):
+        return site, None, f"{SITE_CORE_FILE} is not a dictionary"
+    components = {}
+    for component, variables in (core.get("site_available_components") or {}).items():
+        variables = variables if isinstance(variables, Dict) else {}
+        components[component] = {
+            key: value
+            for key, value in variables.items()
+            if key.endswith(APPLIANCE_VARIABLE_SUFFIXES)
+        }
+    return site, components, None
+
+
+def _executor(workers: int) -> Executor:
+    """
+    Get the pool that decrypts the sites, processes when the decryption is done in memory and threads when ansible-vault does it
+
+    :param workers: the number of workers, ``int``
+    :return: the pool, ``Executor``
+    """
+    if VAULT_IN_MEMORY:
+        # Forked workers would inherit the locks held by the threads of the installer
+        return ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("forkserver")
+        )
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sites")
+
+
+def read_sites_core(path: str, sites: List[str]) -> Dict[str, bytes]:
+    """
+    Read the core.yaml of each site from its branch through a single cat-file process, without a checkout
+
+    :param path: the path to the repository with a branch per site, ``str``
+    :param sites: the names of the site branches, ``List[str]``
+    :return: the content of the core.yaml by site, the branches without it are left out, ``Dict[str, bytes]``
+    """
+    cores = {}
+    with GitCatFile(path=path) as cat_file:
+        for site in sites:
+            data = cat_file.read(object=f"refs/heads/{site}:{site}/{SITE_CORE_FILE}")
+            if data is None:
+                msg(
+                    level="debug",
+                    message=f"Branch {site} has no {site}/{SITE_CORE_FILE}, it is not a site",
+                )
+                continue
+            cores[site] = data
+    return cores
+
+
+def sites_inventory(
+    https_url: str,
+    path: str,
+    token_path: str,
+    token: str = None,
+    workers: Optional[int] = None,
+) -> Dict[str, Dict]:
+    """
+    Get the components enabled in every site of the sites repository
+
+    The branches are read from the shared mirror when the git cache is enabled, otherwise their tips are fetched into a bare repository in the path
+
+    :param https_url: the URL of the sites repository, ``str``
+    :param path: the path of the bare repository used without the git cache, ``str``
+    :param token_path: the path to the token file of the sites, ``str``
+    :param token: the token to access the repository, ``str``
+    :param workers: the number of workers that decrypt the sites, the number of CPUs by default, ``Optional[int]``
+    :return: by site, its components with their appliance variables or the error if it cannot be read, ``Dict[str, Dict]``
+    """
+    repository_path = git_mirror(https_url=https_url, token=token)
+    if repository_path is None:
+        git_fetch_heads(https_url=https_url, path=path, token=token)
+        repository_path = path
+    cores = read_sites_core(
+        path=repository_path, sites=git_refs(path=repository_path).names()
+    )
+    workers = workers or os.cpu_count() or 1
+    inventory = {}
+    with _executor(workers=workers) as executor:
+        for site, components, error in executor.map(
+            _site_components,
+            cores.keys(),
+            cores.values(),
+            [token_path] * len(cores),
+            chunksize=max(1, len(cores) // (4 * workers)),
+        ):
+            if error is not None:
+                msg(
+                    level="warning",
+                    message=f"Site {site} cannot be read: {error}",
+                )
+                inventory[site] = {"error": error}
+            else:
+                inventory[site] = {"components": components}
+    msg(
+        level="debug",
+        message=f"Inventory of {len(inventory)} sites read from the repository {repository_path}",
+    )
+    return dict(sorted(inventory.items()))
+
+
+def component_site_matrix(inventory: Dict[str, Dict]) -> Dict[str, List[str]]:
+    """
+    Get the sites where each component is enabled
+
+    :param inventory: the inventory returned by sites_inventory, ``Dict[str, Dict]``
+    :return: the sorted sites by component, the components sorted by name, ``Dict[str, List[str]]``
+    """
+    matrix: Dict[str, List[str]] = {}
+    for site, site_inventory in inventory.items():
+        for component in site_inventory.get("components", {}):
+            matrix.setdefault(component, []).append(site)
+    return {component: sorted(sites) for component, sites in sorted(matrix.items())}
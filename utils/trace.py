@@ -0,0 +1,228 @@
+import json
+import os
+import re
+import shlex
+import threading
+from collections import defaultdict
+from math import ceil
+from time import time
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from utils.logs import MessageBuffer, buffer_thread_messages, msg
+
+# Credentials that can appear in the argument vector of a command
+SECRET_PATTERNS = [
+    (re.compile(r"((?:Bearer|Basic) )\S+"), r"\1***"),
+    (re.compile(r"(https?://)[^@/\s]+@"), r"\1***@"),
+]
+
+# Programs whose first argument is a subcommand, besides the OpenNebula CLI. The
+# requests to the GitHub API are traced as github <method>
+SUBCOMMAND_PROGRAMS = ("ansible-vault", "git", "github", "systemctl")
+
+_tracer: Optional["CommandTracer"] = None
+_tracer_loaded = False
+_phase: Optional[str] = None
+_thread_phase = threading.local()
+
+
+def _redact(text: str) -> str:
+    """
+    Hide the credentials found in a text
+
+    :param text: the text to redact, ``str``
+    :return: the text without credentials, ``str``
+    """
+    for pattern, replacement in SECRET_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def command_class(command: str | List[str]) -> str:
+    """
+    Get the class of a command, the program and its subcommand, such as onevm show or git fetch
+
+    :param command: the argument vector or shell line, ``str | List[str]``
+    :return: the class of the command, ``str``
+    """
+    if isinstance(command, str):
+        try:
+            argv = shlex.split(command.split("|", 1)[0])
+        except ValueError:
+            argv = command.split()
+        return f"sh {command_class(argv)}" if argv else "sh"
+    program = os.path.basename(command[0])
+    args = command[1:]
+    if program == "git":
+        # Skip the global options, -C takes the path as its value
+        while args and args[0].startswith("-"):
+            args = args[2:] if args[0] in ("-C", "-c") else args[1:]
+    if program.startswith("one") or program in SUBCOMMAND_PROGRAMS:
+        if args and not args[0].startswith("-"):
+            return f"{program} {args[0]}"
+    return program
+
+
+def redact_command(command: str | List[str]) -> str:
+    """
+    Render a command hiding the tokens, passwords and credentials in URLs
+
+    :param command: the argument vector or shell line, ``str | List[str]``
+    :return: the command without credentials, ``str``
+    """
+    if isinstance(command, str):
+        return _redact(text=command)
+    if command_class(command=command) in ("oneuser create", "oneuser passwd"):
+        command = command[:3] + ["***"] + command[4:]
+    return shlex.join([_redact(text=arg) for arg in command])
+
+
+class CommandTracer:
+    """
+    Record of every command run, written as JSON lines
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+        self._file: Optional[TextIO] = None
+        self._lock = threading.Lock()
+
+    def close(self) -> None:
+        """
+        Close the trace file
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def mark_phase(self, phase: str, start: float) -> None:
+        """
+        Append the start of an installer phase to the trace file
+
+        :param phase: the name of the phase, ``str``
+        :param start: the epoch time when the phase started, ``float``
+        """
+        self._write(record={"phase": phase, "start": round(start, 6)})
+
+    def record(
+        self,
+        command: str | List[str],
+        start: float,
+        duration: float,
+        rc: Optional[int],
+        stdout_bytes: int,
+        stderr_bytes: int,
+        phase: Optional[str] = None,
+    ) -> None:
+        """
+        Append a command to the trace file
+
+        :param command: the argument vector or shell line run, ``str | List[str]``
+        :param start: the epoch time when the command started, ``float``
+        :param duration: the seconds the command took, ``float``
+        :param rc: the return code of the command, None if it was killed, ``Optional[int]``
+        :param stdout_bytes: the size of the output, ``int``
+        :param stderr_bytes: the size of the error output, ``int``
+        :param phase: the phase that ran the command, the phase of the current thread by default, ``Optional[str]``
+        """
+        cls = command_class(command=command)
+        self.durations[cls].append(duration)
+        record = {
+            "command": redact_command(command=command),
+            "class": cls,
+            "phase": phase or get_phase(),
+            "start": round(start, 6),
+            "duration": round(duration, 6),
+            "rc": rc,
+            "stdout_bytes": stdout_bytes,
+            "stderr_bytes": stderr_bytes,
+        }
+        self._write(record=record)
+
+    def _write(self, record: Dict) -> None:
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, mode="at", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+
+    def summary(self) -> List[Tuple[str, int, float, float]]:
+        """
+        Group the recorded commands by class, the slowest classes first
+
+        :return: the class, count, total and p95 seconds of each class, ``List[Tuple[str, int, float, float]]``
+        """
+        rows = []
+        for cls, durations in self.durations.items():
+            ordered = sorted(durations)
+            p95 = ordered[max(0, ceil(0.95 * len(ordered)) - 1)]
+            rows.append((cls, len(ordered), sum(ordered), p95))
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+
+def get_tracer() -> Optional[CommandTracer]:
+    """
+    Get the command tracer, enabled when TOOLKIT_INSTALLER_TRACE_PATH is set to a file path
+
+    :return: the command tracer or None if tracing is disabled, ``Optional[CommandTracer]``
+    """
+    global _tracer, _tracer_loaded
+    if not _tracer_loaded:
+        path = os.getenv("TOOLKIT_INSTALLER_TRACE_PATH", "")
+        _tracer = CommandTracer(path=path) if path else None
+        _tracer_loaded = True
+    return _tracer
+
+
+def get_phase() -> Optional[str]:
+    """
+    Get the installer phase in progress
+
+    :return: the name of the phase or None if no phase has started, ``Optional[str]``
+    """
+    return getattr(_thread_phase, "phase", None) or _phase
+
+
+def set_phase(phase: str) -> None:
+    """
+    Start an installer phase, the commands traced from now on are tagged with it
+
+    :param phase: the name of the phase, ``str``
+    """
+    global _phase
+    _phase = phase
+    tracer = get_tracer()
+    if tracer is not None:
+        tracer.mark_phase(phase=phase, start=time())
+
+
+def set_thread_phase(phase: str, messages: Optional[MessageBuffer] = None) -> None:
+    """
+    Tag the commands run by the current thread with a phase of their own, used by the work done in the background
+
+    :param phase: the name of the phase, ``str``
+    :param messages: the buffer that keeps the messages of the thread until they are waited for, ``Optional[MessageBuffer]``
+    """
+    _thread_phase.phase = phase
+    buffer_thread_messages(buffer=messages)
+
+
+def log_trace_summary() -> None:
+    """
+    Log a table with the count, total and p95 time of the traced commands by class
+    """
+    tracer = get_tracer()
+    if tracer is None or not tracer.durations:
+        return
+    rows = tracer.summary()
+    width = max(len("Command"), *(len(row[0]) for row in rows))
+    lines = [f"{'Command':<{width}}  {'Count':>7}  {'Total (s)':>10}  {'p95 (s)':>9}"]
+    for cls, count, total, p95 in rows:
+        lines.append(f"{cls:<{width}}  {count:>7}  {total:>10.2f}  {p95:>9.3f}")
+    msg(
+        level="info",
+        message=f"Commands traced to {tracer.path}:\n" + "\n".join(lines),
+    )
+    tracer.close()